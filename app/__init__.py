@@ -4,6 +4,7 @@ from fastapi import HTTPException
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.errors.custom_exception import CustomException
+from app.errors.exceptions import AppError
 from app.errors.message import ErrorMessage
 from app.logger import app_logger
 from app.models import session
@@ -19,6 +20,9 @@ def handle_errors(func):
             return await func(*args, **kwargs)
         except CustomException as exc:
             raise CustomException(detail=exc.detail, status_code=exc.status_code) from exc
+        except AppError as exc:
+            app_logger.error(exc)
+            raise CustomException(detail=exc.message, status_code=exc.status_code) from exc
         except HTTPException as exc:
             app_logger.error(exc)
             raise HTTPException(detail=ErrorMessage.INTERNAL_SERVER_ERROR, status_code=500) from exc
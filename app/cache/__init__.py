@@ -0,0 +1,20 @@
+# isort: skip_file
+import os
+
+from app.cache.response_cache import CachedResponse, ResponseCache, etag_matches
+from app.cache.prefetch import FramePrefetcher
+from app.models.identity_cache import IdentityCache
+
+# frames and screenshots are served by the frame id, which always points to the same frame,
+# so browsers keep them without asking again
+FRAME_CACHE_CONTROL = os.getenv('FRAME_CACHE_CONTROL', 'private, max-age=31536000, immutable')
+# a frame no points to another frame when a late frame is inserted before it,
+# so its redirect to the frame id is looked up every time
+FRAME_NO_CACHE_CONTROL = 'private, no-cache'
+# screenshots read ahead by the frame prefetch, the others are sent from their files
+SCREENSHOT_CACHE_MAX_BYTES = int(os.getenv('SCREENSHOT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+frame_response_cache = ResponseCache('frames')
+screenshot_response_cache = ResponseCache('screenshots', max_bytes=SCREENSHOT_CACHE_MAX_BYTES)
+# ids of the frames at the frame nos last read, only telling the prefetch which frames are cached already
+frame_no_hints = IdentityCache('frame_nos')
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from app.logger import app_logger
+
+# frames read ahead of the first step of a session, doubled on each step in the same direction up to the max
+FRAME_PREFETCH_MIN_WINDOW = int(os.getenv('FRAME_PREFETCH_MIN_WINDOW', '2'))
+FRAME_PREFETCH_MAX_WINDOW = int(os.getenv('FRAME_PREFETCH_MAX_WINDOW', '8'))
+# prefetches running at once per worker, further ones are dropped instead of queued
+FRAME_PREFETCH_MAX_PENDING = int(os.getenv('FRAME_PREFETCH_MAX_PENDING', '2'))
+FRAME_PREFETCH_MAX_SESSIONS = int(os.getenv('FRAME_PREFETCH_MAX_SESSIONS', '1024'))
+
+
+@dataclass
+class _Cursor:
+    """
+    stepping of a session
+
+    Attributes
+    ----------
+    frame_no : int
+        last frame no read
+    direction : int
+        1 forward, -1 backward
+    window : int
+        number of frames to read ahead
+    """
+    frame_no: int
+    direction: int
+    window: int
+
+
+class FramePrefetcher:
+    """
+    FramePrefetcher
+
+    reads the frames following the one just read into the frame caches in the background.
+    the window grows while a session is stepped through one frame at a time in the same direction,
+    and is reset when it turns or jumps, cancelling the prefetch which is no longer ahead of it.
+    at most max_pending prefetches run at once and one per session, so they hold few pooled connections.
+
+    Attributes
+    ----------
+    load : Callable[[str, list[int]], Awaitable[None]]
+        coroutine function which caches the frames of a session
+    min_window : int
+        frames read ahead of the first step
+    max_window : int
+        maximum frames read ahead, 0 disables prefetching
+    max_pending : int
+        maximum prefetches running at once
+    max_sessions : int
+        maximum sessions whose stepping is remembered
+    scheduled : int
+        number of prefetches started
+    dropped : int
+        number of prefetches not started as max_pending were running
+    cancelled : int
+        number of prefetches cancelled by a turn or a jump
+    """
+
+    def __init__(self,
+                 load: Callable[[str, list[int]], Awaitable[None]],
+                 min_window: int = FRAME_PREFETCH_MIN_WINDOW,
+                 max_window: int = FRAME_PREFETCH_MAX_WINDOW,
+                 max_pending: int = FRAME_PREFETCH_MAX_PENDING,
+                 max_sessions: int = FRAME_PREFETCH_MAX_SESSIONS) -> None:
+        """
+        Parameters
+        ----------
+        load : Callable[[str, list[int]], Awaitable[None]]
+            coroutine function which caches the frames of a session
+        min_window : int, optional
+            frames read ahead of the first step, by default FRAME_PREFETCH_MIN_WINDOW
+        max_window : int, optional
+            maximum frames read ahead, by default FRAME_PREFETCH_MAX_WINDOW
+        max_pending : int, optional
+            maximum prefetches running at once, by default FRAME_PREFETCH_MAX_PENDING
+        max_sessions : int, optional
+            maximum sessions whose stepping is remembered, by default FRAME_PREFETCH_MAX_SESSIONS
+        """
+
+        self.load = load
+        self.min_window = min(min_window, max_window)
+        self.max_window = max_window
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.scheduled = 0
+        self.dropped = 0
+        self.cancelled = 0
+        self._cursors: OrderedDict[str, _Cursor] = OrderedDict()
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def __repr__(self) -> str:
+        return f"<FramePrefetcher(max_window={self.max_window}, max_pending={self.max_pending}, " \
+            f"pending={len(self._tasks)})>"
+
+    def step(self, session_id: str, frame_no: int) -> Optional[_Cursor]:
+        """
+        record a frame read and adapt the window of its session
+
+        Parameters
+        ----------
+        session_id : str
+            session id of user which is uuid
+        frame_no : int
+            frame no
+
+        Returns
+        -------
+        Optional[_Cursor]
+            stepping of the session, None if the same frame is read again
+        """
+
+        cursor = self._cursors.get(session_id)
+        if cursor is not None and cursor.frame_no == frame_no:
+            return None
+
+        if cursor is not None and frame_no - cursor.frame_no == cursor.direction:
+            direction, window = cursor.direction, min(cursor.window * 2, self.max_window)
+        else:
+            # turned or jumped, the frames being read ahead will not be read next
+            direction = -1 if cursor is not None and frame_no - cursor.frame_no == -1 else 1
+            window = self.min_window
+            self._cancel(session_id)
+
+        cursor = _Cursor(frame_no=frame_no, direction=direction, window=window)
+        self._cursors[session_id] = cursor
+        self._cursors.move_to_end(session_id)
+        while len(self._cursors) > self.max_sessions:
+            self._cursors.popitem(last=False)
+        return cursor
+
+    def observe(self, session_id: str, frame_no: int, cached: Callable[[int], bool]) -> Optional[asyncio.Task]:
+        """
+        record a frame read and prefetch the frames ahead of it on the running event loop
+
+        Parameters
+        ----------
+        session_id : str
+            session id of user which is uuid
+        frame_no : int
+            frame no
+        cached : Callable[[int], bool]
+            whether a frame no of the session is cached already
+
+        Returns
+        -------
+        Optional[asyncio.Task]
+            prefetch, None if nothing is prefetched
+        """
+
+        if self.max_window <= 0 or (cursor := self.step(session_id, frame_no)) is None:
+            return None
+
+        frame_nos = [frame_no + cursor.direction * offset for offset in range(1, cursor.window + 1)]
+        frame_nos = [ahead_no for ahead_no in frame_nos if ahead_no >= 1 and not cached(ahead_no)]
+        if not frame_nos or session_id in self._tasks:
+            return None
+        if len(self._tasks) >= self.max_pending:
+            self.dropped += 1
+            return None
+
+        task = asyncio.get_running_loop().create_task(self._run(session_id, frame_nos))
+        self._tasks[session_id] = task
+        self.scheduled += 1
+        return task
+
+    async def _run(self, session_id: str, frame_nos: list[int]) -> None:
+        try:
+            await self.load(session_id, frame_nos)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  # pylint: disable=broad-except
+            app_logger.error(exc)
+        finally:
+            if self._tasks.get(session_id) is asyncio.current_task():
+                del self._tasks[session_id]
+
+    def _cancel(self, session_id: str) -> None:
+        if (task := self._tasks.pop(session_id, None)) is not None:
+            task.cancel()
+            self.cancelled += 1
+
+    async def wait(self) -> None:
+        """
+        wait for the running prefetches
+        """
+
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def stop(self) -> None:
+        """
+        cancel the running prefetches and forget the stepping of every session
+        """
+
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._cursors.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        prefetch counters
+
+        Returns
+        -------
+        dict[str, int]
+            sessions, pending, scheduled, dropped and cancelled prefetches
+        """
+
+        return {'sessions': len(self._cursors),
+                'pending': len(self._tasks),
+                'scheduled': self.scheduled,
+                'dropped': self.dropped,
+                'cancelled': self.cancelled}
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+FRAME_CACHE_MAX_BYTES = int(os.getenv('FRAME_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """
+    CachedResponse
+
+    Attributes
+    ----------
+    body : bytes
+        response body
+    etag : str
+        strong entity tag of the body, quoted
+    media_type : str
+        media type of the body
+    """
+    body: bytes
+    etag: str
+    media_type: str = 'application/json'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    whether an If-None-Match header matches an entity tag
+
+    If-None-Match uses the weak comparison, so W/ prefixes are ignored.
+
+    Parameters
+    ----------
+    if_none_match : Optional[str]
+        If-None-Match header
+    etag : str
+        entity tag, quoted
+
+    Returns
+    -------
+    bool
+        True if the client already has the representation
+    """
+
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix('W/') for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+class ResponseCache:
+    """
+    ResponseCache
+
+    LRU cache per worker of rendered response bodies bounded by their total size in bytes.
+
+    Attributes
+    ----------
+    name : str
+        cache name
+    max_bytes : int
+        maximum total size of the cached bodies
+    size_bytes : int
+        total size of the cached bodies
+    hits : int
+        number of lookups answered from the cache
+    misses : int
+        number of lookups which fell through
+    """
+
+    def __init__(self, name: str, max_bytes: int = FRAME_CACHE_MAX_BYTES) -> None:
+        """
+        Parameters
+        ----------
+        name : str
+            cache name
+        max_bytes : int, optional
+            maximum total size of the cached bodies, by default FRAME_CACHE_MAX_BYTES
+        """
+
+        self.name = name
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<ResponseCache(name={self.name}, size_bytes={self.size_bytes}, max_bytes={self.max_bytes})>"
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        """
+        get a cached response
+
+        Parameters
+        ----------
+        key : Hashable
+            cache key
+
+        Returns
+        -------
+        Optional[CachedResponse]
+            cached response, None if it is not cached
+        """
+
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def put(self,
+            key: Hashable,
+            body: bytes,
+            etag: Optional[str] = None,
+            media_type: str = 'application/json') -> CachedResponse:
+        """
+        cache a response body
+
+        a body larger than max_bytes is not cached, the least recently used bodies are evicted to make room.
+
+        Parameters
+        ----------
+        key : Hashable
+            cache key
+        body : bytes
+            response body
+        etag : Optional[str], optional
+            entity tag, quoted, by default the sha256 of the body
+        media_type : str, optional
+            media type of the body, by default application/json
+
+        Returns
+        -------
+        CachedResponse
+            response with its entity tag
+        """
+
+        if etag is None:
+            etag = f'"{hashlib.sha256(body).hexdigest()}"'
+        entry = CachedResponse(body=body, etag=etag, media_type=media_type)
+        if len(body) > self.max_bytes:
+            return entry
+
+        with self._lock:
+            if (previous := self._entries.pop(key, None)) is not None:
+                self.size_bytes -= len(previous.body)
+            self._entries[key] = entry
+            self.size_bytes += len(body)
+            while self.size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= len(evicted.body)
+        return entry
+
+    def clear(self) -> None:
+        """
+        clear all entries
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        """
+        size and hit counters
+
+        Returns
+        -------
+        dict[str, int]
+            entries, bytes, hits and misses of the cache
+        """
+
+        return {'entries': len(self._entries), 'bytes': self.size_bytes, 'hits': self.hits, 'misses': self.misses}
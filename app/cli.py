@@ -0,0 +1,140 @@
+import argparse
+from datetime import datetime
+from typing import Optional
+
+from app.ingest.spool import INGEST_SPOOL_DIR, RecordSpool
+from app.ingest.worker import LEGACY_CHECKPOINT_NAME, checkpoint_name
+from app.logger import app_logger
+from app.models import FrameModel, IngestCheckpointModel, create_partitions, session
+from app.models.partition import FRAME_PARTITION_MONTHS_AHEAD
+from app.retention import retention_policies
+
+
+def rebuild_session_stats(args: argparse.Namespace) -> None:
+    """
+    compute the session stats again from the frames
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        parsed arguments
+    """
+
+    try:
+        user_sessions = FrameModel.rebuild_session_stats(args.user_session_id)
+        session.commit()
+    finally:
+        session.close()
+
+    app_logger.info(f'rebuilt session stats of {user_sessions} user sessions')
+
+
+def create_frame_partitions(args: argparse.Namespace) -> None:
+    """
+    create the monthly partitions of the frames and the sensors which are missing
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        parsed arguments
+    """
+
+    first_month = datetime.strptime(args.first_month, '%Y-%m') if args.first_month is not None else None
+    created = create_partitions(args.months_ahead, first_month)
+
+    app_logger.info(f'created {len(created)} partitions {", ".join(created)}')
+
+
+def apply_retention(args: argparse.Namespace) -> None:
+    """
+    apply the retention policies, or report what they would reclaim
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        parsed arguments
+    """
+
+    for policy in retention_policies():
+        if args.policy is not None and policy.name not in args.policy:
+            continue
+        report = policy.apply(dry_run=args.dry_run)
+        verb = 'would reclaim' if args.dry_run else 'reclaimed'
+        app_logger.info(f'{report.policy}: {report.items} items, {verb} {report.bytes} bytes')
+
+
+def migrate_checkpoint(args: argparse.Namespace) -> None:
+    """
+    move the checkpoint shared by every spool before they were checkpointed by host and directory
+    to the checkpoint of the spool of this host which drained it
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        parsed arguments
+    """
+
+    name = checkpoint_name(RecordSpool(args.spool_dir))
+    try:
+        moved = IngestCheckpointModel.rename(LEGACY_CHECKPOINT_NAME, name)
+        session.commit()
+    finally:
+        session.close()
+
+    if moved:
+        app_logger.info(f'moved checkpoint {LEGACY_CHECKPOINT_NAME} to {name}')
+    else:
+        app_logger.warning(f'checkpoint {LEGACY_CHECKPOINT_NAME} is not moved, it is missing or {name} has one')
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    maintenance commands
+
+        python -m app.cli rebuild-session-stats [--user-session-id ID ...]
+        python -m app.cli create-partitions [--months-ahead N] [--first-month YYYY-MM]
+        python -m app.cli retention [--dry-run] [--policy NAME ...]
+        python -m app.cli migrate-checkpoint [--spool-dir DIR]
+
+    Parameters
+    ----------
+    argv : Optional[list[str]], optional
+        arguments, by default sys.argv
+    """
+
+    parser = argparse.ArgumentParser(prog='python -m app.cli')
+    commands = parser.add_subparsers(required=True)
+
+    rebuild_parser = commands.add_parser('rebuild-session-stats', help='compute the session stats from the frames')
+    rebuild_parser.add_argument('--user-session-id', type=int, nargs='+', default=None,
+                                help='user sessions to rebuild, every user session if omitted')
+    rebuild_parser.set_defaults(command=rebuild_session_stats)
+
+    partition_parser = commands.add_parser('create-partitions',
+                                           help='create the monthly partitions of the frames and the sensors')
+    partition_parser.add_argument('--months-ahead', type=int, default=FRAME_PARTITION_MONTHS_AHEAD,
+                                  help=f'months after the current one, {FRAME_PARTITION_MONTHS_AHEAD} if omitted')
+    partition_parser.add_argument('--first-month', default=None,
+                                  help='first month as YYYY-MM to partition past frames, the current month if omitted')
+    partition_parser.set_defaults(command=create_frame_partitions)
+
+    retention_parser = commands.add_parser('retention', help='compress and thin old screenshots and drop old sensors')
+    retention_parser.add_argument('--dry-run', action='store_true',
+                                  help='report the items and bytes each policy would reclaim without changing them')
+    retention_parser.add_argument('--policy', nargs='+', default=None,
+                                  choices=[policy.name for policy in retention_policies()],
+                                  help='policies to apply, every policy if omitted')
+    retention_parser.set_defaults(command=apply_retention)
+
+    checkpoint_parser = commands.add_parser('migrate-checkpoint',
+                                            help='move the checkpoint shared before to the spool of this host')
+    checkpoint_parser.add_argument('--spool-dir', default=INGEST_SPOOL_DIR,
+                                   help=f'spool directory which drained it, {INGEST_SPOOL_DIR} if omitted')
+    checkpoint_parser.set_defaults(command=migrate_checkpoint)
+
+    args = parser.parse_args(argv)
+    args.command(args)
+
+
+if __name__ == '__main__':
+    main()
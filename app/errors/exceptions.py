@@ -23,6 +23,18 @@ class InvalidRequestError(AppError):
     message: str = ErrorMessage.INVALID_REQUEST
 
 
+class InvalidImageError(AppError):
+
+    status_code: int = status.HTTP_400_BAD_REQUEST
+    message: str = ErrorMessage.INVALID_IMAGE
+
+
+class SpoolFullError(AppError):
+
+    status_code: int = status.HTTP_503_SERVICE_UNAVAILABLE
+    message: str = ErrorMessage.SPOOL_FULL
+
+
 class DataBaseError(AppError):
 
     status_code: int = status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -35,6 +47,12 @@ class DataBaseConnectionError(AppError):
     message: str = ErrorMessage.DATABASE_CONNECTION_ERROR
 
 
+class ScreenshotNotFoundError(AppError):
+
+    status_code: int = status.HTTP_404_NOT_FOUND
+    message: str = ErrorMessage.SCREENSHOT_NOT_FOUND
+
+
 class BookAlreadyExistsError(AppError):
 
     status_code: int = status.HTTP_409_CONFLICT
@@ -1,8 +1,11 @@
 class ErrorMessage:
     INTERNAL_SERVER_ERROR = 'Internal Server Error'
     INVALID_REQUEST = 'Invalid Request'
+    INVALID_IMAGE = 'Invalid Image'
+    SPOOL_FULL = 'Spool Full'
     DATABASE_ERROR = 'DataBase Error'
     DATABASE_CONNECTION_ERROR = 'DataBase Connection Error'
+    SCREENSHOT_NOT_FOUND = 'Screenshot Not Found'
     BOOK_ALREADY_EXISTS = 'Book Already Exists'
     BOOK_NOT_FOUND = 'Book Not Found'
     EXTERNAL_API_ERROR = 'External API Error'
@@ -18,6 +18,18 @@ class InvalidRequestErrorOut(BaseModel):
     detail: str = ErrorMessage.INVALID_REQUEST
 
 
+@dataclass
+class InvalidImageErrorOut(BaseModel):
+
+    detail: str = ErrorMessage.INVALID_IMAGE
+
+
+@dataclass
+class SpoolFullErrorOut(BaseModel):
+
+    detail: str = ErrorMessage.SPOOL_FULL
+
+
 @dataclass
 class DataBaseErrorOut(BaseModel):
 
@@ -35,6 +47,12 @@ class Root500ErrorClass(BaseModel):
     __root__: Union[InternalServerErrorOut, DataBaseErrorOut, DataBaseConnectionErrorOut]
 
 
+@dataclass
+class ScreenshotNotFoundErrorOut(BaseModel):
+
+    detail: str = ErrorMessage.SCREENSHOT_NOT_FOUND
+
+
 @dataclass
 class BookAlreadyExistsErrorOut(BaseModel):
 
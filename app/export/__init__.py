@@ -0,0 +1,16 @@
+# isort: skip_file
+import os
+
+from app.export.video import (
+    VIDEO_CODECS,
+    VIDEO_EXPORT_FPS,
+    VIDEO_EXPORT_WIDTH,
+    VideoExporter,
+    VideoFormat,
+    encode_video,
+)
+
+# the video of a session url changes when a frame is added, so browsers revalidate it with the etag
+VIDEO_CACHE_CONTROL = os.getenv('VIDEO_CACHE_CONTROL', 'private, no-cache')
+
+video_exporter = VideoExporter()
@@ -0,0 +1,213 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from pathlib import Path
+from typing import Optional
+
+import cv2
+
+VIDEO_EXPORT_DIR = os.getenv('VIDEO_EXPORT_DIR', './exports/videos')
+VIDEO_EXPORT_WORKERS = int(os.getenv('VIDEO_EXPORT_WORKERS', '2'))
+VIDEO_EXPORT_FPS = int(os.getenv('VIDEO_EXPORT_FPS', '2'))
+VIDEO_EXPORT_WIDTH = int(os.getenv('VIDEO_EXPORT_WIDTH', '1280'))
+
+
+class VideoFormat(str, Enum):
+    """container and codec of an exported video"""
+
+    MP4 = 'mp4'
+    MJPEG = 'mjpeg'
+
+
+# fourcc, file extension and media type of each format
+VIDEO_CODECS = {
+    VideoFormat.MP4: ('mp4v', 'mp4', 'video/mp4'),
+    VideoFormat.MJPEG: ('MJPG', 'avi', 'video/x-msvideo'),
+}
+
+
+def _settings_name(video_format: VideoFormat, fps: int, width: int) -> str:
+    """
+    prefix of the names of the videos encoded with the same settings
+
+    Parameters
+    ----------
+    video_format : VideoFormat
+        video format
+    fps : int
+        frames per second
+    width : int
+        width of the video
+
+    Returns
+    -------
+    str
+        file name prefix
+    """
+
+    return f'{video_format.value}_{fps}fps_{width}w_'
+
+
+def encode_video(image_paths: list[str], video_path: str, video_format: VideoFormat, fps: int, width: int) -> None:
+    """
+    encode screenshots into a video
+
+    the height follows the aspect ratio of the first screenshot and every screenshot is resized to the same size.
+    screenshots which cannot be read are skipped.
+    the video is renamed into place, so a reader never sees a partial file.
+
+    Parameters
+    ----------
+    image_paths : list[str]
+        image paths in the order of the frames
+    video_path : str
+        video path
+    video_format : VideoFormat
+        video format
+    fps : int
+        frames per second
+    width : int
+        width of the video, the screenshots are never upscaled
+
+    Raises
+    ------
+    FileNotFoundError
+        none of the screenshots can be read
+    """
+
+    fourcc, extension, _ = VIDEO_CODECS[video_format]
+    temporary_path = f'{video_path}.{os.getpid()}.{id(image_paths)}.tmp.{extension}'
+    Path(video_path).parent.mkdir(parents=True, exist_ok=True)
+
+    writer: Optional[cv2.VideoWriter] = None
+    size = None
+    try:
+        for image_path in image_paths:
+            image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+            if image is None:
+                continue
+
+            if writer is None:
+                height, image_width = image.shape[:2]
+                video_width = min(width, image_width)
+                # mp4v needs an even frame size
+                size = (video_width - video_width % 2, max(round(height * video_width / image_width) // 2 * 2, 2))
+                writer = cv2.VideoWriter(temporary_path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+
+            if image.shape[1::-1] != size:
+                image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            writer.write(image)
+    finally:
+        if writer is not None:
+            writer.release()
+
+    if writer is None:
+        raise FileNotFoundError(video_path)
+
+    os.replace(temporary_path, video_path)
+
+
+class VideoExporter:
+    """
+    VideoExporter
+
+    encodes session videos in a pool of worker threads and keeps them on disk.
+    a video is named after the version of the session it is made from,
+    so it is served as a static file until a frame is added to the session,
+    and the video of the previous version is removed when the new one is written.
+    concurrent requests for the same video wait for one encoding.
+
+    Attributes
+    ----------
+    export_dir : str
+        directory of the videos
+    """
+
+    def __init__(self, export_dir: str = VIDEO_EXPORT_DIR, workers: int = VIDEO_EXPORT_WORKERS) -> None:
+        """
+        Parameters
+        ----------
+        export_dir : str, optional
+            directory of the videos, by default VIDEO_EXPORT_DIR
+        workers : int, optional
+            number of videos encoded at the same time, by default VIDEO_EXPORT_WORKERS
+        """
+
+        self.export_dir = export_dir
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='video_export')
+        self._encoding: dict[str, asyncio.Future] = {}
+
+    def __repr__(self) -> str:
+        return f"<VideoExporter(export_dir={self.export_dir})>"
+
+    def video_path(self, user_session_id: int, version: str, video_format: VideoFormat, fps: int, width: int) -> str:
+        """
+        path of a video
+
+        Parameters
+        ----------
+        user_session_id : int
+            user session id
+        version : str
+            version of the session, which changes when a frame is added
+        video_format : VideoFormat
+            video format
+        fps : int
+            frames per second
+        width : int
+            width of the video
+
+        Returns
+        -------
+        str
+            video path
+        """
+
+        _, extension, _ = VIDEO_CODECS[video_format]
+        return os.path.join(self.export_dir,
+                            str(user_session_id),
+                            f'{_settings_name(video_format, fps, width)}{version}.{extension}')
+
+    async def export(self,
+                     video_path: str,
+                     image_paths: list[str],
+                     video_format: VideoFormat,
+                     fps: int,
+                     width: int) -> None:
+        """
+        encode a video unless another request is already encoding it
+        and remove the videos of older versions of the session with the same settings
+
+        Parameters
+        ----------
+        video_path : str
+            path returned by video_path
+        image_paths : list[str]
+            image paths in the order of the frames
+        video_format : VideoFormat
+            video format
+        fps : int
+            frames per second
+        width : int
+            width of the video
+
+        Raises
+        ------
+        FileNotFoundError
+            none of the screenshots can be read
+        """
+
+        if (encoding := self._encoding.get(video_path)) is None:
+            loop = asyncio.get_running_loop()
+            encoding = loop.run_in_executor(self._executor, encode_video,
+                                            image_paths, video_path, video_format, fps, width)
+            self._encoding[video_path] = encoding
+            encoding.add_done_callback(lambda _: self._encoding.pop(video_path, None))
+
+        await asyncio.shield(encoding)
+
+        path = Path(video_path)
+        for stale_path in path.parent.glob(f'{_settings_name(video_format, fps, width)}*{path.suffix}'):
+            if stale_path != path and '.tmp.' not in stale_path.name:
+                stale_path.unlink(missing_ok=True)
@@ -0,0 +1,12 @@
+# isort: skip_file
+import os
+
+from app.ingest.spool import RecordSpool
+from app.ingest.writer import write_records
+from app.ingest.worker import SpoolWorker
+
+# direct: save records in the request, spool: acknowledge with 202 and save them in the background
+INGEST_MODE = os.getenv('INGEST_MODE', 'direct')
+
+record_spool = RecordSpool()
+spool_worker = SpoolWorker(record_spool)
@@ -0,0 +1,269 @@
+import fcntl
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from app.errors.exceptions import SpoolFullError
+from app.logger import app_logger
+
+INGEST_SPOOL_DIR = os.getenv('INGEST_SPOOL_DIR', './spool')
+INGEST_SPOOL_MAX_BYTES = int(os.getenv('INGEST_SPOOL_MAX_BYTES', str(1024 * 1024 * 1024)))
+INGEST_SPOOL_SEGMENT_BYTES = int(os.getenv('INGEST_SPOOL_SEGMENT_BYTES', str(64 * 1024 * 1024)))
+
+SEGMENT_SUFFIX = '.ndjson'
+
+
+class RecordSpool:
+    """
+    RecordSpool
+
+    append-only spool of records as newline delimited json, shared by every worker process of the host.
+
+    records are appended to segment files named by the position of their first byte,
+    so a position stays valid for the life of the spool and can be checkpointed in the database.
+    appends are serialized between processes with an flock and fsync'd before they are acknowledged.
+    segments are deleted once they are drained, except the active one which carries the position forward.
+
+    Attributes
+    ----------
+    directory : Path
+        spool directory
+    max_bytes : int
+        maximum size of the segments on disk
+    segment_bytes : int
+        size at which a new segment is started
+    """
+
+    def __init__(self,
+                 directory: str = INGEST_SPOOL_DIR,
+                 max_bytes: int = INGEST_SPOOL_MAX_BYTES,
+                 segment_bytes: int = INGEST_SPOOL_SEGMENT_BYTES) -> None:
+        """
+        Parameters
+        ----------
+        directory : str, optional
+            spool directory, by default INGEST_SPOOL_DIR
+        max_bytes : int, optional
+            maximum size of the segments on disk, by default INGEST_SPOOL_MAX_BYTES
+        segment_bytes : int, optional
+            size at which a new segment is started, by default INGEST_SPOOL_SEGMENT_BYTES
+        """
+
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self._drain_lock_fd: Optional[int] = None
+
+    def __repr__(self) -> str:
+        return f"<RecordSpool(directory={self.directory}, max_bytes={self.max_bytes})>"
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """
+        hold the append lock of the spool
+        """
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock_fd = os.open(self.directory / 'append.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(lock_fd)
+
+    def _segments(self) -> list[tuple[int, Path, int]]:
+        """
+        segments ordered by position
+
+        Returns
+        -------
+        list[tuple[int, Path, int]]
+            start position, path and size of each segment
+        """
+
+        if not self.directory.exists():
+            return []
+        return sorted((int(path.stem), path, path.stat().st_size)
+                      for path in self.directory.glob(f'*{SEGMENT_SUFFIX}'))
+
+    def _segment_path(self, start: int) -> Path:
+        return self.directory / f'{start:020d}{SEGMENT_SUFFIX}'
+
+    def size(self) -> int:
+        """
+        size of the segments on disk
+
+        Returns
+        -------
+        int
+            bytes
+        """
+
+        return sum(size for _, _, size in self._segments())
+
+    def append(self, record: bytes) -> int:
+        """
+        append a record and fsync it
+
+        Parameters
+        ----------
+        record : bytes
+            record as json without newline
+
+        Returns
+        -------
+        int
+            spool position after the record
+
+        Raises
+        ------
+        SpoolFullError
+            the spool would exceed max_bytes
+        """
+
+        line = record + b'\n'
+
+        with self._locked():
+            segments = self._segments()
+            if sum(size for _, _, size in segments) + len(line) > self.max_bytes:
+                raise SpoolFullError()
+
+            start, size = (segments[-1][0], segments[-1][2]) if segments else (0, 0)
+            new_segment = not segments or size >= self.segment_bytes
+            if segments and new_segment:
+                start, size = start + size, 0
+
+            segment_fd = os.open(self._segment_path(start), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                written = 0
+                while written < len(line):
+                    written += os.write(segment_fd, line[written:])
+                os.fsync(segment_fd)
+            finally:
+                os.close(segment_fd)
+
+            if new_segment:
+                self._fsync_directory()
+
+        return start + size + len(line)
+
+    def read(self, position: int, max_records: int) -> tuple[list[bytes], int]:
+        """
+        read complete records from a position
+
+        a record which is still being written, or was torn by a crash, is not returned.
+
+        Parameters
+        ----------
+        position : int
+            spool position to read from
+        max_records : int
+            maximum number of records
+
+        Returns
+        -------
+        tuple[list[bytes], int]
+            records and the spool position after them
+        """
+
+        segments = self._segments()
+        if not segments:
+            return [], position
+
+        first_start = segments[0][0]
+        end = segments[-1][0] + segments[-1][2]
+        if not first_start <= position <= end:
+            app_logger.warning(f'spool position {position} is out of {first_start}-{end}, read from {first_start}')
+            position = first_start
+
+        records: list[bytes] = []
+        for start, path, size in segments:
+            if not start <= position < start + size:
+                continue
+            with open(path, 'rb') as segment_file:
+                segment_file.seek(position - start)
+                while len(records) < max_records:
+                    line = segment_file.readline()
+                    if not line.endswith(b'\n'):
+                        break
+                    records.append(line[:-1])
+                    position += len(line)
+            break
+
+        return records, position
+
+    def discard(self, position: int) -> None:
+        """
+        delete segments which are drained up to a position
+
+        Parameters
+        ----------
+        position : int
+            checkpointed spool position
+        """
+
+        with self._locked():
+            for start, path, size in self._segments()[:-1]:
+                if start + size <= position:
+                    path.unlink()
+
+    def repair(self) -> None:
+        """
+        truncate a record torn by a crash at the end of the active segment
+        """
+
+        with self._locked():
+            segments = self._segments()
+            if not segments:
+                return
+            _, path, size = segments[-1]
+            with open(path, 'rb+') as segment_file:
+                data = segment_file.read()
+                if data.endswith(b'\n') or not data:
+                    return
+                app_logger.warning(f'truncate torn record at the end of {path}')
+                segment_file.truncate(data.rfind(b'\n') + 1)
+                os.fsync(segment_file.fileno())
+
+    def try_acquire_drain(self) -> bool:
+        """
+        become the only process of the host which drains the spool
+
+        the lock is released when the process exits, so another worker takes over.
+
+        Returns
+        -------
+        bool
+            True if this spool holds the drain lock
+        """
+
+        if self._drain_lock_fd is not None:
+            return True
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock_fd = os.open(self.directory / 'drain.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(lock_fd)
+            return False
+
+        self._drain_lock_fd = lock_fd
+        return True
+
+    def release_drain(self) -> None:
+        """
+        release the drain lock
+        """
+
+        if self._drain_lock_fd is not None:
+            os.close(self._drain_lock_fd)
+            self._drain_lock_fd = None
+
+    def _fsync_directory(self) -> None:
+        directory_fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
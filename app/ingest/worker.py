@@ -0,0 +1,172 @@
+import asyncio
+import os
+import socket
+from typing import Optional
+
+from pydantic import ValidationError
+
+from app.ingest.spool import RecordSpool
+from app.ingest.writer import write_records
+from app.logger import app_logger
+from app.models import IngestCheckpointModel
+from app.models.setting import async_session_factory
+from app.schemas.requests import RecordSaveIn
+
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '200'))
+INGEST_POLL_INTERVAL = float(os.getenv('INGEST_POLL_INTERVAL', '1'))
+
+# checkpoint shared by the spools of every host before they were checkpointed by host and directory,
+# moved to the checkpoint of the one spool which drained it by python -m app.cli migrate-checkpoint
+LEGACY_CHECKPOINT_NAME = 'records'
+
+
+def checkpoint_name(spool: RecordSpool) -> str:
+    """
+    name of the checkpoint of a spool, which is local to its host
+
+    Parameters
+    ----------
+    spool : RecordSpool
+        spool
+
+    Returns
+    -------
+    str
+        host name and resolved directory of the spool
+    """
+
+    return f'{socket.gethostname()}:{spool.directory.resolve()}'
+
+
+class SpoolWorker:
+    """
+    SpoolWorker
+
+    background task which drains the spool into PostgreSQL and screenshot storage in batches.
+    every worker process runs one, and the one holding the drain lock of the spool does the work.
+    records left in the spool by a previous run are replayed from the checkpoint on start.
+
+    Attributes
+    ----------
+    spool : RecordSpool
+        spool to drain
+    batch_size : int
+        maximum number of records saved in one transaction
+    interval : float
+        seconds to wait when the spool is empty or the drain lock is held by another process
+    """
+
+    def __init__(self,
+                 spool: RecordSpool,
+                 batch_size: int = INGEST_BATCH_SIZE,
+                 interval: float = INGEST_POLL_INTERVAL) -> None:
+        """
+        Parameters
+        ----------
+        spool : RecordSpool
+            spool to drain
+        batch_size : int, optional
+            maximum number of records saved in one transaction, by default INGEST_BATCH_SIZE
+        interval : float, optional
+            seconds to wait when there is nothing to do, by default INGEST_POLL_INTERVAL
+        """
+
+        self.spool = spool
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def __repr__(self) -> str:
+        return f"<SpoolWorker(spool={self.spool}, batch_size={self.batch_size}, interval={self.interval})>"
+
+    def start(self) -> None:
+        """
+        start draining on the running event loop
+        """
+
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """
+        stop draining, records which are not saved yet stay in the spool
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.spool.release_drain()
+
+    def notify(self) -> None:
+        """
+        wake the worker up after a record is appended
+        """
+
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        """
+        drain the spool until stopped
+        """
+
+        draining = False
+        while True:
+            try:
+                if not draining and await asyncio.to_thread(self.spool.try_acquire_drain):
+                    draining = True
+                    await asyncio.to_thread(self.spool.repair)
+                if draining and await self.drain_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                app_logger.error(exc)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain_once(self) -> int:
+        """
+        save one batch of records and checkpoint it in the same transaction
+
+        records which are not valid are skipped. any other error, such as a lost connection or a full disk,
+        rolls the whole batch back with its checkpoint, and the batch is saved again by the next drain.
+
+        Returns
+        -------
+        int
+            number of records read from the spool
+        """
+
+        name = checkpoint_name(self.spool)
+        async with async_session_factory() as db_session:
+            position = await IngestCheckpointModel.async_fetch_position(db_session, name)
+            lines, next_position = await asyncio.to_thread(self.spool.read, position, self.batch_size)
+            if not lines:
+                return 0
+
+            records = []
+            for line in lines:
+                try:
+                    records.append(RecordSaveIn.parse_raw(line))
+                except ValidationError as exc:
+                    app_logger.error(exc)
+
+            saved = await write_records(db_session, records, strict=True)
+            await IngestCheckpointModel.async_save_position(db_session, name, next_position)
+            await db_session.commit()
+
+        if not all(saved):
+            app_logger.error(f'{saved.count(False)} of {len(lines)} spooled records are not saved')
+
+        await asyncio.to_thread(self.spool.discard, next_position)
+        return len(lines)
@@ -0,0 +1,93 @@
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.errors.exceptions import InvalidImageError, InvalidRequestError
+from app.logger import app_logger
+from app.models import (
+    DriveSensorModel,
+    FrameModel,
+    IpPortSensorModel,
+    ProcessSensorModel,
+    ScreenshotSensorModel,
+    UserModel,
+    UserSessionModel,
+)
+from app.schemas.requests import RecordSaveIn
+
+# errors of the data of a record, which saving the record again raises again
+INVALID_RECORD_ERRORS = (InvalidImageError, InvalidRequestError, ValueError, DataError, IntegrityError)
+
+
+async def write_records(db_session: AsyncSession, records: list[RecordSaveIn], strict: bool = False) -> list[bool]:
+    """save records in the transaction of the session without committing it
+
+    users and user sessions are resolved once per distinct key,
+    each frame is saved inside its own savepoint so that a broken frame does not discard the others,
+    and the sensors of all saved frames are written with one multi-row insert per table.
+
+    Parameters
+    ----------
+    db_session : AsyncSession
+        async session
+    records : list[RecordSaveIn]
+        records
+    strict : bool, optional
+        only skip the records whose data is invalid and raise the other errors, such as a lost connection
+        or a full disk, so that the caller saves the whole batch again. by default False, every error skips the record
+
+    Returns
+    -------
+    list[bool]
+        whether each record is saved
+    """
+
+    user_ids: dict[tuple[str, str, str], int] = {}
+    user_session_ids: dict[str, int] = {}
+
+    drive_sensors = []
+    ip_port_sensors = []
+    process_sensors = []
+    saved = []
+
+    for record in records:
+        # ユーザの登録
+        user = record.user
+        user_key = (user.name, user.ip, user.machine_name)
+        if user_key not in user_ids:
+            user_ids[user_key] = await UserModel.async_save(db_session,
+                                                            UserModel(name=user.name,
+                                                                      machine_name=user.machine_name,
+                                                                      ip=user.ip))
+
+        # セッションの登録
+        if record.session_id not in user_session_ids:
+            user_session_ids[record.session_id] = await UserSessionModel.async_save(
+                db_session, UserSessionModel(session_id=record.session_id, user_id=user_ids[user_key]))
+
+        # フレームとスクリーンショットの登録
+        savepoint = await db_session.begin_nested()
+        try:
+            frame_id = await FrameModel.async_save(db_session,
+                                                   FrameModel(frame_create_time=record.created_at,
+                                                              user_session_id=user_session_ids[record.session_id]))
+            await ScreenshotSensorModel.async_save(db_session, record.screenshot_sensor, frame_id, record.created_at)
+            await savepoint.commit()
+        except Exception as exc:  # pylint: disable=broad-except
+            await savepoint.rollback()
+            if strict and not isinstance(exc, INVALID_RECORD_ERRORS):
+                raise
+            app_logger.error(exc)
+            saved.append(False)
+            continue
+
+        drive_sensors.append((record.drive_sensors, frame_id, record.created_at))
+        ip_port_sensors.append((record.ip_port_sensors, frame_id, record.created_at))
+        process_sensors.append((record.process_sensors, frame_id, record.created_at))
+        saved.append(True)
+
+    # 各センサーの一括登録
+    await DriveSensorModel.async_bulk_save(db_session, drive_sensors)
+    await IpPortSensorModel.async_bulk_save(db_session, ip_port_sensors)
+    await ProcessSensorModel.async_bulk_save(db_session, process_sensors)
+
+    return saved
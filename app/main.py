@@ -1,7 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routers import frame_router, record_router, user_session_router
+from app.ingest import INGEST_MODE, spool_worker
+from app.models import AsyncDBEngine, AsyncReadDBEngine, partition_maintainer
+from app.routers import frame_router, metrics_router, record_router, user_session_router
+from app.routers.frame import frame_prefetcher
 
 APP_TITLE = "Internship FastAPI Sample"
 APP_VERSION = "1.0"
@@ -28,3 +31,28 @@ app.add_middleware(
 app.include_router(record_router)
 app.include_router(user_session_router)
 app.include_router(frame_router)
+app.include_router(metrics_router)
+
+
+@app.on_event('startup')
+async def start_spool_worker() -> None:
+    """drain the ingestion spool, replaying what a previous run left"""
+    if INGEST_MODE == 'spool':
+        spool_worker.start()
+
+
+@app.on_event('startup')
+async def start_partition_maintainer() -> None:
+    """create the partitions of the months ahead, and keep creating them while the server runs"""
+    await partition_maintainer.start()
+
+
+@app.on_event('shutdown')
+async def dispose_async_engine() -> None:
+    """stop the background tasks and close the pooled asyncpg connections"""
+    await spool_worker.stop()
+    await frame_prefetcher.stop()
+    await partition_maintainer.stop()
+    await AsyncDBEngine.dispose()
+    if AsyncReadDBEngine is not None:
+        await AsyncReadDBEngine.dispose()
@@ -0,0 +1,46 @@
+"""add unique constraint to frames
+
+Revision ID: 5f2a9c1e7d34
+Revises: c4c6cb86cf58
+Create Date: 2026-10-18 20:10:12.482913
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '5f2a9c1e7d34'
+down_revision = 'c4c6cb86cf58'
+branch_labels = None
+depends_on = None
+
+SENSOR_TABLES = ('drive_sensors', 'ip_port_sensors', 'process_sensors', 'screenshot_sensors')
+
+
+def upgrade():
+    # merge frames which were saved twice by concurrent workers into the oldest one
+    for table in SENSOR_TABLES:
+        op.execute(f"""
+            UPDATE public.{table} AS sensors
+            SET frame_id = duplicates.keep_id
+            FROM (
+                SELECT id, min(id) OVER (PARTITION BY user_session_id, frame_create_time) AS keep_id
+                FROM public.frames
+            ) AS duplicates
+            WHERE sensors.frame_id = duplicates.id
+                AND duplicates.id <> duplicates.keep_id
+        """)
+    op.execute("""
+        DELETE FROM public.frames AS frames
+        USING (
+            SELECT id, min(id) OVER (PARTITION BY user_session_id, frame_create_time) AS keep_id
+            FROM public.frames
+        ) AS duplicates
+        WHERE frames.id = duplicates.id
+            AND duplicates.id <> duplicates.keep_id
+    """)
+    op.create_unique_constraint(op.f('uq_frames_user_session_id'), 'frames',
+                                ['user_session_id', 'frame_create_time'], schema='public')
+
+
+def downgrade():
+    op.drop_constraint(op.f('uq_frames_user_session_id'), 'frames', schema='public', type_='unique')
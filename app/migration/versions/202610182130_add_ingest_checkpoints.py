@@ -0,0 +1,31 @@
+"""add ingest checkpoints
+
+Revision ID: 8d3e6b0a4f12
+Revises: 5f2a9c1e7d34
+Create Date: 2026-10-18 21:30:41.207318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d3e6b0a4f12'
+down_revision = '5f2a9c1e7d34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ingest_checkpoints',
+    sa.Column('name', sa.String(length=40), nullable=False, comment='spool name'),
+    sa.Column('position', sa.BigInteger(), nullable=False, comment='spool position'),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name', name=op.f('pk_ingest_checkpoints')),
+    schema='public'
+    )
+
+
+def downgrade():
+    op.drop_table('ingest_checkpoints', schema='public')
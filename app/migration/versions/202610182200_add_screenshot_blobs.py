@@ -0,0 +1,44 @@
+"""add screenshot blobs
+
+Revision ID: 2c7f4e9b1a58
+Revises: 8d3e6b0a4f12
+Create Date: 2026-10-18 22:00:12.584930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c7f4e9b1a58'
+down_revision = '8d3e6b0a4f12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('screenshot_blobs',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False, comment='sha256 of the image'),
+    sa.Column('extension', sa.String(length=4), nullable=False, comment='file extension'),
+    sa.Column('size', sa.BigInteger(), nullable=False, comment='image size'),
+    sa.Column('ref_count', sa.Integer(), nullable=False, comment='number of screenshot sensors'),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_screenshot_blobs')),
+    sa.UniqueConstraint('sha256', name=op.f('uq_screenshot_blobs_sha256')),
+    schema='public'
+    )
+    op.add_column('screenshot_sensors',
+                  sa.Column('blob_id', sa.Integer(), nullable=True, comment='screenshot blob id'),
+                  schema='public')
+    op.create_foreign_key(op.f('fk_screenshot_sensors_blob_id_screenshot_blobs'),
+                          'screenshot_sensors', 'screenshot_blobs', ['blob_id'], ['id'],
+                          source_schema='public', referent_schema='public')
+
+
+def downgrade():
+    op.drop_constraint(op.f('fk_screenshot_sensors_blob_id_screenshot_blobs'), 'screenshot_sensors',
+                       schema='public', type_='foreignkey')
+    op.drop_column('screenshot_sensors', 'blob_id', schema='public')
+    op.drop_table('screenshot_blobs', schema='public')
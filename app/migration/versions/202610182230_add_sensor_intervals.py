@@ -0,0 +1,86 @@
+"""add sensor intervals
+
+Revision ID: 6a1d3f8c2e97
+Revises: 2c7f4e9b1a58
+Create Date: 2026-10-18 22:30:05.771204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a1d3f8c2e97'
+down_revision = '2c7f4e9b1a58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('drive_sensor_intervals',
+    sa.Column('drive_letter', sa.String(length=1), nullable=False, comment='drive letter'),
+    sa.Column('drive_type', sa.String(length=20), nullable=False, comment='drive type'),
+    sa.Column('volume_name', sa.String(length=255), nullable=False, comment='volume name'),
+    sa.Column('file_system', sa.String(length=255), nullable=False, comment='file system'),
+    sa.Column('all_space', sa.String(length=16), nullable=False, comment='all space'),
+    sa.Column('free_space', sa.String(length=16), nullable=False, comment='free space'),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('first_seen_at', sa.DateTime(), nullable=False, comment='create time of the first frame'),
+    sa.Column('last_seen_at', sa.DateTime(), nullable=False, comment='create time of the last frame'),
+    sa.Column('user_session_id', sa.Integer(), nullable=False, comment='user session id'),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_session_id'], ['public.user_sessions.id'], name=op.f('fk_drive_sensor_intervals_user_session_id_user_sessions')),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_drive_sensor_intervals')),
+    schema='public'
+    )
+    op.create_index('ix_drive_sensor_intervals_user_session_id_first_seen_at', 'drive_sensor_intervals', ['user_session_id', 'first_seen_at'], unique=False, schema='public')
+    op.create_index('ix_drive_sensor_intervals_user_session_id_last_seen_at', 'drive_sensor_intervals', ['user_session_id', 'last_seen_at'], unique=False, schema='public')
+    op.create_table('ip_port_sensor_intervals',
+    sa.Column('state', sa.String(length=10), nullable=True, comment='ip port state. listen or establish'),
+    sa.Column('ip', sa.String(length=39), nullable=False, comment='ip address'),
+    sa.Column('port', sa.Integer(), nullable=False, comment='port'),
+    sa.Column('process_id', sa.Integer(), nullable=False, comment='process id'),
+    sa.Column('remote_ip', sa.String(length=39), nullable=False, comment='remote ip address'),
+    sa.Column('remote_port', sa.Integer(), nullable=False, comment='remote port'),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('first_seen_at', sa.DateTime(), nullable=False, comment='create time of the first frame'),
+    sa.Column('last_seen_at', sa.DateTime(), nullable=False, comment='create time of the last frame'),
+    sa.Column('user_session_id', sa.Integer(), nullable=False, comment='user session id'),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_session_id'], ['public.user_sessions.id'], name=op.f('fk_ip_port_sensor_intervals_user_session_id_user_sessions')),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_ip_port_sensor_intervals')),
+    schema='public'
+    )
+    op.create_index('ix_ip_port_sensor_intervals_user_session_id_first_seen_at', 'ip_port_sensor_intervals', ['user_session_id', 'first_seen_at'], unique=False, schema='public')
+    op.create_index('ix_ip_port_sensor_intervals_user_session_id_last_seen_at', 'ip_port_sensor_intervals', ['user_session_id', 'last_seen_at'], unique=False, schema='public')
+    op.create_table('process_sensor_intervals',
+    sa.Column('file_path', sa.String(length=255), nullable=False, comment='file path'),
+    sa.Column('process_name', sa.String(length=255), nullable=False, comment='process name'),
+    sa.Column('process_id', sa.Integer(), nullable=False, comment='process id'),
+    sa.Column('started_at', sa.DateTime(), nullable=False, comment='started at'),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('first_seen_at', sa.DateTime(), nullable=False, comment='create time of the first frame'),
+    sa.Column('last_seen_at', sa.DateTime(), nullable=False, comment='create time of the last frame'),
+    sa.Column('user_session_id', sa.Integer(), nullable=False, comment='user session id'),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_session_id'], ['public.user_sessions.id'], name=op.f('fk_process_sensor_intervals_user_session_id_user_sessions')),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_process_sensor_intervals')),
+    schema='public'
+    )
+    op.create_index('ix_process_sensor_intervals_user_session_id_first_seen_at', 'process_sensor_intervals', ['user_session_id', 'first_seen_at'], unique=False, schema='public')
+    op.create_index('ix_process_sensor_intervals_user_session_id_last_seen_at', 'process_sensor_intervals', ['user_session_id', 'last_seen_at'], unique=False, schema='public')
+
+
+def downgrade():
+    op.drop_index('ix_process_sensor_intervals_user_session_id_last_seen_at', table_name='process_sensor_intervals', schema='public')
+    op.drop_index('ix_process_sensor_intervals_user_session_id_first_seen_at', table_name='process_sensor_intervals', schema='public')
+    op.drop_table('process_sensor_intervals', schema='public')
+    op.drop_index('ix_ip_port_sensor_intervals_user_session_id_last_seen_at', table_name='ip_port_sensor_intervals', schema='public')
+    op.drop_index('ix_ip_port_sensor_intervals_user_session_id_first_seen_at', table_name='ip_port_sensor_intervals', schema='public')
+    op.drop_table('ip_port_sensor_intervals', schema='public')
+    op.drop_index('ix_drive_sensor_intervals_user_session_id_last_seen_at', table_name='drive_sensor_intervals', schema='public')
+    op.drop_index('ix_drive_sensor_intervals_user_session_id_first_seen_at', table_name='drive_sensor_intervals', schema='public')
+    op.drop_table('drive_sensor_intervals', schema='public')
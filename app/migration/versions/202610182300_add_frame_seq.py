@@ -0,0 +1,52 @@
+"""add frame seq
+
+Revision ID: 9b4e2d7a6c31
+Revises: 6a1d3f8c2e97
+Create Date: 2026-10-18 23:00:27.310842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4e2d7a6c31'
+down_revision = '6a1d3f8c2e97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('frames',
+                  sa.Column('frame_seq', sa.Integer(), nullable=True, comment='frame no in the session'),
+                  schema='public')
+    op.execute("""
+        UPDATE public.frames
+        SET frame_seq = numbered.frame_seq
+        FROM (SELECT id,
+                     row_number() OVER (PARTITION BY user_session_id ORDER BY frame_create_time) AS frame_seq
+              FROM public.frames) AS numbered
+        WHERE frames.id = numbered.id
+    """)
+    op.alter_column('frames', 'frame_seq', nullable=False, schema='public')
+    op.create_index('ix_frames_user_session_id_frame_seq', 'frames', ['user_session_id', 'frame_seq'],
+                    unique=False, schema='public')
+
+    op.add_column('user_sessions',
+                  sa.Column('frame_count', sa.Integer(), server_default='0', nullable=False,
+                            comment='number of frames'),
+                  schema='public')
+    op.execute("""
+        UPDATE public.user_sessions
+        SET frame_count = counted.frame_count
+        FROM (SELECT user_session_id, count(*) AS frame_count
+              FROM public.frames
+              GROUP BY user_session_id) AS counted
+        WHERE user_sessions.id = counted.user_session_id
+    """)
+
+
+def downgrade():
+    op.drop_column('user_sessions', 'frame_count', schema='public')
+    op.drop_index('ix_frames_user_session_id_frame_seq', table_name='frames', schema='public')
+    op.drop_column('frames', 'frame_seq', schema='public')
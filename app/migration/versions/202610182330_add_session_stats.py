@@ -0,0 +1,49 @@
+"""add session stats
+
+Revision ID: 3f8a6c2d9e14
+Revises: 9b4e2d7a6c31
+Create Date: 2026-10-18 23:30:12.584106
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8a6c2d9e14'
+down_revision = '9b4e2d7a6c31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('session_stats',
+    sa.Column('user_session_id', sa.Integer(), nullable=False, comment='user session id'),
+    sa.Column('start_time', sa.DateTime(), nullable=False, comment='create time of the first frame'),
+    sa.Column('end_time', sa.DateTime(), nullable=False, comment='create time of the last frame'),
+    sa.Column('frame_count', sa.Integer(), nullable=False, comment='number of frames'),
+    sa.Column('last_frame_id', sa.Integer(), nullable=False, comment='id of the last frame'),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_session_id'], ['public.user_sessions.id'],
+                            name=op.f('fk_session_stats_user_session_id_user_sessions')),
+    sa.PrimaryKeyConstraint('user_session_id', name=op.f('pk_session_stats')),
+    schema='public'
+    )
+    op.execute("""
+        INSERT INTO public.session_stats (user_session_id, start_time, end_time, frame_count, last_frame_id,
+                                          created_at, updated_at)
+        SELECT user_session_id,
+               min(frame_create_time),
+               max(frame_create_time),
+               count(*),
+               (array_agg(id ORDER BY frame_create_time DESC))[1],
+               now(),
+               now()
+        FROM public.frames
+        GROUP BY user_session_id
+    """)
+
+
+def downgrade():
+    op.drop_table('session_stats', schema='public')
@@ -0,0 +1,55 @@
+"""add user to session stats
+
+Revision ID: 7c2e9a4f1b63
+Revises: 3f8a6c2d9e14
+Create Date: 2026-10-18 23:45:38.902174
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e9a4f1b63'
+down_revision = '3f8a6c2d9e14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('session_stats',
+                  sa.Column('user_id', sa.Integer(), nullable=True, comment='user id'),
+                  schema='public')
+    op.add_column('session_stats',
+                  sa.Column('user_name', sa.String(length=40), nullable=True, comment='user name'),
+                  schema='public')
+    op.add_column('session_stats',
+                  sa.Column('machine_name', sa.String(length=40), nullable=True, comment='machine name'),
+                  schema='public')
+    op.execute("""
+        UPDATE public.session_stats
+        SET user_id = users.id, user_name = users.name, machine_name = users.machine_name
+        FROM public.user_sessions
+        JOIN public.users ON user_sessions.user_id = users.id
+        WHERE session_stats.user_session_id = user_sessions.id
+    """)
+    op.alter_column('session_stats', 'user_id', nullable=False, schema='public')
+    op.alter_column('session_stats', 'user_name', nullable=False, schema='public')
+    op.alter_column('session_stats', 'machine_name', nullable=False, schema='public')
+    op.create_foreign_key(op.f('fk_session_stats_user_id_users'), 'session_stats', 'users',
+                          ['user_id'], ['id'], source_schema='public', referent_schema='public')
+    op.create_index('ix_session_stats_user_name_start_time_user_session_id', 'session_stats',
+                    ['user_name', 'start_time', 'user_session_id'], unique=False, schema='public')
+    op.create_index('ix_session_stats_machine_name_user_name_start_time', 'session_stats',
+                    ['machine_name', 'user_name', 'start_time', 'user_session_id'], unique=False, schema='public')
+
+
+def downgrade():
+    op.drop_index('ix_session_stats_machine_name_user_name_start_time', table_name='session_stats',
+                  schema='public')
+    op.drop_index('ix_session_stats_user_name_start_time_user_session_id', table_name='session_stats',
+                  schema='public')
+    op.drop_constraint(op.f('fk_session_stats_user_id_users'), 'session_stats', type_='foreignkey', schema='public')
+    op.drop_column('session_stats', 'machine_name', schema='public')
+    op.drop_column('session_stats', 'user_name', schema='public')
+    op.drop_column('session_stats', 'user_id', schema='public')
@@ -0,0 +1,37 @@
+"""add sensor frame id indexes
+
+Revision ID: 5d9f1c7b3a20
+Revises: 7c2e9a4f1b63
+Create Date: 2026-10-19 00:00:12.584317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d9f1c7b3a20'
+down_revision = '7c2e9a4f1b63'
+branch_labels = None
+depends_on = None
+
+# the tables are large in production, so the indexes are built without blocking the ingestion
+INDEXES = [('ix_drive_sensors_frame_id', 'drive_sensors', 'frame_id'),
+           ('ix_ip_port_sensors_frame_id', 'ip_port_sensors', 'frame_id'),
+           ('ix_process_sensors_frame_id', 'process_sensors', 'frame_id'),
+           ('ix_screenshot_sensors_frame_id', 'screenshot_sensors', 'frame_id'),
+           ('ix_screenshot_sensors_blob_id', 'screenshot_sensors', 'blob_id')]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for index_name, table_name, column_name in INDEXES:
+            op.create_index(index_name, table_name, [column_name], unique=False, schema='public',
+                            postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for index_name, table_name, _ in reversed(INDEXES):
+            op.drop_index(index_name, table_name=table_name, schema='public',
+                          postgresql_concurrently=True)
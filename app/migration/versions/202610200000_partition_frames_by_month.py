@@ -0,0 +1,127 @@
+"""partition frames by month
+
+Revision ID: 8e1b4c6d2f57
+Revises: 5d9f1c7b3a20
+Create Date: 2026-10-20 00:00:08.417265
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e1b4c6d2f57'
+down_revision = '5d9f1c7b3a20'
+branch_labels = None
+depends_on = None
+
+# every table is rewritten in one transaction, so the ingestion is stopped while it runs
+PARTITIONED_TABLES = ('frames', 'drive_sensors', 'ip_port_sensors', 'process_sensors')
+SENSOR_TABLES = PARTITIONED_TABLES[1:]
+# months after the current one partitioned ahead, the server creates the later ones
+MONTHS_AHEAD = 3
+
+
+def fetch_columns(table):
+    return [column['name'] for column in sa.inspect(op.get_bind()).get_columns(table, schema='public')]
+
+
+def fetch_months():
+    """first moments of the months from the first frame up to the month after the last one partitioned"""
+
+    return op.get_bind().execute(sa.text(f"""
+        SELECT generate_series(first_month, date_trunc('month', now()) + interval '{MONTHS_AHEAD + 1} months',
+                               interval '1 month')::timestamp
+        FROM (SELECT date_trunc('month', coalesce(min(frame_create_time), now())) AS first_month
+              FROM public.frames) AS frames
+    """)).scalars().all()
+
+
+def upgrade():
+    for table in (*SENSOR_TABLES, 'screenshot_sensors'):
+        op.add_column(table,
+                      sa.Column('frame_create_time', sa.DateTime(), nullable=True, comment='create time of the frame'),
+                      schema='public')
+        op.execute(f"""
+            UPDATE public.{table} AS sensors
+            SET frame_create_time = frames.frame_create_time
+            FROM public.frames
+            WHERE sensors.frame_id = frames.id
+        """)
+        op.alter_column(table, 'frame_create_time', nullable=False, schema='public')
+        op.drop_constraint(f'fk_{table}_frame_id_frames', table, schema='public', type_='foreignkey')
+
+    months = fetch_months()
+
+    for table in PARTITIONED_TABLES:
+        columns = ', '.join(fetch_columns(table))
+        op.rename_table(table, f'{table}_unpartitioned', schema='public')
+        # the id keeps drawing from the sequence of the unpartitioned table
+        op.execute(f"""
+            CREATE TABLE public.{table} (LIKE public.{table}_unpartitioned INCLUDING DEFAULTS INCLUDING COMMENTS)
+            PARTITION BY RANGE (frame_create_time)
+        """)
+        op.execute(f'CREATE TABLE public.{table}_default PARTITION OF public.{table} DEFAULT')
+        for month, next_month in zip(months, months[1:]):
+            op.execute(f"""
+                CREATE TABLE public.{table}_{month:%Y_%m} PARTITION OF public.{table}
+                FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')
+            """)
+        op.execute(f'INSERT INTO public.{table} ({columns}) SELECT {columns} FROM public.{table}_unpartitioned')
+        op.execute(f'ALTER SEQUENCE public.{table}_id_seq OWNED BY public.{table}.id')
+
+    for table in reversed(PARTITIONED_TABLES):
+        op.drop_table(f'{table}_unpartitioned', schema='public')
+
+    op.create_primary_key(op.f('pk_frames'), 'frames', ['id', 'frame_create_time'], schema='public')
+    op.create_unique_constraint(op.f('uq_frames_user_session_id'), 'frames',
+                                ['user_session_id', 'frame_create_time'], schema='public')
+    op.create_foreign_key(op.f('fk_frames_user_session_id_user_sessions'), 'frames', 'user_sessions',
+                          ['user_session_id'], ['id'], source_schema='public', referent_schema='public')
+    op.create_index('ix_frames_user_session_id_frame_seq', 'frames', ['user_session_id', 'frame_seq'],
+                    unique=False, schema='public')
+
+    for table in SENSOR_TABLES:
+        op.create_primary_key(op.f(f'pk_{table}'), table, ['id', 'frame_create_time'], schema='public')
+        op.create_index(f'ix_{table}_frame_id', table, ['frame_id'], unique=False, schema='public')
+    for table in (*SENSOR_TABLES, 'screenshot_sensors'):
+        op.create_foreign_key(op.f(f'fk_{table}_frame_id_frames'), table, 'frames',
+                              ['frame_id', 'frame_create_time'], ['id', 'frame_create_time'],
+                              source_schema='public', referent_schema='public')
+
+
+def downgrade():
+    op.drop_constraint('fk_screenshot_sensors_frame_id_frames', 'screenshot_sensors', schema='public',
+                       type_='foreignkey')
+
+    for table in PARTITIONED_TABLES:
+        op.rename_table(table, f'{table}_partitioned', schema='public')
+        op.execute(f"""
+            CREATE TABLE public.{table} (LIKE public.{table}_partitioned INCLUDING DEFAULTS INCLUDING COMMENTS)
+        """)
+        if table != 'frames':
+            op.drop_column(table, 'frame_create_time', schema='public')
+        columns = ', '.join(fetch_columns(table))
+        op.execute(f'INSERT INTO public.{table} ({columns}) SELECT {columns} FROM public.{table}_partitioned')
+        op.execute(f'ALTER SEQUENCE public.{table}_id_seq OWNED BY public.{table}.id')
+
+    # the partitions are dropped with their tables
+    for table in reversed(PARTITIONED_TABLES):
+        op.drop_table(f'{table}_partitioned', schema='public')
+
+    op.create_primary_key(op.f('pk_frames'), 'frames', ['id'], schema='public')
+    op.create_unique_constraint(op.f('uq_frames_user_session_id'), 'frames',
+                                ['user_session_id', 'frame_create_time'], schema='public')
+    op.create_foreign_key(op.f('fk_frames_user_session_id_user_sessions'), 'frames', 'user_sessions',
+                          ['user_session_id'], ['id'], source_schema='public', referent_schema='public')
+    op.create_index('ix_frames_user_session_id_frame_seq', 'frames', ['user_session_id', 'frame_seq'],
+                    unique=False, schema='public')
+
+    for table in SENSOR_TABLES:
+        op.create_primary_key(op.f(f'pk_{table}'), table, ['id'], schema='public')
+        op.create_index(f'ix_{table}_frame_id', table, ['frame_id'], unique=False, schema='public')
+    for table in (*SENSOR_TABLES, 'screenshot_sensors'):
+        op.create_foreign_key(op.f(f'fk_{table}_frame_id_frames'), table, 'frames', ['frame_id'], ['id'],
+                              source_schema='public', referent_schema='public')
+
+    op.drop_column('screenshot_sensors', 'frame_create_time', schema='public')
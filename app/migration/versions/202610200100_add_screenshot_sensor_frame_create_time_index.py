@@ -0,0 +1,29 @@
+"""add screenshot sensor frame create time index
+
+Revision ID: 4a7d2e9c1b86
+Revises: 8e1b4c6d2f57
+Create Date: 2026-10-20 01:00:04.931582
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a7d2e9c1b86'
+down_revision = '8e1b4c6d2f57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the retention walks the screenshots from the oldest frames
+    with op.get_context().autocommit_block():
+        op.create_index('ix_screenshot_sensors_frame_create_time_id', 'screenshot_sensors',
+                        ['frame_create_time', 'id'], unique=False, schema='public', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_screenshot_sensors_frame_create_time_id', table_name='screenshot_sensors', schema='public',
+                      postgresql_concurrently=True)
@@ -0,0 +1,29 @@
+"""widen ingest checkpoint name
+
+Revision ID: 6c2f8a1d9e43
+Revises: 4a7d2e9c1b86
+Create Date: 2026-10-20 02:00:12.640917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c2f8a1d9e43'
+down_revision = '4a7d2e9c1b86'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the checkpoints are named by the host and the directory of the spool
+    op.alter_column('ingest_checkpoints', 'name', existing_type=sa.String(length=40), type_=sa.Text(),
+                    existing_comment='spool name', existing_nullable=False, schema='public')
+
+
+def downgrade():
+    # only the shared checkpoint 'records' is read before the upgrade
+    op.execute("DELETE FROM public.ingest_checkpoints WHERE length(name) > 40")
+    op.alter_column('ingest_checkpoints', 'name', existing_type=sa.Text(), type_=sa.String(length=40),
+                    existing_comment='spool name', existing_nullable=False, schema='public')
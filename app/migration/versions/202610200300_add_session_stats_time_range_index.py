@@ -0,0 +1,30 @@
+"""add session stats time range index
+
+Revision ID: 3f9b5d2c7a18
+Revises: 6c2f8a1d9e43
+Create Date: 2026-10-20 03:00:27.318504
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9b5d2c7a18'
+down_revision = '6c2f8a1d9e43'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the list of user sessions is filtered by the dates the sessions overlap
+    with op.get_context().autocommit_block():
+        op.create_index('ix_session_stats_time_range', 'session_stats',
+                        [sa.text("tsrange(start_time, end_time, '[]')")], unique=False, schema='public',
+                        postgresql_using='gist', postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_session_stats_time_range', table_name='session_stats', schema='public',
+                      postgresql_concurrently=True)
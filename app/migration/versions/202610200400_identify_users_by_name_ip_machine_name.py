@@ -0,0 +1,31 @@
+"""identify users by name ip machine name
+
+Revision ID: 8b3e6f1a2d57
+Revises: 3f9b5d2c7a18
+Create Date: 2026-10-20 04:00:41.905127
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3e6f1a2d57'
+down_revision = '3f9b5d2c7a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the rows are unique by each column, so they are unique by the three of them together
+    op.drop_constraint('uq_users_ip', 'users', schema='public', type_='unique')
+    op.drop_constraint('uq_users_machine_name', 'users', schema='public', type_='unique')
+    op.drop_constraint('uq_users_name', 'users', schema='public', type_='unique')
+    op.create_unique_constraint('uq_users_name_ip_machine_name', 'users', ['name', 'ip', 'machine_name'],
+                                schema='public')
+
+
+def downgrade():
+    op.drop_constraint('uq_users_name_ip_machine_name', 'users', schema='public', type_='unique')
+    op.create_unique_constraint('uq_users_name', 'users', ['name'], schema='public')
+    op.create_unique_constraint('uq_users_machine_name', 'users', ['machine_name'], schema='public')
+    op.create_unique_constraint('uq_users_ip', 'users', ['ip'], schema='public')
@@ -1,9 +1,41 @@
 # isort: skip_file
-from app.models.setting import BaseModel, Engine, session
+from app.models.setting import (
+    AsyncDBEngine,
+    AsyncReadDBEngine,
+    BaseModel,
+    Engine,
+    async_read_session,
+    get_async_read_session,
+    get_async_session,
+    pool_stats,
+    read_replica_stats,
+    session,
+    to_datetime,
+)
+from app.models.identity_cache import (
+    IdentityCache,
+    frame_id_cache,
+    identity_cache_stats,
+    user_id_cache,
+    user_session_id_cache,
+)
+from app.models.bulk import bulk_insert
+from app.models.partition import create_partitions, partition_maintainer, partitioned_by_month
 from app.models.user import UserModel
 from app.models.user_session import UserSessionModel
+from app.models.session_stats import SessionStatsModel
 from app.models.frame import FrameModel
-from app.models.sensors.drive import DriveSensorModel
-from app.models.sensors.ip_port import IpPortSensorModel
-from app.models.sensors.process import ProcessSensorModel
+from app.models.sensors.drive import DriveSensorIntervalModel, DriveSensorModel
+from app.models.sensors.ip_port import IpPortSensorIntervalModel, IpPortSensorModel
+from app.models.sensors.process import ProcessSensorIntervalModel, ProcessSensorModel
+from app.models.sensors.screenshot_blob import ScreenshotBlobModel
 from app.models.sensors.screenshot import ScreenshotSensorModel
+from app.models.ingest_checkpoint import IngestCheckpointModel
+from app.models.frame_detail import (
+    async_fetch_frame_detail,
+    async_fetch_frame_detail_by_id,
+    async_fetch_frame_range,
+    fetch_frame_detail,
+    fetch_frame_detail_by_id,
+    fetch_frame_range,
+)
@@ -0,0 +1,133 @@
+import io
+import os
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Table, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+
+from app.models.setting import session
+
+SENSOR_COPY_THRESHOLD = int(os.getenv('SENSOR_COPY_THRESHOLD', '100'))
+
+
+def _copy_value(value: Any) -> str:
+    """
+    format a value for COPY text format
+
+    Parameters
+    ----------
+    value : Any
+        column value
+
+    Returns
+    -------
+    str
+        escaped value, \\N for NULL
+    """
+
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_rows(table: Table, rows: list[dict[str, Any]], db_session: Session = session) -> None:
+    """
+    stream rows into a table with COPY ... FROM STDIN
+
+    runs on the connection of the current session transaction,
+    so the rows are committed or rolled back together with the rest of the request.
+
+    Parameters
+    ----------
+    table : Table
+        destination table
+    rows : list[dict[str, Any]]
+        rows which have the same keys
+    db_session : Session, optional
+        session, by default the scoped session
+    """
+
+    now = datetime.now()
+    columns = [*rows[0].keys(), 'created_at', 'updated_at']
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_value(value) for value in (*row.values(), now, now)))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    """SQL
+    COPY drive_sensors (drive_letter, drive_type, ..., frame_id, created_at, updated_at) FROM STDIN
+    """
+
+    dbapi_connection = db_session.connection().connection.dbapi_connection
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table.fullname} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def copy_records(table: Table, rows: list[dict[str, Any]], db_session: Session) -> None:
+    """
+    stream rows into a table with the binary COPY of asyncpg
+
+    called from the sync session of an AsyncSession.run_sync,
+    the copy is awaited on the asyncpg connection of the current session transaction.
+
+    Parameters
+    ----------
+    table : Table
+        destination table
+    rows : list[dict[str, Any]]
+        rows which have the same keys
+    db_session : Session
+        sync session of the async session
+    """
+
+    now = datetime.now()
+    columns = [*rows[0].keys(), 'created_at', 'updated_at']
+    records = [(*row.values(), now, now) for row in rows]
+
+    """SQL
+    COPY drive_sensors (drive_letter, drive_type, ..., frame_id, created_at, updated_at) FROM STDIN (FORMAT binary)
+    """
+
+    driver_connection = db_session.connection().connection.driver_connection
+    await_only(driver_connection.copy_records_to_table(table.name,
+                                                       records=records,
+                                                       columns=columns,
+                                                       schema_name=table.schema))
+
+
+def bulk_insert(table: Table, rows: list[dict[str, Any]], db_session: Session = session) -> None:
+    """
+    insert rows without building ORM objects
+
+    uses COPY when there are at least SENSOR_COPY_THRESHOLD rows,
+    through psycopg2 for the sync session and asyncpg for the sync session of an async one,
+    otherwise a multi-row INSERT.
+    asyncpg opens its transaction with the first statement, so COPY waits until the transaction has one
+    and the rows are never committed on their own.
+
+    Parameters
+    ----------
+    table : Table
+        destination table
+    rows : list[dict[str, Any]]
+        rows which have the same keys
+    db_session : Session, optional
+        session, by default the scoped session
+    """
+
+    if not rows:
+        return
+
+    connection = db_session.connection()
+    driver = connection.dialect.driver
+    if len(rows) >= SENSOR_COPY_THRESHOLD and driver == 'psycopg2':
+        copy_rows(table, rows, db_session)
+    elif (len(rows) >= SENSOR_COPY_THRESHOLD and driver == 'asyncpg'
+          and connection.connection.driver_connection.is_in_transaction()):
+        copy_records(table, rows, db_session)
+    else:
+        db_session.execute(insert(table), rows)
@@ -25,6 +25,10 @@ class FrameFactory(SQLAlchemyModelFactory):
     def frame_create_time(self):
         date = datetime.now()
         return date
+
+    @factory.lazy_attribute
+    def frame_seq(self):
+        return len(self.user_session.frames) + 1
     user_session = SubFactory(UserSessionFactory)
     created_at = datetime.now()
     updated_at = datetime.now()
@@ -3,11 +3,39 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, select
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    UniqueConstraint,
+    delete,
+    false,
+    select,
+    true,
+    update,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array_agg, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, relationship
 from sqlalchemy.sql import func
 
-from app.models import BaseModel, UserModel, UserSessionModel, session
+from app.errors.exceptions import DataBaseError
+from app.logger import app_logger
+from app.models import (
+    BaseModel,
+    SessionStatsModel,
+    UserModel,
+    UserSessionModel,
+    frame_id_cache,
+    partitioned_by_month,
+    session,
+    to_datetime,
+)
+
+# statements of FrameModel.save before a frame which conflicts but is never visible is given up
+FRAME_SAVE_ATTEMPTS = 3
 
 
 class FrameModel(BaseModel):
@@ -20,20 +48,32 @@ class FrameModel(BaseModel):
         frame id
     frame_create_time : str
         frame create time
+    frame_seq : int
+        1-based position of the frame in its session ordered by frame create time
     user_session_id : int
         user session id
     user_session : UserSessionModel
         user session
     """
     __tablename__ = 'frames'
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    # partitioned by the month of frame_create_time, frame_seq is not unique,
+    # frames after a late frame are renumbered by one statement
+    __table_args__ = partitioned_by_month(UniqueConstraint('user_session_id', 'frame_create_time'),
+                                          Index('ix_frames_user_session_id_frame_seq', 'user_session_id', 'frame_seq'))
+    id = Column(Integer, autoincrement=True)
     frame_create_time = Column(DateTime, nullable=False, comment='frame create time')
+    # 0 only between the insert of save and its numbering in the same transaction
+    frame_seq = Column(Integer, nullable=False, comment='frame no in the session')
     user_session_id = Column(Integer, ForeignKey(UserSessionModel.id), nullable=False, comment='user session id')
 
     user_session = relationship(UserSessionModel, backref='frames')
 
+    # the id alone identifies a frame, the primary key of the table includes the partition key
+    __mapper_args__ = {'primary_key': [id]}
+
     def __init__(self,
                  frame_create_time: str,
+                 frame_seq: Optional[int] = None,
                  user_session_id: Optional[int] = None,
                  user_session: Optional[UserSessionModel] = None,
                  created_at: Optional[datetime] = None,
@@ -43,6 +83,8 @@ class FrameModel(BaseModel):
         ----------
         frame_create_time : str
             frame create time
+        frame_seq : Optional[int], optional
+            frame no in the session, assigned by save, by default None
         user_id : Optional[int], optional
             user id, by default None
         user : Optional[UserModel], optional
@@ -54,6 +96,7 @@ class FrameModel(BaseModel):
         """
 
         self.frame_create_time = frame_create_time
+        self.frame_seq = frame_seq
 
         if user_session_id is not None:
             self.user_session_id = user_session_id
@@ -63,15 +106,145 @@ class FrameModel(BaseModel):
         self.updated_at = updated_at
 
     def __repr__(self) -> str:
-        return f"< FrameModel(frame_create_time={self.frame_create_time}, user_session_id={self.user_session_id}) >"
+        return f"< FrameModel(frame_create_time={self.frame_create_time}, frame_seq={self.frame_seq}, " \
+            f"user_session_id={self.user_session_id}) >"
 
     @ classmethod
-    def save(cls, frame: FrameModel) -> int:
+    def save(cls, frame: FrameModel, db_session: Session = session) -> int:
         """
         save frame
+        look up the identity cache first,
+        then insert the frame or take the existing one in a single statement.
+        an inserted frame is numbered and counted in the session stats
+
+        Parameters
+        ----------
+        frame : FrameModel
+            frame
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        int
+            frame id
+
+        Raises
+        ------
+        DataBaseError
+            the frame conflicts with a frame which stays invisible to the transaction
+        """
+
+        frame_key = (frame.user_session_id, str(frame.frame_create_time))
+        if (frame_id := frame_id_cache.get(frame_key)) is not None:
+            return frame_id
+
+        frame_create_time = to_datetime(frame.frame_create_time)
+
+        inserted = insert(cls).values(frame_create_time=frame_create_time,
+                                      frame_seq=0,
+                                      user_session_id=frame.user_session_id)\
+            .on_conflict_do_nothing(index_elements=[cls.user_session_id, cls.frame_create_time])\
+            .returning(cls.id).cte('inserted')
+        stmt = select(inserted.c.id, true())\
+            .union_all(select(cls.id, false()).where(cls.user_session_id == frame.user_session_id,
+                                                     cls.frame_create_time == frame_create_time))
+
+        # xmax cannot be returned from a partitioned table, the insert tells the new frame from the existing one
+        """SQL
+        WITH inserted AS (
+            INSERT INTO frames (frame_create_time, frame_seq, user_session_id, created_at, updated_at)
+            VALUES (:frame_create_time, 0, :user_session_id, :created_at, :updated_at)
+            ON CONFLICT (user_session_id, frame_create_time) DO NOTHING
+            RETURNING frames.id
+        )
+        SELECT inserted.id, true FROM inserted
+        UNION ALL
+        SELECT frames.id, false FROM frames
+        WHERE frames.user_session_id = :user_session_id_1 AND frames.frame_create_time = :frame_create_time_1
+        """
+
+        # the existing frame is out of the snapshot of the statement when its insert committed while this one waited,
+        # the statement runs again with a new snapshot then.
+        # a frame deleted or rolled back meanwhile conflicts without being seen, so the attempts are bounded
+        for _ in range(FRAME_SAVE_ATTEMPTS):
+            if (row := db_session.execute(stmt).first()) is not None:
+                break
+        else:
+            app_logger.error(f'frame {frame_key} conflicts but is not visible after {FRAME_SAVE_ATTEMPTS} attempts')
+            raise DataBaseError()
+        frame_id, inserted = row
+        if inserted:
+            cls._assign_frame_seq(frame_id, frame_create_time, frame.user_session_id, db_session)
+            SessionStatsModel.add_frame(frame.user_session_id, frame_id, frame_create_time, db_session=db_session)
+
+        frame_id_cache.stage(db_session, frame_key, frame_id)
+        return frame_id
+
+    @classmethod
+    def _assign_frame_seq(cls,
+                          frame_id: int,
+                          frame_create_time: datetime,
+                          user_session_id: int,
+                          db_session: Session) -> None:
+        """
+        number a frame inserted into its session
+
+        the frame counter of the user session is locked until commit, so frames of a session are numbered one by one.
+        a frame older than the saved ones shifts the frames after it.
+
+        Parameters
+        ----------
+        frame_id : int
+            frame id
+        frame_create_time : datetime
+            frame create time
+        user_session_id : int
+            user session id
+        db_session : Session
+            session
+        """
+
+        stmt = update(UserSessionModel).where(UserSessionModel.id == user_session_id)\
+            .values(frame_count=UserSessionModel.frame_count + 1).returning(UserSessionModel.frame_count)
+
+        """SQL
+        UPDATE user_sessions SET frame_count = user_sessions.frame_count + 1
+        WHERE user_sessions.id = :id_1
+        RETURNING user_sessions.frame_count
+        """
+
+        frame_count = db_session.execute(stmt).scalar_one()
+
+        stmt = update(cls).where(cls.user_session_id == user_session_id, cls.frame_create_time > frame_create_time)\
+            .values(frame_seq=cls.frame_seq + 1).execution_options(synchronize_session=False)
+
+        """SQL
+        UPDATE frames SET frame_seq = frames.frame_seq + 1
+        WHERE frames.user_session_id = :user_session_id_1 AND frames.frame_create_time > :frame_create_time_1
+        """
+
+        later_frames = db_session.execute(stmt).rowcount
+
+        stmt = update(cls).where(cls.id == frame_id, cls.frame_create_time == frame_create_time)\
+            .values(frame_seq=frame_count - later_frames).execution_options(synchronize_session=False)
+
+        """SQL
+        UPDATE frames SET frame_seq = :frame_seq
+        WHERE frames.id = :id_1 AND frames.frame_create_time = :frame_create_time_1
+        """
+
+        db_session.execute(stmt)
+
+    @classmethod
+    async def async_save(cls, db_session: AsyncSession, frame: FrameModel) -> int:
+        """
+        awaitable save
 
         Parameters
         ----------
+        db_session : AsyncSession
+            async session
         frame : FrameModel
             frame
 
@@ -81,18 +254,13 @@ class FrameModel(BaseModel):
             frame id
         """
 
-        if (frame_model := cls.fetch_by_frame_create_time_user_session_id(frame.frame_create_time,
-                                                                          frame.user_session_id)) is None:
-            frame = cls(frame_create_time=frame.frame_create_time, user_session_id=frame.user_session_id)
-            session.add(frame)
-            session.flush()
-            return frame.id
-        return frame_model.id
+        return await db_session.run_sync(lambda sync_session: cls.save(frame, db_session=sync_session))
 
     @classmethod
     def fetch_by_frame_create_time_user_session_id(cls,
                                                    frame_create_time: str,
-                                                   user_session_id: int) -> Optional[FrameModel]:
+                                                   user_session_id: int,
+                                                   db_session: Session = session) -> Optional[FrameModel]:
         """
         fetch frame by frame create time and user session id
 
@@ -102,6 +270,8 @@ class FrameModel(BaseModel):
             frame create time
         user_session_id : int
             user session id
+        db_session : Session, optional
+            session, by default the scoped session
 
         Returns
         -------
@@ -109,8 +279,8 @@ class FrameModel(BaseModel):
             frame
         """
 
-        stmt = select(cls.id).where(cls.frame_create_time == frame_create_time
-                                    and cls.user_session_id == user_session_id)
+        stmt = select(cls.id).where(cls.frame_create_time == to_datetime(frame_create_time),
+                                    cls.user_session_id == user_session_id)
 
         """SQL
         SELECT frames.id
@@ -119,15 +289,48 @@ class FrameModel(BaseModel):
             AND frames.user_session_id = %(user_session_id_1) s
         """
 
-        fetch_result = session.execute(stmt).one_or_none()
+        fetch_result = db_session.execute(stmt).one_or_none()
 
         return fetch_result
 
     @classmethod
-    def fetch_all_user_session(cls) -> list[tuple[int, int, str, str, str, str]]:
+    async def async_fetch_by_frame_create_time_user_session_id(cls,
+                                                               db_session: AsyncSession,
+                                                               frame_create_time: str,
+                                                               user_session_id: int) -> Optional[FrameModel]:
+        """
+        awaitable fetch_by_frame_create_time_user_session_id
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        frame_create_time : str
+            frame create time
+        user_session_id : int
+            user session id
+
+        Returns
+        -------
+        Optional[FrameModel]
+            frame
+        """
+
+        return await db_session.run_sync(
+            lambda sync_session: cls.fetch_by_frame_create_time_user_session_id(frame_create_time,
+                                                                                user_session_id,
+                                                                                db_session=sync_session))
+
+    @classmethod
+    def fetch_all_user_session(cls, db_session: Session = session) -> list[tuple[int, int, str, str, str, str]]:
         """
         fetch all user sessions and frames start time and end time
 
+        Parameters
+        ----------
+        db_session : Session, optional
+            session, by default the scoped session
+
         Returns
         -------
         list[tuple[int, int, str, str, str, str]]
@@ -163,13 +366,110 @@ class FrameModel(BaseModel):
         ORDER BY users.name
         """
 
-        fetch_result = session.execute(stmt).all()
+        fetch_result = db_session.execute(stmt).all()
         return fetch_result
 
     @classmethod
-    def fetch_frame_by_session_id_frame_no(cls, session_id: str, frame_no: int):
+    async def async_fetch_all_user_session(cls, db_session: AsyncSession) -> list[tuple[int, int, str, str, str, str]]:
+        """
+        awaitable fetch_all_user_session
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+
+        Returns
+        -------
+        list[tuple[int, int, str, str, str, str]]
+            user sessions and frames start time and end time
+        """
+
+        return await db_session.run_sync(lambda sync_session: cls.fetch_all_user_session(db_session=sync_session))
+
+    @classmethod
+    def rebuild_session_stats(cls, user_session_ids: Optional[list[int]] = None, db_session: Session = session) -> int:
+        """
+        compute the session stats again from the frames
+
+        Parameters
+        ----------
+        user_session_ids : Optional[list[int]], optional
+            user sessions to rebuild, by default None for every user session
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        int
+            number of user sessions with frames
+        """
+
+        stmt = delete(SessionStatsModel)
+        if user_session_ids is not None:
+            stmt = stmt.where(SessionStatsModel.user_session_id.in_(user_session_ids))
+
+        """SQL
+        DELETE FROM session_stats WHERE session_stats.user_session_id IN (:user_session_id_1, ...)
+        """
+
+        db_session.execute(stmt)
+
+        stats = select(cls.user_session_id,
+                       UserModel.id,
+                       UserModel.name,
+                       UserModel.machine_name,
+                       func.min(cls.frame_create_time),
+                       func.max(cls.frame_create_time),
+                       func.count(),
+                       array_agg(aggregate_order_by(cls.id, cls.frame_create_time.desc()))[1],
+                       func.now(),
+                       func.now())\
+            .join(UserSessionModel, cls.user_session_id == UserSessionModel.id)\
+            .join(UserModel, UserSessionModel.user_id == UserModel.id)\
+            .group_by(cls.user_session_id, UserModel.id, UserModel.name, UserModel.machine_name)
+        if user_session_ids is not None:
+            stats = stats.where(cls.user_session_id.in_(user_session_ids))
+
+        table = SessionStatsModel.__table__
+        stmt = insert(table).from_select([table.c.user_session_id,
+                                          table.c.user_id,
+                                          table.c.user_name,
+                                          table.c.machine_name,
+                                          table.c.start_time,
+                                          table.c.end_time,
+                                          table.c.frame_count,
+                                          table.c.last_frame_id,
+                                          table.c.created_at,
+                                          table.c.updated_at], stats)
+
+        """SQL
+        INSERT INTO session_stats (user_session_id, user_id, user_name, machine_name, start_time, end_time,
+                                   frame_count, last_frame_id, created_at, updated_at)
+        SELECT frames.user_session_id,
+            users.id,
+            users.name,
+            users.machine_name,
+            min(frames.frame_create_time),
+            max(frames.frame_create_time),
+            count(*),
+            (array_agg(frames.id ORDER BY frames.frame_create_time DESC))[1],
+            now(),
+            now()
+        FROM frames
+        JOIN user_sessions ON frames.user_session_id = user_sessions.id
+        JOIN users ON user_sessions.user_id = users.id
+        WHERE frames.user_session_id IN (:user_session_id_1, ...)
+        GROUP BY frames.user_session_id, users.id, users.name, users.machine_name
+        """
+
+        return db_session.execute(stmt).rowcount
+
+    @classmethod
+    def fetch_frame_by_session_id_frame_no(cls, session_id: str, frame_no: int, db_session: Session = session):
         """
         fetch frame by session id and frame no
+        an index lookup on (user_session_id, frame_seq) in the partitions of the months of the session
 
         Parameters
         ----------
@@ -177,16 +477,18 @@ class FrameModel(BaseModel):
             session id of user which is uuid
         frame_no : int
             frame no
+        db_session : Session, optional
+            session, by default the scoped session
         """
 
+        session_range = SessionStatsModel.frame_time_range(session_id=session_id)
         stmt = select(FrameModel.id,
                       func.to_char(cls.frame_create_time,  # pylint: disable=not-callable
                                    'YYYY-MM-DD HH24:MI:SS').label('frame_create_time')).\
             join(UserSessionModel, cls.user_session_id == UserSessionModel.id).\
-            where(UserSessionModel.session_id == session_id).\
-            order_by(cls.frame_create_time).\
-            limit(1).\
-            offset(frame_no - 1)
+            where(UserSessionModel.session_id == session_id,
+                  cls.frame_seq == frame_no,
+                  cls.frame_create_time.between(*session_range))
 
         """SQL
         SELECT frames.id,
@@ -194,11 +496,99 @@ class FrameModel(BaseModel):
         FROM frames
         JOIN user_sessions ON frames.user_session_id = user_sessions.id
         WHERE user_sessions.session_id = %(session_id_1) s
-        ORDER BY frames.frame_create_time
-        LIMIT %(param_1) s
-        OFFSET %(param_2) s
+            AND frames.frame_seq = %(frame_seq_1) s
+            AND frames.frame_create_time BETWEEN coalesce((SELECT session_stats.start_time ...), '-infinity')
+                                             AND coalesce((SELECT session_stats.end_time ...), 'infinity')
         """
 
-        fetch_result = session.execute(stmt).one()
+        fetch_result = db_session.execute(stmt).one()
 
         return fetch_result
+
+    @classmethod
+    async def async_fetch_frame_by_session_id_frame_no(cls, db_session: AsyncSession, session_id: str, frame_no: int):
+        """
+        awaitable fetch_frame_by_session_id_frame_no
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        session_id : str
+            session id of user which is uuid
+        frame_no : int
+            frame no
+        """
+
+        return await db_session.run_sync(
+            lambda sync_session: cls.fetch_frame_by_session_id_frame_no(session_id, frame_no, db_session=sync_session))
+
+    @classmethod
+    def fetch_frame_id_by_session_id_frame_no(cls,
+                                              session_id: str,
+                                              frame_no: int,
+                                              db_session: Session = session) -> Optional[int]:
+        """
+        fetch the id of the frame at a frame no, which changes when a late frame is inserted before it
+
+        Parameters
+        ----------
+        session_id : str
+            session id of user which is uuid
+        frame_no : int
+            frame no
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        Optional[int]
+            frame id, None if the session has no such frame
+        """
+
+        session_range = SessionStatsModel.frame_time_range(session_id=session_id)
+        stmt = select(cls.id).\
+            join(UserSessionModel, cls.user_session_id == UserSessionModel.id).\
+            where(UserSessionModel.session_id == session_id,
+                  cls.frame_seq == frame_no,
+                  cls.frame_create_time.between(*session_range))
+
+        """SQL
+        SELECT frames.id
+        FROM frames
+        JOIN user_sessions ON frames.user_session_id = user_sessions.id
+        WHERE user_sessions.session_id = %(session_id_1) s
+            AND frames.frame_seq = %(frame_seq_1) s
+            AND frames.frame_create_time BETWEEN coalesce((SELECT session_stats.start_time ...), '-infinity')
+                                             AND coalesce((SELECT session_stats.end_time ...), 'infinity')
+        """
+
+        return db_session.execute(stmt).scalar_one_or_none()
+
+    @classmethod
+    async def async_fetch_frame_id_by_session_id_frame_no(cls,
+                                                          db_session: AsyncSession,
+                                                          session_id: str,
+                                                          frame_no: int) -> Optional[int]:
+        """
+        awaitable fetch_frame_id_by_session_id_frame_no
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        session_id : str
+            session id of user which is uuid
+        frame_no : int
+            frame no
+
+        Returns
+        -------
+        Optional[int]
+            frame id, None if the session has no such frame
+        """
+
+        return await db_session.run_sync(
+            lambda sync_session: cls.fetch_frame_id_by_session_id_frame_no(session_id,
+                                                                           frame_no,
+                                                                           db_session=sync_session))
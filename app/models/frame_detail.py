@@ -0,0 +1,356 @@
+import os
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from sqlalchemy import ColumnElement, Row, Select, cast, literal, select
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.models import (
+    DriveSensorIntervalModel,
+    DriveSensorModel,
+    FrameModel,
+    IpPortSensorIntervalModel,
+    IpPortSensorModel,
+    ProcessSensorIntervalModel,
+    ProcessSensorModel,
+    ScreenshotSensorModel,
+    SessionStatsModel,
+    UserSessionModel,
+    session,
+)
+from app.models.sensors.interval import interval_storage
+
+DRIVE_SENSOR_FIELDS = ('drive_letter', 'drive_type', 'volume_name', 'file_system', 'all_space', 'free_space')
+IP_PORT_SENSOR_FIELDS = ('state', 'ip', 'port', 'process_id', 'remote_ip', 'remote_port')
+PROCESS_SENSOR_FIELDS = ('file_path', 'process_name', 'process_id', 'started_at')
+
+# frames fetched from the server side cursor at a time by fetch_frame_range
+FRAME_RANGE_YIELD_PER = int(os.getenv('FRAME_RANGE_YIELD_PER', '100'))
+
+
+def _field(model: Any, name: str) -> Any:
+    """
+    column of a sensor as it is returned by the api
+
+    Parameters
+    ----------
+    model : Any
+        sensor model or sensor interval model
+    name : str
+        column name
+
+    Returns
+    -------
+    Any
+        column expression
+    """
+
+    column = getattr(model, name)
+    if name == 'started_at':
+        return func.to_char(column, 'YYYY-MM-DD HH24:MI:SS')  # pylint: disable=not-callable
+    return column
+
+
+def _sensor_list(model: Any, interval_model: Any, fields: tuple[str, ...]) -> ColumnElement:
+    """
+    json array of the sensors of the frame selected by the enclosing query
+
+    the sensors are matched on the partition key too, so each subquery reads the partition of the month of the frame.
+    the intervals which contain the frame are appended when SENSOR_STORAGE_MODE is interval.
+
+    Parameters
+    ----------
+    model : Any
+        sensor model
+    interval_model : Any
+        sensor interval model
+    fields : tuple[str, ...]
+        column names
+
+    Returns
+    -------
+    ColumnElement
+        jsonb array built by correlated subqueries
+    """
+
+    def json_array(source: Any, *criteria: Any) -> Any:
+        row = func.jsonb_build_object(*(item for name in fields for item in (literal(name), _field(source, name))))
+        array = select(func.jsonb_agg(aggregate_order_by(row, source.id))).where(*criteria).scalar_subquery()
+        return func.coalesce(array, cast(literal('[]'), JSONB), type_=JSONB)
+
+    sensors = json_array(model,
+                         model.frame_id == FrameModel.id,
+                         model.frame_create_time == FrameModel.frame_create_time)
+    if interval_storage():
+        intervals = json_array(interval_model,
+                               interval_model.user_session_id == FrameModel.user_session_id,
+                               FrameModel.frame_create_time.between(interval_model.first_seen_at,
+                                                                    interval_model.last_seen_at))
+        sensors = sensors.op('||', return_type=JSONB)(intervals)
+
+    return sensors
+
+
+def _frame_details(*criteria: Any, image_path: bool = False) -> Select:
+    """
+    select frames with their sensors
+
+    Parameters
+    ----------
+    *criteria : Any
+        criteria of the frames
+    image_path : bool, optional
+        select the screenshot image path too, by default False
+
+    Returns
+    -------
+    Select
+        select statement
+    """
+
+    columns = [FrameModel.id,
+               FrameModel.frame_seq,
+               func.to_char(FrameModel.frame_create_time,  # pylint: disable=not-callable
+                            'YYYY-MM-DD HH24:MI:SS').label('frame_create_time'),
+               _sensor_list(DriveSensorModel, DriveSensorIntervalModel, DRIVE_SENSOR_FIELDS)
+               .label('drive_sensors'),
+               _sensor_list(IpPortSensorModel, IpPortSensorIntervalModel, IP_PORT_SENSOR_FIELDS)
+               .label('ip_port_sensors'),
+               _sensor_list(ProcessSensorModel, ProcessSensorIntervalModel, PROCESS_SENSOR_FIELDS)
+               .label('process_sensors')]
+    if image_path:
+        columns.append(select(ScreenshotSensorModel.image_path)
+                       .where(ScreenshotSensorModel.frame_id == FrameModel.id,
+                              ScreenshotSensorModel.frame_create_time == FrameModel.frame_create_time)
+                       .limit(1).scalar_subquery().label('image_path'))
+
+    return select(*columns).join(UserSessionModel, FrameModel.user_session_id == UserSessionModel.id).where(*criteria)
+
+
+def fetch_frame_detail(session_id: str, frame_no: int, db_session: Session = session) -> Row:
+    """
+    fetch a frame with its sensors in one statement
+
+    Parameters
+    ----------
+    session_id : str
+        session id of user which is uuid
+    frame_no : int
+        frame no
+    db_session : Session, optional
+        session, by default the scoped session
+
+    Returns
+    -------
+    Row
+        frame id, frame no, frame create time, and drive sensors, ip port sensors and process sensors as lists of dicts
+    """
+
+    session_range = SessionStatsModel.frame_time_range(session_id=session_id)
+    stmt = _frame_details(UserSessionModel.session_id == session_id,
+                          FrameModel.frame_seq == frame_no,
+                          FrameModel.frame_create_time.between(*session_range))
+
+    """SQL
+    SELECT frames.id,
+        frames.frame_seq,
+        to_char(frames.frame_create_time, 'YYYY-MM-DD HH24:MI:SS') AS frame_create_time,
+        coalesce((SELECT jsonb_agg(jsonb_build_object('drive_letter', drive_sensors.drive_letter, ...)
+                                   ORDER BY drive_sensors.id)
+                  FROM drive_sensors
+                  WHERE drive_sensors.frame_id = frames.id
+                      AND drive_sensors.frame_create_time = frames.frame_create_time), CAST('[]' AS JSONB))
+            AS drive_sensors,
+        (...) AS ip_port_sensors,
+        (...) AS process_sensors
+    FROM frames
+    JOIN user_sessions ON frames.user_session_id = user_sessions.id
+    WHERE user_sessions.session_id = %(session_id_1) s
+        AND frames.frame_seq = %(frame_seq_1) s
+        AND frames.frame_create_time BETWEEN coalesce((SELECT session_stats.start_time ...), '-infinity')
+                                         AND coalesce((SELECT session_stats.end_time ...), 'infinity')
+    """
+
+    return db_session.execute(stmt).one()
+
+
+async def async_fetch_frame_detail(db_session: AsyncSession, session_id: str, frame_no: int) -> Row:
+    """
+    awaitable fetch_frame_detail
+
+    Parameters
+    ----------
+    db_session : AsyncSession
+        async session
+    session_id : str
+        session id of user which is uuid
+    frame_no : int
+        frame no
+
+    Returns
+    -------
+    Row
+        frame with its sensors
+    """
+
+    return await db_session.run_sync(
+        lambda sync_session: fetch_frame_detail(session_id, frame_no, db_session=sync_session))
+
+
+def fetch_frame_detail_by_id(frame_id: int, db_session: Session = session) -> Row:
+    """
+    fetch a frame by its id with its sensors in one statement
+
+    Parameters
+    ----------
+    frame_id : int
+        frame id
+    db_session : Session, optional
+        session, by default the scoped session
+
+    Returns
+    -------
+    Row
+        frame id, frame no, frame create time, and drive sensors, ip port sensors and process sensors as lists of dicts
+    """
+
+    stmt = _frame_details(FrameModel.id == frame_id)
+
+    """SQL
+    SELECT frames.id, frames.frame_seq, ... AS process_sensors
+    FROM frames
+    JOIN user_sessions ON frames.user_session_id = user_sessions.id
+    WHERE frames.id = %(id_1) s
+    """
+
+    return db_session.execute(stmt).one()
+
+
+async def async_fetch_frame_detail_by_id(db_session: AsyncSession, frame_id: int) -> Row:
+    """
+    awaitable fetch_frame_detail_by_id
+
+    Parameters
+    ----------
+    db_session : AsyncSession
+        async session
+    frame_id : int
+        frame id
+
+    Returns
+    -------
+    Row
+        frame with its sensors
+    """
+
+    return await db_session.run_sync(lambda sync_session: fetch_frame_detail_by_id(frame_id, db_session=sync_session))
+
+
+def _frame_range(session_id: str, first_no: int, last_no: Optional[int]) -> Select:
+    """
+    select the frames of a session between two frame nos with their sensors and screenshot image paths
+
+    Parameters
+    ----------
+    session_id : str
+        session id of user which is uuid
+    first_no : int
+        first frame no
+    last_no : Optional[int]
+        last frame no, None for the last frame of the session
+
+    Returns
+    -------
+    Select
+        select statement ordered by frame no
+    """
+
+    session_range = SessionStatsModel.frame_time_range(session_id=session_id)
+    criteria = [UserSessionModel.session_id == session_id,
+                FrameModel.frame_seq >= first_no,
+                FrameModel.frame_create_time.between(*session_range)]
+    if last_no is not None:
+        criteria.append(FrameModel.frame_seq <= last_no)
+
+    stmt = _frame_details(*criteria, image_path=True).order_by(FrameModel.frame_seq)
+
+    """SQL
+    SELECT frames.id, frames.frame_seq, ... AS process_sensors,
+        (SELECT screenshot_sensors.image_path FROM screenshot_sensors
+         WHERE screenshot_sensors.frame_id = frames.id
+             AND screenshot_sensors.frame_create_time = frames.frame_create_time LIMIT 1) AS image_path
+    FROM frames
+    JOIN user_sessions ON frames.user_session_id = user_sessions.id
+    WHERE user_sessions.session_id = %(session_id_1) s
+        AND frames.frame_seq >= %(frame_seq_1) s
+        AND frames.frame_create_time BETWEEN coalesce((SELECT session_stats.start_time ...), '-infinity')
+                                         AND coalesce((SELECT session_stats.end_time ...), 'infinity')
+        AND frames.frame_seq <= %(frame_seq_2) s
+    ORDER BY frames.frame_seq
+    """
+
+    return stmt
+
+
+def fetch_frame_range(session_id: str,
+                      first_no: int,
+                      last_no: Optional[int] = None,
+                      db_session: Session = session) -> Iterator[Row]:
+    """
+    fetch the frames of a session between two frame nos with their sensors in one statement
+
+    the rows are read through a server side cursor FRAME_RANGE_YIELD_PER at a time,
+    so the memory does not grow with the range.
+
+    Parameters
+    ----------
+    session_id : str
+        session id of user which is uuid
+    first_no : int
+        first frame no
+    last_no : Optional[int], optional
+        last frame no, by default None for the last frame of the session
+    db_session : Session, optional
+        session, by default the scoped session
+
+    Yields
+    ------
+    Row
+        frame with its sensors and screenshot image path, ordered by frame no
+    """
+
+    stmt = _frame_range(session_id, first_no, last_no).execution_options(yield_per=FRAME_RANGE_YIELD_PER)
+
+    yield from db_session.execute(stmt)
+
+
+async def async_fetch_frame_range(db_session: AsyncSession,
+                                  session_id: str,
+                                  first_no: int,
+                                  last_no: Optional[int] = None) -> AsyncIterator[Row]:
+    """
+    awaitable fetch_frame_range
+
+    Parameters
+    ----------
+    db_session : AsyncSession
+        async session
+    session_id : str
+        session id of user which is uuid
+    first_no : int
+        first frame no
+    last_no : Optional[int], optional
+        last frame no, by default None for the last frame of the session
+
+    Yields
+    ------
+    Row
+        frame with its sensors and screenshot image path, ordered by frame no
+    """
+
+    stmt = _frame_range(session_id, first_no, last_no).execution_options(yield_per=FRAME_RANGE_YIELD_PER)
+
+    async for row in await db_session.stream(stmt):
+        yield row
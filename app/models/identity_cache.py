@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, SessionTransaction, scoped_session
+
+IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', '10000'))
+IDENTITY_CACHE_TTL = float(os.getenv('IDENTITY_CACHE_TTL', '3600'))
+
+PENDING_KEY = 'identity_cache_pending'
+
+
+class IdentityCache:
+    """
+    IdentityCache
+
+    bounded LRU cache per worker which maps natural keys to database ids.
+    ids of rows inserted by the current transaction are staged and become visible only after commit,
+    and the ids staged in a transaction or a savepoint are dropped when it rolls back.
+
+    Attributes
+    ----------
+    name : str
+        cache name
+    max_size : int
+        maximum number of entries
+    ttl : float
+        seconds until an entry expires
+    hits : int
+        number of lookups answered from the cache
+    misses : int
+        number of lookups which fell through to the database
+    """
+
+    instances: list[IdentityCache] = []
+
+    def __init__(self, name: str, max_size: int = IDENTITY_CACHE_SIZE, ttl: float = IDENTITY_CACHE_TTL) -> None:
+        """
+        Parameters
+        ----------
+        name : str
+            cache name
+        max_size : int, optional
+            maximum number of entries, by default IDENTITY_CACHE_SIZE
+        ttl : float, optional
+            seconds until an entry expires, by default IDENTITY_CACHE_TTL
+        """
+
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        IdentityCache.instances.append(self)
+
+    def __repr__(self) -> str:
+        return f"<IdentityCache(name={self.name}, size={len(self._entries)}, hits={self.hits}, misses={self.misses})>"
+
+    def get(self, key: Hashable) -> Optional[int]:
+        """
+        get id by natural key
+
+        Parameters
+        ----------
+        key : Hashable
+            natural key
+
+        Returns
+        -------
+        Optional[int]
+            cached id, None if the key is not cached or expired
+        """
+
+        with self._lock:
+            if (entry := self._entries.get(key)) is None or entry[1] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: int) -> None:
+        """
+        put id of a committed row
+
+        Parameters
+        ----------
+        key : Hashable
+            natural key
+        value : int
+            database id
+        """
+
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stage(self, db_session: Session, key: Hashable, value: int) -> None:
+        """
+        stage id of a row inserted by the current transaction
+
+        the id is put into the cache when the transaction commits,
+        and dropped when the transaction or the savepoint it was staged in rolls back.
+
+        Parameters
+        ----------
+        db_session : Session
+            session which inserted the row
+        key : Hashable
+            natural key
+        value : int
+            database id
+        """
+
+        if isinstance(db_session, scoped_session):
+            db_session = db_session()
+        transaction = db_session.get_nested_transaction() or db_session.get_transaction()
+        db_session.info.setdefault(PENDING_KEY, []).append((transaction, self, key, value))
+
+    def clear(self) -> None:
+        """
+        clear all entries
+        """
+
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """
+        hit and miss counters
+
+        Returns
+        -------
+        dict[str, int]
+            size, hits and misses of the cache
+        """
+
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    @classmethod
+    def clear_all(cls) -> None:
+        """
+        clear all caches
+        """
+
+        for instance in cls.instances:
+            instance.clear()
+
+
+user_id_cache = IdentityCache('users')
+user_session_id_cache = IdentityCache('user_sessions')
+frame_id_cache = IdentityCache('frames')
+
+
+def identity_cache_stats() -> dict[str, dict[str, int]]:
+    """
+    hit and miss counters of all caches
+
+    Returns
+    -------
+    dict[str, dict[str, int]]
+        stats by cache name
+    """
+
+    return {instance.name: instance.stats() for instance in IdentityCache.instances}
+
+
+def _staged_in(transaction: Optional[SessionTransaction], rolled_back: SessionTransaction) -> bool:
+    """whether a transaction is the one rolled back or a savepoint inside it"""
+
+    while transaction is not None:
+        if transaction is rolled_back:
+            return True
+        transaction = transaction.parent
+    return False
+
+
+@event.listens_for(Session, 'after_commit')
+def _promote_pending(db_session: Session) -> None:
+    for _, cache, key, value in db_session.info.pop(PENDING_KEY, []):
+        cache.put(key, value)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _drop_rolled_back(db_session: Session, previous_transaction: SessionTransaction) -> None:
+    # a savepoint of one broken record keeps the ids of the other records and the cached ids of committed rows
+    if pending := db_session.info.get(PENDING_KEY):
+        pending[:] = [entry for entry in pending if not _staged_in(entry[0], previous_transaction)]
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _drop_pending(db_session: Session, transaction: SessionTransaction) -> None:
+    if transaction.parent is None:
+        db_session.info.pop(PENDING_KEY, None)
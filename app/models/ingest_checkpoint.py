@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, Text, exists, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from app.models import BaseModel, session
+
+
+class IngestCheckpointModel(BaseModel):
+    """
+    IngestCheckpointModel
+
+    position of the spool up to which records are saved.
+    it is updated in the transaction which saves the records,
+    so a record is never saved twice even if the worker stops between the two.
+
+    Attributes
+    ----------
+    name : str
+        spool name, the host and the directory of the spool
+    position : int
+        spool position after the last saved record
+    """
+    __tablename__ = 'ingest_checkpoints'
+    name = Column(Text, primary_key=True, comment='spool name')
+    position = Column(BigInteger, nullable=False, default=0, comment='spool position')
+
+    def __repr__(self) -> str:
+        return f"<IngestCheckpointModel(name={self.name}, position={self.position})>"
+
+    @classmethod
+    def fetch_position(cls, name: str, db_session: Session = session) -> int:
+        """
+        fetch position of the spool
+
+        Parameters
+        ----------
+        name : str
+            spool name
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        int
+            position, 0 if the spool has never been drained
+        """
+
+        stmt = select(cls.position).where(cls.name == name)
+
+        """SQL
+        SELECT ingest_checkpoints.position
+        FROM ingest_checkpoints
+        WHERE ingest_checkpoints.name = :name_1
+        """
+
+        position = db_session.execute(stmt).scalar_one_or_none()
+
+        return position or 0
+
+    @classmethod
+    async def async_fetch_position(cls, db_session: AsyncSession, name: str) -> int:
+        """
+        awaitable fetch_position
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        name : str
+            spool name
+
+        Returns
+        -------
+        int
+            position, 0 if the spool has never been drained
+        """
+
+        return await db_session.run_sync(lambda sync_session: cls.fetch_position(name, db_session=sync_session))
+
+    @classmethod
+    def save_position(cls, name: str, position: int, db_session: Session = session) -> None:
+        """
+        save position of the spool
+
+        Parameters
+        ----------
+        name : str
+            spool name
+        position : int
+            spool position after the last saved record
+        db_session : Session, optional
+            session, by default the scoped session
+        """
+
+        now = datetime.now()
+        stmt = insert(cls).values(name=name, position=position, created_at=now, updated_at=now)
+        stmt = stmt.on_conflict_do_update(index_elements=[cls.name],
+                                          set_={'position': stmt.excluded.position,
+                                                'updated_at': stmt.excluded.updated_at})
+
+        """SQL
+        INSERT INTO ingest_checkpoints (name, position, created_at, updated_at)
+        VALUES (:name, :position, :created_at, :updated_at)
+        ON CONFLICT (name) DO UPDATE SET position = excluded.position, updated_at = excluded.updated_at
+        """
+
+        db_session.execute(stmt)
+
+    @classmethod
+    async def async_save_position(cls, db_session: AsyncSession, name: str, position: int) -> None:
+        """
+        awaitable save_position
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        name : str
+            spool name
+        position : int
+            spool position after the last saved record
+        """
+
+        await db_session.run_sync(lambda sync_session: cls.save_position(name, position, db_session=sync_session))
+
+    @classmethod
+    def rename(cls, name: str, new_name: str, db_session: Session = session) -> bool:
+        """
+        move a checkpoint to another spool name which has no checkpoint yet
+
+        Parameters
+        ----------
+        name : str
+            spool name of the checkpoint
+        new_name : str
+            spool name to move it to
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        bool
+            whether the checkpoint is moved, False if there is none or the new name has one already
+        """
+
+        other = aliased(cls)
+        stmt = update(cls).where(cls.name == name, ~exists().where(other.name == new_name))\
+            .values(name=new_name, updated_at=datetime.now())
+
+        """SQL
+        UPDATE ingest_checkpoints SET name = :new_name, updated_at = :updated_at
+        WHERE ingest_checkpoints.name = :name_1
+            AND NOT (EXISTS (SELECT * FROM ingest_checkpoints AS ingest_checkpoints_1
+                             WHERE ingest_checkpoints_1.name = :new_name))
+        """
+
+        return db_session.execute(stmt).rowcount > 0
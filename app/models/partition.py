@@ -0,0 +1,427 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import Connection, PrimaryKeyConstraint, Table, event, text
+from sqlalchemy.exc import DBAPIError
+
+from app.logger import app_logger
+from app.models.setting import BaseModel, Engine
+
+# months after the current one whose partitions are created before their frames arrive
+FRAME_PARTITION_MONTHS_AHEAD = int(os.getenv('FRAME_PARTITION_MONTHS_AHEAD', '3'))
+# seconds between the checks of a running server for the partitions ahead, 0 to check on startup only
+FRAME_PARTITION_CHECK_INTERVAL = float(os.getenv('FRAME_PARTITION_CHECK_INTERVAL', '86400'))
+# milliseconds creating a partition waits for the locks of its table before it is left to the next check
+FRAME_PARTITION_LOCK_TIMEOUT = int(os.getenv('FRAME_PARTITION_LOCK_TIMEOUT', '5000'))
+
+PARTITION_KEY = 'frame_create_time'
+
+
+def partitioned_by_month(*constraints: Any) -> tuple:
+    """
+    table args of a table partitioned by the month of the frame create time
+
+    the primary key includes the partition key, as every unique constraint of a partitioned table must.
+
+    Parameters
+    ----------
+    *constraints : Any
+        other constraints and indexes of the table
+
+    Returns
+    -------
+    tuple
+        __table_args__
+    """
+
+    return (PrimaryKeyConstraint('id', PARTITION_KEY),
+            *constraints,
+            {**BaseModel.__table_args__, 'postgresql_partition_by': f'RANGE ({PARTITION_KEY})'})
+
+
+def partitioned_tables() -> list[Table]:
+    """
+    tables partitioned by month, parents before the tables referencing them
+
+    Returns
+    -------
+    list[Table]
+        partitioned tables
+    """
+
+    return [table for table in BaseModel.metadata.sorted_tables
+            if table.dialect_options['postgresql'].get('partition_by')]
+
+
+def month_start(value: datetime) -> datetime:
+    """
+    first moment of the month of a datetime
+
+    Parameters
+    ----------
+    value : datetime
+        datetime
+
+    Returns
+    -------
+    datetime
+        first day of the month at midnight
+    """
+
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """
+    first moment of a month before or after another
+
+    Parameters
+    ----------
+    month : datetime
+        first moment of a month
+    months : int
+        number of months to add, negative for the months before
+
+    Returns
+    -------
+    datetime
+        first moment of the month
+    """
+
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table_name: str, month: Optional[datetime] = None) -> str:
+    """
+    name of a partition
+
+    Parameters
+    ----------
+    table_name : str
+        partitioned table name
+    month : Optional[datetime], optional
+        first moment of the month of the partition, by default None for the default partition
+
+    Returns
+    -------
+    str
+        e.g. frames_2026_10 or frames_default
+    """
+
+    if month is None:
+        return f'{table_name}_default'
+    return f'{table_name}_{month:%Y_%m}'
+
+
+def _qualified_name(connection: Connection, name: str) -> str:
+    """quoted name of a table in the schema of the models"""
+
+    preparer = connection.dialect.identifier_preparer
+    if BaseModel.metadata.schema is None:
+        return preparer.quote(name)
+    return f'{preparer.quote_schema(BaseModel.metadata.schema)}.{preparer.quote(name)}'
+
+
+def _table_exists(connection: Connection, name: str) -> bool:
+    return connection.execute(text('SELECT to_regclass(:name)'),
+                              {'name': _qualified_name(connection, name)}).scalar() is not None
+
+
+def _alter_partition(connection: Connection, name: str, *statements: str) -> bool:
+    """
+    run the statements creating or dropping a partition in a savepoint which waits for locks up to the lock timeout
+
+    a partition which is not altered, e.g. behind a long reader of its table or by another worker at the same time,
+    is skipped and altered on a later run, so the queries queued behind the lock are never held for long.
+
+    Parameters
+    ----------
+    connection : Connection
+        connection in a transaction
+    name : str
+        quoted partition name
+    *statements : str
+        statements creating or dropping the partition
+
+    Returns
+    -------
+    bool
+        whether the statements are run
+    """
+
+    set_lock_timeout = text("SELECT set_config('lock_timeout', :lock_timeout, true)")
+    lock_timeout = connection.execute(text("SELECT current_setting('lock_timeout')")).scalar()
+
+    try:
+        with connection.begin_nested():
+            connection.execute(set_lock_timeout, {'lock_timeout': f'{FRAME_PARTITION_LOCK_TIMEOUT}ms'})
+            for statement in statements:
+                connection.execute(text(statement))
+    except DBAPIError as exc:
+        app_logger.warning(f'partition {name} is not altered: {exc.orig}')
+        return False
+    finally:
+        connection.execute(set_lock_timeout, {'lock_timeout': lock_timeout})
+    return True
+
+
+def _create_month_partition(connection: Connection, table: Table, month: datetime) -> bool:
+    """
+    create the partition of a month and attach it to its table
+
+    the partition is created apart and attached, which locks the parent less than CREATE TABLE ... PARTITION OF.
+    attaching fails when the default partition holds rows of the month, the month is then left to the default.
+
+    Parameters
+    ----------
+    connection : Connection
+        connection in a transaction
+    table : Table
+        partitioned table
+    month : datetime
+        first moment of the month
+
+    Returns
+    -------
+    bool
+        whether the partition is created
+    """
+
+    parent = _qualified_name(connection, table.name)
+    partition = _qualified_name(connection, partition_name(table.name, month))
+
+    return _alter_partition(connection,
+                            partition,
+                            f'CREATE TABLE {partition} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                            f"ALTER TABLE {parent} ATTACH PARTITION {partition} "
+                            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')")
+
+
+def create_partitions(months_ahead: int = FRAME_PARTITION_MONTHS_AHEAD,
+                      first_month: Optional[datetime] = None,
+                      connection: Optional[Connection] = None) -> list[str]:
+    """
+    create the default partition and the monthly partitions missing up to months ahead of the current month
+
+    frames out of the monthly partitions are kept in the default partition.
+    tables which are not created yet are skipped, and partitions which exist are kept, so it may run at any time.
+    a partition waiting for the locks of its table longer than FRAME_PARTITION_LOCK_TIMEOUT is left to the next run.
+
+    Parameters
+    ----------
+    months_ahead : int, optional
+        months after the current one, by default FRAME_PARTITION_MONTHS_AHEAD
+    first_month : Optional[datetime], optional
+        first month to create, by default None for the current month
+    connection : Optional[Connection], optional
+        connection in a transaction, by default None for a transaction of its own
+
+    Returns
+    -------
+    list[str]
+        names of the partitions created
+    """
+
+    if connection is None:
+        with Engine.begin() as own_connection:
+            return create_partitions(months_ahead, first_month, own_connection)
+
+    current_month = month_start(datetime.now())
+    first_month = current_month if first_month is None else month_start(first_month)
+    last_month = add_months(current_month, months_ahead)
+
+    created = []
+    for table in partitioned_tables():
+        if not _table_exists(connection, table.name):
+            continue
+
+        default_name = partition_name(table.name)
+        default_partition = _qualified_name(connection, default_name)
+        if not _table_exists(connection, default_name) and _alter_partition(
+                connection,
+                default_partition,
+                f'CREATE TABLE {default_partition} PARTITION OF {_qualified_name(connection, table.name)} DEFAULT'):
+            created.append(default_name)
+
+        month = first_month
+        while month <= last_month:
+            name = partition_name(table.name, month)
+            if not _table_exists(connection, name) and _create_month_partition(connection, table, month):
+                created.append(name)
+            month = add_months(month, 1)
+
+    return created
+
+
+def month_partitions(connection: Connection, table: Table) -> dict[datetime, str]:
+    """
+    monthly partitions of a table
+
+    Parameters
+    ----------
+    connection : Connection
+        connection
+    table : Table
+        partitioned table
+
+    Returns
+    -------
+    dict[datetime, str]
+        partition names by the first moment of their month, in the order of the months
+    """
+
+    names = connection.execute(text("""
+        SELECT partitions.relname FROM pg_inherits
+        JOIN pg_class AS partitions ON partitions.oid = pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent = to_regclass(:table_name)
+    """), {'table_name': _qualified_name(connection, table.name)}).scalars()
+
+    partitions = {}
+    for name in names:
+        try:
+            partitions[datetime.strptime(name[len(table.name) + 1:], '%Y_%m')] = name
+        except ValueError:
+            continue
+    return dict(sorted(partitions.items()))
+
+
+def drop_partitions(tables: list[Table],
+                    before: datetime,
+                    dry_run: bool = False,
+                    connection: Optional[Connection] = None) -> dict[str, tuple[int, int]]:
+    """
+    drop the monthly partitions whose whole month is before a datetime
+
+    a partition waiting longer than FRAME_PARTITION_LOCK_TIMEOUT for the lock of its table is left to the next run.
+    rows of those months in the default partition are not dropped.
+
+    Parameters
+    ----------
+    tables : list[Table]
+        partitioned tables which no other table references
+    before : datetime
+        datetime the months end before
+    dry_run : bool, optional
+        measure the partitions without dropping them, by default False
+    connection : Optional[Connection], optional
+        connection in a transaction, by default None for a transaction of its own
+
+    Returns
+    -------
+    dict[str, tuple[int, int]]
+        number of rows and bytes of each partition dropped
+    """
+
+    if connection is None:
+        with Engine.begin() as own_connection:
+            return drop_partitions(tables, before, dry_run, own_connection)
+
+    dropped = {}
+    for table in tables:
+        if not _table_exists(connection, table.name):
+            continue
+
+        for month, name in month_partitions(connection, table).items():
+            if add_months(month, 1) > before:
+                break
+
+            partition = _qualified_name(connection, name)
+            rows, size = connection.execute(text(f'SELECT count(*), pg_total_relation_size(to_regclass(:name)) '
+                                                 f'FROM {partition}'), {'name': partition}).one()
+            if dry_run or _alter_partition(connection, partition, f'DROP TABLE {partition}'):
+                dropped[name] = (rows, size)
+
+    return dropped
+
+
+@event.listens_for(BaseModel.metadata, 'after_create')
+def _create_initial_partitions(target: Any, connection: Connection, **kw: Any) -> None:
+    """partition the tables created by create_all, so they take rows at once"""
+
+    create_partitions(connection=connection)
+
+
+class PartitionMaintainer:
+    """
+    PartitionMaintainer
+
+    creates the partitions ahead on startup and then every interval while the server runs,
+    so frames of a new month never wait for a migration.
+
+    Attributes
+    ----------
+    interval : float
+        seconds between the checks, 0 to check on startup only
+    """
+
+    def __init__(self, interval: float = FRAME_PARTITION_CHECK_INTERVAL) -> None:
+        """
+        Parameters
+        ----------
+        interval : float, optional
+            seconds between the checks, by default FRAME_PARTITION_CHECK_INTERVAL
+        """
+
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def __repr__(self) -> str:
+        return f"<PartitionMaintainer(interval={self.interval})>"
+
+    async def check(self) -> list[str]:
+        """
+        create the missing partitions in a worker thread
+
+        Returns
+        -------
+        list[str]
+            names of the partitions created, empty when the check fails
+        """
+
+        try:
+            created = await asyncio.to_thread(create_partitions)
+        except Exception as exc:  # pylint: disable=broad-except
+            app_logger.error(exc)
+            return []
+        if created:
+            app_logger.info(f'created partitions {", ".join(created)}')
+        return created
+
+    async def start(self) -> None:
+        """
+        check once, then keep checking on the running event loop
+        """
+
+        await self.check()
+        if self.interval > 0:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """
+        stop checking
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self) -> None:
+        """
+        check every interval until stopped
+        """
+
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+
+partition_maintainer = PartitionMaintainer()
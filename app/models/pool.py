@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# connections kept open per engine and worker process, and opened beyond them under load
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+# seconds a request waits for a connection before it fails
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+# seconds after which a connection is replaced, -1 to keep it
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# milliseconds a statement may run on the server, 0 for no limit
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', '0'))
+
+
+def pool_options() -> dict[str, Any]:
+    """
+    pool keyword arguments of create_engine and create_async_engine
+
+    Returns
+    -------
+    dict[str, Any]
+        pool size, overflow, timeout, recycle and pre ping
+    """
+
+    return {'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'pool_recycle': DB_POOL_RECYCLE,
+            'pool_pre_ping': DB_POOL_PRE_PING}
+
+
+class PoolMetrics:
+    """
+    PoolMetrics
+
+    checkout counters of the pool of an engine, read with the live state of the pool by stats.
+    the wait of a checkout includes opening a connection when the pool has none idle.
+
+    Attributes
+    ----------
+    name : str
+        engine name
+    checkouts : int
+        number of connections checked out
+    timeouts : int
+        number of checkouts which gave up after the pool timeout
+    wait_seconds_total : float
+        total time spent waiting for checkouts
+    wait_seconds_max : float
+        longest wait for a checkout
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        Parameters
+        ----------
+        name : str
+            engine name
+        """
+
+        self.name = name
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<PoolMetrics(name={self.name}, checkouts={self.checkouts}, timeouts={self.timeouts})>"
+
+    def record(self, wait_seconds: float, timed_out: bool = False) -> None:
+        """
+        count a checkout
+
+        Parameters
+        ----------
+        wait_seconds : float
+            time spent waiting for the connection
+        timed_out : bool, optional
+            the checkout gave up, by default False
+        """
+
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def reset(self) -> None:
+        """
+        reset the counters
+        """
+
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+
+    def pool_class(self, base: type[QueuePool]) -> type[QueuePool]:
+        """
+        subclass of a queue pool which times its checkouts into these metrics
+
+        the class is kept when the engine recreates its pool, so the metrics survive dispose.
+
+        Parameters
+        ----------
+        base : type[QueuePool]
+            QueuePool or AsyncAdaptedQueuePool
+
+        Returns
+        -------
+        type[QueuePool]
+            pool class to pass as poolclass
+        """
+
+        metrics = self
+
+        class TimedPool(base):  # pylint: disable=too-few-public-methods
+
+            def _do_get(self) -> Any:
+                start = time.perf_counter()
+                try:
+                    connection = super()._do_get()
+                except PoolTimeoutError:
+                    metrics.record(time.perf_counter() - start, timed_out=True)
+                    raise
+                metrics.record(time.perf_counter() - start)
+                return connection
+
+        TimedPool.__name__ = TimedPool.__qualname__ = f'Timed{base.__name__}'
+        return TimedPool
+
+    def stats(self, pool: QueuePool) -> dict[str, Any]:
+        """
+        live state of a pool with the checkout counters
+
+        Parameters
+        ----------
+        pool : QueuePool
+            current pool of the engine
+
+        Returns
+        -------
+        dict[str, Any]
+            size, max overflow, checked out, idle and overflow connections, checkouts, timeouts and waits
+        """
+
+        with self._lock:
+            return {'size': pool.size(),
+                    'max_overflow': pool._max_overflow,  # pylint: disable=protected-access
+                    'checked_out': pool.checkedout(),
+                    'checked_in': pool.checkedin(),
+                    'overflow': max(pool.overflow(), 0),
+                    'checkouts': self.checkouts,
+                    'timeouts': self.timeouts,
+                    'wait_seconds_total': round(self.wait_seconds_total, 6),
+                    'wait_seconds_max': round(self.wait_seconds_max, 6)}
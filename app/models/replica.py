@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.logger import app_logger
+
+# seconds the replica may be behind the primary before the reads go to the primary
+DB_READ_MAX_LAG = float(os.getenv('DB_READ_MAX_LAG', '5'))
+# seconds a measured lag is trusted before the replica is asked again
+DB_READ_LAG_CHECK_INTERVAL = float(os.getenv('DB_READ_LAG_CHECK_INTERVAL', '1'))
+
+# a standby which replayed all the wal it received is not behind, however long ago the last commit was.
+# a server which is not a standby is never behind, NULL is a standby which has replayed nothing yet
+REPLICA_LAG_SQL = """
+SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())::float
+       END
+"""
+
+
+class ReplicaLag:
+    """
+    ReplicaLag
+
+    replication lag of the read engine, measured at most once per check interval by each worker process
+
+    Attributes
+    ----------
+    max_lag : float
+        seconds the replica may be behind
+    check_interval : float
+        seconds a measured lag is trusted
+    lag : Optional[float]
+        last measured lag in seconds, None when the replica was not reachable
+    checks : int
+        number of times the lag was measured
+    reads : int
+        number of sessions opened on the replica
+    fallbacks : int
+        number of sessions opened on the primary instead
+    """
+
+    def __init__(self, max_lag: float = DB_READ_MAX_LAG, check_interval: float = DB_READ_LAG_CHECK_INTERVAL) -> None:
+        """
+        Parameters
+        ----------
+        max_lag : float, optional
+            seconds the replica may be behind, by default DB_READ_MAX_LAG
+        check_interval : float, optional
+            seconds a measured lag is trusted, by default DB_READ_LAG_CHECK_INTERVAL
+        """
+
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: Optional[float] = None
+        self.checks = 0
+        self.reads = 0
+        self.fallbacks = 0
+        self._checked_at: Optional[float] = None
+
+    def __repr__(self) -> str:
+        return f"<ReplicaLag(lag={self.lag}, max_lag={self.max_lag}, fallbacks={self.fallbacks})>"
+
+    @staticmethod
+    async def measure(engine: AsyncEngine) -> Optional[float]:
+        """
+        measure the lag of a replica
+
+        Parameters
+        ----------
+        engine : AsyncEngine
+            engine of the replica
+
+        Returns
+        -------
+        Optional[float]
+            lag in seconds, None when the replica is not reachable or has replayed nothing yet
+        """
+
+        try:
+            async with engine.connect() as conn:
+                return (await conn.execute(text(REPLICA_LAG_SQL))).scalar()
+        except (OSError, SQLAlchemyError) as exception:
+            app_logger.warning(f'read replica is not reachable: {exception}')
+            return None
+
+    async def fresh(self, engine: AsyncEngine) -> bool:
+        """
+        whether the replica is close enough to the primary to read from, and count the answer
+
+        Parameters
+        ----------
+        engine : AsyncEngine
+            engine of the replica
+
+        Returns
+        -------
+        bool
+            True to read from the replica, False to read from the primary
+        """
+
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval:
+            self.lag = await self.measure(engine)
+            self._checked_at = time.monotonic()
+            self.checks += 1
+
+        if self.lag is not None and self.lag <= self.max_lag:
+            self.reads += 1
+            return True
+        self.fallbacks += 1
+        return False
+
+    def stats(self) -> dict[str, Any]:
+        """
+        last lag and the counters
+
+        Returns
+        -------
+        dict[str, Any]
+            lag, max lag, checks, reads and fallbacks
+        """
+
+        return {'lag_seconds': self.lag,
+                'max_lag_seconds': self.max_lag,
+                'checks': self.checks,
+                'reads': self.reads,
+                'fallbacks': self.fallbacks}
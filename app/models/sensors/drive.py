@@ -1,15 +1,54 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Union
 
-from sqlalchemy import Column, ForeignKey, Integer, String, select
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, DateTime, ForeignKeyConstraint, Integer, String, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, relationship
 
-from app.models import BaseModel, FrameModel, session
+from app.models import BaseModel, FrameModel, bulk_insert, partitioned_by_month, session, to_datetime
+from app.models.sensors.interval import SensorIntervalMixin, interval_storage
 from app.schemas.requests.sensors.drive import RequestDriveSensor
 
 
+class DriveSensorIntervalModel(SensorIntervalMixin, BaseModel):
+    """
+    DriveSensorIntervalModel
+
+    drive sensors saved once per run of frames in which they are reported
+
+    Attributes
+    ----------
+    drive_letter : str
+        drive letter
+    drive_type : DriveType
+        drive type
+    volume_name : str
+        volume name
+    file_system : str
+        file system
+    all_space : str
+        all space
+    free_space : str
+        free space
+    """
+    __tablename__ = 'drive_sensor_intervals'
+    VALUE_COLUMNS = ('drive_letter', 'drive_type', 'volume_name', 'file_system', 'all_space', 'free_space')
+    drive_letter = Column(String(1), nullable=False, comment='drive letter')
+    drive_type = Column(String(20), nullable=False, comment='drive type')
+    volume_name = Column(String(255), nullable=False, comment='volume name')
+    file_system = Column(String(255), nullable=False, comment='file system')
+    all_space = Column(String(16), nullable=False, comment='all space')
+    free_space = Column(String(16), nullable=False, comment='free space')
+
+    def __repr__(self) -> str:
+        return f"<DriveSensorIntervalModel(id={self.id}, drive_letter={self.drive_letter}, " \
+            f"volume_name={self.volume_name}, " \
+            f"user_session_id={self.user_session_id}, first_seen_at={self.first_seen_at}, " \
+            f"last_seen_at={self.last_seen_at})>"
+
+
 class DriveSensorModel(BaseModel):
     """
     DriveSensorModel
@@ -32,21 +71,29 @@ class DriveSensorModel(BaseModel):
         free space
     frame_id : int
         frame id
+    frame_create_time : datetime
+        create time of the frame
     frame : FrameModel
         frame
     """
     __tablename__ = 'drive_sensors'
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    # partitioned by the month of the frame, which is referenced with its partition key
+    __table_args__ = partitioned_by_month(ForeignKeyConstraint(['frame_id', 'frame_create_time'],
+                                                               [FrameModel.id, FrameModel.frame_create_time]))
+    id = Column(Integer, autoincrement=True)
     drive_letter = Column(String(1), nullable=False, comment='drive letter')
     drive_type = Column(String(20), nullable=False, comment='drive type')
     volume_name = Column(String(255), nullable=False, comment='volume name')
     file_system = Column(String(255), nullable=False, comment='file system')
     all_space = Column(String(16), nullable=False, comment='all space')
     free_space = Column(String(16), nullable=False, comment='free space')
-    frame_id = Column(Integer, ForeignKey(FrameModel.id), nullable=False, comment='frame id')
+    frame_id = Column(Integer, nullable=False, index=True, comment='frame id')
+    frame_create_time = Column(DateTime, nullable=False, comment='create time of the frame')
 
     frame = relationship(FrameModel, backref='drive_sensors')
 
+    __mapper_args__ = {'primary_key': [id]}
+
     def __init__(self,
                  drive_letter: str,
                  drive_type: str,
@@ -55,6 +102,7 @@ class DriveSensorModel(BaseModel):
                  all_space: str,
                  free_space: str,
                  frame_id: Optional[int] = None,
+                 frame_create_time: Optional[datetime] = None,
                  frame: Optional[FrameModel] = None,
                  created_at: Optional[datetime] = None,
                  updated_at: Optional[datetime] = None) -> None:
@@ -75,6 +123,8 @@ class DriveSensorModel(BaseModel):
             free space
         frame_id : Optional[int], optional
             frame id, by default None
+        frame_create_time : Optional[datetime], optional
+            create time of the frame of frame_id, by default None
         frame : Optional[FrameModel], optional
             frame, by default None
         created_at : Optional[datetime], optional
@@ -92,6 +142,7 @@ class DriveSensorModel(BaseModel):
 
         if frame_id is not None:
             self.frame_id = frame_id
+            self.frame_create_time = frame_create_time
         elif frame is not None:
             self.frame = frame
         self.created_at = created_at
@@ -104,7 +155,11 @@ class DriveSensorModel(BaseModel):
             f"created_at={self.created_at} updated_at={self.updated_at} >"
 
     @classmethod
-    def save(cls, request_drive_sensors: list[RequestDriveSensor], frame_id: int) -> None:
+    def save(cls,
+             request_drive_sensors: list[RequestDriveSensor],
+             frame_id: int,
+             frame_create_time: Union[str, datetime],
+             db_session: Session = session) -> None:
         """Save drive sensors.
 
         Parameters
@@ -113,37 +168,147 @@ class DriveSensorModel(BaseModel):
             drive sensors
         frame_id : int
             frame id
+        frame_create_time : Union[str, datetime]
+            frame create time
+        db_session : Session, optional
+            session, by default the scoped session
+        """
+        cls.bulk_save([(request_drive_sensors, frame_id, frame_create_time)], db_session=db_session)
+
+    @classmethod
+    async def async_save(cls,
+                         db_session: AsyncSession,
+                         request_drive_sensors: list[RequestDriveSensor],
+                         frame_id: int,
+                         frame_create_time: Union[str, datetime]) -> None:
+        """Awaitable save.
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        request_drive_sensors : list[RequestDriveSensor]
+            drive sensors
+        frame_id : int
+            frame id
+        frame_create_time : Union[str, datetime]
+            frame create time
+        """
+        await cls.async_bulk_save(db_session, [(request_drive_sensors, frame_id, frame_create_time)])
+
+    @classmethod
+    def bulk_save(cls,
+                  request_drive_sensors_by_frame: list[tuple[list[RequestDriveSensor], int, Union[str, datetime]]],
+                  db_session: Session = session) -> None:
+        """Save drive sensors of several frames without building ORM objects.
+
+        the rows are saved as intervals when SENSOR_STORAGE_MODE is interval.
+
+        Parameters
+        ----------
+        request_drive_sensors_by_frame : list[tuple[list[RequestDriveSensor], int, Union[str, datetime]]]
+            drive sensors with the id and create time of the frame they belong to
+        db_session : Session, optional
+            session, by default the scoped session
+        """
+        drive_sensors_by_frame = [
+            ([
+                {
+                    'drive_letter': request_drive_sensor.drive_letter,
+                    'drive_type': request_drive_sensor.drive_type.name,
+                    'volume_name': request_drive_sensor.volume_name,
+                    'file_system': request_drive_sensor.file_system,
+                    'all_space': request_drive_sensor.all_space,
+                    'free_space': request_drive_sensor.free_space
+                }
+                for request_drive_sensor in request_drive_sensors], frame_id, to_datetime(frame_create_time))
+            for request_drive_sensors, frame_id, frame_create_time in request_drive_sensors_by_frame]
+
+        if interval_storage():
+            rows_by_frame = [(rows, frame_id) for rows, frame_id, _ in drive_sensors_by_frame]
+            DriveSensorIntervalModel.save_intervals(rows_by_frame, db_session)
+            return
+
+        drive_sensors = [{**drive_sensor, 'frame_id': frame_id, 'frame_create_time': frame_create_time}
+                         for drive_sensors_of_frame, frame_id, frame_create_time in drive_sensors_by_frame
+                         for drive_sensor in drive_sensors_of_frame]
+
+        bulk_insert(cls.__table__, drive_sensors, db_session)
+
+    @classmethod
+    async def async_bulk_save(cls,
+                              db_session: AsyncSession,
+                              request_drive_sensors_by_frame: list[tuple[list[RequestDriveSensor], int,
+                                                                         Union[str, datetime]]]) -> None:
+        """Awaitable bulk_save.
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        request_drive_sensors_by_frame : list[tuple[list[RequestDriveSensor], int, Union[str, datetime]]]
+            drive sensors with the id and create time of the frame they belong to
         """
-        drive_sensors = []
-        for request_drive_sensor in request_drive_sensors:
-            drive_sensor_model = cls(
-                drive_letter=request_drive_sensor.drive_letter,
-                drive_type=request_drive_sensor.drive_type.name,
-                volume_name=request_drive_sensor.volume_name,
-                file_system=request_drive_sensor.file_system,
-                all_space=request_drive_sensor.all_space,
-                free_space=request_drive_sensor.free_space,
-                frame_id=frame_id
-            )
-            drive_sensors.append(drive_sensor_model)
-        session.add_all(drive_sensors)
+        await db_session.run_sync(
+            lambda sync_session: cls.bulk_save(request_drive_sensors_by_frame, db_session=sync_session))
 
     @classmethod
-    def fetch_by_frame_id(cls, frame_id: int) -> list[DriveSensorModel]:
+    def fetch_by_frame_id(cls,
+                          frame_id: int,
+                          frame_create_time: Optional[Union[str, datetime]] = None,
+                          db_session: Session = session) -> list[Union[DriveSensorModel, DriveSensorIntervalModel]]:
         """Fetch drive sensors by frame id.
 
+        the partition of the frame alone is read when its create time is given.
+        the intervals which contain the frame are read as well when SENSOR_STORAGE_MODE is interval.
+
         Parameters
         ----------
         frame_id : int
             frame id
+        frame_create_time : Optional[Union[str, datetime]], optional
+            frame create time, by default None to look for the frame in every partition
+        db_session : Session, optional
+            session, by default the scoped session
 
         Returns
         -------
-        list[DriveSensorModel]
+        list[Union[DriveSensorModel, DriveSensorIntervalModel]]
             drive sensors
         """
         stmt = select(cls).where(cls.frame_id == frame_id)
+        if frame_create_time is not None:
+            stmt = stmt.where(cls.frame_create_time == to_datetime(frame_create_time))
+
+        drive_sensors = db_session.execute(stmt).scalars().all()
 
-        drive_sensors = session.execute(stmt).scalars().all()
+        if interval_storage():
+            stmt = DriveSensorIntervalModel.select_by_frame_id(DriveSensorIntervalModel, frame_id=frame_id)
+            drive_sensors = [*drive_sensors, *db_session.execute(stmt).scalars().all()]
 
         return drive_sensors
+
+    @classmethod
+    async def async_fetch_by_frame_id(cls,
+                                      db_session: AsyncSession,
+                                      frame_id: int,
+                                      frame_create_time: Optional[Union[str, datetime]] = None
+                                      ) -> list[Union[DriveSensorModel, DriveSensorIntervalModel]]:
+        """Awaitable fetch_by_frame_id.
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        frame_id : int
+            frame id
+        frame_create_time : Optional[Union[str, datetime]], optional
+            frame create time, by default None
+
+        Returns
+        -------
+        list[Union[DriveSensorModel, DriveSensorIntervalModel]]
+            drive sensors
+        """
+        return await db_session.run_sync(
+            lambda sync_session: cls.fetch_by_frame_id(frame_id, frame_create_time, db_session=sync_session))
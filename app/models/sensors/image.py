@@ -0,0 +1,177 @@
+import hashlib
+import os
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO
+
+from app.errors.exceptions import InvalidImageError
+
+SCREENSHOT_MAX_BYTES = int(os.getenv('SCREENSHOT_MAX_BYTES', str(32 * 1024 * 1024)))
+SCREENSHOT_MAX_WIDTH = int(os.getenv('SCREENSHOT_MAX_WIDTH', '8192'))
+SCREENSHOT_MAX_HEIGHT = int(os.getenv('SCREENSHOT_MAX_HEIGHT', '8192'))
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_SIGNATURE = b'\xff\xd8'
+
+# start of frame markers which carry the image size
+JPEG_SOF_MARKERS = {0xc0, 0xc1, 0xc2, 0xc3, 0xc5, 0xc6, 0xc7, 0xc9, 0xca, 0xcb, 0xcd, 0xce, 0xcf}
+# markers without a length field
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xd0, 0xd9)}
+
+
+@dataclass(frozen=True)
+class ImageHeader:
+    """
+    ImageHeader
+
+    Attributes
+    ----------
+    format : str
+        png or jpg
+    width : int
+        width in pixels
+    height : int
+        height in pixels
+    size : int
+        file size in bytes
+    """
+
+    format: str
+    width: int
+    height: int
+    size: int
+
+
+def _read_png_size(image_file: BinaryIO) -> tuple[int, int]:
+    """
+    read width and height from the IHDR chunk which always follows the signature
+
+    Parameters
+    ----------
+    image_file : BinaryIO
+        image positioned right after the signature
+
+    Returns
+    -------
+    tuple[int, int]
+        width, height
+    """
+
+    chunk = image_file.read(16)
+    if len(chunk) < 16 or chunk[4:8] != b'IHDR':
+        raise InvalidImageError()
+    return struct.unpack('>II', chunk[8:16])
+
+
+def _read_jpeg_size(image_file: BinaryIO) -> tuple[int, int]:
+    """
+    walk the marker segments up to the first start of frame segment
+
+    Parameters
+    ----------
+    image_file : BinaryIO
+        image positioned right after the signature
+
+    Returns
+    -------
+    tuple[int, int]
+        width, height
+    """
+
+    while True:
+        byte = image_file.read(1)
+        if byte != b'\xff':
+            raise InvalidImageError()
+        marker = image_file.read(1)
+        while marker == b'\xff':
+            marker = image_file.read(1)
+        if not marker:
+            raise InvalidImageError()
+        if marker[0] in JPEG_STANDALONE_MARKERS:
+            continue
+
+        length_field = image_file.read(2)
+        if len(length_field) < 2:
+            raise InvalidImageError()
+        length = struct.unpack('>H', length_field)[0]
+
+        if marker[0] in JPEG_SOF_MARKERS:
+            segment = image_file.read(5)
+            if len(segment) < 5:
+                raise InvalidImageError()
+            height, width = struct.unpack('>HH', segment[1:5])
+            return width, height
+
+        image_file.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_header(image_file: BinaryIO) -> ImageHeader:
+    """
+    validate an image from its header alone, without decoding the pixels
+
+    checks the png / jpeg magic bytes, the dimensions and the file size,
+    and rewinds the file so that it can be copied as it is.
+
+    Parameters
+    ----------
+    image_file : BinaryIO
+        seekable image file
+
+    Returns
+    -------
+    ImageHeader
+        format, width, height and size of the image
+
+    Raises
+    ------
+    InvalidImageError
+        the image is not png / jpeg or exceeds the limits
+    """
+
+    size = image_file.seek(0, os.SEEK_END)
+    image_file.seek(0)
+
+    if size > SCREENSHOT_MAX_BYTES:
+        raise InvalidImageError()
+
+    signature = image_file.read(len(PNG_SIGNATURE))
+    if signature == PNG_SIGNATURE:
+        image_format = 'png'
+        width, height = _read_png_size(image_file)
+    elif signature.startswith(JPEG_SIGNATURE):
+        image_format = 'jpg'
+        image_file.seek(len(JPEG_SIGNATURE))
+        width, height = _read_jpeg_size(image_file)
+    else:
+        raise InvalidImageError()
+
+    image_file.seek(0)
+
+    if not 0 < width <= SCREENSHOT_MAX_WIDTH or not 0 < height <= SCREENSHOT_MAX_HEIGHT:
+        raise InvalidImageError()
+
+    return ImageHeader(format=image_format, width=width, height=height, size=size)
+
+
+def image_digest(image_file: BinaryIO) -> str:
+    """
+    sha256 of an image file, read in chunks and rewound
+
+    Parameters
+    ----------
+    image_file : BinaryIO
+        seekable image file
+
+    Returns
+    -------
+    str
+        hex digest
+    """
+
+    digest = hashlib.sha256()
+    image_file.seek(0)
+    while chunk := image_file.read(1024 * 1024):
+        digest.update(chunk)
+    image_file.seek(0)
+
+    return digest.hexdigest()
@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import os
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    Select,
+    and_,
+    delete,
+    insert,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.orm import Session, aliased, declared_attr
+from sqlalchemy.sql import func
+
+from app.models import BaseModel, FrameModel, UserSessionModel, bulk_insert, session
+
+# snapshot stores the rows of every frame, interval stores each distinct row once per run of frames
+SENSOR_STORAGE_MODE = os.getenv('SENSOR_STORAGE_MODE', 'snapshot')
+
+
+def interval_storage() -> bool:
+    """
+    whether the sensors are saved as intervals
+
+    Returns
+    -------
+    bool
+        True if SENSOR_STORAGE_MODE is interval
+    """
+
+    return SENSOR_STORAGE_MODE == 'interval'
+
+
+class SensorIntervalMixin:
+    """
+    SensorIntervalMixin
+
+    columns and queries of a sensor table which keeps each distinct row once
+    with the create times of the first and the last frame of the session it is seen in.
+    a row belongs to every frame of the session created between the two.
+
+    a new frame extends the intervals which end at the previous frame of the session and are still reported,
+    and opens an interval for the other rows. intervals which are not reported any more are left closed.
+    a frame saved out of order, or saved again, splits the intervals around it.
+
+    Attributes
+    ----------
+    VALUE_COLUMNS : tuple[str, ...]
+        names of the sensor columns which identify a row
+    id : int
+        interval id
+    user_session_id : int
+        user session id
+    first_seen_at : datetime
+        create time of the first frame
+    last_seen_at : datetime
+        create time of the last frame
+    """
+    VALUE_COLUMNS: tuple[str, ...] = ()
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    first_seen_at = Column(DateTime, nullable=False, comment='create time of the first frame')
+    last_seen_at = Column(DateTime, nullable=False, comment='create time of the last frame')
+
+    @declared_attr
+    def user_session_id(cls):  # pylint: disable=no-self-argument
+        return Column(Integer, ForeignKey(UserSessionModel.id), nullable=False, comment='user session id')
+
+    @declared_attr
+    def __table_args__(cls):  # pylint: disable=no-self-argument
+        return (Index(f'ix_{cls.__tablename__}_user_session_id_first_seen_at', 'user_session_id', 'first_seen_at'),
+                Index(f'ix_{cls.__tablename__}_user_session_id_last_seen_at', 'user_session_id', 'last_seen_at'),
+                BaseModel.__table_args__)
+
+    @classmethod
+    def select_by_frame_id(cls, *columns: Any, frame_id: int) -> Select:
+        """
+        select the intervals which contain a frame
+
+        Parameters
+        ----------
+        *columns : Any
+            columns or the model to select
+        frame_id : int
+            frame id
+
+        Returns
+        -------
+        Select
+            select statement
+        """
+
+        stmt = select(*columns).join(FrameModel,
+                                     and_(FrameModel.user_session_id == cls.user_session_id,
+                                          FrameModel.frame_create_time.between(cls.first_seen_at, cls.last_seen_at)))\
+            .where(FrameModel.id == frame_id)
+
+        """SQL
+        SELECT process_sensor_intervals.file_path, ...
+        FROM process_sensor_intervals
+        JOIN frames ON frames.user_session_id = process_sensor_intervals.user_session_id
+            AND frames.frame_create_time BETWEEN process_sensor_intervals.first_seen_at
+                                             AND process_sensor_intervals.last_seen_at
+        WHERE frames.id = :id_1
+        """
+
+        return stmt
+
+    @classmethod
+    def save_intervals(cls,
+                       rows_by_frame: list[tuple[list[dict[str, Any]], int]],
+                       db_session: Session = session) -> None:
+        """
+        save the sensor rows of several frames as intervals
+
+        the frames are applied in the order of their create time within each session.
+
+        Parameters
+        ----------
+        rows_by_frame : list[tuple[list[dict[str, Any]], int]]
+            pairs of sensor rows keyed by VALUE_COLUMNS and the frame id they belong to
+        db_session : Session, optional
+            session, by default the scoped session
+        """
+
+        if not rows_by_frame:
+            return
+
+        frames = cls._fetch_neighbors({frame_id for _, frame_id in rows_by_frame}, db_session)
+
+        for rows, frame_id in sorted(rows_by_frame, key=lambda pair: frames[pair[1]][:2]):
+            cls._save_frame(rows, *frames[frame_id], db_session)
+
+    @staticmethod
+    def _fetch_neighbors(frame_ids: set[int], db_session: Session) -> dict[int, tuple]:
+        """
+        fetch the create times of frames and of the frames before and after them in the session
+
+        Parameters
+        ----------
+        frame_ids : set[int]
+            frame ids
+        db_session : Session
+            session
+
+        Returns
+        -------
+        dict[int, tuple[int, datetime, Optional[datetime], Optional[datetime]]]
+            user session id, create time, previous create time and next create time by frame id
+        """
+
+        neighbor = aliased(FrameModel)
+        in_session = neighbor.user_session_id == FrameModel.user_session_id
+        previous_time = select(func.max(neighbor.frame_create_time))\
+            .where(in_session, neighbor.frame_create_time < FrameModel.frame_create_time).scalar_subquery()
+        next_time = select(func.min(neighbor.frame_create_time))\
+            .where(in_session, neighbor.frame_create_time > FrameModel.frame_create_time).scalar_subquery()
+
+        stmt = select(FrameModel.id,
+                      FrameModel.user_session_id,
+                      FrameModel.frame_create_time,
+                      previous_time,
+                      next_time).where(FrameModel.id.in_(frame_ids))
+
+        """SQL
+        SELECT frames.id, frames.user_session_id, frames.frame_create_time,
+               (SELECT max(frames_1.frame_create_time) FROM frames AS frames_1
+                WHERE frames_1.user_session_id = frames.user_session_id
+                AND frames_1.frame_create_time < frames.frame_create_time),
+               (SELECT min(frames_1.frame_create_time) FROM frames AS frames_1
+                WHERE frames_1.user_session_id = frames.user_session_id
+                AND frames_1.frame_create_time > frames.frame_create_time)
+        FROM frames
+        WHERE frames.id IN (:id_1, ...)
+        """
+
+        return {frame_id: tuple(neighbors) for frame_id, *neighbors in db_session.execute(stmt).all()}
+
+    @classmethod
+    def _save_frame(cls,
+                    rows: list[dict[str, Any]],
+                    user_session_id: int,
+                    frame_time: datetime,
+                    previous_time: Optional[datetime],
+                    next_time: Optional[datetime],
+                    db_session: Session) -> None:
+        """
+        apply the sensor rows of one frame to the intervals of its session
+
+        Parameters
+        ----------
+        rows : list[dict[str, Any]]
+            sensor rows keyed by VALUE_COLUMNS
+        user_session_id : int
+            user session id
+        frame_time : datetime
+            create time of the frame
+        previous_time : Optional[datetime]
+            create time of the previous frame of the session
+        next_time : Optional[datetime]
+            create time of the next frame of the session
+        db_session : Session
+            session
+        """
+
+        value_columns = [getattr(cls, name) for name in cls.VALUE_COLUMNS]
+        pending = Counter(tuple(row[name] for name in cls.VALUE_COLUMNS) for row in rows)
+
+        # intervals which end at the previous frame or contain this frame
+        stmt = select(cls.id, cls.first_seen_at, cls.last_seen_at, *value_columns)\
+            .where(cls.user_session_id == user_session_id,
+                   cls.first_seen_at <= frame_time,
+                   cls.last_seen_at >= (previous_time or frame_time))
+
+        open_ids: dict[tuple, list[int]] = defaultdict(list)
+        for interval_id, first_seen_at, last_seen_at, *value in db_session.execute(stmt).all():
+            value = tuple(value)
+            if last_seen_at < frame_time:
+                open_ids[value].append(interval_id)
+            elif pending[value] > 0:
+                pending[value] -= 1
+            else:
+                cls._split(interval_id, first_seen_at, last_seen_at, frame_time, previous_time, next_time, db_session)
+
+        extended_ids = []
+        opened_rows = []
+        for value, count in pending.items():
+            extended = open_ids[value][:count]
+            extended_ids.extend(extended)
+            opened_rows.extend({**dict(zip(cls.VALUE_COLUMNS, value)),
+                                'user_session_id': user_session_id,
+                                'first_seen_at': frame_time,
+                                'last_seen_at': frame_time}
+                               for _ in range(count - len(extended)))
+
+        if extended_ids:
+            stmt = update(cls.__table__).where(cls.id.in_(extended_ids)).values(last_seen_at=frame_time)
+
+            """SQL
+            UPDATE process_sensor_intervals SET last_seen_at = :last_seen_at
+            WHERE process_sensor_intervals.id IN (:id_1, ...)
+            """
+
+            db_session.execute(stmt)
+
+        bulk_insert(cls.__table__, opened_rows, db_session)
+
+    @classmethod
+    def _split(cls,
+               interval_id: int,
+               first_seen_at: datetime,
+               last_seen_at: datetime,
+               frame_time: datetime,
+               previous_time: Optional[datetime],
+               next_time: Optional[datetime],
+               db_session: Session) -> None:
+        """
+        take a frame out of an interval whose row is not reported by the frame
+
+        Parameters
+        ----------
+        interval_id : int
+            interval id
+        first_seen_at : datetime
+            create time of the first frame of the interval
+        last_seen_at : datetime
+            create time of the last frame of the interval
+        frame_time : datetime
+            create time of the frame
+        previous_time : Optional[datetime]
+            create time of the previous frame of the session
+        next_time : Optional[datetime]
+            create time of the next frame of the session
+        db_session : Session
+            session
+        """
+
+        table = cls.__table__
+        if first_seen_at < frame_time:
+            db_session.execute(update(table).where(table.c.id == interval_id).values(last_seen_at=previous_time))
+            if last_seen_at > frame_time:
+                value_columns = [table.c[name] for name in (*cls.VALUE_COLUMNS, 'user_session_id')]
+                stmt = insert(table).from_select(
+                    [*value_columns, table.c.first_seen_at, table.c.last_seen_at,
+                     table.c.created_at, table.c.updated_at],
+                    select(*value_columns, literal(next_time, DateTime), literal(last_seen_at, DateTime),
+                           func.now(), func.now())
+                    .where(table.c.id == interval_id))
+                db_session.execute(stmt)
+        elif last_seen_at > frame_time:
+            db_session.execute(update(table).where(table.c.id == interval_id).values(first_seen_at=next_time))
+        else:
+            db_session.execute(delete(table).where(table.c.id == interval_id))
@@ -1,15 +1,53 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Union
 
-from sqlalchemy import Column, ForeignKey, Integer, String, UniqueConstraint, select
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, DateTime, ForeignKeyConstraint, Integer, String, UniqueConstraint, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, relationship
 
-from app.models import BaseModel, FrameModel, session
+from app.models import BaseModel, FrameModel, bulk_insert, partitioned_by_month, session, to_datetime
+from app.models.sensors.interval import SensorIntervalMixin, interval_storage
 from app.schemas.requests.sensors.ip_port import RequestIpPortSensor
 
 
+class IpPortSensorIntervalModel(SensorIntervalMixin, BaseModel):
+    """
+    IpPortSensorIntervalModel
+
+    ip port sensors saved once per run of frames in which they are reported
+
+    Attributes
+    ----------
+    state : str
+        ip port state. listen or establish
+    ip : str
+        ip address
+    port : int
+        port
+    process_id : int
+        process id
+    remote_ip : str
+        remote ip address
+    remote_port : int
+        remote port
+    """
+    __tablename__ = 'ip_port_sensor_intervals'
+    VALUE_COLUMNS = ('state', 'ip', 'port', 'process_id', 'remote_ip', 'remote_port')
+    state = Column(String(10), comment='ip port state. listen or establish')
+    ip = Column(String(39), nullable=False, comment='ip address')
+    port = Column(Integer, nullable=False, comment='port')
+    process_id = Column(Integer, nullable=False, comment='process id')
+    remote_ip = Column(String(39), nullable=False, comment='remote ip address')
+    remote_port = Column(Integer, nullable=False, comment='remote port')
+
+    def __repr__(self) -> str:
+        return f"<IpPortSensorIntervalModel(id={self.id}, state={self.state}, ip={self.ip}, port={self.port}, " \
+            f"user_session_id={self.user_session_id}, first_seen_at={self.first_seen_at}, " \
+            f"last_seen_at={self.last_seen_at})>"
+
+
 class IpPortSensorModel(BaseModel):
     """
     IpPortSensorModel
@@ -32,20 +70,28 @@ class IpPortSensorModel(BaseModel):
         remote port
     frame_id : int
         frame id
+    frame_create_time : datetime
+        create time of the frame
     frame : FrameModel
         frame
     """
     __tablename__ = 'ip_port_sensors'
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    # partitioned by the month of the frame, which is referenced with its partition key
+    __table_args__ = partitioned_by_month(ForeignKeyConstraint(['frame_id', 'frame_create_time'],
+                                                               [FrameModel.id, FrameModel.frame_create_time]))
+    id = Column(Integer, autoincrement=True)
     state = Column(String(10), comment='ip port state. listen or establish')
     ip = Column(String(39), nullable=False, comment='ip address')
     port = Column(Integer, nullable=False, comment='port')
     process_id = Column(Integer, nullable=False, comment='process id')
     remote_ip = Column(String(39), nullable=False, comment='remote ip address')
     remote_port = Column(Integer, nullable=False, comment='remote port')
-    frame_id = Column(Integer, ForeignKey(FrameModel.id), nullable=False, comment='frame id')
+    frame_id = Column(Integer, nullable=False, index=True, comment='frame id')
+    frame_create_time = Column(DateTime, nullable=False, comment='create time of the frame')
 
     frame = relationship(FrameModel, backref='ip_port_sensors')
+
+    __mapper_args__ = {'primary_key': [id]}
     UniqueConstraint("state",
                      "ip",
                      "port",
@@ -63,6 +109,7 @@ class IpPortSensorModel(BaseModel):
                  remote_ip: str,
                  remote_port: int,
                  frame_id: Optional[int] = None,
+                 frame_create_time: Optional[datetime] = None,
                  frame: Optional[FrameModel] = None,
                  created_at: Optional[datetime] = None,
                  updated_at: Optional[datetime] = None) -> None:
@@ -83,6 +130,8 @@ class IpPortSensorModel(BaseModel):
             remote port
         frame_id : Optional[int], optional
             frame id, by default None
+        frame_create_time : Optional[datetime], optional
+            create time of the frame of frame_id, by default None
         frame : Optional[FrameModel], optional
             frame, by default None
         created_at : Optional[datetime], optional
@@ -99,6 +148,7 @@ class IpPortSensorModel(BaseModel):
 
         if frame_id is not None:
             self.frame_id = frame_id
+            self.frame_create_time = frame_create_time
         elif frame is not None:
             self.frame = frame
         self.created_at = created_at
@@ -110,7 +160,11 @@ class IpPortSensorModel(BaseModel):
             f"frame_id={self.frame_id} created_at={self.created_at} updated_at={self.updated_at} >"
 
     @classmethod
-    def save(cls, request_ip_port_sensors: list[RequestIpPortSensor], frame_id: int) -> None:
+    def save(cls,
+             request_ip_port_sensors: list[RequestIpPortSensor],
+             frame_id: int,
+             frame_create_time: Union[str, datetime],
+             db_session: Session = session) -> None:
         """Save ip port sensors.
 
         Parameters
@@ -119,39 +173,147 @@ class IpPortSensorModel(BaseModel):
             ip port sensors
         frame_id : int
             frame id
+        frame_create_time : Union[str, datetime]
+            frame create time
+        db_session : Session, optional
+            session, by default the scoped session
         """
-        ip_port_sensors = []
-
-        for request_ip_port_sensor in request_ip_port_sensors:
-            ip_port_sensor_model = cls(
-                state=request_ip_port_sensor.state.name,
-                ip=request_ip_port_sensor.ip,
-                port=request_ip_port_sensor.port,
-                process_id=request_ip_port_sensor.process_id,
-                remote_ip=request_ip_port_sensor.remote_ip,
-                remote_port=request_ip_port_sensor.remote_port,
-                frame_id=frame_id
-            )
-            ip_port_sensors.append(ip_port_sensor_model)
-
-        session.add_all(ip_port_sensors)
+        cls.bulk_save([(request_ip_port_sensors, frame_id, frame_create_time)], db_session=db_session)
 
     @classmethod
-    def fetch_by_frame_id(cls, frame_id: int) -> list[IpPortSensorModel]:
+    async def async_save(cls,
+                         db_session: AsyncSession,
+                         request_ip_port_sensors: list[RequestIpPortSensor],
+                         frame_id: int,
+                         frame_create_time: Union[str, datetime]) -> None:
+        """Awaitable save.
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        request_ip_port_sensors : list[RequestIpPortSensor]
+            ip port sensors
+        frame_id : int
+            frame id
+        frame_create_time : Union[str, datetime]
+            frame create time
+        """
+        await cls.async_bulk_save(db_session, [(request_ip_port_sensors, frame_id, frame_create_time)])
+
+    @classmethod
+    def bulk_save(cls,
+                  request_ip_port_sensors_by_frame: list[tuple[list[RequestIpPortSensor], int, Union[str, datetime]]],
+                  db_session: Session = session) -> None:
+        """Save ip port sensors of several frames without building ORM objects.
+
+        the rows are saved as intervals when SENSOR_STORAGE_MODE is interval.
+
+        Parameters
+        ----------
+        request_ip_port_sensors_by_frame : list[tuple[list[RequestIpPortSensor], int, Union[str, datetime]]]
+            ip port sensors with the id and create time of the frame they belong to
+        db_session : Session, optional
+            session, by default the scoped session
+        """
+        ip_port_sensors_by_frame = [
+            ([
+                {
+                    'state': request_ip_port_sensor.state.name,
+                    'ip': request_ip_port_sensor.ip,
+                    'port': request_ip_port_sensor.port,
+                    'process_id': request_ip_port_sensor.process_id,
+                    'remote_ip': request_ip_port_sensor.remote_ip,
+                    'remote_port': request_ip_port_sensor.remote_port
+                }
+                for request_ip_port_sensor in request_ip_port_sensors], frame_id, to_datetime(frame_create_time))
+            for request_ip_port_sensors, frame_id, frame_create_time in request_ip_port_sensors_by_frame]
+
+        if interval_storage():
+            rows_by_frame = [(rows, frame_id) for rows, frame_id, _ in ip_port_sensors_by_frame]
+            IpPortSensorIntervalModel.save_intervals(rows_by_frame, db_session)
+            return
+
+        ip_port_sensors = [{**ip_port_sensor, 'frame_id': frame_id, 'frame_create_time': frame_create_time}
+                           for ip_port_sensors_of_frame, frame_id, frame_create_time in ip_port_sensors_by_frame
+                           for ip_port_sensor in ip_port_sensors_of_frame]
+
+        bulk_insert(cls.__table__, ip_port_sensors, db_session)
+
+    @classmethod
+    async def async_bulk_save(cls,
+                              db_session: AsyncSession,
+                              request_ip_port_sensors_by_frame: list[tuple[list[RequestIpPortSensor], int,
+                                                                           Union[str, datetime]]]) -> None:
+        """Awaitable bulk_save.
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        request_ip_port_sensors_by_frame : list[tuple[list[RequestIpPortSensor], int, Union[str, datetime]]]
+            ip port sensors with the id and create time of the frame they belong to
+        """
+        await db_session.run_sync(
+            lambda sync_session: cls.bulk_save(request_ip_port_sensors_by_frame, db_session=sync_session))
+
+    @classmethod
+    def fetch_by_frame_id(cls,
+                          frame_id: int,
+                          frame_create_time: Optional[Union[str, datetime]] = None,
+                          db_session: Session = session) -> list[Union[IpPortSensorModel, IpPortSensorIntervalModel]]:
         """Fetch ip port sensors by frame id.
 
+        the partition of the frame alone is read when its create time is given.
+        the intervals which contain the frame are read as well when SENSOR_STORAGE_MODE is interval.
+
         Parameters
         ----------
         frame_id : int
             frame id
+        frame_create_time : Optional[Union[str, datetime]], optional
+            frame create time, by default None to look for the frame in every partition
+        db_session : Session, optional
+            session, by default the scoped session
 
         Returns
         -------
-        list[IpPortSensorModel]
+        list[Union[IpPortSensorModel, IpPortSensorIntervalModel]]
             ip port sensors
         """
         stmt = select(cls).where(cls.frame_id == frame_id)
+        if frame_create_time is not None:
+            stmt = stmt.where(cls.frame_create_time == to_datetime(frame_create_time))
+
+        ip_port_sensors = db_session.execute(stmt).scalars().all()
 
-        ip_port_sensors = session.execute(stmt).scalars().all()
+        if interval_storage():
+            stmt = IpPortSensorIntervalModel.select_by_frame_id(IpPortSensorIntervalModel, frame_id=frame_id)
+            ip_port_sensors = [*ip_port_sensors, *db_session.execute(stmt).scalars().all()]
 
         return ip_port_sensors
+
+    @classmethod
+    async def async_fetch_by_frame_id(cls,
+                                      db_session: AsyncSession,
+                                      frame_id: int,
+                                      frame_create_time: Optional[Union[str, datetime]] = None
+                                      ) -> list[Union[IpPortSensorModel, IpPortSensorIntervalModel]]:
+        """Awaitable fetch_by_frame_id.
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        frame_id : int
+            frame id
+        frame_create_time : Optional[Union[str, datetime]], optional
+            frame create time, by default None
+
+        Returns
+        -------
+        list[Union[IpPortSensorModel, IpPortSensorIntervalModel]]
+            ip port sensors
+        """
+        return await db_session.run_sync(
+            lambda sync_session: cls.fetch_by_frame_id(frame_id, frame_create_time, db_session=sync_session))
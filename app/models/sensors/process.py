@@ -1,16 +1,51 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Union
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, select
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, DateTime, ForeignKeyConstraint, Integer, String, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, relationship
 from sqlalchemy.sql import func
 
-from app.models import BaseModel, FrameModel, session
+from app.models import BaseModel, FrameModel, bulk_insert, partitioned_by_month, session, to_datetime
+from app.models.sensors.interval import SensorIntervalMixin, interval_storage
 from app.schemas.requests.sensors import RequestProcessSensor
 
 
+class ProcessSensorIntervalModel(SensorIntervalMixin, BaseModel):
+    """
+    ProcessSensorIntervalModel
+
+    process sensors saved once per run of frames in which they are reported
+
+    Attributes
+    ----------
+    file_path : str
+        file path
+    process_name : str
+        process name
+    process_id : int
+        process id
+    started_at : datetime
+        started at
+    """
+    __tablename__ = 'process_sensor_intervals'
+    VALUE_COLUMNS = ('file_path', 'process_name', 'process_id', 'started_at')
+    file_path = Column(String(255), nullable=False, comment='file path')
+    process_name = Column(String(255), nullable=False, comment='process name')
+    process_id = Column(Integer, nullable=False, comment='process id')
+    started_at = Column(DateTime, nullable=False, comment='started at')
+
+    def __repr__(self) -> str:
+        return f"<ProcessSensorIntervalModel(id={self.id}, " \
+            f"process_name={self.process_name}, " \
+            f"process_id={self.process_id}, " \
+            f"user_session_id={self.user_session_id}, " \
+            f"first_seen_at={self.first_seen_at}, " \
+            f"last_seen_at={self.last_seen_at})>"
+
+
 class ProcessSensorModel(BaseModel):
     """
     ProcessSensorModel
@@ -29,25 +64,34 @@ class ProcessSensorModel(BaseModel):
         started at
     frame_id : int
         frame id
+    frame_create_time : datetime
+        create time of the frame
     frame : FrameModel
         frame
     """
     __tablename__ = 'process_sensors'
-    id = Column(Integer, primary_key=True, autoincrement=True)
+    # partitioned by the month of the frame, which is referenced with its partition key
+    __table_args__ = partitioned_by_month(ForeignKeyConstraint(['frame_id', 'frame_create_time'],
+                                                               [FrameModel.id, FrameModel.frame_create_time]))
+    id = Column(Integer, autoincrement=True)
     file_path = Column(String(255), nullable=False, comment='file path')
     process_name = Column(String(255), nullable=False, comment='process name')
     process_id = Column(Integer, nullable=False, comment='process id')
     started_at = Column(DateTime, nullable=False, comment='started at')
-    frame_id = Column(Integer, ForeignKey(FrameModel.id), nullable=False, comment='frame id')
+    frame_id = Column(Integer, nullable=False, index=True, comment='frame id')
+    frame_create_time = Column(DateTime, nullable=False, comment='create time of the frame')
 
     frame = relationship(FrameModel, backref='process_sensors')
 
+    __mapper_args__ = {'primary_key': [id]}
+
     def __init__(self,
                  file_path: str,
                  process_name: str,
                  process_id: int,
                  started_at: str,
                  frame_id: Optional[int] = None,
+                 frame_create_time: Optional[datetime] = None,
                  frame: Optional[FrameModel] = None,
                  created_at: Optional[datetime] = None,
                  updated_at: Optional[datetime] = None) -> None:
@@ -56,6 +100,8 @@ class ProcessSensorModel(BaseModel):
         ----------
         frame_id : Optional[int], optional
             frame id, by default None
+        frame_create_time : Optional[datetime], optional
+            create time of the frame of frame_id, by default None
         frame : Optional[FrameModel], optional
             frame, by default None
         created_at : Optional[datetime], optional
@@ -69,6 +115,7 @@ class ProcessSensorModel(BaseModel):
         self.started_at = started_at
         if frame_id is not None:
             self.frame_id = frame_id
+            self.frame_create_time = frame_create_time
         elif frame is not None:
             self.frame = frame
         self.created_at = created_at
@@ -85,7 +132,11 @@ class ProcessSensorModel(BaseModel):
             f"updated_at={self.updated_at})>"
 
     @classmethod
-    def save(cls, request_process_sensors: list[RequestProcessSensor], frame_id: int) -> None:
+    def save(cls,
+             request_process_sensors: list[RequestProcessSensor],
+             frame_id: int,
+             frame_create_time: Union[str, datetime],
+             db_session: Session = session) -> None:
         """Save process sensors.
 
         Parameters
@@ -94,26 +145,106 @@ class ProcessSensorModel(BaseModel):
             request process sensors
         frame_id : int
             frame id
+        frame_create_time : Union[str, datetime]
+            frame create time
+        db_session : Session, optional
+            session, by default the scoped session
         """
-        process_sensors = []
-        for request_process_sensor in request_process_sensors:
-            process_sensors.append(cls(
-                file_path=request_process_sensor.file_path,
-                process_name=request_process_sensor.process_name,
-                process_id=request_process_sensor.process_id,
-                started_at=request_process_sensor.started_at,
-                frame_id=frame_id
-            ))
-        session.add_all(process_sensors)
+        cls.bulk_save([(request_process_sensors, frame_id, frame_create_time)], db_session=db_session)
 
     @classmethod
-    def fetch_by_frame_id(cls, frame_id: int) -> list[tuple[str, int, str, str]]:
+    async def async_save(cls,
+                         db_session: AsyncSession,
+                         request_process_sensors: list[RequestProcessSensor],
+                         frame_id: int,
+                         frame_create_time: Union[str, datetime]) -> None:
+        """Awaitable save.
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        request_process_sensors : list[RequestProcessSensor]
+            request process sensors
+        frame_id : int
+            frame id
+        frame_create_time : Union[str, datetime]
+            frame create time
+        """
+        await cls.async_bulk_save(db_session, [(request_process_sensors, frame_id, frame_create_time)])
+
+    @classmethod
+    def bulk_save(cls,
+                  request_process_sensors_by_frame: list[tuple[list[RequestProcessSensor], int, Union[str, datetime]]],
+                  db_session: Session = session) -> None:
+        """Save process sensors of several frames without building ORM objects.
+
+        the rows are saved as intervals when SENSOR_STORAGE_MODE is interval.
+
+        Parameters
+        ----------
+        request_process_sensors_by_frame : list[tuple[list[RequestProcessSensor], int, Union[str, datetime]]]
+            request process sensors with the id and create time of the frame they belong to
+        db_session : Session, optional
+            session, by default the scoped session
+        """
+        process_sensors_by_frame = [
+            ([
+                {
+                    'file_path': request_process_sensor.file_path,
+                    'process_name': request_process_sensor.process_name,
+                    'process_id': request_process_sensor.process_id,
+                    'started_at': to_datetime(request_process_sensor.started_at)
+                }
+                for request_process_sensor in request_process_sensors], frame_id, to_datetime(frame_create_time))
+            for request_process_sensors, frame_id, frame_create_time in request_process_sensors_by_frame]
+
+        if interval_storage():
+            rows_by_frame = [(rows, frame_id) for rows, frame_id, _ in process_sensors_by_frame]
+            ProcessSensorIntervalModel.save_intervals(rows_by_frame, db_session)
+            return
+
+        process_sensors = [{**process_sensor, 'frame_id': frame_id, 'frame_create_time': frame_create_time}
+                           for process_sensors, frame_id, frame_create_time in process_sensors_by_frame
+                           for process_sensor in process_sensors]
+
+        bulk_insert(cls.__table__, process_sensors, db_session)
+
+    @classmethod
+    async def async_bulk_save(cls,
+                              db_session: AsyncSession,
+                              request_process_sensors_by_frame: list[tuple[list[RequestProcessSensor], int,
+                                                                           Union[str, datetime]]]) -> None:
+        """Awaitable bulk_save.
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        request_process_sensors_by_frame : list[tuple[list[RequestProcessSensor], int, Union[str, datetime]]]
+            process sensors with the id and create time of the frame they belong to
+        """
+        await db_session.run_sync(
+            lambda sync_session: cls.bulk_save(request_process_sensors_by_frame, db_session=sync_session))
+
+    @classmethod
+    def fetch_by_frame_id(cls,
+                          frame_id: int,
+                          frame_create_time: Optional[Union[str, datetime]] = None,
+                          db_session: Session = session) -> list[tuple[str, int, str, str]]:
         """Fetch process sensors by frame id.
 
+        the partition of the frame alone is read when its create time is given.
+        the intervals which contain the frame are read as well when SENSOR_STORAGE_MODE is interval.
+
         Parameters
         ----------
         frame_id : int
             frame id
+        frame_create_time : Optional[Union[str, datetime]], optional
+            frame create time, by default None to look for the frame in every partition
+        db_session : Session, optional
+            session, by default the scoped session
 
         Returns
         -------
@@ -126,5 +257,42 @@ class ProcessSensorModel(BaseModel):
                       cls.process_name,
                       func.to_char(cls.started_at, 'YYYY-MM-DD HH24:MI:SS').label('started_at')  # pylint: disable=not-callable
                       ).where(cls.frame_id == frame_id)
-        process_sensors = session.execute(stmt).all()
+        if frame_create_time is not None:
+            stmt = stmt.where(cls.frame_create_time == to_datetime(frame_create_time))
+
+        if interval_storage():
+            interval = ProcessSensorIntervalModel
+            stmt = union_all(stmt, interval.select_by_frame_id(
+                interval.file_path,
+                interval.process_id,
+                interval.process_name,
+                func.to_char(interval.started_at, 'YYYY-MM-DD HH24:MI:SS'),  # pylint: disable=not-callable
+                frame_id=frame_id))
+
+        process_sensors = db_session.execute(stmt).all()
         return process_sensors
+
+    @classmethod
+    async def async_fetch_by_frame_id(cls,
+                                      db_session: AsyncSession,
+                                      frame_id: int,
+                                      frame_create_time: Optional[Union[str, datetime]] = None
+                                      ) -> list[tuple[str, int, str, str]]:
+        """Awaitable fetch_by_frame_id.
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        frame_id : int
+            frame id
+        frame_create_time : Optional[Union[str, datetime]], optional
+            frame create time, by default None
+
+        Returns
+        -------
+        list[tuple[str, int, str, str]]
+            process sensors
+        """
+        return await db_session.run_sync(
+            lambda sync_session: cls.fetch_by_frame_id(frame_id, frame_create_time, db_session=sync_session))
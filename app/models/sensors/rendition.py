@@ -0,0 +1,117 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import cv2
+
+from app.logger import app_logger
+
+# widths of the downscaled webp renditions written for every stored screenshot, empty for none
+SCREENSHOT_RENDITION_WIDTHS = tuple(int(width) for width in
+                                    os.getenv('SCREENSHOT_RENDITION_WIDTHS', '160,480,1280').split(',') if width)
+SCREENSHOT_RENDITION_QUALITY = int(os.getenv('SCREENSHOT_RENDITION_QUALITY', '80'))
+
+rendition_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rendition')
+
+
+def rendition_path(image_path: str, width: int) -> str:
+    """
+    path of a rendition, next to the screenshot it is made from
+
+    Parameters
+    ----------
+    image_path : str
+        image path of the screenshot
+    width : int
+        width of the rendition
+
+    Returns
+    -------
+    str
+        rendition path
+    """
+
+    return f'{os.path.splitext(image_path)[0]}_{width}w.webp'
+
+
+def rendition_paths(image_path: str) -> list[str]:
+    """
+    paths of the renditions of a screenshot found on disk, whatever widths they were written for
+
+    Parameters
+    ----------
+    image_path : str
+        image path of the screenshot
+
+    Returns
+    -------
+    list[str]
+        rendition paths
+    """
+
+    path = Path(image_path)
+    return [str(rendition) for rendition in path.parent.glob(f'{path.stem}_*w.webp')]
+
+
+def write_renditions(image_path: str, widths: Optional[tuple[int, ...]] = None) -> None:
+    """
+    write webp renditions of a screenshot
+
+    the screenshot is decoded once and never upscaled,
+    and each rendition is renamed into place so a reader never sees a partial file.
+
+    Parameters
+    ----------
+    image_path : str
+        image path of the screenshot
+    widths : Optional[tuple[int, ...]], optional
+        widths of the renditions, by default SCREENSHOT_RENDITION_WIDTHS
+    """
+
+    if widths is None:
+        widths = SCREENSHOT_RENDITION_WIDTHS
+
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise FileNotFoundError(image_path)
+
+    height, width = image.shape[:2]
+    for rendition_width in widths:
+        if rendition_width < width:
+            rendition_height = max(round(height * rendition_width / width), 1)
+            rendition = cv2.resize(image, (rendition_width, rendition_height), interpolation=cv2.INTER_AREA)
+        else:
+            rendition = image
+
+        path = rendition_path(image_path, rendition_width)
+        temporary_path = f'{path}.{os.getpid()}.tmp.webp'
+        cv2.imwrite(temporary_path, rendition, [cv2.IMWRITE_WEBP_QUALITY, SCREENSHOT_RENDITION_QUALITY])
+        os.replace(temporary_path, path)
+
+
+def _log_error(future: Future) -> None:
+    if (exc := future.exception()) is not None:
+        app_logger.error(exc)
+
+
+def schedule_renditions(image_path: str) -> Future:
+    """
+    write the renditions of a screenshot in the background
+
+    a rendition which is requested before it is written is rendered on demand instead.
+
+    Parameters
+    ----------
+    image_path : str
+        image path of the screenshot
+
+    Returns
+    -------
+    Future
+        future of write_renditions
+    """
+
+    future = rendition_executor.submit(write_renditions, image_path)
+    future.add_done_callback(_log_error)
+    return future
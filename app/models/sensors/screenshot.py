@@ -1,18 +1,41 @@
 from __future__ import annotations
 
+import asyncio
 import base64
+import io
+import os
+import shutil
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Optional, Union
 
 import cv2
 import numpy as np
-from sqlalchemy import Column, ForeignKey, Integer, Text, select
-from sqlalchemy.orm import relationship
-
-from app.models import BaseModel, FrameModel, session
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    ForeignKeyConstraint,
+    Index,
+    Integer,
+    Text,
+    and_,
+    delete,
+    select,
+    update,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, relationship
+
+from app.models import BaseModel, FrameModel, SessionStatsModel, UserSessionModel, session, to_datetime
+from app.models.sensors.image import ImageHeader, image_digest, read_image_header
+from app.models.sensors.rendition import SCREENSHOT_RENDITION_WIDTHS, schedule_renditions
+from app.models.sensors.screenshot_blob import ScreenshotBlobModel
 from app.schemas.requests.sensors import RequestScreenshotSensor
 
+# resize screenshots wider than this before saving, 0 keeps the original bytes
+SCREENSHOT_RESIZE_WIDTH = int(os.getenv('SCREENSHOT_RESIZE_WIDTH', '0'))
+
 
 def decode_base64(base64_image: str) -> np.ndarray:
     """
@@ -68,20 +91,37 @@ class ScreenshotSensorModel(BaseModel):
         ip port
     image_path : str
         file path
+    blob_id : int
+        screenshot blob id, None for screenshots saved before deduplication
     frame_id : int
         frame id
+    frame_create_time : datetime
+        create time of the frame
     frame : FrameModel
         frame
     """
     __tablename__ = 'screenshot_sensors'
+    # not partitioned, the frame is referenced with its partition key
+    __table_args__ = (ForeignKeyConstraint(['frame_id', 'frame_create_time'],
+                                           [FrameModel.id, FrameModel.frame_create_time]),
+                      Index('ix_screenshot_sensors_frame_create_time_id', 'frame_create_time', 'id'),
+                      BaseModel.__table_args__)
     id = Column(Integer, primary_key=True, autoincrement=True)
     image_path = Column(Text, nullable=False, comment='file path')
-    frame_id = Column(Integer, ForeignKey(FrameModel.id), nullable=False, comment='frame id')
+    blob_id = Column(Integer,
+                     ForeignKey(ScreenshotBlobModel.id),
+                     nullable=True,
+                     index=True,
+                     comment='screenshot blob id')
+    frame_id = Column(Integer, nullable=False, index=True, comment='frame id')
+    frame_create_time = Column(DateTime, nullable=False, comment='create time of the frame')
     frame = relationship(FrameModel, backref='screenshot_sensors')
 
     def __init__(self,
                  image_path: str,
+                 blob_id: Optional[int] = None,
                  frame_id: Optional[int] = None,
+                 frame_create_time: Optional[datetime] = None,
                  frame: Optional[FrameModel] = None,
                  created_at: Optional[datetime] = None,
                  updated_at: Optional[datetime] = None) -> None:
@@ -90,8 +130,12 @@ class ScreenshotSensorModel(BaseModel):
         ----------
         image_path : str
             image file path
+        blob_id : Optional[int], optional
+            screenshot blob id, by default None
         frame_id : Optional[int], optional
             frame id, by default None
+        frame_create_time : Optional[datetime], optional
+            create time of the frame of frame_id, by default None
         frame : Optional[FrameModel], optional
             frame, by default None
         created_at : Optional[datetime], optional
@@ -100,23 +144,25 @@ class ScreenshotSensorModel(BaseModel):
             updated datetime, by default None
         """
         self.image_path = image_path
+        self.blob_id = blob_id
         if frame_id is not None:
             self.frame_id = frame_id
+            self.frame_create_time = frame_create_time
         elif frame is not None:
             self.frame = frame
         self.created_at = created_at
         self.updated_at = updated_at
 
     def __repr__(self) -> str:
-        return f"<ScreenshotSensorModel(id={self.id}, image_path={self.image_path}, frame_id={self.frame_id}"\
-            f", created_at={self.created_at}, updated_at={self.updated_at})>"
+        return f"<ScreenshotSensorModel(id={self.id}, image_path={self.image_path}, blob_id={self.blob_id}"\
+            f", frame_id={self.frame_id}, created_at={self.created_at}, updated_at={self.updated_at})>"
 
     @classmethod
     def save(cls,
              request_screenshot_sensor: RequestScreenshotSensor,
              frame_id: int,
-             user_name: str,
-             frame_create_time: datetime):
+             frame_create_time: Union[str, datetime],
+             db_session: Session = session):
         """
         save
 
@@ -126,64 +172,399 @@ class ScreenshotSensorModel(BaseModel):
             request screenshot sensor
         frame_id : int
             frame id
-        user_name : str
-            user name
-        frame_create_time : datetime
+        frame_create_time : Union[str, datetime]
             frame create time
+        db_session : Session, optional
+            session, by default the scoped session
         """
 
-        image_path = cls._save_image(request_screenshot_sensor.image,
-                                     frame_id,
-                                     user_name,
-                                     frame_create_time)
+        image_file = io.BytesIO(base64.b64decode(request_screenshot_sensor.image))
 
-        screenshot_sensor = ScreenshotSensorModel(image_path=image_path, frame_id=frame_id)
-        session.add(screenshot_sensor)
+        cls.save_file(image_file, frame_id, frame_create_time, db_session=db_session)
 
     @classmethod
-    def _save_image(cls,
-                    image: str,
-                    frame_id: int,
-                    user_name: str,
-                    frame_create_time: str) -> str:
+    async def async_save(cls,
+                         db_session: AsyncSession,
+                         request_screenshot_sensor: RequestScreenshotSensor,
+                         frame_id: int,
+                         frame_create_time: Union[str, datetime]):
         """
-        save image
+        awaitable save
+        the base64 image is decoded in a worker thread
 
         Parameters
         ----------
-        image : str
-            image
+        db_session : AsyncSession
+            async session
+        request_screenshot_sensor : ScreenshotSensorCreateRequest
+            request screenshot sensor
         frame_id : int
             frame id
-        user_name : str
-            user name
-        frame_create_time : str
+        frame_create_time : Union[str, datetime]
             frame create time
+        """
+
+        image_file = io.BytesIO(await asyncio.to_thread(base64.b64decode, request_screenshot_sensor.image))
+
+        await cls.async_save_file(db_session, image_file, frame_id, frame_create_time)
+
+    @classmethod
+    def save_file(cls,
+                  image_file: BinaryIO,
+                  frame_id: int,
+                  frame_create_time: Union[str, datetime],
+                  db_session: Session = session):
+        """
+        save screenshot uploaded as raw bytes
+
+        the screenshot references the blob of its content hash,
+        and the file is written only when the blob is new.
+        the renditions of a new blob are written in the background.
+
+        Parameters
+        ----------
+        image_file : BinaryIO
+            uploaded png or jpeg file
+        frame_id : int
+            frame id
+        frame_create_time : Union[str, datetime]
+            frame create time
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Raises
+        ------
+        InvalidImageError
+            the image is not png / jpeg or exceeds the limits
+        """
+
+        header = read_image_header(image_file)
+        sha256 = image_digest(image_file)
+
+        blob_id, image_path, inserted = ScreenshotBlobModel.acquire(sha256,
+                                                                    header.format,
+                                                                    header.size,
+                                                                    db_session=db_session)
+        if inserted:
+            cls._write_image(image_file, header, image_path)
+            if SCREENSHOT_RENDITION_WIDTHS:
+                schedule_renditions(image_path)
+
+        screenshot_sensor = ScreenshotSensorModel(image_path=image_path,
+                                                  blob_id=blob_id,
+                                                  frame_id=frame_id,
+                                                  frame_create_time=to_datetime(frame_create_time))
+        db_session.add(screenshot_sensor)
+
+    @classmethod
+    async def async_save_file(cls,
+                              db_session: AsyncSession,
+                              image_file: BinaryIO,
+                              frame_id: int,
+                              frame_create_time: Union[str, datetime]):
+        """
+        awaitable save_file
+        the image is validated, hashed and written in a worker thread
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        image_file : BinaryIO
+            uploaded png or jpeg file
+        frame_id : int
+            frame id
+        frame_create_time : Union[str, datetime]
+            frame create time
+
+        Raises
+        ------
+        InvalidImageError
+            the image is not png / jpeg or exceeds the limits
+        """
+
+        header = await asyncio.to_thread(read_image_header, image_file)
+        sha256 = await asyncio.to_thread(image_digest, image_file)
+
+        blob_id, image_path, inserted = await db_session.run_sync(
+            lambda sync_session: ScreenshotBlobModel.acquire(sha256,
+                                                             header.format,
+                                                             header.size,
+                                                             db_session=sync_session))
+        if inserted:
+            await asyncio.to_thread(cls._write_image, image_file, header, image_path)
+            if SCREENSHOT_RENDITION_WIDTHS:
+                schedule_renditions(image_path)
+
+        db_session.add(ScreenshotSensorModel(image_path=image_path,
+                                             blob_id=blob_id,
+                                             frame_id=frame_id,
+                                             frame_create_time=to_datetime(frame_create_time)))
+
+    @classmethod
+    def _write_image(cls, image_file: BinaryIO, header: ImageHeader, image_path: str) -> None:
+        """
+        write the original bytes of a validated image
+
+        the image is decoded only when SCREENSHOT_RESIZE_WIDTH is set and the image is wider than it.
+        the file is renamed into place, so a reader never sees a partial image.
+
+        Parameters
+        ----------
+        image_file : BinaryIO
+            seekable png or jpeg file
+        header : ImageHeader
+            header of the image
+        image_path : str
+            image path
+        """
+
+        Path(image_path).parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = f'{image_path}.{os.getpid()}.tmp.{header.format}'
+
+        if 0 < SCREENSHOT_RESIZE_WIDTH < header.width:
+            image = cv2.imdecode(np.frombuffer(image_file.read(), dtype=np.uint8), cv2.IMREAD_COLOR)
+            height = round(header.height * SCREENSHOT_RESIZE_WIDTH / header.width)
+            resized_image = cv2.resize(image, (SCREENSHOT_RESIZE_WIDTH, height), interpolation=cv2.INTER_AREA)
+            cv2.imwrite(temporary_path, resized_image)
+        else:
+            with open(temporary_path, 'wb') as saved_file:
+                shutil.copyfileobj(image_file, saved_file)
+
+        os.replace(temporary_path, image_path)
+
+    @classmethod
+    def delete_by_frame_ids(cls, frame_ids: list[int], db_session: Session = session) -> None:
+        """
+        delete screenshot sensors of frames and drop their blob references
+
+        unreferenced blobs are removed by ScreenshotBlobModel.sweep
+
+        Parameters
+        ----------
+        frame_ids : list[int]
+            frame ids
+        db_session : Session, optional
+            session, by default the scoped session
+        """
+
+        stmt = delete(cls).where(cls.frame_id.in_(frame_ids)).returning(cls.blob_id)
+
+        """SQL
+        DELETE FROM screenshot_sensors
+        WHERE screenshot_sensors.frame_id IN (:frame_id_1, ...)
+        RETURNING screenshot_sensors.blob_id
+        """
+
+        blob_ids = [blob_id for blob_id in db_session.execute(stmt).scalars() if blob_id is not None]
+
+        ScreenshotBlobModel.release(blob_ids, db_session=db_session)
+
+    @classmethod
+    def update_image_path_by_blob_id(cls, blob_id: int, image_path: str, db_session: Session = session) -> None:
+        """
+        point the screenshot sensors of a blob to its new file
+
+        Parameters
+        ----------
+        blob_id : int
+            screenshot blob id
+        image_path : str
+            image path returned by ScreenshotBlobModel.replace_file
+        db_session : Session, optional
+            session, by default the scoped session
+        """
+
+        stmt = update(cls).where(cls.blob_id == blob_id).values(image_path=image_path)\
+            .execution_options(synchronize_session=False)
+
+        """SQL
+        UPDATE screenshot_sensors SET image_path = :image_path
+        WHERE screenshot_sensors.blob_id = :blob_id_1
+        """
+
+        db_session.execute(stmt)
+
+    @classmethod
+    def fetch_image_path_by_frame_id(cls, frame_id: int, db_session: Session = session) -> str:
+        """
+        fetch_image_path_by_frame_id
+
+        Parameters
+        ----------
+        frame_id : int
+            frame id
+        db_session : Session, optional
+            session, by default the scoped session
 
         Returns
         -------
         str
-            saved image path
+            image path
         """
 
-        decoded_image = decode_base64(image)
+        stmt = select(cls.image_path).where(cls.frame_id == frame_id)
 
-        frame_create_time = frame_create_time.split(' ')
-        date, time = frame_create_time[0], frame_create_time[1]
-        year, month, day = date.split('-')
-        hour, minute, second = time.split(':')
+        return db_session.execute(stmt).scalars().first()
 
-        save_path = f'./screenshots/{user_name}/{year}{month}{day}'
-        Path(save_path).mkdir(parents=True, exist_ok=True)
+    @classmethod
+    async def async_fetch_image_path_by_frame_id(cls, db_session: AsyncSession, frame_id: int) -> Optional[str]:
+        """
+        awaitable fetch_image_path_by_frame_id
 
-        image_path = f'{save_path}/{hour}{minute}{second}_{frame_id}.png'
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        frame_id : int
+            frame id
 
-        cv2.imwrite(f'{image_path}', decoded_image)
+        Returns
+        -------
+        Optional[str]
+            image path, None if the frame has no screenshot
+        """
+
+        return await db_session.run_sync(
+            lambda sync_session: cls.fetch_image_path_by_frame_id(frame_id, db_session=sync_session))
+
+    @classmethod
+    def fetch_image_path_by_session_id_frame_no(cls,
+                                                session_id: str,
+                                                frame_no: int,
+                                                db_session: Session = session) -> Optional[str]:
+        """
+        fetch the image path of the screenshot of a frame by session id and frame no
+
+        Parameters
+        ----------
+        session_id : str
+            session id of user which is uuid
+        frame_no : int
+            frame no
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        Optional[str]
+            image path, None if the frame or its screenshot does not exist
+        """
+
+        session_range = SessionStatsModel.frame_time_range(session_id=session_id)
+        stmt = select(cls.image_path)\
+            .join(FrameModel, and_(cls.frame_id == FrameModel.id,
+                                   cls.frame_create_time == FrameModel.frame_create_time))\
+            .join(UserSessionModel, FrameModel.user_session_id == UserSessionModel.id)\
+            .where(UserSessionModel.session_id == session_id,
+                   FrameModel.frame_seq == frame_no,
+                   FrameModel.frame_create_time.between(*session_range))
+
+        """SQL
+        SELECT screenshot_sensors.image_path
+        FROM screenshot_sensors
+        JOIN frames ON screenshot_sensors.frame_id = frames.id
+            AND screenshot_sensors.frame_create_time = frames.frame_create_time
+        JOIN user_sessions ON frames.user_session_id = user_sessions.id
+        WHERE user_sessions.session_id = %(session_id_1) s
+            AND frames.frame_seq = %(frame_seq_1) s
+            AND frames.frame_create_time BETWEEN coalesce((SELECT session_stats.start_time ...), '-infinity')
+                                             AND coalesce((SELECT session_stats.end_time ...), 'infinity')
+        """
+
+        return db_session.execute(stmt).scalars().first()
+
+    @classmethod
+    async def async_fetch_image_path_by_session_id_frame_no(cls,
+                                                            db_session: AsyncSession,
+                                                            session_id: str,
+                                                            frame_no: int) -> Optional[str]:
+        """
+        awaitable fetch_image_path_by_session_id_frame_no
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        session_id : str
+            session id of user which is uuid
+        frame_no : int
+            frame no
+
+        Returns
+        -------
+        Optional[str]
+            image path
+        """
+
+        return await db_session.run_sync(
+            lambda sync_session: cls.fetch_image_path_by_session_id_frame_no(session_id, frame_no,
+                                                                             db_session=sync_session))
+
+    @classmethod
+    def fetch_image_paths_by_user_session_id(cls, user_session_id: int, db_session: Session = session) -> list[str]:
+        """
+        fetch the image paths of the screenshots of a user session in the order of the frames
+
+        Parameters
+        ----------
+        user_session_id : int
+            user session id
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        list[str]
+            image paths
+        """
+
+        session_range = SessionStatsModel.frame_time_range(user_session_id=user_session_id)
+        stmt = select(cls.image_path)\
+            .join(FrameModel, and_(cls.frame_id == FrameModel.id,
+                                   cls.frame_create_time == FrameModel.frame_create_time))\
+            .where(FrameModel.user_session_id == user_session_id,
+                   FrameModel.frame_create_time.between(*session_range))\
+            .order_by(FrameModel.frame_seq, cls.id)
+
+        """SQL
+        SELECT screenshot_sensors.image_path
+        FROM screenshot_sensors
+        JOIN frames ON screenshot_sensors.frame_id = frames.id
+            AND screenshot_sensors.frame_create_time = frames.frame_create_time
+        WHERE frames.user_session_id = :user_session_id_1
+            AND frames.frame_create_time BETWEEN coalesce((SELECT session_stats.start_time ...), '-infinity')
+                                             AND coalesce((SELECT session_stats.end_time ...), 'infinity')
+        ORDER BY frames.frame_seq, screenshot_sensors.id
+        """
+
+        return list(db_session.execute(stmt).scalars())
+
+    @classmethod
+    async def async_fetch_image_paths_by_user_session_id(cls,
+                                                         db_session: AsyncSession,
+                                                         user_session_id: int) -> list[str]:
+        """
+        awaitable fetch_image_paths_by_user_session_id
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        user_session_id : int
+            user session id
+
+        Returns
+        -------
+        list[str]
+            image paths
+        """
 
-        return image_path
+        return await db_session.run_sync(
+            lambda sync_session: cls.fetch_image_paths_by_user_session_id(user_session_id, db_session=sync_session))
 
     @classmethod
-    def fetch_by_frame_id(cls, frame_id: int) -> str:
+    def fetch_by_frame_id(cls, frame_id: int, db_session: Session = session) -> str:
         """
         fetch_by_frame_id
 
@@ -191,6 +572,31 @@ class ScreenshotSensorModel(BaseModel):
         ----------
         frame_id : int
             frame id
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        str
+            encoded image
+        """
+
+        image_path = cls.fetch_image_path_by_frame_id(frame_id, db_session=db_session)
+
+        return cls.encode_image(image_path)
+
+    @classmethod
+    async def async_fetch_by_frame_id(cls, db_session: AsyncSession, frame_id: int) -> str:
+        """
+        awaitable fetch_by_frame_id
+        the image is read and encoded in a worker thread
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        frame_id : int
+            frame id
 
         Returns
         -------
@@ -198,11 +604,43 @@ class ScreenshotSensorModel(BaseModel):
             encoded image
         """
 
-        stmt = select(cls).where(cls.frame_id == frame_id)
-        screenshot_sensor = session.execute(stmt).scalars().first()
+        image_path = await db_session.run_sync(
+            lambda sync_session: cls.fetch_image_path_by_frame_id(frame_id, db_session=sync_session))
+
+        return await asyncio.to_thread(cls.encode_image, image_path)
+
+    @staticmethod
+    def read_base64(image_path: str) -> str:
+        """
+        read a saved screenshot as base64 of its stored bytes, without decoding it
+
+        Parameters
+        ----------
+        image_path : str
+            image path
+
+        Returns
+        -------
+        str
+            base64 encoded png or jpeg
+        """
+
+        return base64.b64encode(Path(image_path).read_bytes()).decode()
+
+    @staticmethod
+    def encode_image(image_path: str) -> str:
+        """
+        read a saved screenshot as base64 png
 
-        image_path = screenshot_sensor.image_path
+        Parameters
+        ----------
+        image_path : str
+            image path
 
-        encoded_image = encode_base64(cv2.imread(image_path))
+        Returns
+        -------
+        str
+            encoded image
+        """
 
-        return encoded_image
+        return encode_base64(cv2.imread(image_path))
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Optional
+
+from sqlalchemy import BigInteger, Column, Integer, String, delete, exists, literal_column, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, aliased
+
+from app.models import BaseModel, session
+from app.models.sensors.rendition import rendition_paths
+
+SCREENSHOT_BLOB_DIR = os.getenv('SCREENSHOT_BLOB_DIR', './screenshots/blobs')
+
+
+class ScreenshotBlobModel(BaseModel):
+    """
+    ScreenshotBlobModel
+
+    screenshot file stored once per content hash and shared by every screenshot sensor with the same bytes.
+    the file is written by the transaction which inserts the row,
+    and the row and the file are removed by sweep once no screenshot sensor references it.
+    a blob encoded again is keyed by the hash of its new file, so an upload of the original image gets a new blob.
+
+    Attributes
+    ----------
+    id : int
+        screenshot blob id
+    sha256 : str
+        sha256 of the file
+    extension : str
+        png or jpg, webp once encoded again
+    size : int
+        uploaded image size in bytes
+    ref_count : int
+        number of screenshot sensors which reference the blob
+    """
+    __tablename__ = 'screenshot_blobs'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sha256 = Column(String(64), unique=True, nullable=False, comment='sha256 of the image')
+    extension = Column(String(4), nullable=False, comment='file extension')
+    size = Column(BigInteger, nullable=False, comment='image size')
+    ref_count = Column(Integer, nullable=False, default=0, comment='number of screenshot sensors')
+
+    def __repr__(self) -> str:
+        return f"<ScreenshotBlobModel(id={self.id}, sha256={self.sha256}, ref_count={self.ref_count})>"
+
+    @staticmethod
+    def blob_path(blob_id: int, sha256: str, extension: str) -> str:
+        """
+        path of a blob file
+
+        the id is part of the name, so a blob inserted again after a sweep never shares the file being removed
+
+        Parameters
+        ----------
+        blob_id : int
+            screenshot blob id
+        sha256 : str
+            sha256 of the image
+        extension : str
+            file extension
+
+        Returns
+        -------
+        str
+            image path
+        """
+
+        return f'{SCREENSHOT_BLOB_DIR}/{sha256[:2]}/{sha256}_{blob_id}.{extension}'
+
+    @classmethod
+    def acquire(cls, sha256: str, extension: str, size: int, db_session: Session = session) -> tuple[int, str, bool]:
+        """
+        take a reference to the blob of an image, inserting it if it is new
+
+        Parameters
+        ----------
+        sha256 : str
+            sha256 of the image
+        extension : str
+            file extension
+        size : int
+            image size in bytes
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        tuple[int, str, bool]
+            blob id, image path and whether the blob is inserted and its file has to be written
+        """
+
+        stmt = insert(cls).values(sha256=sha256, extension=extension, size=size, ref_count=1)
+        stmt = stmt.on_conflict_do_update(index_elements=[cls.sha256],
+                                          set_={'ref_count': cls.ref_count + 1})\
+            .returning(cls.id, cls.extension, literal_column('xmax') == 0)
+
+        """SQL
+        INSERT INTO screenshot_blobs (sha256, extension, size, ref_count, created_at, updated_at)
+        VALUES (:sha256, :extension, :size, 1, :created_at, :updated_at)
+        ON CONFLICT (sha256) DO UPDATE SET ref_count = screenshot_blobs.ref_count + 1
+        RETURNING screenshot_blobs.id, screenshot_blobs.extension, xmax = 0
+        """
+
+        blob_id, stored_extension, inserted = db_session.execute(stmt).one()
+
+        return blob_id, cls.blob_path(blob_id, sha256, stored_extension), inserted
+
+    @classmethod
+    def replace_file(cls,
+                     blob_id: int,
+                     extension: str,
+                     new_sha256: str,
+                     new_extension: str,
+                     size: int,
+                     db_session: Session = session) -> Optional[str]:
+        """
+        point a blob to its file encoded again, keyed by the hash of the new file
+
+        the row is locked until commit, so a screenshot saved with the blob at the same time waits for the new path.
+        remove the file of the old extension after the transaction commits
+
+        Parameters
+        ----------
+        blob_id : int
+            screenshot blob id
+        extension : str
+            extension of the current file
+        new_sha256 : str
+            sha256 of the new file
+        new_extension : str
+            extension of the new file
+        size : int
+            size of the new file
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        Optional[str]
+            image path of the new file,
+            None if the blob is swept or its file replaced meanwhile, or another blob has the same new file
+        """
+
+        other = aliased(cls)
+        stmt = update(cls).where(cls.id == blob_id,
+                                 cls.extension == extension,
+                                 ~exists().where(other.sha256 == new_sha256))\
+            .values(sha256=new_sha256, extension=new_extension, size=size)
+
+        """SQL
+        UPDATE screenshot_blobs SET sha256 = :new_sha256, extension = :new_extension, size = :size
+        WHERE screenshot_blobs.id = :id_1 AND screenshot_blobs.extension = :extension_1
+            AND NOT (EXISTS (SELECT * FROM screenshot_blobs AS screenshot_blobs_1
+                             WHERE screenshot_blobs_1.sha256 = :new_sha256))
+        """
+
+        if db_session.execute(stmt).rowcount == 0:
+            return None
+        return cls.blob_path(blob_id, new_sha256, new_extension)
+
+    @classmethod
+    def release(cls, blob_ids: Iterable[int], db_session: Session = session) -> None:
+        """
+        drop references to blobs
+
+        Parameters
+        ----------
+        blob_ids : Iterable[int]
+            blob id of each dropped reference, repeated for several references
+        db_session : Session, optional
+            session, by default the scoped session
+        """
+
+        for blob_id, count in Counter(blob_ids).items():
+            stmt = update(cls).where(cls.id == blob_id).values(ref_count=cls.ref_count - count)
+
+            """SQL
+            UPDATE screenshot_blobs SET ref_count = screenshot_blobs.ref_count - :count
+            WHERE screenshot_blobs.id = :id_1
+            """
+
+            db_session.execute(stmt)
+
+    @classmethod
+    def sweep(cls, db_session: Session = session) -> list[str]:
+        """
+        delete blobs which are no longer referenced
+
+        remove the returned files with remove_files after the transaction commits
+
+        Parameters
+        ----------
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        list[str]
+            image paths of the deleted blobs
+        """
+
+        stmt = delete(cls).where(cls.ref_count <= 0).returning(cls.id, cls.sha256, cls.extension)
+
+        """SQL
+        DELETE FROM screenshot_blobs
+        WHERE screenshot_blobs.ref_count <= 0
+        RETURNING screenshot_blobs.id, screenshot_blobs.sha256, screenshot_blobs.extension
+        """
+
+        return [cls.blob_path(blob_id, sha256, extension)
+                for blob_id, sha256, extension in db_session.execute(stmt).all()]
+
+    @staticmethod
+    def remove_files(image_paths: Iterable[str]) -> None:
+        """
+        remove blob files and their renditions
+
+        Parameters
+        ----------
+        image_paths : Iterable[str]
+            image paths returned by sweep
+        """
+
+        for image_path in image_paths:
+            for path in [image_path, *rendition_paths(image_path)]:
+                Path(path).unlink(missing_ok=True)
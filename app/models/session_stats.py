@@ -0,0 +1,370 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import (
+    Column,
+    ColumnElement,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    Row,
+    String,
+    case,
+    cast,
+    literal,
+    literal_column,
+    select,
+    text,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.models import BaseModel, UserModel, UserSessionModel, session
+
+
+class SessionStatsModel(BaseModel):
+    """
+    SessionStatsModel
+
+    summary of the frames of a user session, updated by FrameModel.save in the transaction which inserts a frame,
+    so the list of user sessions is read without aggregating the frames.
+    FrameModel.rebuild_session_stats computes it again from the frames.
+    the user is copied in, so the list is paged and filtered on the indexes of this table alone.
+
+    Attributes
+    ----------
+    user_session_id : int
+        user session id
+    user_id : int
+        user id
+    user_name : str
+        user name
+    machine_name : str
+        machine name
+    start_time : datetime
+        create time of the first frame
+    end_time : datetime
+        create time of the last frame
+    frame_count : int
+        number of frames
+    last_frame_id : int
+        id of the last frame
+    """
+    __tablename__ = 'session_stats'
+    # the order of the list, and the same order for the sessions of one machine
+    __table_args__ = (Index('ix_session_stats_user_name_start_time_user_session_id',
+                            'user_name', 'start_time', 'user_session_id'),
+                      Index('ix_session_stats_machine_name_user_name_start_time',
+                            'machine_name', 'user_name', 'start_time', 'user_session_id'),
+                      # the sessions which overlap the dates of the filter
+                      Index('ix_session_stats_time_range',
+                            text("tsrange(start_time, end_time, '[]')"),
+                            postgresql_using='gist'),
+                      BaseModel.__table_args__)
+    user_session_id = Column(Integer, ForeignKey(UserSessionModel.id), primary_key=True, comment='user session id')
+    user_id = Column(Integer, ForeignKey(UserModel.id), nullable=False, comment='user id')
+    user_name = Column(String(40), nullable=False, comment='user name')
+    machine_name = Column(String(40), nullable=False, comment='machine name')
+    start_time = Column(DateTime, nullable=False, comment='create time of the first frame')
+    end_time = Column(DateTime, nullable=False, comment='create time of the last frame')
+    frame_count = Column(Integer, nullable=False, comment='number of frames')
+    last_frame_id = Column(Integer, nullable=False, comment='id of the last frame')
+
+    def __repr__(self) -> str:
+        return f"<SessionStatsModel(user_session_id={self.user_session_id}, start_time={self.start_time}, " \
+            f"end_time={self.end_time}, frame_count={self.frame_count}, last_frame_id={self.last_frame_id})>"
+
+    @classmethod
+    def add_frame(cls,
+                  user_session_id: int,
+                  frame_id: int,
+                  frame_create_time: datetime,
+                  db_session: Session = session) -> None:
+        """
+        count a frame inserted into its session
+
+        Parameters
+        ----------
+        user_session_id : int
+            user session id
+        frame_id : int
+            frame id
+        frame_create_time : datetime
+            frame create time
+        db_session : Session, optional
+            session, by default the scoped session
+        """
+
+        table = cls.__table__
+        frame_stats = select(UserSessionModel.id,
+                             UserModel.id,
+                             UserModel.name,
+                             UserModel.machine_name,
+                             literal(frame_create_time, DateTime),
+                             literal(frame_create_time, DateTime),
+                             literal(1),
+                             literal(frame_id),
+                             func.now(),
+                             func.now())\
+            .join(UserModel, UserSessionModel.user_id == UserModel.id)\
+            .where(UserSessionModel.id == user_session_id)
+        stmt = insert(table).from_select([table.c.user_session_id,
+                                          table.c.user_id,
+                                          table.c.user_name,
+                                          table.c.machine_name,
+                                          table.c.start_time,
+                                          table.c.end_time,
+                                          table.c.frame_count,
+                                          table.c.last_frame_id,
+                                          table.c.created_at,
+                                          table.c.updated_at], frame_stats)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_session_id],
+            set_={'start_time': func.least(table.c.start_time, stmt.excluded.start_time),
+                  'end_time': func.greatest(table.c.end_time, stmt.excluded.end_time),
+                  'frame_count': table.c.frame_count + 1,
+                  'last_frame_id': case((stmt.excluded.end_time > table.c.end_time, stmt.excluded.last_frame_id),
+                                        else_=table.c.last_frame_id),
+                  'updated_at': stmt.excluded.updated_at})
+
+        """SQL
+        INSERT INTO session_stats (user_session_id, user_id, user_name, machine_name, start_time, end_time,
+                                   frame_count, last_frame_id, created_at, updated_at)
+        SELECT user_sessions.id, users.id, users.name, users.machine_name, :frame_create_time, :frame_create_time,
+            1, :frame_id, now(), now()
+        FROM user_sessions
+        JOIN users ON user_sessions.user_id = users.id
+        WHERE user_sessions.id = :id_1
+        ON CONFLICT (user_session_id) DO UPDATE SET
+            start_time = least(session_stats.start_time, excluded.start_time),
+            end_time = greatest(session_stats.end_time, excluded.end_time),
+            frame_count = session_stats.frame_count + 1,
+            last_frame_id = CASE WHEN (excluded.end_time > session_stats.end_time)
+                                 THEN excluded.last_frame_id ELSE session_stats.last_frame_id END,
+            updated_at = excluded.updated_at
+        """
+
+        db_session.execute(stmt)
+
+    @classmethod
+    def frame_time_range(cls,
+                         session_id: Optional[str] = None,
+                         user_session_id: Optional[int] = None) -> tuple[ColumnElement, ColumnElement]:
+        """
+        first and last frame create times of a user session to bound the frames read from the partitioned tables
+
+        they are uncorrelated subqueries, computed once before the frames are read,
+        so the executor skips the monthly partitions out of the session.
+        a user session without stats is not bounded.
+
+        Parameters
+        ----------
+        session_id : Optional[str], optional
+            session id of user which is uuid, by default None
+        user_session_id : Optional[int], optional
+            user session id, by default None
+
+        Returns
+        -------
+        tuple[ColumnElement, ColumnElement]
+            start time and end time, -infinity and infinity without stats
+        """
+
+        def bound(column: Column, unbounded: str) -> ColumnElement:
+            stmt = select(column)
+            if user_session_id is not None:
+                stmt = stmt.where(cls.user_session_id == user_session_id)
+            else:
+                stmt = stmt.join(UserSessionModel, cls.user_session_id == UserSessionModel.id)\
+                    .where(UserSessionModel.session_id == session_id)
+            return func.coalesce(stmt.scalar_subquery(), cast(literal_column(f"'{unbounded}'"), DateTime))
+
+        """SQL
+        coalesce((SELECT session_stats.start_time FROM session_stats
+                  JOIN user_sessions ON session_stats.user_session_id = user_sessions.id
+                  WHERE user_sessions.session_id = :session_id_1), CAST('-infinity' AS TIMESTAMP WITHOUT TIME ZONE)),
+        coalesce((SELECT session_stats.end_time ...), CAST('infinity' AS TIMESTAMP WITHOUT TIME ZONE))
+        """
+
+        return bound(cls.start_time, '-infinity'), bound(cls.end_time, 'infinity')
+
+    @classmethod
+    def fetch_by_session_id(cls, session_id: str, db_session: Session = session) -> Optional[Row]:
+        """
+        fetch the stats of a user session by session id
+
+        Parameters
+        ----------
+        session_id : str
+            session id of user which is uuid
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        Optional[Row]
+            user session id, frame count and last frame id, None if the session has no frames
+        """
+
+        stmt = select(cls.user_session_id, cls.frame_count, cls.last_frame_id)\
+            .join(UserSessionModel, cls.user_session_id == UserSessionModel.id)\
+            .where(UserSessionModel.session_id == session_id)
+
+        """SQL
+        SELECT session_stats.user_session_id, session_stats.frame_count, session_stats.last_frame_id
+        FROM session_stats
+        JOIN user_sessions ON session_stats.user_session_id = user_sessions.id
+        WHERE user_sessions.session_id = %(session_id_1) s
+        """
+
+        return db_session.execute(stmt).one_or_none()
+
+    @classmethod
+    async def async_fetch_by_session_id(cls, db_session: AsyncSession, session_id: str) -> Optional[Row]:
+        """
+        awaitable fetch_by_session_id
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        session_id : str
+            session id of user which is uuid
+
+        Returns
+        -------
+        Optional[Row]
+            stats of the user session
+        """
+
+        return await db_session.run_sync(
+            lambda sync_session: cls.fetch_by_session_id(session_id, db_session=sync_session))
+
+    @classmethod
+    def fetch_page(cls,
+                   limit: int,
+                   after: Optional[tuple[str, datetime, int]] = None,
+                   user_name: Optional[str] = None,
+                   machine_name: Optional[str] = None,
+                   start_date: Optional[datetime] = None,
+                   end_date: Optional[datetime] = None,
+                   db_session: Session = session) -> list[Row]:
+        """
+        fetch a page of user sessions ordered by user name and start time
+
+        the page after a session is a range scan of an index from that session,
+        so any page is read in the same time however many sessions are recorded.
+
+        Parameters
+        ----------
+        limit : int
+            maximum number of user sessions
+        after : Optional[tuple[str, datetime, int]], optional
+            user name, start time and user session id of the last session of the previous page,
+            by default None for the first page
+        user_name : Optional[str], optional
+            user name, by default None for every user
+        machine_name : Optional[str], optional
+            machine name, by default None for every machine
+        start_date : Optional[datetime], optional
+            only sessions which end at or after it, by default None
+        end_date : Optional[datetime], optional
+            only sessions which start at or before it, by default None
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        list[Row]
+            user session id, user id, session id, user name, machine name, start time and end time
+        """
+
+        stmt = select(cls.user_session_id,
+                      cls.user_id,
+                      UserSessionModel.session_id,
+                      cls.user_name,
+                      cls.machine_name,
+                      cls.start_time,
+                      cls.end_time)\
+            .join(UserSessionModel, cls.user_session_id == UserSessionModel.id)\
+            .order_by(cls.user_name, cls.start_time, cls.user_session_id)\
+            .limit(limit)
+
+        if after is not None:
+            stmt = stmt.where(tuple_(cls.user_name, cls.start_time, cls.user_session_id) > tuple_(*after))
+        if user_name is not None:
+            stmt = stmt.where(cls.user_name == user_name)
+        if machine_name is not None:
+            stmt = stmt.where(cls.machine_name == machine_name)
+        if start_date is not None or end_date is not None:
+            if start_date is not None and end_date is not None and start_date > end_date:
+                return []
+            # a range of a NULL bound is unbounded on that side, the filter is a scan of the gist index
+            stmt = stmt.where(func.tsrange(cls.start_time, cls.end_time, literal_column("'[]'"))
+                              .op('&&')(func.tsrange(start_date, end_date, literal_column("'[]'"))))
+
+        """SQL
+        SELECT session_stats.user_session_id, session_stats.user_id, user_sessions.session_id,
+            session_stats.user_name, session_stats.machine_name, session_stats.start_time, session_stats.end_time
+        FROM session_stats
+        JOIN user_sessions ON session_stats.user_session_id = user_sessions.id
+        WHERE (session_stats.user_name, session_stats.start_time, session_stats.user_session_id)
+                > (:param_1, :param_2, :param_3)
+            AND session_stats.user_name = :user_name_1
+            AND session_stats.machine_name = :machine_name_1
+            AND tsrange(session_stats.start_time, session_stats.end_time, '[]') && tsrange(:start_date, :end_date, '[]')
+        ORDER BY session_stats.user_name, session_stats.start_time, session_stats.user_session_id
+        LIMIT :param_4
+        """
+
+        return db_session.execute(stmt).all()
+
+    @classmethod
+    async def async_fetch_page(cls,
+                               db_session: AsyncSession,
+                               limit: int,
+                               after: Optional[tuple[str, datetime, int]] = None,
+                               user_name: Optional[str] = None,
+                               machine_name: Optional[str] = None,
+                               start_date: Optional[datetime] = None,
+                               end_date: Optional[datetime] = None) -> list[Row]:
+        """
+        awaitable fetch_page
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        limit : int
+            maximum number of user sessions
+        after : Optional[tuple[str, datetime, int]], optional
+            sort key of the last session of the previous page, by default None
+        user_name : Optional[str], optional
+            user name, by default None
+        machine_name : Optional[str], optional
+            machine name, by default None
+        start_date : Optional[datetime], optional
+            only sessions which end at or after it, by default None
+        end_date : Optional[datetime], optional
+            only sessions which start at or before it, by default None
+
+        Returns
+        -------
+        list[Row]
+            page of user sessions
+        """
+
+        return await db_session.run_sync(
+            lambda sync_session: cls.fetch_page(limit,
+                                                after=after,
+                                                user_name=user_name,
+                                                machine_name=machine_name,
+                                                start_date=start_date,
+                                                end_date=end_date,
+                                                db_session=sync_session))
@@ -1,13 +1,19 @@
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import Any, AsyncIterator, Optional, Union
 
 from sqlalchemy import Column, DateTime, MetaData, create_engine, inspect
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, declared_attr, scoped_session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy_utils import create_database, database_exists
 
 from app.errors.exceptions import DataBaseConnectionError, InternalServerError
 from app.logger import app_logger
+from app.models.pool import DB_STATEMENT_TIMEOUT, PoolMetrics, pool_options
+from app.models.replica import ReplicaLag
 
 # Engine
 SERVER = os.getenv('POSTGRES_SERVER')
@@ -16,16 +22,166 @@ PASSWORD = os.getenv('POSTGRES_PASSWORD')
 DB = os.getenv('POSTGRES_DB')
 PORT = os.getenv('POSTGRES_PORT')
 
+# Read engine
+# the read only routers read from a replica of the database when its server is set
+READ_SERVER = os.getenv('POSTGRES_READ_SERVER')
+READ_USER = os.getenv('POSTGRES_READ_USER', USER)
+READ_PASSWORD = os.getenv('POSTGRES_READ_PASSWORD', PASSWORD)
+READ_DB = os.getenv('POSTGRES_READ_DB', DB)
+READ_PORT = os.getenv('POSTGRES_READ_PORT', PORT)
+# seconds to wait for a connection to the replica before reading from the primary
+DB_READ_CONNECT_TIMEOUT = float(os.getenv('DB_READ_CONNECT_TIMEOUT', '5'))
+
+# every worker process opens up to pool_size + max_overflow connections on each engine
+engine_metrics = PoolMetrics('sync')
+async_engine_metrics = PoolMetrics('async')
+async_read_engine_metrics = PoolMetrics('async-read')
+
 Engine = create_engine(
     f"postgresql://{USER}:{PASSWORD}@{SERVER}:{PORT}/{DB}",
-    echo=False
+    echo=False,
+    poolclass=engine_metrics.pool_class(QueuePool),
+    connect_args={'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'},
+    **pool_options()
+)
+
+AsyncDBEngine = create_async_engine(
+    f"postgresql+asyncpg://{USER}:{PASSWORD}@{SERVER}:{PORT}/{DB}",
+    echo=False,
+    poolclass=async_engine_metrics.pool_class(AsyncAdaptedQueuePool),
+    connect_args={'server_settings': {'statement_timeout': str(DB_STATEMENT_TIMEOUT)}},
+    **pool_options()
 )
 
+AsyncReadDBEngine: Optional[AsyncEngine] = None
+if READ_SERVER:
+    AsyncReadDBEngine = create_async_engine(
+        f"postgresql+asyncpg://{READ_USER}:{READ_PASSWORD}@{READ_SERVER}:{READ_PORT}/{READ_DB}",
+        echo=False,
+        poolclass=async_read_engine_metrics.pool_class(AsyncAdaptedQueuePool),
+        connect_args={'server_settings': {'statement_timeout': str(DB_STATEMENT_TIMEOUT)},
+                      'timeout': DB_READ_CONNECT_TIMEOUT},
+        **pool_options()
+    )
+
+read_replica_lag = ReplicaLag()
+
 # Session
 session = scoped_session(
     sessionmaker(Engine, autoflush=False, autocommit=False)
 )
 
+async_session_factory = async_sessionmaker(AsyncDBEngine, autoflush=False, expire_on_commit=False)
+
+async_read_session_factory = None
+if AsyncReadDBEngine is not None:
+    async_read_session_factory = async_sessionmaker(AsyncReadDBEngine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """
+    provide an AsyncSession per request as a FastAPI dependency
+
+    the session is closed, and its uncommitted work rolled back, when the request ends
+
+    Yields
+    ------
+    AsyncSession
+        async session
+    """
+
+    async with async_session_factory() as db_session:
+        yield db_session
+
+
+@asynccontextmanager
+async def async_read_session() -> AsyncIterator[AsyncSession]:
+    """
+    AsyncSession for reading only, on the read engine when it is configured and not too far behind
+
+    the primary is read instead when the replica lags more than DB_READ_MAX_LAG seconds or is not reachable
+
+    Yields
+    ------
+    AsyncSession
+        async session of the replica or the primary
+    """
+
+    factory = async_session_factory
+    if async_read_session_factory is not None and await read_replica_lag.fresh(AsyncReadDBEngine):
+        factory = async_read_session_factory
+
+    async with factory() as db_session:
+        yield db_session
+
+
+async def get_async_read_session() -> AsyncIterator[AsyncSession]:
+    """
+    provide an AsyncSession for reading only per request as a FastAPI dependency
+
+    Yields
+    ------
+    AsyncSession
+        async session of the replica or the primary
+    """
+
+    async with async_read_session() as db_session:
+        yield db_session
+
+
+def pool_stats() -> dict[str, dict]:
+    """
+    live state and checkout counters of the pools of the engines in this worker process
+
+    Returns
+    -------
+    dict[str, dict]
+        stats by engine name
+    """
+
+    stats = {engine_metrics.name: engine_metrics.stats(Engine.pool),
+             async_engine_metrics.name: async_engine_metrics.stats(AsyncDBEngine.pool)}
+    if AsyncReadDBEngine is not None:
+        stats[async_read_engine_metrics.name] = async_read_engine_metrics.stats(AsyncReadDBEngine.pool)
+    return stats
+
+
+def read_replica_stats() -> Optional[dict[str, Any]]:
+    """
+    lag and counters of the read engine in this worker process
+
+    Returns
+    -------
+    Optional[dict[str, Any]]
+        stats of the replica lag, None without a read engine
+    """
+
+    if AsyncReadDBEngine is None:
+        return None
+    return read_replica_lag.stats()
+
+
+def to_datetime(value: Union[str, datetime]) -> datetime:
+    """
+    convert a 'YYYY-MM-DD HH:MM:SS' string to datetime
+
+    asyncpg binds timestamps only from datetime, not from strings
+
+    Parameters
+    ----------
+    value : Union[str, datetime]
+        datetime or its string
+
+    Returns
+    -------
+    datetime
+        datetime
+    """
+
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
 
 class Base():
     """BaseModel Class
@@ -3,9 +3,12 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Column, Integer, String, select
+from sqlalchemy import Column, Integer, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
-from app.models import BaseModel, Engine, session
+from app.models import BaseModel, Engine, session, user_id_cache
 
 
 class UserModel(BaseModel):
@@ -24,10 +27,13 @@ class UserModel(BaseModel):
         user machine name
     """
     __tablename__ = 'users'
+    # a user is identified by the name, ip and machine name together,
+    # the same name on a new machine or a machine on a new ip is another user
+    __table_args__ = (UniqueConstraint('name', 'ip', 'machine_name', name='uq_users_name_ip_machine_name'),)
     id = Column(Integer, primary_key=True, autoincrement=True)
-    name = Column(String(40), unique=True, nullable=False, comment='user name')
-    ip = Column(String(39), unique=True, nullable=False, comment='ip address')
-    machine_name = Column(String(40), unique=True, nullable=False, comment='machine name')
+    name = Column(String(40), nullable=False, comment='user name')
+    ip = Column(String(39), nullable=False, comment='ip address')
+    machine_name = Column(String(40), nullable=False, comment='machine name')
 
     def __init__(self,
                  name: str,
@@ -60,18 +66,20 @@ class UserModel(BaseModel):
         return f"<UserModel(name={self.name}) ip_address={self.ip} machine_name={self.machine_name}>)"
 
     @classmethod
-    def save(cls, user: UserModel) -> int:
+    def save(cls, user: UserModel, db_session: Session = session) -> int:
         """
         save user
 
-        fetch user by name, ip, machine_name
-        if user is not exist, save user
-        if user is exist, return user id
+        look up the identity cache first,
+        then insert the user or take the existing one in a single statement
+        so that concurrent workers never race on the unique constraint
 
         Parameters
         ----------
         user : User
             user
+        db_session : Session, optional
+            session, by default the scoped session
 
         Returns
         -------
@@ -79,51 +87,44 @@ class UserModel(BaseModel):
             saved user id
         """
 
-        if (user_model := cls._fetch_by_name_ip_machine_name(user.name, user.ip, user.machine_name)) is None:
-            # if user is not exist, save user
-            session.add(user)
-            session.flush()
-            return user.id
-        return user_model.id
+        user_key = (user.name, user.ip, user.machine_name)
+        if (user_id := user_id_cache.get(user_key)) is not None:
+            return user_id
 
-    @classmethod
-    def _fetch_by_name_ip_machine_name(cls, name: str, ip: str, machine_name: str) -> Optional[UserModel]:
+        stmt = insert(cls).values(name=user.name, ip=user.ip, machine_name=user.machine_name)
+        stmt = stmt.on_conflict_do_update(constraint='uq_users_name_ip_machine_name',
+                                          set_={'name': stmt.excluded.name}).returning(cls.id)
+
+        """SQL
+        INSERT INTO users (name, ip, machine_name, created_at, updated_at)
+        VALUES (:name, :ip, :machine_name, :created_at, :updated_at)
+        ON CONFLICT ON CONSTRAINT uq_users_name_ip_machine_name DO UPDATE SET name = excluded.name
+        RETURNING users.id
         """
-        fetch user by name, ip, machine_name
 
-        if user is not exist, return None
-        if user is exist, return user id
+        user_id = db_session.execute(stmt).scalar_one()
+        user_id_cache.stage(db_session, user_key, user_id)
+        return user_id
+
+    @classmethod
+    async def async_save(cls, db_session: AsyncSession, user: UserModel) -> int:
+        """
+        awaitable save
 
         Parameters
         ----------
-        name : str
-            user name
-        ip : str
-            user ip address
-        machine_name : str
-            user machine name
+        db_session : AsyncSession
+            async session
+        user : User
+            user
 
         Returns
         -------
-        Optional[UserModel]
-            fetched user
-        """
-
-        stmt = select(cls.id).where(cls.name == name
-                                    and cls.ip == ip
-                                    and cls.machine_name == machine_name)
-
-        """SQL
-        SELECT users.id AS users_id
-        FROM users
-        WHERE users.name = :name_1
-            AND users.ip = :ip_1
-            AND users.machine_name = :machine_name_1
+        int
+            saved user id
         """
 
-        fetch_result = session.execute(stmt).one_or_none()
-
-        return fetch_result
+        return await db_session.run_sync(lambda sync_session: cls.save(user, db_session=sync_session))
 
 
 if __name__ == "__main__":
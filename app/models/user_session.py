@@ -4,9 +4,11 @@ from datetime import datetime
 from typing import Optional
 
 from sqlalchemy import UUID, Column, ForeignKey, Integer, select
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, relationship
 
-from app.models import BaseModel, UserModel, session
+from app.models import BaseModel, UserModel, session, user_session_id_cache
 
 
 class UserSessionModel(BaseModel):
@@ -22,11 +24,14 @@ class UserSessionModel(BaseModel):
         represents the session between when the user opens and closes the PC.
     user_id : int
         user id
+    frame_count : int
+        number of frames, the frame_seq of the last numbered frame
     """
     __tablename__ = 'user_sessions'
     id = Column(Integer, primary_key=True, autoincrement=True)
     session_id = Column(UUID(as_uuid=True), unique=True, nullable=False, comment='session id')
     user_id = Column(Integer, ForeignKey(UserModel.id), nullable=False, comment='user id')
+    frame_count = Column(Integer, nullable=False, default=0, comment='number of frames')
 
     user = relationship(UserModel, backref='user_sessions')
 
@@ -62,9 +67,55 @@ class UserSessionModel(BaseModel):
         return f"<UserSessionModel(id={self.id}, session_id={self.session_id}, user_id={self.user_id})>"
 
     @classmethod
-    def save(cls, user_session: UserSessionModel) -> int:
+    def save(cls, user_session: UserSessionModel, db_session: Session = session) -> int:
         """
         save user session
+        look up the identity cache first,
+        then insert the user session or take the existing one in a single statement
+
+        Parameters
+        ----------
+        user_session : UserSessionModel
+            user session
+        db_session : Session, optional
+            session, by default the scoped session
+
+        Returns
+        -------
+        int
+            user session id
+        """
+
+        session_key = str(user_session.session_id)
+        if (user_session_id := user_session_id_cache.get(session_key)) is not None:
+            return user_session_id
+
+        stmt = insert(cls).values(session_id=user_session.session_id, user_id=user_session.user_id)
+        stmt = stmt.on_conflict_do_update(index_elements=[cls.session_id],
+                                          set_={'session_id': stmt.excluded.session_id}).returning(cls.id)
+
+        """SQL
+        INSERT INTO user_sessions (session_id, user_id, created_at, updated_at)
+        VALUES (:session_id, :user_id, :created_at, :updated_at)
+        ON CONFLICT (session_id) DO UPDATE SET session_id = excluded.session_id
+        RETURNING user_sessions.id
+        """
+
+        user_session_id = db_session.execute(stmt).scalar_one()
+        user_session_id_cache.stage(db_session, session_key, user_session_id)
+        return user_session_id
+
+    @classmethod
+    async def async_save(cls, db_session: AsyncSession, user_session: UserSessionModel) -> int:
+        """
+        awaitable save
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        user_session : UserSessionModel
+            user session
 
         Returns
         -------
@@ -72,14 +123,10 @@ class UserSessionModel(BaseModel):
             user session id
         """
 
-        if (user_session_model := cls.fetch_by_session_id(user_session.session_id)) is None:
-            session.add(user_session)
-            session.flush()
-            return user_session.id
-        return user_session_model.id
+        return await db_session.run_sync(lambda sync_session: cls.save(user_session, db_session=sync_session))
 
     @classmethod
-    def fetch_by_session_id(cls, session_id: UUID) -> Optional[UserSessionModel]:
+    def fetch_by_session_id(cls, session_id: UUID, db_session: Session = session) -> Optional[UserSessionModel]:
         """
         fetch user session by session id
         if not found, return None
@@ -88,6 +135,8 @@ class UserSessionModel(BaseModel):
         ----------
         session_id : UUID
             session id
+        db_session : Session, optional
+            session, by default the scoped session
 
         Returns
         -------
@@ -107,6 +156,27 @@ class UserSessionModel(BaseModel):
             session_id = :session_id_1
         """
 
-        fetch_result = session.execute(stmt).one_or_none()
+        fetch_result = db_session.execute(stmt).one_or_none()
 
         return fetch_result
+
+    @classmethod
+    async def async_fetch_by_session_id(cls, db_session: AsyncSession, session_id: UUID) -> Optional[UserSessionModel]:
+        """
+        awaitable fetch_by_session_id
+
+        Parameters
+        ----------
+        db_session : AsyncSession
+            async session
+        session_id : UUID
+            session id
+
+        Returns
+        -------
+        Optional[UserSessionModel]
+            user session
+        """
+
+        return await db_session.run_sync(
+            lambda sync_session: cls.fetch_by_session_id(session_id, db_session=sync_session))
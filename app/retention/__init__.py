@@ -0,0 +1,10 @@
+# isort: skip_file
+from app.retention.policy import (
+    CompressScreenshots,
+    ExpireSensors,
+    RetentionPolicy,
+    RetentionReport,
+    ThinScreenshots,
+    encode_webp,
+    retention_policies,
+)
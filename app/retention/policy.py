@@ -0,0 +1,568 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Optional
+
+import cv2
+from sqlalchemy import (
+    ColumnElement,
+    DateTime,
+    Integer,
+    TableClause,
+    and_,
+    column,
+    delete,
+    exists,
+    select,
+    table,
+    tuple_,
+)
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql import func
+
+from app.models import (
+    BaseModel,
+    DriveSensorIntervalModel,
+    DriveSensorModel,
+    FrameModel,
+    IpPortSensorIntervalModel,
+    IpPortSensorModel,
+    ProcessSensorIntervalModel,
+    ProcessSensorModel,
+    ScreenshotBlobModel,
+    ScreenshotSensorModel,
+    session,
+)
+from app.models.partition import drop_partitions, partition_name
+from app.models.sensors.rendition import rendition_paths
+
+# screenshots whose frames are older than this many days are encoded again as webp, 0 to keep them as they are
+RETENTION_COMPRESS_DAYS = int(os.getenv('RETENTION_COMPRESS_DAYS', '7'))
+RETENTION_COMPRESS_WIDTH = int(os.getenv('RETENTION_COMPRESS_WIDTH', '1280'))
+RETENTION_COMPRESS_QUALITY = int(os.getenv('RETENTION_COMPRESS_QUALITY', '60'))
+# only the screenshot of every Nth frame older than this many days is kept, 0 to keep them all
+RETENTION_THIN_DAYS = int(os.getenv('RETENTION_THIN_DAYS', '90'))
+RETENTION_THIN_EVERY = int(os.getenv('RETENTION_THIN_EVERY', '10'))
+# drive, ip port and process rows of frames older than this many days are dropped, 0 to keep them
+RETENTION_SENSOR_DAYS = int(os.getenv('RETENTION_SENSOR_DAYS', '365'))
+# rows handled per transaction, seconds to sleep between the transactions and batches per policy and run, 0 for all
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '100'))
+RETENTION_BATCH_PAUSE = float(os.getenv('RETENTION_BATCH_PAUSE', '1'))
+RETENTION_MAX_BATCHES = int(os.getenv('RETENTION_MAX_BATCHES', '0'))
+
+
+@dataclass
+class RetentionReport:
+    """
+    RetentionReport
+
+    Attributes
+    ----------
+    policy : str
+        policy name
+    items : int
+        number of blobs, screenshots or sensor rows the policy applies to
+    bytes : int
+        bytes reclaimed, or which would be reclaimed by a dry run
+    """
+
+    policy: str
+    items: int = 0
+    bytes: int = 0
+
+
+def encode_webp(image_path: str, width: int, quality: int) -> Optional[bytes]:
+    """
+    encode a screenshot as webp, downscaled to a width and never upscaled
+
+    Parameters
+    ----------
+    image_path : str
+        image path
+    width : int
+        largest width
+    quality : int
+        webp quality
+
+    Returns
+    -------
+    Optional[bytes]
+        webp image, None if the screenshot cannot be read
+    """
+
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+
+    height, image_width = image.shape[:2]
+    if width < image_width:
+        image = cv2.resize(image, (width, max(round(height * width / image_width), 1)), interpolation=cv2.INTER_AREA)
+
+    _, encoded = cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, quality])
+    return encoded.tobytes()
+
+
+class RetentionPolicy(ABC):
+    """
+    RetentionPolicy
+
+    applies to the data of frames older than a number of days, a batch of rows per transaction.
+    each batch starts after the last row of the previous one, so a run visits every row once,
+    and a run stopped after max batches goes on from the oldest rows left on the next run.
+
+    Attributes
+    ----------
+    name : str
+        policy name
+    days : int
+        age of the frames in days, 0 disables the policy
+    batch_size : int
+        rows per batch
+    batch_pause : float
+        seconds between batches, which leaves the database to the ingestion
+    max_batches : int
+        batches per run, 0 for all
+    """
+
+    name = 'retention'
+
+    def __init__(self,
+                 days: int,
+                 batch_size: int = RETENTION_BATCH_SIZE,
+                 batch_pause: float = RETENTION_BATCH_PAUSE,
+                 max_batches: int = RETENTION_MAX_BATCHES,
+                 db_session: Session = session) -> None:
+        """
+        Parameters
+        ----------
+        days : int
+            age of the frames in days, 0 disables the policy
+        batch_size : int, optional
+            rows per batch, by default RETENTION_BATCH_SIZE
+        batch_pause : float, optional
+            seconds between batches, by default RETENTION_BATCH_PAUSE
+        max_batches : int, optional
+            batches per run, by default RETENTION_MAX_BATCHES
+        db_session : Session, optional
+            session, by default the scoped session
+        """
+
+        self.days = days
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.max_batches = max_batches
+        self.db_session = db_session
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__}(days={self.days}, batch_size={self.batch_size})>"
+
+    def apply(self, dry_run: bool = False, now: Optional[datetime] = None) -> RetentionReport:
+        """
+        run the batches
+
+        Parameters
+        ----------
+        dry_run : bool, optional
+            only measure what the policy would reclaim, by default False
+        now : Optional[datetime], optional
+            the frames are aged from, by default the current time
+
+        Returns
+        -------
+        RetentionReport
+            items and bytes reclaimed
+        """
+
+        report = RetentionReport(self.name)
+        if self.days <= 0:
+            return report
+
+        cutoff = (now or datetime.now()) - timedelta(days=self.days)
+        after = None
+        batches = 0
+        while True:
+            try:
+                after = self.run_batch(cutoff, after, dry_run, report)
+            finally:
+                self.db_session.close()
+            batches += 1
+            if after is None or 0 < self.max_batches <= batches:
+                break
+            time.sleep(self.batch_pause)
+
+        self.finish(dry_run, report)
+        return report
+
+    @abstractmethod
+    def run_batch(self, cutoff: datetime, after: Any, dry_run: bool, report: RetentionReport) -> Any:
+        """
+        handle one batch and add it to the report
+
+        Parameters
+        ----------
+        cutoff : datetime
+            frames created before it are handled
+        after : Any
+            position returned by the previous batch, None for the first batch
+        dry_run : bool
+            only measure the batch
+        report : RetentionReport
+            report of the run
+
+        Returns
+        -------
+        Any
+            position of the next batch, None when no rows are left
+        """
+
+    def finish(self, dry_run: bool, report: RetentionReport) -> None:
+        """
+        complete the report once the batches are run
+
+        Parameters
+        ----------
+        dry_run : bool
+            only measure the run
+        report : RetentionReport
+            report of the run
+        """
+
+
+class CompressScreenshots(RetentionPolicy):
+    """
+    CompressScreenshots
+
+    encodes the blobs of the screenshots of old frames again as lossy webp of a smaller width.
+    a blob is encoded once no frame newer than the cutoff references it, and kept when webp is not smaller.
+    the blob is keyed by the hash of the webp, so a new upload of the image never shares the degraded file.
+    screenshots saved before deduplication are left as they are.
+    """
+
+    name = 'compress-screenshots'
+
+    def __init__(self,
+                 days: int = RETENTION_COMPRESS_DAYS,
+                 width: int = RETENTION_COMPRESS_WIDTH,
+                 quality: int = RETENTION_COMPRESS_QUALITY,
+                 **kwargs: Any) -> None:
+        """
+        Parameters
+        ----------
+        days : int, optional
+            age of the frames in days, by default RETENTION_COMPRESS_DAYS
+        width : int, optional
+            largest width of the webp, by default RETENTION_COMPRESS_WIDTH
+        quality : int, optional
+            webp quality, by default RETENTION_COMPRESS_QUALITY
+        **kwargs : Any
+            batch settings of RetentionPolicy
+        """
+
+        super().__init__(days, **kwargs)
+        self.width = width
+        self.quality = quality
+
+    def run_batch(self, cutoff: datetime, after: Any, dry_run: bool, report: RetentionReport) -> Any:
+
+        screenshot = ScreenshotSensorModel
+        newer = aliased(ScreenshotSensorModel)
+        position = tuple_(screenshot.frame_create_time, screenshot.id)
+
+        # each blob is visited once, at its latest screenshot
+        stmt = select(screenshot.frame_create_time,
+                      screenshot.id,
+                      ScreenshotBlobModel.id,
+                      ScreenshotBlobModel.sha256,
+                      ScreenshotBlobModel.extension,
+                      ScreenshotBlobModel.size)\
+            .join(ScreenshotBlobModel, screenshot.blob_id == ScreenshotBlobModel.id)\
+            .where(screenshot.frame_create_time < cutoff,
+                   ScreenshotBlobModel.extension != 'webp',
+                   ~exists().where(newer.blob_id == screenshot.blob_id,
+                                   tuple_(newer.frame_create_time, newer.id) > position))\
+            .order_by(screenshot.frame_create_time, screenshot.id).limit(self.batch_size)
+        if after is not None:
+            stmt = stmt.where(position > tuple_(*after))
+
+        """SQL
+        SELECT screenshot_sensors.frame_create_time, screenshot_sensors.id, screenshot_blobs.id,
+            screenshot_blobs.sha256, screenshot_blobs.extension, screenshot_blobs.size
+        FROM screenshot_sensors
+        JOIN screenshot_blobs ON screenshot_sensors.blob_id = screenshot_blobs.id
+        WHERE screenshot_sensors.frame_create_time < :cutoff
+            AND screenshot_blobs.extension != 'webp'
+            AND NOT (EXISTS (SELECT * FROM screenshot_sensors AS screenshot_sensors_1
+                             WHERE screenshot_sensors_1.blob_id = screenshot_sensors.blob_id
+                                AND (screenshot_sensors_1.frame_create_time, screenshot_sensors_1.id)
+                                    > (screenshot_sensors.frame_create_time, screenshot_sensors.id)))
+            AND (screenshot_sensors.frame_create_time, screenshot_sensors.id) > (:frame_create_time, :id)
+        ORDER BY screenshot_sensors.frame_create_time, screenshot_sensors.id
+        LIMIT :batch_size
+        """
+
+        rows = self.db_session.execute(stmt).all()
+        # no transaction is kept open while the screenshots are encoded
+        self.db_session.commit()
+
+        for _, _, blob_id, sha256, extension, size in rows:
+            image_path = ScreenshotBlobModel.blob_path(blob_id, sha256, extension)
+            encoded = encode_webp(image_path, self.width, self.quality)
+            if encoded is None or len(encoded) >= size:
+                continue
+
+            if not dry_run and not self._replace(blob_id, sha256, extension, encoded):
+                continue
+            report.items += 1
+            report.bytes += size - len(encoded)
+
+        if len(rows) < self.batch_size:
+            return None
+        return tuple(rows[-1][:2])
+
+    def _replace(self, blob_id: int, sha256: str, extension: str, encoded: bytes) -> bool:
+        """
+        write the webp of a blob and point the blob and its screenshots to it
+
+        Parameters
+        ----------
+        blob_id : int
+            screenshot blob id
+        sha256 : str
+            sha256 of the current file
+        extension : str
+            extension of the current file
+        encoded : bytes
+            webp image
+
+        Returns
+        -------
+        bool
+            whether the blob is replaced, False if it is swept or replaced meanwhile
+        """
+
+        new_sha256 = hashlib.sha256(encoded).hexdigest()
+        new_path = ScreenshotBlobModel.blob_path(blob_id, new_sha256, 'webp')
+        temporary_path = f'{new_path}.{os.getpid()}.tmp.webp'
+        Path(new_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(temporary_path).write_bytes(encoded)
+        os.replace(temporary_path, new_path)
+
+        try:
+            image_path = ScreenshotBlobModel.replace_file(blob_id, extension, new_sha256, 'webp', len(encoded),
+                                                          db_session=self.db_session)
+            if image_path is not None:
+                ScreenshotSensorModel.update_image_path_by_blob_id(blob_id, image_path, db_session=self.db_session)
+            self.db_session.commit()
+        except Exception:
+            self.db_session.rollback()
+            Path(new_path).unlink(missing_ok=True)
+            raise
+
+        if image_path is None:
+            Path(new_path).unlink(missing_ok=True)
+            return False
+
+        # the renditions are kept under the name of the new file
+        old_path = ScreenshotBlobModel.blob_path(blob_id, sha256, extension)
+        old_stem, new_stem = os.path.splitext(old_path)[0], os.path.splitext(new_path)[0]
+        for rendition in rendition_paths(old_path):
+            os.replace(rendition, f'{new_stem}{rendition[len(old_stem):]}')
+        Path(old_path).unlink(missing_ok=True)
+        return True
+
+
+class ThinScreenshots(RetentionPolicy):
+    """
+    ThinScreenshots
+
+    deletes the screenshots of old frames but those of the first frame and every Nth frame after it.
+    the frames and their sensors are kept, so the frame nos of a session never change.
+    blobs no longer referenced are swept and their files removed.
+    """
+
+    name = 'thin-screenshots'
+
+    def __init__(self, days: int = RETENTION_THIN_DAYS, every: int = RETENTION_THIN_EVERY, **kwargs: Any) -> None:
+        """
+        Parameters
+        ----------
+        days : int, optional
+            age of the frames in days, by default RETENTION_THIN_DAYS
+        every : int, optional
+            the screenshot of every Nth frame is kept, by default RETENTION_THIN_EVERY, 1 keeps them all
+        **kwargs : Any
+            batch settings of RetentionPolicy
+        """
+
+        super().__init__(days if every > 1 else 0, **kwargs)
+        self.every = every
+        self._released: Counter[int] = Counter()
+
+    def run_batch(self, cutoff: datetime, after: Any, dry_run: bool, report: RetentionReport) -> Any:
+
+        screenshot = ScreenshotSensorModel
+        position = tuple_(screenshot.frame_create_time, screenshot.id)
+
+        stmt = select(screenshot.frame_create_time, screenshot.id, screenshot.frame_id, screenshot.blob_id)\
+            .join(FrameModel, and_(screenshot.frame_id == FrameModel.id,
+                                   screenshot.frame_create_time == FrameModel.frame_create_time))\
+            .where(screenshot.frame_create_time < cutoff,
+                   screenshot.blob_id.is_not(None),
+                   (FrameModel.frame_seq - 1) % self.every != 0)\
+            .order_by(screenshot.frame_create_time, screenshot.id).limit(self.batch_size)
+        if after is not None:
+            stmt = stmt.where(position > tuple_(*after))
+
+        """SQL
+        SELECT screenshot_sensors.frame_create_time, screenshot_sensors.id,
+            screenshot_sensors.frame_id, screenshot_sensors.blob_id
+        FROM screenshot_sensors
+        JOIN frames ON screenshot_sensors.frame_id = frames.id
+            AND screenshot_sensors.frame_create_time = frames.frame_create_time
+        WHERE screenshot_sensors.frame_create_time < :cutoff
+            AND screenshot_sensors.blob_id IS NOT NULL
+            AND (frames.frame_seq - 1) % :every != 0
+            AND (screenshot_sensors.frame_create_time, screenshot_sensors.id) > (:frame_create_time, :id)
+        ORDER BY screenshot_sensors.frame_create_time, screenshot_sensors.id
+        LIMIT :batch_size
+        """
+
+        rows = self.db_session.execute(stmt).all()
+        report.items += len(rows)
+
+        if dry_run:
+            self._released.update(blob_id for _, _, _, blob_id in rows)
+        elif rows:
+            ScreenshotSensorModel.delete_by_frame_ids(list({frame_id for _, _, frame_id, _ in rows}),
+                                                      db_session=self.db_session)
+            image_paths = ScreenshotBlobModel.sweep(db_session=self.db_session)
+            self.db_session.commit()
+            report.bytes += sum(Path(image_path).stat().st_size
+                                for image_path in image_paths if Path(image_path).exists())
+            ScreenshotBlobModel.remove_files(image_paths)
+
+        if len(rows) < self.batch_size:
+            return None
+        return tuple(rows[-1][:2])
+
+    def finish(self, dry_run: bool, report: RetentionReport) -> None:
+
+        # a blob is reclaimed when every screenshot which references it is deleted
+        blob_ids = list(self._released)
+        for start in range(0, len(blob_ids), self.batch_size):
+            stmt = select(ScreenshotBlobModel.id, ScreenshotBlobModel.ref_count, ScreenshotBlobModel.size)\
+                .where(ScreenshotBlobModel.id.in_(blob_ids[start:start + self.batch_size]))
+
+            """SQL
+            SELECT screenshot_blobs.id, screenshot_blobs.ref_count, screenshot_blobs.size
+            FROM screenshot_blobs
+            WHERE screenshot_blobs.id IN (:id_1, ...)
+            """
+
+            report.bytes += sum(size for blob_id, ref_count, size in self.db_session.execute(stmt).all()
+                                if self._released[blob_id] >= ref_count)
+        self.db_session.close()
+        self._released.clear()
+
+
+class ExpireSensors(RetentionPolicy):
+    """
+    ExpireSensors
+
+    drops the drive, ip port and process rows of old frames.
+    the monthly partitions are dropped once their whole month is older than the cutoff,
+    rows of the default partition and intervals which ended before the cutoff are deleted in batches.
+    the frames and their screenshots are kept.
+    """
+
+    name = 'expire-sensors'
+
+    SENSOR_MODELS = (DriveSensorModel, IpPortSensorModel, ProcessSensorModel)
+    INTERVAL_MODELS = (DriveSensorIntervalModel, IpPortSensorIntervalModel, ProcessSensorIntervalModel)
+
+    def __init__(self, days: int = RETENTION_SENSOR_DAYS, **kwargs: Any) -> None:
+        """
+        Parameters
+        ----------
+        days : int, optional
+            age of the frames in days, by default RETENTION_SENSOR_DAYS
+        **kwargs : Any
+            batch settings of RetentionPolicy
+        """
+
+        super().__init__(days, **kwargs)
+
+    def _tables(self) -> list[tuple[TableClause, ColumnElement]]:
+        """tables whose rows are deleted in batches, with the create time their rows are aged by"""
+
+        tables = []
+        for model in self.SENSOR_MODELS:
+            default_partition = table(partition_name(model.__tablename__),
+                                      column('id', Integer),
+                                      column('frame_create_time', DateTime),
+                                      schema=BaseModel.metadata.schema)
+            tables.append((default_partition, default_partition.c.frame_create_time))
+        for model in self.INTERVAL_MODELS:
+            tables.append((model.__table__, model.__table__.c.last_seen_at))
+        return tables
+
+    def run_batch(self, cutoff: datetime, after: Any, dry_run: bool, report: RetentionReport) -> Any:
+
+        if after is None:
+            dropped = drop_partitions([model.__table__ for model in self.SENSOR_MODELS], cutoff, dry_run)
+            report.items += sum(rows for rows, _ in dropped.values())
+            report.bytes += sum(size for _, size in dropped.values())
+            after = (0, 0)
+
+        table_no, last_id = after
+        sensor_table, create_time = self._tables()[table_no]
+
+        ids = select(sensor_table.c.id).where(sensor_table.c.id > last_id, create_time < cutoff)\
+            .order_by(sensor_table.c.id).limit(self.batch_size)
+        row_size = func.pg_column_size(sensor_table.table_valued())  # pylint: disable=not-callable
+        if dry_run:
+            stmt = select(sensor_table.c.id, row_size).where(sensor_table.c.id.in_(ids.scalar_subquery()))
+        else:
+            stmt = delete(sensor_table).where(sensor_table.c.id.in_(ids.scalar_subquery()))\
+                .returning(sensor_table.c.id, row_size)
+
+        """SQL
+        DELETE FROM drive_sensors_default
+        WHERE drive_sensors_default.id IN (SELECT drive_sensors_default.id FROM drive_sensors_default
+                                           WHERE drive_sensors_default.id > :last_id
+                                               AND drive_sensors_default.frame_create_time < :cutoff
+                                           ORDER BY drive_sensors_default.id
+                                           LIMIT :batch_size)
+        RETURNING drive_sensors_default.id, pg_column_size(drive_sensors_default)
+        """
+
+        rows = self.db_session.execute(stmt).all()
+        self.db_session.commit()
+        report.items += len(rows)
+        report.bytes += sum(size for _, size in rows)
+
+        if len(rows) == self.batch_size:
+            return table_no, max(row_id for row_id, _ in rows)
+        if table_no + 1 < len(self._tables()):
+            return table_no + 1, 0
+        return None
+
+
+def retention_policies() -> list[RetentionPolicy]:
+    """
+    policies configured by the environment, in the order they run
+
+    Returns
+    -------
+    list[RetentionPolicy]
+        compress, thin and expire
+    """
+
+    return [CompressScreenshots(), ThinScreenshots(), ExpireSensors()]
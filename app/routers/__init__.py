@@ -2,3 +2,4 @@
 from app.routers.record import router as record_router
 from app.routers.user_session import router as user_session_router
 from app.routers.frame import router as frame_router
+from app.routers.metrics import router as metrics_router
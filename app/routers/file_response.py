@@ -0,0 +1,278 @@
+import asyncio
+import mimetypes
+import os
+import re
+from typing import Optional, Union
+
+from fastapi import Response
+from fastapi.responses import FileResponse
+
+from app.cache import etag_matches
+
+BYTE_RANGE_PATTERN = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+class RangeNotSatisfiableError(Exception):
+    """the requested range starts after the end of the file"""
+
+
+def _byte_range(range_header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    first and last byte of a single byte range
+
+    multiple and malformed ranges are ignored and the whole file is sent.
+
+    Parameters
+    ----------
+    range_header : Optional[str]
+        Range header
+    size : int
+        file size
+
+    Returns
+    -------
+    Optional[tuple[int, int]]
+        first and last byte, both inclusive, None for the whole file
+
+    Raises
+    ------
+    RangeNotSatisfiableError
+        the range does not overlap the file
+    """
+
+    if range_header is None or (match := BYTE_RANGE_PATTERN.fullmatch(range_header.strip())) is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-n は末尾の n バイト
+        if int(last) == 0:
+            raise RangeNotSatisfiableError
+        return max(size - int(last), 0), size - 1
+    if last and int(last) < int(first):
+        return None
+    if int(first) >= size:
+        raise RangeNotSatisfiableError
+    return int(first), (min(int(last), size - 1) if last else size - 1)
+
+
+def _file_etag(stat_result: os.stat_result) -> str:
+    """
+    strong etag of a file from its modification time and size
+
+    Parameters
+    ----------
+    stat_result : os.stat_result
+        stat of the file
+
+    Returns
+    -------
+    str
+        quoted etag
+    """
+
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _read_bytes(path: str, first: int, last: int) -> bytes:
+    """
+    read a slice of a file
+
+    Parameters
+    ----------
+    path : str
+        file path
+    first : int
+        first byte
+    last : int
+        last byte, inclusive
+
+    Returns
+    -------
+    bytes
+        content
+    """
+
+    with open(path, 'rb') as file:
+        file.seek(first)
+        return file.read(last - first + 1)
+
+
+def read_file(path: str) -> tuple[bytes, str]:
+    """
+    read a whole file with the etag it is served with
+
+    Parameters
+    ----------
+    path : str
+        file path
+
+    Returns
+    -------
+    tuple[bytes, str]
+        content and quoted etag
+
+    Raises
+    ------
+    FileNotFoundError
+        the file does not exist
+    """
+
+    with open(path, 'rb') as file:
+        return file.read(), _file_etag(os.fstat(file.fileno()))
+
+
+def _preconditions(etag: str,
+                   size: int,
+                   headers: dict[str, str],
+                   range_header: Optional[str],
+                   if_range: Optional[str],
+                   if_none_match: Optional[str]) -> Union[Response, tuple[int, int], None]:
+    """
+    evaluate If-None-Match, If-Range and Range
+
+    Parameters
+    ----------
+    etag : str
+        quoted etag of the content
+    size : int
+        content size
+    headers : dict[str, str]
+        headers of the response
+    range_header : Optional[str]
+        Range header
+    if_range : Optional[str]
+        If-Range header
+    if_none_match : Optional[str]
+        If-None-Match header
+
+    Returns
+    -------
+    Union[Response, tuple[int, int], None]
+        304 or 416 response, first and last byte of the range, or None for the whole content
+    """
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    # If-Range が一致しない場合は Range を無視してファイル全体を返す
+    if if_range is not None and if_range != etag:
+        range_header = None
+
+    try:
+        return _byte_range(range_header, size)
+    except RangeNotSatisfiableError:
+        return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+
+def serve_bytes(content: bytes,
+                etag: str,
+                cache_control: str,
+                media_type: str,
+                range_header: Optional[str] = None,
+                if_range: Optional[str] = None,
+                if_none_match: Optional[str] = None) -> Response:
+    """
+    response of a file already read into memory, answered as serve_file answers the file
+
+    Parameters
+    ----------
+    content : bytes
+        content of the file
+    etag : str
+        quoted etag of the file
+    cache_control : str
+        Cache-Control header
+    media_type : str
+        media type
+    range_header : Optional[str], optional
+        Range header, by default None
+    if_range : Optional[str], optional
+        If-Range header, by default None
+    if_none_match : Optional[str], optional
+        If-None-Match header, by default None
+
+    Returns
+    -------
+    Response
+        200 with the content, 206 with a range, 304 or 416
+    """
+
+    headers = {'ETag': etag, 'Cache-Control': cache_control, 'Accept-Ranges': 'bytes'}
+    byte_range = _preconditions(etag, len(content), headers, range_header, if_range, if_none_match)
+    if isinstance(byte_range, Response):
+        return byte_range
+
+    if byte_range is None:
+        return Response(content=content, media_type=media_type, headers=headers)
+
+    first, last = byte_range
+    return Response(content=content[first:last + 1],
+                    status_code=206,
+                    media_type=media_type,
+                    headers={**headers, 'Content-Range': f'bytes {first}-{last}/{len(content)}'})
+
+
+async def serve_file(path: str,
+                     cache_control: str,
+                     range_header: Optional[str] = None,
+                     if_range: Optional[str] = None,
+                     if_none_match: Optional[str] = None,
+                     media_type: Optional[str] = None,
+                     etag: Optional[str] = None) -> Response:
+    """
+    response of a stored file with an etag and a single byte range
+
+    Starlette 0.27 FileResponse does not answer Range, so a single range is read here,
+    and the whole file is sent by FileResponse, with zero copy send when the server offers it.
+
+    Parameters
+    ----------
+    path : str
+        file path
+    cache_control : str
+        Cache-Control header
+    range_header : Optional[str], optional
+        Range header, by default None
+    if_range : Optional[str], optional
+        If-Range header, by default None
+    if_none_match : Optional[str], optional
+        If-None-Match header, by default None
+    media_type : Optional[str], optional
+        media type, by default guessed from the extension
+    etag : Optional[str], optional
+        quoted etag of the file, by default from its modification time and size
+
+    Returns
+    -------
+    Response
+        200 with the file, 206 with a range, 304 or 416
+
+    Raises
+    ------
+    FileNotFoundError
+        the file does not exist
+    """
+
+    stat_result = await asyncio.to_thread(os.stat, path)
+
+    etag = etag or _file_etag(stat_result)
+    headers = {'ETag': etag, 'Cache-Control': cache_control, 'Accept-Ranges': 'bytes'}
+    byte_range = _preconditions(etag, stat_result.st_size, headers, range_header, if_range, if_none_match)
+    if isinstance(byte_range, Response):
+        return byte_range
+
+    media_type = media_type or mimetypes.guess_type(path)[0]
+
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
+
+    first, last = byte_range
+    content = await asyncio.to_thread(_read_bytes, path, first, last)
+
+    return Response(content=content,
+                    status_code=206,
+                    media_type=media_type,
+                    headers={**headers, 'Content-Range': f'bytes {first}-{last}/{stat_result.st_size}'})
@@ -1,15 +1,39 @@
-from fastapi import APIRouter
+import asyncio
+import mimetypes
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, StreamingResponse
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import handle_errors
-from app.models import DriveSensorModel, FrameModel, IpPortSensorModel, ProcessSensorModel, ScreenshotSensorModel
-from app.routers.setting import AppRoutes
-from app.schemas.responses import GetFrameOut
-from app.schemas.responses.sensors import (
-    ResponseDriveSensor,
-    ResponseIpPortSensor,
-    ResponseProcessSensor,
-    ResponseScreenshotSensor,
+from app.cache import (
+    FRAME_CACHE_CONTROL,
+    FRAME_NO_CACHE_CONTROL,
+    FramePrefetcher,
+    etag_matches,
+    frame_no_hints,
+    frame_response_cache,
+    screenshot_response_cache,
+)
+from app.errors.exceptions import InvalidRequestError, ScreenshotNotFoundError
+from app.errors.responses import InvalidRequestErrorOut, ScreenshotNotFoundErrorOut
+from app.models import (
+    FrameModel,
+    ScreenshotSensorModel,
+    async_fetch_frame_detail_by_id,
+    async_fetch_frame_range,
+    async_read_session,
+    get_async_read_session,
 )
+from app.models.sensors.rendition import SCREENSHOT_RENDITION_WIDTHS, rendition_path, write_renditions
+from app.routers.file_response import read_file, serve_bytes, serve_file
+from app.routers.setting import AppRoutes
+from app.schemas.responses import GetFrameOut, GetFrameRangeOut
+from app.schemas.responses.sensors import ResponseScreenshotSensor
 
 router = APIRouter(
     prefix=AppRoutes.Frames.PREFIX,
@@ -17,53 +41,369 @@ router = APIRouter(
 )
 
 
-@router.get(AppRoutes.Frames.GET_URL,
+async def _rendition(image_path: str, width: int) -> str:
+    """
+    path of a rendition of a screenshot, rendered now if the background stage has not written it yet
+
+    Parameters
+    ----------
+    image_path : str
+        image path of the screenshot
+    width : int
+        width of the rendition
+
+    Returns
+    -------
+    str
+        rendition path
+
+    Raises
+    ------
+    ScreenshotNotFoundError
+        the screenshot file does not exist
+    """
+
+    path = rendition_path(image_path, width)
+    if not await asyncio.to_thread(os.path.exists, path):
+        try:
+            await asyncio.to_thread(write_renditions, image_path, (width,))
+        except FileNotFoundError as exc:
+            raise ScreenshotNotFoundError() from exc
+    return path
+
+
+def _frame_url(frame_id: int) -> str:
+    """
+    url of a frame by its id
+
+    Parameters
+    ----------
+    frame_id : int
+        frame id
+
+    Returns
+    -------
+    str
+        path of the frame endpoint
+    """
+
+    return AppRoutes.Frames.PREFIX + AppRoutes.Frames.BY_ID_URL.format(frame_id=frame_id)
+
+
+def _screenshot_url(frame_id: int) -> str:
+    """
+    url of the screenshot of a frame by its id
+
+    Parameters
+    ----------
+    frame_id : int
+        frame id
+
+    Returns
+    -------
+    str
+        path of the screenshot endpoint
+    """
+
+    return AppRoutes.Frames.PREFIX + AppRoutes.Frames.BY_ID_SCREENSHOT_URL.format(frame_id=frame_id)
+
+
+def _frame_etag(frame_id: int) -> str:
+    """
+    entity tag of a frame, which never changes for its id
+
+    Parameters
+    ----------
+    frame_id : int
+        frame id
+
+    Returns
+    -------
+    str
+        quoted etag
+    """
+
+    return f'"frame-{frame_id}"'
+
+
+def _screenshot_etag(frame_id: int, size: Optional[int] = None) -> str:
+    """
+    entity tag of the screenshot of a frame or of one of its renditions, which never changes for its id
+
+    Parameters
+    ----------
+    frame_id : int
+        frame id
+    size : Optional[int], optional
+        width of the rendition, by default None for the original image
+
+    Returns
+    -------
+    str
+        quoted etag
+    """
+
+    if size is None:
+        return f'"screenshot-{frame_id}"'
+    return f'"screenshot-{frame_id}-{size}w"'
+
+
+def _frame_body(frame: Row) -> bytes:
+    """
+    json body of a frame
+
+    Parameters
+    ----------
+    frame : Row
+        frame with its sensors
+
+    Returns
+    -------
+    bytes
+        response body
+    """
+
+    # スクリーンショットは画像を読まずに専用エンドポイントの URL を返す
+    frame_out = GetFrameOut(record_time=frame.frame_create_time,
+                            drive_sensors=frame.drive_sensors,
+                            ip_port_sensors=frame.ip_port_sensors,
+                            process_sensors=frame.process_sensors,
+                            screenshot_sensor=ResponseScreenshotSensor(url=_screenshot_url(frame.id)))
+
+    return JSONResponse(jsonable_encoder(frame_out, exclude_none=True)).body
+
+
+async def _prefetch_frames(session_id: str, frame_nos: list[int]) -> None:
+    """
+    cache frames of a session and their screenshots by the frame id
+
+    the connection is returned to the pool before the screenshots are read.
+
+    Parameters
+    ----------
+    session_id : str
+        session id of user which is uuid
+    frame_nos : list[int]
+        frame nos
+    """
+
+    image_paths = {}
+    async with async_read_session() as db_session:
+        async for frame in async_fetch_frame_range(db_session, session_id, min(frame_nos), max(frame_nos)):
+            if frame.frame_seq in frame_nos:
+                frame_no_hints.put((session_id, frame.frame_seq), frame.id)
+                if frame.id not in frame_response_cache:
+                    frame_response_cache.put(frame.id, _frame_body(frame), etag=_frame_etag(frame.id))
+                if frame.image_path is not None:
+                    image_paths[frame.id] = frame.image_path
+
+    for frame_id, image_path in image_paths.items():
+        if frame_id in screenshot_response_cache:
+            continue
+        try:
+            content, _ = await asyncio.to_thread(read_file, image_path)
+        except FileNotFoundError:
+            continue
+        screenshot_response_cache.put(frame_id,
+                                      content,
+                                      etag=_screenshot_etag(frame_id),
+                                      media_type=mimetypes.guess_type(image_path)[0] or 'application/octet-stream')
+
+
+frame_prefetcher = FramePrefetcher(_prefetch_frames)
+
+
+def _prefetched(session_id: str, frame_no: int) -> bool:
+    """
+    whether the frame last seen at a frame no is cached, a hint as the frame no may point to another frame since
+
+    Parameters
+    ----------
+    session_id : str
+        session id of user which is uuid
+    frame_no : int
+        frame no
+
+    Returns
+    -------
+    bool
+        True if the frame need not be read ahead
+    """
+
+    return (frame_id := frame_no_hints.get((session_id, frame_no))) is not None and frame_id in frame_response_cache
+
+
+async def _frame_id(db_session: AsyncSession, session_id: str, frame_no: int) -> Optional[int]:
+    """
+    id of the frame at a frame no, and read the frames after it ahead in the background
+
+    Parameters
+    ----------
+    db_session : AsyncSession
+        async session
+    session_id : str
+        session id of user which is uuid
+    frame_no : int
+        frame no
+
+    Returns
+    -------
+    Optional[int]
+        frame id, None if the session has no such frame
+    """
+
+    frame_id = await FrameModel.async_fetch_frame_id_by_session_id_frame_no(db_session, session_id, frame_no)
+    if frame_id is not None:
+        frame_no_hints.put((session_id, frame_no), frame_id)
+
+    # 次に開かれるフレームをスクリーンショットと合わせてバックグラウンドで先読み
+    frame_prefetcher.observe(session_id, frame_no, cached=lambda ahead_no: _prefetched(session_id, ahead_no))
+
+    return frame_id
+
+
+@router.get(AppRoutes.Frames.BY_ID_URL,
             response_model=GetFrameOut,
-            summary='Get a frame')
+            responses={304: {'description': 'Not Modified'}},
+            summary='Get a frame by its id')
 @handle_errors
-async def get_frame(session_id: str, frame_no: str) -> GetFrameOut:
-
-    frame_model = FrameModel.fetch_frame_by_session_id_frame_no(session_id=session_id, frame_no=int(frame_no))
-
-    frame_id, frame_create_time = frame_model.id, frame_model.frame_create_time
-
-    drive_sensor_models = DriveSensorModel.fetch_by_frame_id(frame_id=frame_id)
-    ip_port_sensor_models = IpPortSensorModel.fetch_by_frame_id(frame_id=frame_id)
-    process_sensor_models = ProcessSensorModel.fetch_by_frame_id(frame_id=frame_id)
-    screenshot_image = ScreenshotSensorModel.fetch_by_frame_id(frame_id=frame_id)
-
-    drive_sensors = [
-        ResponseDriveSensor(
-            drive_letter=drive_sensor_model.drive_letter,
-            drive_type=drive_sensor_model.drive_type,
-            volume_name=drive_sensor_model.volume_name,
-            file_system=drive_sensor_model.file_system,
-            all_space=drive_sensor_model.all_space,
-            free_space=drive_sensor_model.free_space)
-        for drive_sensor_model in drive_sensor_models]
-
-    ip_port_sensors = [
-        ResponseIpPortSensor(
-            state=ip_port_sensor_model.state,
-            ip=ip_port_sensor_model.ip,
-            port=ip_port_sensor_model.port,
-            process_id=ip_port_sensor_model.process_id,
-            remote_ip=ip_port_sensor_model.remote_ip,
-            remote_port=ip_port_sensor_model.remote_port)
-        for ip_port_sensor_model in ip_port_sensor_models]
-
-    process_sensors = [
-        ResponseProcessSensor(
-            file_path=process_sensor_model.file_path,
-            process_name=process_sensor_model.process_name,
-            process_id=process_sensor_model.process_id,
-            started_at=process_sensor_model.started_at)
-        for process_sensor_model in process_sensor_models]
-
-    screenshot_sensor = ResponseScreenshotSensor(image=screenshot_image)
-
-    return GetFrameOut(record_time=frame_create_time,
-                       drive_sensors=drive_sensors,
-                       ip_port_sensors=ip_port_sensors,
-                       process_sensors=process_sensors,
-                       screenshot_sensor=screenshot_sensor)
+async def get_frame_by_id(frame_id: int,
+                          if_none_match: Optional[str] = Header(default=None),
+                          db_session: AsyncSession = Depends(get_async_read_session)) -> Response:
+
+    # フレーム ID の内容は変わらないため、ETag が一致すればキャッシュも DB も参照せずに 304 を返す
+    etag = _frame_etag(frame_id)
+    headers = {'ETag': etag, 'Cache-Control': FRAME_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if (cached_response := frame_response_cache.get(frame_id)) is None:
+        # フレームと各センサーを1回のクエリで取得
+        frame = await async_fetch_frame_detail_by_id(db_session, frame_id)
+        cached_response = frame_response_cache.put(frame_id, _frame_body(frame), etag=etag)
+
+    return Response(content=cached_response.body, media_type='application/json', headers=headers)
+
+
+@router.get(AppRoutes.Frames.BY_ID_SCREENSHOT_URL,
+            response_class=FileResponse,
+            responses={200: {'content': {'image/png': {}, 'image/jpeg': {}, 'image/webp': {}}},
+                       206: {'description': 'Partial Content'},
+                       304: {'description': 'Not Modified'},
+                       400: {'model': InvalidRequestErrorOut},
+                       404: {'model': ScreenshotNotFoundErrorOut},
+                       416: {'description': 'Range Not Satisfiable'}},
+            summary='Get the screenshot of a frame by its id')
+@handle_errors
+async def get_frame_screenshot_by_id(frame_id: int,
+                                     size: Optional[int] = Query(default=None,
+                                                                 description='width of a webp rendition, '
+                                                                             'the original image if omitted'),
+                                     range_header: Optional[str] = Header(default=None, alias='Range'),
+                                     if_range: Optional[str] = Header(default=None),
+                                     if_none_match: Optional[str] = Header(default=None),
+                                     db_session: AsyncSession = Depends(get_async_read_session)) -> Response:
+
+    if size is not None and size not in SCREENSHOT_RENDITION_WIDTHS:
+        raise InvalidRequestError()
+
+    etag = _screenshot_etag(frame_id, size)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304,
+                        headers={'ETag': etag, 'Cache-Control': FRAME_CACHE_CONTROL, 'Accept-Ranges': 'bytes'})
+
+    # 先読み済みのスクリーンショットはファイルを参照せずに返す
+    if size is None and (cached_response := screenshot_response_cache.get(frame_id)) is not None:
+        return serve_bytes(cached_response.body,
+                           etag=etag,
+                           cache_control=FRAME_CACHE_CONTROL,
+                           media_type=cached_response.media_type,
+                           range_header=range_header,
+                           if_range=if_range)
+
+    image_path = await ScreenshotSensorModel.async_fetch_image_path_by_frame_id(db_session, frame_id)
+    if image_path is None:
+        raise ScreenshotNotFoundError()
+
+    # size 指定時は縮小版を返す
+    if size is not None:
+        image_path = await _rendition(image_path, size)
+
+    try:
+        return await serve_file(image_path,
+                                cache_control=FRAME_CACHE_CONTROL,
+                                range_header=range_header,
+                                if_range=if_range,
+                                etag=etag)
+    except FileNotFoundError as exc:
+        raise ScreenshotNotFoundError() from exc
+
+
+@router.get(AppRoutes.Frames.GET_URL,
+            response_class=RedirectResponse,
+            status_code=307,
+            responses={400: {'model': InvalidRequestErrorOut}},
+            summary='Redirect to the frame at a frame no')
+@handle_errors
+async def get_frame(session_id: str,
+                    frame_no: str,
+                    db_session: AsyncSession = Depends(get_async_read_session)) -> Response:
+
+    # 遅れて届いたフレームで番号がずれるため、フレーム番号は毎回フレーム ID に引き直す
+    if (frame_id := await _frame_id(db_session, session_id, int(frame_no))) is None:
+        raise InvalidRequestError()
+
+    return RedirectResponse(_frame_url(frame_id), status_code=307, headers={'Cache-Control': FRAME_NO_CACHE_CONTROL})
+
+
+@router.get(AppRoutes.Frames.RANGE_URL,
+            response_class=StreamingResponse,
+            responses={200: {'content': {'application/x-ndjson': {'schema': GetFrameRangeOut.schema()}}}},
+            summary='Stream the frames of a session as newline delimited json')
+@handle_errors
+async def get_frame_range(session_id: str,
+                          first_no: int = Query(default=1, alias='from', ge=1, description='first frame no'),
+                          last_no: Optional[int] = Query(default=None,
+                                                         alias='to',
+                                                         ge=1,
+                                                         description='last frame no, the last frame if omitted'),
+                          screenshots: bool = Query(default=False, description='embed the screenshots as base64'),
+                          db_session: AsyncSession = Depends(get_async_read_session)) -> StreamingResponse:
+
+    async def frame_lines():
+        # 範囲内のフレームを1回のクエリでサーバーサイドカーソルから順に取得
+        async for frame in async_fetch_frame_range(db_session, session_id, first_no, last_no):
+            image = None
+            if screenshots and frame.image_path is not None:
+                image = await asyncio.to_thread(ScreenshotSensorModel.read_base64, frame.image_path)
+
+            frame_out = GetFrameRangeOut(frame_no=frame.frame_seq,
+                                         record_time=frame.frame_create_time,
+                                         drive_sensors=frame.drive_sensors,
+                                         ip_port_sensors=frame.ip_port_sensors,
+                                         process_sensors=frame.process_sensors,
+                                         screenshot_sensor=ResponseScreenshotSensor(
+                                             url=_screenshot_url(frame.id), image=image))
+            yield frame_out.json(exclude_none=True) + '\n'
+
+    return StreamingResponse(frame_lines(), media_type='application/x-ndjson')
+
+
+@router.get(AppRoutes.Frames.SCREENSHOT_URL,
+            response_class=RedirectResponse,
+            status_code=307,
+            responses={404: {'model': ScreenshotNotFoundErrorOut}},
+            summary='Redirect to the screenshot of the frame at a frame no')
+@handle_errors
+async def get_frame_screenshot(session_id: str,
+                               frame_no: str,
+                               size: Optional[int] = Query(default=None,
+                                                           description='width of a webp rendition, '
+                                                                       'the original image if omitted'),
+                               db_session: AsyncSession = Depends(get_async_read_session)) -> Response:
+
+    if (frame_id := await _frame_id(db_session, session_id, int(frame_no))) is None:
+        raise ScreenshotNotFoundError()
+
+    url = _screenshot_url(frame_id) if size is None else f'{_screenshot_url(frame_id)}?size={size}'
+    return RedirectResponse(url, status_code=307, headers={'Cache-Control': FRAME_NO_CACHE_CONTROL})
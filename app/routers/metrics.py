@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+
+from app import handle_errors
+from app.cache import frame_response_cache, screenshot_response_cache
+from app.models import identity_cache_stats, pool_stats, read_replica_stats
+from app.routers.frame import frame_prefetcher
+from app.routers.setting import AppRoutes
+from app.schemas.responses import GetMetricsOut
+
+router = APIRouter(
+    prefix=AppRoutes.Metrics.PREFIX,
+    tags=[AppRoutes.Metrics.TAG],
+)
+
+
+@router.get(AppRoutes.Metrics.GET_URL,
+            response_model=GetMetricsOut,
+            summary='Get the connection pool and cache metrics of this worker')
+@handle_errors
+async def get_metrics() -> GetMetricsOut:
+
+    # 値はワーカープロセスごとなので、全体はワーカー数分を合算する
+    return GetMetricsOut(pools=pool_stats(),
+                         identity_caches=identity_cache_stats(),
+                         response_caches={response_cache.name: response_cache.stats()
+                                          for response_cache in (frame_response_cache, screenshot_response_cache)},
+                         frame_prefetch=frame_prefetcher.stats(),
+                         read_replica=read_replica_stats())
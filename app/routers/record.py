@@ -1,6 +1,14 @@
-from fastapi import APIRouter
+import asyncio
+
+from fastapi import APIRouter, Depends, File, Form, Response, UploadFile, status
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import handle_errors
+from app.errors.custom_exception import CustomException
+from app.errors.message import ErrorMessage
+from app.ingest import INGEST_MODE, record_spool, spool_worker, write_records
+from app.logger import app_logger
 from app.models import (
     DriveSensorModel,
     FrameModel,
@@ -9,11 +17,11 @@ from app.models import (
     ScreenshotSensorModel,
     UserModel,
     UserSessionModel,
-    session,
+    get_async_session,
 )
 from app.routers.setting import AppRoutes
-from app.schemas.requests import RecordSaveIn
-from app.schemas.responses import RecordSaveOut
+from app.schemas.requests import RecordSaveIn, RecordUploadIn
+from app.schemas.responses import RecordBatchSaveOut, RecordSaveOut, RecordSaveResult
 
 router = APIRouter(
     prefix=AppRoutes.Records.PREFIX,
@@ -21,11 +29,22 @@ router = APIRouter(
 )
 
 
-@router.post(AppRoutes.Records.POST_URL,
-             response_model=RecordSaveOut,
-             summary='Create a record')
-@handle_errors
-async def save(record: RecordSaveIn) -> RecordSaveOut:
+async def _save_record(db_session: AsyncSession, record: RecordUploadIn) -> int:
+    """save user, user session, frame and sensors of a record except the screenshot
+
+    Parameters
+    ----------
+    db_session : AsyncSession
+        async session
+    record : RecordUploadIn
+        record
+
+    Returns
+    -------
+    int
+        frame id
+    """
+
     # ユーザの登録
     user = record.user
 
@@ -33,37 +52,134 @@ async def save(record: RecordSaveIn) -> RecordSaveOut:
                            machine_name=user.machine_name,
                            ip=user.ip)
 
-    use_id = UserModel.save(user_model)
+    use_id = await UserModel.async_save(db_session, user_model)
 
     # セッションの登録
     session_id = record.session_id
     created_at = record.created_at
     user_session_model = UserSessionModel(session_id=session_id,
                                           user_id=use_id)
-    user_session_id = UserSessionModel.save(user_session_model)
+    user_session_id = await UserSessionModel.async_save(db_session, user_session_model)
 
     # フレームの登録
     frame_model = FrameModel(frame_create_time=created_at,
                              user_session_id=user_session_id)
-    frame_id = FrameModel.save(frame_model)
+    frame_id = await FrameModel.async_save(db_session, frame_model)
 
     # 各センサーの登録
     # drive
     drive_sensors = record.drive_sensors
-    DriveSensorModel.save(drive_sensors, frame_id)
+    await DriveSensorModel.async_save(db_session, drive_sensors, frame_id, created_at)
 
     # ip_port
     ip_port_sensors = record.ip_port_sensors
-    IpPortSensorModel.save(ip_port_sensors, frame_id)
+    await IpPortSensorModel.async_save(db_session, ip_port_sensors, frame_id, created_at)
 
     # process
     process_sensors = record.process_sensors
-    ProcessSensorModel.save(process_sensors, frame_id)
+    await ProcessSensorModel.async_save(db_session, process_sensors, frame_id, created_at)
+
+    return frame_id
+
+
+@router.post(AppRoutes.Records.POST_URL,
+             response_model=RecordSaveOut,
+             summary='Create a record')
+@handle_errors
+async def save(record: RecordSaveIn,
+               response: Response,
+               db_session: AsyncSession = Depends(get_async_session)) -> RecordSaveOut:
+
+    # スプールモードでは追記のみ行い、保存はバックグラウンドで行う
+    if INGEST_MODE == 'spool':
+        await asyncio.to_thread(record_spool.append, record.json().encode())
+        spool_worker.notify()
+        response.status_code = status.HTTP_202_ACCEPTED
+        return RecordSaveOut(message='accepted')
+
+    frame_id = await _save_record(db_session, record)
 
     # screenshot
     screenshot = record.screenshot_sensor
-    ScreenshotSensorModel.save(screenshot, frame_id, user.name, created_at)
+    await ScreenshotSensorModel.async_save(db_session, screenshot, frame_id, record.created_at)
+
+    await db_session.commit()
+
+    return RecordSaveOut(message='success')
 
-    session.commit()
+
+@router.post(AppRoutes.Records.UPLOAD_URL,
+             response_model=RecordSaveOut,
+             summary='Create a record with the screenshot as raw bytes')
+@handle_errors
+async def upload(record: str = Form(description='RecordUploadIn as json'),
+                 screenshot: UploadFile = File(description='png image'),
+                 db_session: AsyncSession = Depends(get_async_session)) -> RecordSaveOut:
+    """save a record sent as multipart/form-data
+
+    the screenshot is streamed to storage as it is,
+    without base64 in the json body.
+
+    Parameters
+    ----------
+    record : str
+        RecordUploadIn as json
+    screenshot : UploadFile
+        png image
+    db_session : AsyncSession
+        async session
+
+    Returns
+    -------
+    RecordSaveOut
+        message
+    """
+
+    try:
+        record_upload = RecordUploadIn.parse_raw(record)
+    except ValidationError as exc:
+        app_logger.error(exc)
+        raise CustomException(status_code=status.HTTP_400_BAD_REQUEST, detail=ErrorMessage.INVALID_REQUEST) from exc
+
+    frame_id = await _save_record(db_session, record_upload)
+
+    # screenshot
+    await ScreenshotSensorModel.async_save_file(db_session, screenshot.file, frame_id, record_upload.created_at)
+
+    await db_session.commit()
 
     return RecordSaveOut(message='success')
+
+
+@router.post(AppRoutes.Records.BATCH_POST_URL,
+             response_model=RecordBatchSaveOut,
+             summary='Create records in bulk')
+@handle_errors
+async def save_batch(records: list[RecordSaveIn],
+                     db_session: AsyncSession = Depends(get_async_session)) -> RecordBatchSaveOut:
+    """save buffered records in one transaction
+
+    Parameters
+    ----------
+    records : list[RecordSaveIn]
+        records buffered by the agent
+    db_session : AsyncSession
+        async session
+
+    Returns
+    -------
+    RecordBatchSaveOut
+        save status of each record
+    """
+
+    saved = await write_records(db_session, records)
+
+    await db_session.commit()
+
+    results = [RecordSaveResult(index=index,
+                                session_id=record.session_id,
+                                created_at=record.created_at,
+                                status='success' if is_saved else 'failed')
+               for index, (record, is_saved) in enumerate(zip(records, saved))]
+
+    return RecordBatchSaveOut(results=results)
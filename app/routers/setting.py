@@ -6,13 +6,25 @@ class AppRoutes:
         TAG: str = "records"
         PREFIX: str = "/records"
         POST_URL: str = "/"
+        BATCH_POST_URL: str = "/batch"
+        UPLOAD_URL: str = "/upload"
 
     class UserSessions:
         TAG: str = "user_sessions"
         PREFIX: str = "/user_sessions"
         GET_URL: str = "/"
+        VIDEO_URL: str = "/{session_id}/video"
 
     class Frames:
         TAG: str = "frames"
         PREFIX: str = "/frames"
         GET_URL: str = "/{session_id}/{frame_no}"
+        RANGE_URL: str = "/{session_id}"
+        SCREENSHOT_URL: str = "/{session_id}/{frame_no}/screenshot"
+        BY_ID_URL: str = "/by-id/{frame_id}"
+        BY_ID_SCREENSHOT_URL: str = "/by-id/{frame_id}/screenshot"
+
+    class Metrics:
+        TAG: str = "metrics"
+        PREFIX: str = "/metrics"
+        GET_URL: str = "/"
@@ -1,34 +1,234 @@
-from fastapi import APIRouter
+import asyncio
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import handle_errors
-from app.models.frame import FrameModel
+from app.errors.exceptions import InvalidRequestError, ScreenshotNotFoundError
+from app.errors.responses import InvalidRequestErrorOut, ScreenshotNotFoundErrorOut
+from app.export import (
+    VIDEO_CACHE_CONTROL,
+    VIDEO_CODECS,
+    VIDEO_EXPORT_FPS,
+    VIDEO_EXPORT_WIDTH,
+    VideoFormat,
+    video_exporter,
+)
+from app.models import ScreenshotSensorModel, SessionStatsModel, get_async_read_session
+from app.routers.file_response import serve_file
 from app.routers.setting import AppRoutes
 from app.schemas.responses import GetUserSessionOut, UserSession
 
+USER_SESSIONS_DEFAULT_LIMIT = 100
+USER_SESSIONS_MAX_LIMIT = 1000
+
 router = APIRouter(
     prefix=AppRoutes.UserSessions.PREFIX,
     tags=[AppRoutes.UserSessions.TAG],
 )
 
 
+def _encode_cursor(user_name: str, start_time: datetime, user_session_id: int) -> str:
+    """
+    opaque cursor of the page after a user session
+
+    Parameters
+    ----------
+    user_name : str
+        user name
+    start_time : datetime
+        start time
+    user_session_id : int
+        user session id
+
+    Returns
+    -------
+    str
+        url safe cursor
+    """
+
+    key = json.dumps([user_name, start_time.isoformat(), user_session_id])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[str, datetime, int]:
+    """
+    sort key of the user session a cursor points after
+
+    Parameters
+    ----------
+    cursor : str
+        cursor returned by the previous page
+
+    Returns
+    -------
+    tuple[str, datetime, int]
+        user name, start time and user session id
+
+    Raises
+    ------
+    InvalidRequestError
+        the cursor is not one returned by this api
+    """
+
+    try:
+        user_name, start_time, user_session_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(user_name), datetime.fromisoformat(start_time), int(user_session_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as exc:
+        raise InvalidRequestError() from exc
+
+
 @router.get(AppRoutes.UserSessions.GET_URL,
             response_model=GetUserSessionOut,
-            summary='Create a record')
+            responses={400: {'model': InvalidRequestErrorOut}},
+            summary='Get user sessions')
 @handle_errors
-async def get_user_sessions() -> GetUserSessionOut:
-    """get user sessions
+async def get_user_sessions(cursor: Optional[str] = Query(default=None, description='next_cursor of the previous page'),
+                            limit: int = Query(default=USER_SESSIONS_DEFAULT_LIMIT,
+                                               ge=1,
+                                               le=USER_SESSIONS_MAX_LIMIT),
+                            user_name: Optional[str] = Query(default=None, alias='userName'),
+                            machine_name: Optional[str] = Query(default=None, alias='machineName'),
+                            start_date: Optional[datetime] = Query(default=None,
+                                                                   alias='startDate',
+                                                                   description='sessions which end at or after it'),
+                            end_date: Optional[datetime] = Query(default=None,
+                                                                 alias='endDate',
+                                                                 description='sessions which start at or before it'),
+                            db_session: AsyncSession = Depends(get_async_read_session)) -> GetUserSessionOut:
+    """get a page of user sessions ordered by user name and start time
+
+    Parameters
+    ----------
+    cursor : Optional[str]
+        next_cursor of the previous page, None for the first page
+    limit : int
+        maximum number of user sessions
+    user_name : Optional[str]
+        user name
+    machine_name : Optional[str]
+        machine name
+    start_date : Optional[datetime]
+        only sessions which end at or after it
+    end_date : Optional[datetime]
+        only sessions which start at or before it
+    db_session : AsyncSession
+        async session
 
     Returns
     -------
     GetUserSessionOut
-        user sessions
+        user sessions and the cursor of the next page
     """
 
-    fetched_user_sessions = FrameModel.fetch_all_user_session()
-    return GetUserSessionOut(user_sessions=[UserSession(id=user_session.id,
+    after = _decode_cursor(cursor) if cursor is not None else None
+
+    # フレームを集計せずにセッションの集計テーブルから取得
+    # 次のページの有無を判定するため1件多く取得する
+    fetched_user_sessions = await SessionStatsModel.async_fetch_page(db_session,
+                                                                     limit + 1,
+                                                                     after=after,
+                                                                     user_name=user_name,
+                                                                     machine_name=machine_name,
+                                                                     start_date=start_date,
+                                                                     end_date=end_date)
+
+    next_cursor = None
+    if len(fetched_user_sessions) > limit:
+        fetched_user_sessions = fetched_user_sessions[:limit]
+        last = fetched_user_sessions[-1]
+        next_cursor = _encode_cursor(last.user_name, last.start_time, last.user_session_id)
+
+    return GetUserSessionOut(user_sessions=[UserSession(id=user_session.user_id,
                                                         sessionId=str(user_session.session_id),
-                                                        startDate=user_session.start_time,
-                                                        endDate=user_session.end_time,
-                                                        userName=user_session.name,
+                                                        startDate=user_session.start_time.strftime('%Y-%m-%d %H:%M:%S'),
+                                                        endDate=user_session.end_time.strftime('%Y-%m-%d %H:%M:%S'),
+                                                        userName=user_session.user_name,
                                                         machineName=user_session.machine_name)
-                                            for user_session in fetched_user_sessions])
+                                            for user_session in fetched_user_sessions],
+                             next_cursor=next_cursor)
+
+
+@router.get(AppRoutes.UserSessions.VIDEO_URL,
+            response_class=FileResponse,
+            responses={200: {'content': {'video/mp4': {}, 'video/x-msvideo': {}}},
+                       206: {'description': 'Partial Content'},
+                       304: {'description': 'Not Modified'},
+                       404: {'model': ScreenshotNotFoundErrorOut},
+                       416: {'description': 'Range Not Satisfiable'}},
+            summary='Export the screenshots of a user session as a video')
+@handle_errors
+async def get_user_session_video(session_id: str,
+                                 video_format: VideoFormat = Query(default=VideoFormat.MP4, alias='format'),
+                                 fps: int = Query(default=VIDEO_EXPORT_FPS, ge=1, le=60),
+                                 width: int = Query(default=VIDEO_EXPORT_WIDTH, ge=16, le=3840),
+                                 range_header: Optional[str] = Header(default=None, alias='Range'),
+                                 if_range: Optional[str] = Header(default=None),
+                                 if_none_match: Optional[str] = Header(default=None),
+                                 db_session: AsyncSession = Depends(get_async_read_session)) -> Response:
+    """export the screenshots of a user session as a video
+
+    the video is encoded once per version of the session and served from disk afterwards
+
+    Parameters
+    ----------
+    session_id : str
+        session id of user which is uuid
+    video_format : VideoFormat
+        mp4 or mjpeg
+    fps : int
+        frames per second
+    width : int
+        width of the video
+    range_header : Optional[str]
+        Range header
+    if_range : Optional[str]
+        If-Range header
+    if_none_match : Optional[str]
+        If-None-Match header
+    db_session : AsyncSession
+        async session
+
+    Returns
+    -------
+    Response
+        video
+    """
+
+    session_stats = await SessionStatsModel.async_fetch_by_session_id(db_session, session_id)
+    if session_stats is None:
+        raise ScreenshotNotFoundError()
+
+    # フレームが追加されるとバージョンが変わり、動画を作り直す
+    version = f'{session_stats.frame_count}-{session_stats.last_frame_id}'
+    video_path = video_exporter.video_path(session_stats.user_session_id, version, video_format, fps, width)
+
+    if not await asyncio.to_thread(os.path.exists, video_path):
+        image_paths = await ScreenshotSensorModel.async_fetch_image_paths_by_user_session_id(
+            db_session, session_stats.user_session_id)
+
+        # エンコード中はデータベースの接続を返却する
+        await db_session.close()
+
+        try:
+            await video_exporter.export(video_path, image_paths, video_format, fps, width)
+        except FileNotFoundError as exc:
+            raise ScreenshotNotFoundError() from exc
+
+    _, _, media_type = VIDEO_CODECS[video_format]
+    try:
+        return await serve_file(video_path,
+                                cache_control=VIDEO_CACHE_CONTROL,
+                                range_header=range_header,
+                                if_range=if_range,
+                                if_none_match=if_none_match,
+                                media_type=media_type)
+    except FileNotFoundError as exc:
+        raise ScreenshotNotFoundError() from exc
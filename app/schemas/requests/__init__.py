@@ -1,2 +1,2 @@
-from app.schemas.requests.record import RecordSaveIn
+from app.schemas.requests.record import RecordSaveIn, RecordUploadIn
 from app.schemas.requests.user import User
@@ -9,9 +9,10 @@ from app.schemas.requests.sensors import (
 from app.schemas.requests.user import User
 
 
-class RecordSaveIn(BaseModel):
+class RecordUploadIn(BaseModel):
     """
-    Record schema for request body validation.
+    Record schema without the screenshot.
+    Used as the metadata part of a multipart upload where the screenshot travels as raw bytes.
 
     Parameters
     ----------
@@ -25,10 +26,8 @@ class RecordSaveIn(BaseModel):
         Drive sensor schema list.
     ip_port_sensor : list[RequestIpPortSensor]
         Ip port sensor schema list.
-    process_sensor : list[RequestProcessSensorsSensorsSensorsSensorsSensorsSensor]
+    process_sensor : list[RequestProcessSensor]
         Process sensor schema list.
-    screenshot_sensor : RequestScreenshotSensor
-        Screenshot sensor schema.
     """
 
     user: User = Field(title='user', description='user')
@@ -40,8 +39,6 @@ class RecordSaveIn(BaseModel):
                                                        description='ip_port_sensor')
     process_sensors: list[RequestProcessSensor] = Field(title='process_sensor',
                                                         description='process_sensor')
-    screenshot_sensor: RequestScreenshotSensor = Field(title='screenshot_sensor',
-                                                       description='screenshot_sensor')
 
     class Config:
         schema_extra = {
@@ -51,7 +48,40 @@ class RecordSaveIn(BaseModel):
                 'session_id': '8e140dd8-f921-4988-a91a-53cec6b3ad28',
                 'drive_sensors': [RequestDriveSensor.Config.schema_extra['example']],
                 'ip_port_sensors': [RequestIpPortSensor.Config.schema_extra['example']],
-                'process_sensors': [RequestProcessSensor.Config.schema_extra['example']],
+                'process_sensors': [RequestProcessSensor.Config.schema_extra['example']]
+            }
+        }
+
+
+class RecordSaveIn(RecordUploadIn):
+    """
+    Record schema for request body validation.
+
+    Parameters
+    ----------
+    user : User
+        User schema.
+    created_at : str
+        Created at of the record.
+    session_id : str
+        session id of the record
+    drive_sensor : list[RequestDriveSensor]
+        Drive sensor schema list.
+    ip_port_sensor : list[RequestIpPortSensor]
+        Ip port sensor schema list.
+    process_sensor : list[RequestProcessSensorsSensorsSensorsSensorsSensorsSensor]
+        Process sensor schema list.
+    screenshot_sensor : RequestScreenshotSensor
+        Screenshot sensor schema.
+    """
+
+    screenshot_sensor: RequestScreenshotSensor = Field(title='screenshot_sensor',
+                                                       description='screenshot_sensor')
+
+    class Config:
+        schema_extra = {
+            'example': {
+                **RecordUploadIn.Config.schema_extra['example'],
                 'screenshot_sensor': RequestScreenshotSensor.Config.schema_extra['example']
             }
         }
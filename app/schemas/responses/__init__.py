@@ -1,4 +1,5 @@
 # isort: skip_file
-from app.schemas.responses.record import RecordSaveOut
+from app.schemas.responses.record import RecordBatchSaveOut, RecordSaveOut, RecordSaveResult
 from app.schemas.responses.user_session import GetUserSessionOut, UserSession
-from app.schemas.responses.frame import GetFrameOut
+from app.schemas.responses.frame import GetFrameOut, GetFrameRangeOut
+from app.schemas.responses.metrics import GetMetricsOut, PoolStats
@@ -30,3 +30,16 @@ class GetFrameOut(BaseModel):
                 'screenshot_sensor': ResponseScreenshotSensor.Config.schema_extra['example']
             }
         }
+
+
+class GetFrameRangeOut(GetFrameOut):
+
+    frame_no: int = Field(title='frame_no', ge=1)
+
+    class Config:
+        schema_extra = {
+            'example': {
+                'frame_no': 1,
+                **GetFrameOut.Config.schema_extra['example']
+            }
+        }
@@ -0,0 +1,77 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class PoolStats(BaseModel):
+    """PoolStats
+
+    Attributes
+    ----------
+    size : int
+        connections kept open
+    max_overflow : int
+        connections opened beyond size under load
+    checked_out : int
+        connections in use
+    checked_in : int
+        idle connections
+    overflow : int
+        connections opened beyond size now
+    checkouts : int
+        connections checked out since start
+    timeouts : int
+        checkouts which gave up after the pool timeout
+    wait_seconds_total : float
+        total time spent waiting for checkouts
+    wait_seconds_max : float
+        longest wait for a checkout
+    """
+
+    size: int = Field(title='size')
+    max_overflow: int = Field(title='max_overflow')
+    checked_out: int = Field(title='checked_out')
+    checked_in: int = Field(title='checked_in')
+    overflow: int = Field(title='overflow')
+    checkouts: int = Field(title='checkouts')
+    timeouts: int = Field(title='timeouts')
+    wait_seconds_total: float = Field(title='wait_seconds_total')
+    wait_seconds_max: float = Field(title='wait_seconds_max')
+
+    class Config:
+        schema_extra = {
+            'example': {
+                'size': 5,
+                'max_overflow': 10,
+                'checked_out': 2,
+                'checked_in': 3,
+                'overflow': 0,
+                'checkouts': 1024,
+                'timeouts': 0,
+                'wait_seconds_total': 0.512,
+                'wait_seconds_max': 0.031
+            }
+        }
+
+
+class GetMetricsOut(BaseModel):
+
+    pools: dict[str, PoolStats] = Field(title='pools', description='connection pools of this worker by engine')
+    identity_caches: dict[str, dict[str, int]] = Field(title='identity_caches')
+    response_caches: dict[str, dict[str, int]] = Field(title='response_caches')
+    frame_prefetch: dict[str, int] = Field(title='frame_prefetch')
+    read_replica: Optional[dict[str, Optional[float]]] = Field(default=None,
+                                                               title='read_replica',
+                                                               description='lag of the read engine, null without one')
+
+    class Config:
+        schema_extra = {
+            'example': {
+                'pools': {'sync': PoolStats.Config.schema_extra['example'],
+                          'async': PoolStats.Config.schema_extra['example']},
+                'identity_caches': {'users': {'size': 1, 'hits': 10, 'misses': 1}},
+                'response_caches': {'frames': {'entries': 1, 'bytes': 2048, 'hits': 10, 'misses': 1}},
+                'frame_prefetch': {'sessions': 1, 'pending': 0, 'scheduled': 4, 'dropped': 0, 'cancelled': 1},
+                'read_replica': {'lag_seconds': 0.2, 'max_lag_seconds': 5, 'checks': 60, 'reads': 1000, 'fallbacks': 2}
+            }
+        }
@@ -11,3 +11,46 @@ class RecordSaveOut(BaseModel):
                 'message': 'success'
             }
         }
+
+
+class RecordSaveResult(BaseModel):
+    """Save result of one record of a batch.
+
+    Attributes
+    ----------
+    index : int
+        position of the record in the request body
+    session_id : str
+        session id of the record
+    created_at : str
+        created at of the record
+    status : str
+        success or failed
+    """
+
+    index: int = Field(title='index', ge=0)
+    session_id: str = Field(title='session id', min_length=36, max_length=36)
+    created_at: str = Field(title='created_at', min_length=19, max_length=19)
+    status: str = Field(title='status', min_length=1, max_length=255)
+
+    class Config:
+        schema_extra = {
+            'example': {
+                'index': 0,
+                'session_id': '8e140dd8-f921-4988-a91a-53cec6b3ad28',
+                'created_at': '2021-01-01 00:00:00',
+                'status': 'success'
+            }
+        }
+
+
+class RecordBatchSaveOut(BaseModel):
+
+    results: list[RecordSaveResult] = Field(title='results')
+
+    class Config:
+        schema_extra = {
+            'example': {
+                'results': [RecordSaveResult.Config.schema_extra['example']]
+            }
+        }
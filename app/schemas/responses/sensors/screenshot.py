@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
 
@@ -7,15 +9,18 @@ class ResponseScreenshotSensor(BaseModel):  # pylint: disable=duplicate-code
 
     Parameters
     ----------
-    image : str
-        Base64 encoded image.
+    url : str
+        URL of the screenshot image.
+    image : Optional[str]
+        Base64 encoded image, only when it is requested.
     """
 
-    image: str = Field(title='image', min_length=1, description='base64 encoded image')
+    url: str = Field(title='url', min_length=1, description='url of the screenshot image')
+    image: Optional[str] = Field(default=None, title='image', description='base64 encoded image, only when requested')
 
     class Config:
         schema_extra = {
             'example': {
-                'image': 'base64 encoded image'
+                'url': '/frames/8c5b0f2e-5a4c-4a8e-9f3b-1c2d3e4f5a6b/1/screenshot'
             }
         }
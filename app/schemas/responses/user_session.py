@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 
 
@@ -43,10 +45,14 @@ class UserSession(BaseModel):
 class GetUserSessionOut(BaseModel):
 
     user_sessions: list[UserSession] = Field(title='data')
+    next_cursor: Optional[str] = Field(default=None,
+                                       title='next_cursor',
+                                       description='cursor of the next page, null on the last page')
 
     class Config:
         schema_extra = {
             'example': {
-                'user_sessions': [UserSession.Config.schema_extra['example']]
+                'user_sessions': [UserSession.Config.schema_extra['example']],
+                'next_cursor': 'WyJ0ZXN0IiwgIjIwMjEtMDEtMDFUMDA6MDA6MDAiLCAxXQ=='
             }
         }
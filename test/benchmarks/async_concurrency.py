@@ -0,0 +1,123 @@
+"""benchmark of 100 parallel clients reading a frame like GET /frames/{session_id}/{frame_no}
+
+run from the repository root with the database environment variables set
+
+    python -m test.benchmarks.async_concurrency
+
+every client is a coroutine on one event loop, as requests are on one uvicorn worker.
+the blocking variant calls the sync model methods, which hold the event loop during each query,
+the async variant awaits their async counterparts on an AsyncSession per client.
+a second round adds server side latency with pg_sleep to model a slow frame fetch.
+"""
+import asyncio
+import os
+import statistics
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import func, select
+from sqlalchemy.sql.ddl import CreateSchema
+
+from app.models import (
+    AsyncDBEngine,
+    BaseModel,
+    DriveSensorModel,
+    Engine,
+    FrameModel,
+    IpPortSensorModel,
+    ProcessSensorModel,
+    session,
+)
+from app.models.factories import (
+    DriveSensorFactory,
+    FrameFactory,
+    IpPortSensorFactory,
+    ProcessSensorFactory,
+    UserSessionFactory,
+)
+from app.models.setting import async_session_factory
+
+CLIENTS = 100
+FRAMES = 20
+SLOW_QUERY_SECONDS = 0.01
+
+
+def seed() -> str:
+    user_session = UserSessionFactory()
+    for _ in range(FRAMES):
+        frame = FrameFactory(user_session=user_session)
+        session.add_all([*DriveSensorFactory.build_batch(3, frame=frame),
+                         *IpPortSensorFactory.build_batch(30, frame=frame),
+                         *ProcessSensorFactory.build_batch(50, frame=frame)])
+    session.commit()
+    session_id = str(user_session.session_id)
+    session.close()
+    return session_id
+
+
+async def blocking_client(session_id: str, frame_no: int, slow_query: float) -> None:
+    """the route before the async layer: sync session inside an async def"""
+    try:
+        if slow_query:
+            session.execute(select(func.pg_sleep(slow_query)))  # pylint: disable=not-callable
+        frame = FrameModel.fetch_frame_by_session_id_frame_no(session_id, frame_no)
+        DriveSensorModel.fetch_by_frame_id(frame.id)
+        IpPortSensorModel.fetch_by_frame_id(frame.id)
+        ProcessSensorModel.fetch_by_frame_id(frame.id)
+    finally:
+        session.close()
+
+
+async def async_client(session_id: str, frame_no: int, slow_query: float) -> None:
+    """the route with the async layer: one AsyncSession per request"""
+    async with async_session_factory() as db_session:
+        if slow_query:
+            await db_session.execute(select(func.pg_sleep(slow_query)))  # pylint: disable=not-callable
+        frame = await FrameModel.async_fetch_frame_by_session_id_frame_no(db_session, session_id, frame_no)
+        await DriveSensorModel.async_fetch_by_frame_id(db_session, frame.id)
+        await IpPortSensorModel.async_fetch_by_frame_id(db_session, frame.id)
+        await ProcessSensorModel.async_fetch_by_frame_id(db_session, frame.id)
+
+
+async def run(client: Callable[[str, int, float], Awaitable[None]],
+              session_id: str,
+              slow_query: float) -> tuple[float, list[float]]:
+
+    async def timed(frame_no: int, arrived: float) -> float:
+        await client(session_id, frame_no, slow_query)
+        return time.perf_counter() - arrived
+
+    # warm up the connection pools
+    arrived = time.perf_counter()
+    await asyncio.gather(*(timed(index % FRAMES + 1, arrived) for index in range(CLIENTS)))
+
+    # every client arrives at once, latency is measured from the arrival
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(timed(index % FRAMES + 1, start) for index in range(CLIENTS)))
+    return time.perf_counter() - start, sorted(latencies)
+
+
+async def main() -> None:
+    with Engine.connect() as conn:
+        conn.execute(CreateSchema(os.environ['DB_SCHEMA'], if_not_exists=True))
+        conn.commit()
+    BaseModel.metadata.create_all(Engine)
+
+    session_id = seed()
+
+    print(f'{CLIENTS} parallel clients, {FRAMES} frames')
+    for slow_query in (0, SLOW_QUERY_SECONDS):
+        print(f'server side latency {slow_query * 1000:.0f} ms')
+        for client in (blocking_client, async_client):
+            elapsed, latencies = await run(client, session_id, slow_query)
+            print(f'  {client.__name__:<16} total {elapsed * 1000:8.1f} ms'
+                  f'  {CLIENTS / elapsed:7.1f} req/s'
+                  f'  median {statistics.median(latencies) * 1000:8.1f} ms'
+                  f'  p95 {latencies[int(CLIENTS * 0.95) - 1] * 1000:8.1f} ms')
+
+    await AsyncDBEngine.dispose()
+    BaseModel.metadata.drop_all(Engine)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
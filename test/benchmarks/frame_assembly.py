@@ -0,0 +1,140 @@
+"""benchmark of GET /frames/{session_id}/{frame_no} assembly on a frame with 300 processes and 300 sockets
+
+run from the repository root with the database environment variables set
+
+    python -m test.benchmarks.frame_assembly
+
+the sequential variant is the route before the single query path:
+the frame lookup and one fetch_by_frame_id per sensor, then pydantic objects built field by field.
+the single query variant fetches the frame and every sensor list as jsonb in one statement.
+both run on the async engine, the screenshot is read by neither as it is served by its own endpoint.
+"""
+import asyncio
+import os
+import statistics
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy.sql.ddl import CreateSchema
+
+from app.models import (
+    AsyncDBEngine,
+    BaseModel,
+    DriveSensorModel,
+    Engine,
+    FrameModel,
+    IpPortSensorModel,
+    ProcessSensorModel,
+    ScreenshotSensorModel,
+    async_fetch_frame_detail,
+    session,
+)
+from app.models.factories import (
+    DriveSensorFactory,
+    FrameFactory,
+    IpPortSensorFactory,
+    ProcessSensorFactory,
+    UserSessionFactory,
+)
+from app.models.setting import async_session_factory
+from app.schemas.responses import GetFrameOut
+from app.schemas.responses.sensors import (
+    ResponseDriveSensor,
+    ResponseIpPortSensor,
+    ResponseProcessSensor,
+    ResponseScreenshotSensor,
+)
+
+ITERATIONS = 200
+PROCESS_SENSOR_COUNT = 300
+IP_PORT_SENSOR_COUNT = 300
+DRIVE_SENSOR_COUNT = 3
+
+
+def seed() -> str:
+    user_session = UserSessionFactory()
+    frame = FrameFactory(user_session=user_session)
+    session.add_all([*DriveSensorFactory.build_batch(DRIVE_SENSOR_COUNT, frame=frame),
+                     *IpPortSensorFactory.build_batch(IP_PORT_SENSOR_COUNT, frame=frame),
+                     *ProcessSensorFactory.build_batch(PROCESS_SENSOR_COUNT, frame=frame),
+                     ScreenshotSensorModel(frame=frame, image_path='test/images/sample.png')])
+    session.commit()
+    session_id = str(user_session.session_id)
+    session.close()
+    return session_id
+
+
+async def sequential(session_id: str) -> GetFrameOut:
+    async with async_session_factory() as db_session:
+        frame = await FrameModel.async_fetch_frame_by_session_id_frame_no(db_session, session_id, 1)
+        drive_sensor_models = await DriveSensorModel.async_fetch_by_frame_id(db_session, frame.id)
+        ip_port_sensor_models = await IpPortSensorModel.async_fetch_by_frame_id(db_session, frame.id)
+        process_sensor_models = await ProcessSensorModel.async_fetch_by_frame_id(db_session, frame.id)
+        await db_session.run_sync(
+            lambda sync_session: ScreenshotSensorModel.fetch_image_path_by_frame_id(frame.id, db_session=sync_session))
+
+    return GetFrameOut(
+        record_time=frame.frame_create_time,
+        drive_sensors=[ResponseDriveSensor(drive_letter=model.drive_letter,
+                                           drive_type=model.drive_type,
+                                           volume_name=model.volume_name,
+                                           file_system=model.file_system,
+                                           all_space=model.all_space,
+                                           free_space=model.free_space) for model in drive_sensor_models],
+        ip_port_sensors=[ResponseIpPortSensor(state=model.state,
+                                              ip=model.ip,
+                                              port=model.port,
+                                              process_id=model.process_id,
+                                              remote_ip=model.remote_ip,
+                                              remote_port=model.remote_port) for model in ip_port_sensor_models],
+        process_sensors=[ResponseProcessSensor(file_path=model.file_path,
+                                               process_name=model.process_name,
+                                               process_id=model.process_id,
+                                               started_at=model.started_at) for model in process_sensor_models],
+        screenshot_sensor=ResponseScreenshotSensor(url='-'))
+
+
+async def single_query(session_id: str) -> GetFrameOut:
+    async with async_session_factory() as db_session:
+        frame = await async_fetch_frame_detail(db_session, session_id, 1)
+
+    return GetFrameOut(record_time=frame.frame_create_time,
+                       drive_sensors=frame.drive_sensors,
+                       ip_port_sensors=frame.ip_port_sensors,
+                       process_sensors=frame.process_sensors,
+                       screenshot_sensor=ResponseScreenshotSensor(url='-'))
+
+
+async def run(assemble: Callable[[str], Awaitable[GetFrameOut]], session_id: str) -> list[float]:
+    # warm up the connection pool and the statement caches
+    for _ in range(10):
+        await assemble(session_id)
+
+    elapsed = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        await assemble(session_id)
+        elapsed.append(time.perf_counter() - start)
+    return sorted(elapsed)
+
+
+async def main() -> None:
+    with Engine.connect() as conn:
+        conn.execute(CreateSchema(os.environ['DB_SCHEMA'], if_not_exists=True))
+        conn.commit()
+    BaseModel.metadata.create_all(Engine)
+
+    session_id = seed()
+
+    print(f'{PROCESS_SENSOR_COUNT} process sensors + {IP_PORT_SENSOR_COUNT} ip port sensors, {ITERATIONS} iterations')
+    for assemble in (sequential, single_query):
+        elapsed = await run(assemble, session_id)
+        print(f'{assemble.__name__:<14} p50 {statistics.median(elapsed) * 1000:8.2f} ms'
+              f'  p99 {elapsed[int(ITERATIONS * 0.99) - 1] * 1000:8.2f} ms')
+
+    await AsyncDBEngine.dispose()
+    BaseModel.metadata.drop_all(Engine)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+"""benchmark of the sensor write paths on a 500 row frame
+
+run from the repository root with the database environment variables set
+
+    python -m test.benchmarks.sensor_bulk_insert
+
+tables are created in the test schema and every iteration is rolled back.
+the sync paths run on psycopg2 as the cli does, the async paths on asyncpg
+through AsyncSession.run_sync as the ingest of the routers does.
+"""
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.ddl import CreateSchema
+
+from app.models import (
+    AsyncDBEngine,
+    BaseModel,
+    Engine,
+    FrameModel,
+    IpPortSensorModel,
+    ProcessSensorModel,
+    session,
+    to_datetime,
+)
+from app.models.bulk import copy_records, copy_rows
+from app.models.setting import async_session_factory
+from app.models.factories import UserSessionFactory
+from app.schemas.requests.factories import IpPortSensorFactory, ProcessSensorFactory
+
+ITERATIONS = 20
+PROCESS_SENSOR_COUNT = 200
+IP_PORT_SENSOR_COUNT = 300
+
+
+def orm_add_all(request_process_sensors, request_ip_port_sensors, frame: FrameModel) -> None:
+    """the write path before the bulk loader: one ORM object per row"""
+    session.add_all([ProcessSensorModel(file_path=sensor.file_path,
+                                        process_name=sensor.process_name,
+                                        process_id=sensor.process_id,
+                                        started_at=sensor.started_at,
+                                        frame_id=frame.id,
+                                        frame_create_time=frame.frame_create_time)
+                     for sensor in request_process_sensors])
+    session.add_all([IpPortSensorModel(state=sensor.state.name,
+                                       ip=sensor.ip,
+                                       port=sensor.port,
+                                       process_id=sensor.process_id,
+                                       remote_ip=sensor.remote_ip,
+                                       remote_port=sensor.remote_port,
+                                       frame_id=frame.id,
+                                       frame_create_time=frame.frame_create_time)
+                     for sensor in request_ip_port_sensors])
+    session.flush()
+
+
+def _rows(request_process_sensors, request_ip_port_sensors, frame: FrameModel) -> tuple[list[dict], list[dict]]:
+    process_rows = [{'file_path': sensor.file_path,
+                     'process_name': sensor.process_name,
+                     'process_id': sensor.process_id,
+                     'started_at': to_datetime(sensor.started_at),
+                     'frame_id': frame.id,
+                     'frame_create_time': frame.frame_create_time}
+                    for sensor in request_process_sensors]
+    ip_port_rows = [{'state': sensor.state.name,
+                     'ip': sensor.ip,
+                     'port': sensor.port,
+                     'process_id': sensor.process_id,
+                     'remote_ip': sensor.remote_ip,
+                     'remote_port': sensor.remote_port,
+                     'frame_id': frame.id,
+                     'frame_create_time': frame.frame_create_time}
+                    for sensor in request_ip_port_sensors]
+    return process_rows, ip_port_rows
+
+
+def core_multi_row_insert(request_process_sensors, request_ip_port_sensors, frame: FrameModel,
+                          db_session: Session = session) -> None:
+    """multi-row INSERT without ORM objects"""
+    process_rows, ip_port_rows = _rows(request_process_sensors, request_ip_port_sensors, frame)
+    db_session.execute(insert(ProcessSensorModel.__table__), process_rows)
+    db_session.execute(insert(IpPortSensorModel.__table__), ip_port_rows)
+
+
+def copy_from_stdin(request_process_sensors, request_ip_port_sensors, frame: FrameModel) -> None:
+    """COPY ... FROM STDIN on psycopg2"""
+    process_rows, ip_port_rows = _rows(request_process_sensors, request_ip_port_sensors, frame)
+    copy_rows(ProcessSensorModel.__table__, process_rows)
+    copy_rows(IpPortSensorModel.__table__, ip_port_rows)
+
+
+def asyncpg_copy_records(request_process_sensors, request_ip_port_sensors, frame: FrameModel,
+                         db_session: Session) -> None:
+    """binary COPY on asyncpg"""
+    process_rows, ip_port_rows = _rows(request_process_sensors, request_ip_port_sensors, frame)
+    copy_records(ProcessSensorModel.__table__, process_rows, db_session)
+    copy_records(IpPortSensorModel.__table__, ip_port_rows, db_session)
+
+
+def run(write: Callable) -> list[float]:
+    request_process_sensors = ProcessSensorFactory.build_batch(PROCESS_SENSOR_COUNT)
+    request_ip_port_sensors = IpPortSensorFactory.build_batch(IP_PORT_SENSOR_COUNT)
+
+    elapsed = []
+    for _ in range(ITERATIONS):
+        user_session = UserSessionFactory()
+        frame = FrameModel(frame_create_time=datetime.now(), frame_seq=1, user_session=user_session)
+        session.add(frame)
+        session.flush()
+
+        start = time.perf_counter()
+        write(request_process_sensors, request_ip_port_sensors, frame)
+        session.flush()
+        elapsed.append(time.perf_counter() - start)
+
+        session.rollback()
+    session.close()
+    return elapsed
+
+
+def _add_frame(db_session: Session) -> FrameModel:
+    frame = FrameModel(frame_create_time=datetime.now(), frame_seq=1, user_session=UserSessionFactory.build())
+    db_session.add(frame)
+    db_session.flush()
+    return frame
+
+
+async def run_async(write: Callable) -> list[float]:
+    request_process_sensors = ProcessSensorFactory.build_batch(PROCESS_SENSOR_COUNT)
+    request_ip_port_sensors = IpPortSensorFactory.build_batch(IP_PORT_SENSOR_COUNT)
+
+    elapsed = []
+    async with async_session_factory() as db_session:
+        for _ in range(ITERATIONS):
+            frame = await db_session.run_sync(_add_frame)
+
+            start = time.perf_counter()
+            await db_session.run_sync(lambda sync_session: write(request_process_sensors, request_ip_port_sensors,
+                                                                 frame, sync_session))
+            elapsed.append(time.perf_counter() - start)
+
+            await db_session.rollback()
+    await AsyncDBEngine.dispose()
+    return elapsed
+
+
+def _print(name: str, elapsed: list[float]) -> None:
+    print(f'{name:<24} median {statistics.median(elapsed) * 1000:8.2f} ms  min {min(elapsed) * 1000:8.2f} ms')
+
+
+def main() -> None:
+    with Engine.connect() as conn:
+        conn.execute(CreateSchema(os.environ['DB_SCHEMA'], if_not_exists=True))
+        conn.commit()
+    BaseModel.metadata.create_all(Engine)
+
+    print(f'{PROCESS_SENSOR_COUNT} process sensors + {IP_PORT_SENSOR_COUNT} ip port sensors, {ITERATIONS} iterations')
+    print('psycopg2')
+    for write in (orm_add_all, core_multi_row_insert, copy_from_stdin):
+        _print(write.__name__, run(write))
+    print('asyncpg')
+    for write in (core_multi_row_insert, asyncpg_copy_records):
+        _print(write.__name__, asyncio.run(run_async(write)))
+
+    BaseModel.metadata.drop_all(Engine)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.cache import FramePrefetcher
+
+
+class TestFramePrefetcher():
+
+    @pytest.mark.anyio
+    async def test_window_follows_direction(self):
+        """
+        test the window doubles while stepping in one direction and is reset when it turns or jumps
+        """
+
+        loaded = []
+
+        async def load(session_id, frame_nos):
+            loaded.append(frame_nos)
+
+        prefetcher = FramePrefetcher(load, min_window=2, max_window=4, max_pending=2)
+
+        for frame_no in (1, 2, 3, 2, 1, 10):
+            prefetcher.observe('session', frame_no, cached=lambda frame_no: False)
+            await prefetcher.wait()
+        # the same frame again does not move the window
+        assert prefetcher.observe('session', 10, cached=lambda frame_no: False) is None
+
+        assert loaded == [[2, 3], [3, 4, 5, 6], [4, 5, 6, 7], [1], [11, 12]]
+        assert prefetcher.stats()['sessions'] == 1
+
+    @pytest.mark.anyio
+    async def test_skip_cached(self):
+        """
+        test frames already cached are not prefetched
+        """
+
+        loaded = []
+
+        async def load(session_id, frame_nos):
+            loaded.append(frame_nos)
+
+        prefetcher = FramePrefetcher(load, min_window=3, max_window=3)
+
+        prefetcher.observe('session', 1, cached=lambda frame_no: frame_no == 3)
+        await prefetcher.wait()
+        assert prefetcher.observe('session', 2, cached=lambda frame_no: True) is None
+
+        assert loaded == [[2, 4]]
+
+    @pytest.mark.anyio
+    async def test_bounded(self):
+        """
+        test prefetches beyond max_pending are dropped and a turn cancels the running one
+        """
+
+        release = asyncio.Event()
+
+        async def load(session_id, frame_nos):
+            await release.wait()
+
+        prefetcher = FramePrefetcher(load, min_window=2, max_window=8, max_pending=2)
+
+        first = prefetcher.observe('session_1', 5, cached=lambda frame_no: False)
+        prefetcher.observe('session_2', 1, cached=lambda frame_no: False)
+        assert prefetcher.observe('session_3', 1, cached=lambda frame_no: False) is None
+
+        # the previous prefetch is still ahead of a step forward
+        assert prefetcher.observe('session_1', 6, cached=lambda frame_no: False) is None
+        assert prefetcher.observe('session_1', 5, cached=lambda frame_no: False) is not None
+        await asyncio.sleep(0)
+
+        assert first.cancelled()
+        assert prefetcher.stats() == {'sessions': 3, 'pending': 2, 'scheduled': 3, 'dropped': 1, 'cancelled': 1}
+
+        await prefetcher.stop()
+
+        assert prefetcher.stats()['pending'] == 0
@@ -0,0 +1,51 @@
+from app.cache import ResponseCache, etag_matches
+
+
+class TestResponseCache():
+
+    def test_put_and_get(self):
+        """
+        test put and get
+        check the entity tag is strong and stable for the same body
+        """
+
+        response_cache = ResponseCache('test', max_bytes=100)
+
+        cached_response = response_cache.put('frame', b'{"a":1}')
+
+        assert response_cache.get('frame') == cached_response
+        assert response_cache.get('other') is None
+        assert cached_response.etag == ResponseCache('other').put('frame', b'{"a":1}').etag
+        assert not cached_response.etag.startswith('W/')
+        assert response_cache.stats() == {'entries': 1, 'bytes': 7, 'hits': 1, 'misses': 1}
+
+    def test_evict_by_bytes(self):
+        """
+        test the least recently used bodies are evicted when the total size exceeds max_bytes
+        """
+
+        response_cache = ResponseCache('test', max_bytes=10)
+
+        response_cache.put(1, b'1234')
+        response_cache.put(2, b'1234')
+        response_cache.get(1)
+        response_cache.put(3, b'1234')
+        response_cache.put(4, b'12345678901')
+
+        assert response_cache.get(1) is not None
+        assert response_cache.get(2) is None
+        assert response_cache.get(3) is not None
+        assert response_cache.get(4) is None
+        assert response_cache.size_bytes == 8
+
+    def test_etag_matches(self):
+        """
+        test If-None-Match comparison
+        """
+
+        assert etag_matches('"abc"', '"abc"')
+        assert etag_matches('W/"abc"', '"abc"')
+        assert etag_matches('"x", "abc"', '"abc"')
+        assert etag_matches('*', '"abc"')
+        assert not etag_matches('"x"', '"abc"')
+        assert not etag_matches(None, '"abc"')
@@ -3,13 +3,20 @@ import os
 import pytest
 from fastapi.testclient import TestClient
 from PIL import Image
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm.scoping import scoped_session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.sql.ddl import CreateSchema, DropSchema
 from sqlalchemy_utils import database_exists
 from sqlalchemy_utils.functions.database import create_database
 
 from app.main import app
-from app.models import BaseModel, Engine, session
+from app.models import AsyncDBEngine, BaseModel, Engine, IdentityCache, session
+from app.models import setting
+from app.models.replica import ReplicaLag
+from app.models.sensors import screenshot_blob
+from app.models.sensors.rendition import rendition_executor
+from app.models.setting import async_session_factory
 
 
 def remove_session() -> None:
@@ -44,6 +51,7 @@ def setup_test_env(request):
 def drop_all_tables():
     remove_session()
     BaseModel.metadata.drop_all(Engine)
+    IdentityCache.clear_all()
 
 
 @pytest.fixture(scope='function', autouse=True)
@@ -68,9 +76,47 @@ def setup_tables_at_class(request):
     return setup_tables_at_class
 
 
+@pytest.fixture(autouse=True)
+def screenshot_blob_dir(tmp_path, monkeypatch):
+    """store screenshot blobs in the temp dir of each test and wait for their renditions"""
+    blob_dir = tmp_path / 'blobs'
+    monkeypatch.setattr(screenshot_blob, 'SCREENSHOT_BLOB_DIR', str(blob_dir))
+    yield blob_dir
+    rendition_executor.submit(lambda: None).result()
+
+
 @pytest.fixture()
 def app_client():
-    return TestClient(app)
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture()
+def anyio_backend():
+    return 'asyncio'
+
+
+@pytest.fixture()
+async def async_db_session():
+    async with async_session_factory() as db_session:
+        yield db_session
+    await AsyncDBEngine.dispose()
+
+
+@pytest.fixture()
+def read_replica_lag(app_client, monkeypatch) -> ReplicaLag:
+    """configure a read engine on the test database, a replica which never lags, and return its lag"""
+    read_engine = create_async_engine(AsyncDBEngine.url,
+                                      poolclass=setting.async_read_engine_metrics.pool_class(AsyncAdaptedQueuePool))
+    replica_lag = ReplicaLag(check_interval=0)
+    monkeypatch.setattr(setting, 'AsyncReadDBEngine', read_engine)
+    monkeypatch.setattr(setting,
+                        'async_read_session_factory',
+                        async_sessionmaker(read_engine, autoflush=False, expire_on_commit=False))
+    monkeypatch.setattr(setting, 'read_replica_lag', replica_lag)
+    yield replica_lag
+    # the connections belong to the event loop of the test client
+    app_client.portal.call(read_engine.dispose)
 
 
 @pytest.fixture()
@@ -0,0 +1,67 @@
+import asyncio
+
+import cv2
+import pytest
+
+from app.export import VideoExporter, VideoFormat, encode_video
+
+
+class TestVideoExport():
+
+    @pytest.mark.parametrize('video_format', [VideoFormat.MP4, VideoFormat.MJPEG])
+    def test_encode_video(self, tmp_path, video_format):
+        """
+        test encode video
+        check every readable screenshot is a frame of the size derived from the width
+        """
+
+        video_path = str(tmp_path / 'video')
+
+        encode_video(['test/images/sample.png', str(tmp_path / 'missing.png'), 'test/images/sample.png'],
+                     video_path, video_format, 2, 160)
+
+        capture = cv2.VideoCapture(video_path)
+        try:
+            assert int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) == 2
+            assert (capture.get(cv2.CAP_PROP_FRAME_WIDTH), capture.get(cv2.CAP_PROP_FRAME_HEIGHT)) == (160, 102)
+        finally:
+            capture.release()
+        assert [path.name for path in tmp_path.iterdir()] == ['video']
+
+    def test_encode_video_no_screenshots(self, tmp_path):
+        """
+        test encode video
+        check an error is raised when none of the screenshots can be read
+        """
+
+        with pytest.raises(FileNotFoundError):
+            encode_video([str(tmp_path / 'missing.png')], str(tmp_path / 'video.mp4'), VideoFormat.MP4, 2, 160)
+
+    @pytest.mark.anyio
+    async def test_export(self, tmp_path, monkeypatch):
+        """
+        test export
+        check concurrent requests encode once and the video of the previous version is removed
+        """
+
+        encoded = []
+
+        def count_encode(image_paths, video_path, *args):
+            encoded.append(video_path)
+            encode_video(image_paths, video_path, *args)
+
+        monkeypatch.setattr('app.export.video.encode_video', count_encode)
+
+        video_exporter = VideoExporter(str(tmp_path))
+        old_path = video_exporter.video_path(1, '1-1', VideoFormat.MP4, 2, 160)
+        other_path = video_exporter.video_path(1, '1-1', VideoFormat.MP4, 4, 160)
+        new_path = video_exporter.video_path(1, '2-2', VideoFormat.MP4, 2, 160)
+
+        await video_exporter.export(old_path, ['test/images/sample.png'], VideoFormat.MP4, 2, 160)
+        await video_exporter.export(other_path, ['test/images/sample.png'], VideoFormat.MP4, 4, 160)
+        await asyncio.gather(*(video_exporter.export(new_path, ['test/images/sample.png'] * 2, VideoFormat.MP4, 2, 160)
+                               for _ in range(3)))
+
+        assert encoded == [old_path, other_path, new_path]
+        assert sorted(path.name for path in (tmp_path / '1').iterdir()) == ['mp4_2fps_160w_2-2.mp4',
+                                                                           'mp4_4fps_160w_1-1.mp4']
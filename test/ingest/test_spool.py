@@ -0,0 +1,91 @@
+import pytest
+
+from app.errors.exceptions import SpoolFullError
+from app.ingest import RecordSpool
+
+
+def test_append_read(tmp_path):
+    """
+    test records are read back in order from a position
+    """
+
+    spool = RecordSpool(tmp_path)
+
+    first_end = spool.append(b'{"no": 1}')
+    second_end = spool.append(b'{"no": 2}')
+
+    assert spool.read(0, 10) == ([b'{"no": 1}', b'{"no": 2}'], second_end)
+    assert spool.read(0, 1) == ([b'{"no": 1}'], first_end)
+    assert spool.read(first_end, 10) == ([b'{"no": 2}'], second_end)
+    assert spool.read(second_end, 10) == ([], second_end)
+
+
+def test_segments(tmp_path):
+    """
+    test positions continue across segments and drained segments are deleted
+    """
+
+    spool = RecordSpool(tmp_path, segment_bytes=10)
+
+    positions = [spool.append(f'{{"no": {no}}}'.encode()) for no in range(3)]
+
+    assert len(list(tmp_path.glob('*.ndjson'))) == 3
+    assert spool.read(positions[0], 10) == ([b'{"no": 1}'], positions[1])
+
+    spool.discard(positions[1])
+
+    assert len(list(tmp_path.glob('*.ndjson'))) == 1
+    assert spool.read(positions[1], 10) == ([b'{"no": 2}'], positions[2])
+
+    # the active segment is kept so that the next position continues
+    spool.discard(positions[2])
+
+    assert spool.append(b'{"no": 3}') == positions[2] + len(b'{"no": 3}\n')
+
+
+def test_append_full(tmp_path):
+    """
+    test append is refused when the spool would exceed the maximum size
+    """
+
+    spool = RecordSpool(tmp_path, max_bytes=20)
+
+    spool.append(b'{"no": 1}')
+
+    with pytest.raises(SpoolFullError):
+        spool.append(b'{"no": 2}' * 2)
+
+
+def test_repair(tmp_path):
+    """
+    test a record torn by a crash is neither read nor kept
+    """
+
+    spool = RecordSpool(tmp_path)
+    position = spool.append(b'{"no": 1}')
+    with open(next(tmp_path.glob('*.ndjson')), 'ab') as segment_file:
+        segment_file.write(b'{"no": ')
+
+    assert spool.read(0, 10) == ([b'{"no": 1}'], position)
+
+    spool.repair()
+
+    assert spool.size() == position
+    assert spool.append(b'{"no": 2}') == position + len(b'{"no": 2}\n')
+
+
+def test_drain_lock(tmp_path):
+    """
+    test only one spool of the directory drains at a time
+    """
+
+    spool_1 = RecordSpool(tmp_path)
+    spool_2 = RecordSpool(tmp_path)
+
+    assert spool_1.try_acquire_drain()
+    assert not spool_2.try_acquire_drain()
+
+    spool_1.release_drain()
+
+    assert spool_2.try_acquire_drain()
+    spool_2.release_drain()
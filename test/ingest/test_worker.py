@@ -0,0 +1,163 @@
+import asyncio
+import base64
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app import cli
+from app.ingest import RecordSpool, SpoolWorker
+from app.ingest.worker import LEGACY_CHECKPOINT_NAME, checkpoint_name
+from app.models import DriveSensorModel, FrameModel, IngestCheckpointModel, ScreenshotSensorModel
+from app.schemas.requests.factories import RecordSaveInFactory, UserFactory
+
+
+@pytest.mark.anyio
+async def test_drain_once(tmp_path, db_session, async_db_session, screenshot_blob_dir):
+    """
+    test spooled records are saved and checkpointed
+    and are not saved again by the next drain
+    """
+
+    with open('test/images/sample.png', 'rb') as image_file:
+        image = base64.b64encode(image_file.read())
+
+    spool = RecordSpool(tmp_path)
+    user = UserFactory(name='test_user')
+    records = [RecordSaveInFactory(user=user, created_at=f'2012-01-01 00:00:0{no}', screenshot_sensor={'image': image})
+               for no in range(3)]
+    for record in records:
+        position = spool.append(record.json().encode())
+
+    worker = SpoolWorker(spool, batch_size=2)
+
+    assert await worker.drain_once() == 2
+    assert await worker.drain_once() == 1
+    assert await worker.drain_once() == 0
+
+    assert db_session.execute(select(func.count()).select_from(FrameModel)).scalar_one() == 3
+    assert db_session.execute(select(func.count()).select_from(DriveSensorModel)).scalar_one() == \
+        sum(len(record.drive_sensors) for record in records)
+    assert IngestCheckpointModel.fetch_position(checkpoint_name(spool)) == position
+    # identical screenshots are stored once
+    assert len(list(screenshot_blob_dir.rglob('*.png'))) == 1
+
+
+@pytest.mark.anyio
+async def test_drain_once_failure(tmp_path, db_session, async_db_session, monkeypatch):
+    """
+    test a batch failing on an error which is not of a record is not checkpointed and is saved again,
+    and a record with an invalid image is skipped
+    """
+
+    with open('test/images/sample.png', 'rb') as image_file:
+        image = base64.b64encode(image_file.read())
+
+    spool = RecordSpool(tmp_path)
+    user = UserFactory(name='test_user')
+    spool.append(RecordSaveInFactory(user=user,
+                                     created_at='2012-01-01 00:00:00',
+                                     screenshot_sensor={'image': base64.b64encode(b'not an image')}).json().encode())
+    position = spool.append(RecordSaveInFactory(user=user,
+                                                created_at='2012-01-01 00:00:01',
+                                                screenshot_sensor={'image': image}).json().encode())
+
+    worker = SpoolWorker(spool)
+    async_save_file = ScreenshotSensorModel.async_save_file
+
+    async def full_disk(*args, **kwargs):
+        raise OSError('No space left on device')
+
+    monkeypatch.setattr(ScreenshotSensorModel, 'async_save_file', full_disk)
+    with pytest.raises(OSError):
+        await worker.drain_once()
+
+    assert IngestCheckpointModel.fetch_position(checkpoint_name(spool)) == 0
+    assert db_session.execute(select(func.count()).select_from(FrameModel)).scalar_one() == 0
+    db_session.close()
+
+    monkeypatch.setattr(ScreenshotSensorModel, 'async_save_file', async_save_file)
+
+    assert await worker.drain_once() == 2
+    assert IngestCheckpointModel.fetch_position(checkpoint_name(spool)) == position
+    assert db_session.execute(select(func.count()).select_from(FrameModel)).scalar_one() == 1
+
+
+@pytest.mark.anyio
+async def test_run_replays_spool(tmp_path, async_db_session):
+    """
+    test records left in the spool before the worker starts are replayed
+    and records appended afterwards are saved after notify
+    """
+
+    with open('test/images/sample.png', 'rb') as image_file:
+        image = base64.b64encode(image_file.read())
+
+    spool = RecordSpool(tmp_path)
+    user = UserFactory(name='test_user')
+    spool.append(RecordSaveInFactory(user=user,
+                                     created_at='2012-01-01 00:00:00',
+                                     screenshot_sensor={'image': image}).json().encode())
+
+    worker = SpoolWorker(spool, interval=60)
+    worker.start()
+
+    position = spool.append(RecordSaveInFactory(user=user,
+                                                created_at='2012-01-01 00:00:01',
+                                                screenshot_sensor={'image': image}).json().encode())
+    worker.notify()
+
+    for _ in range(100):
+        if await IngestCheckpointModel.async_fetch_position(async_db_session, checkpoint_name(spool)) == position:
+            break
+        await async_db_session.rollback()
+        await asyncio.sleep(0.05)
+
+    await worker.stop()
+
+    assert await IngestCheckpointModel.async_fetch_position(async_db_session, checkpoint_name(spool)) == position
+    # the drain lock is released on stop
+    assert RecordSpool(tmp_path).try_acquire_drain()
+
+
+@pytest.mark.anyio
+async def test_checkpoint_name(tmp_path, db_session, async_db_session):
+    """
+    test the checkpoint is named by the host and the resolved directory of the spool,
+    a spool without a checkpoint starts from its first segment,
+    and the checkpoint shared before is moved to one spool by the cli
+    """
+
+    with open('test/images/sample.png', 'rb') as image_file:
+        image = base64.b64encode(image_file.read())
+
+    spool = RecordSpool(tmp_path / 'spool')
+    other_spool = RecordSpool(tmp_path / 'other_spool')
+    user = UserFactory(name='test_user')
+    for target in (spool, other_spool):
+        skipped_position, position = [
+            target.append(RecordSaveInFactory(user=user, created_at=created_at, screenshot_sensor={'image': image})
+                          .json().encode())
+            for created_at in ('2012-01-01 00:00:00', '2012-01-01 00:00:01')]
+
+    # the spool dir of the relative path is resolved
+    assert checkpoint_name(spool) == checkpoint_name(RecordSpool(tmp_path / 'other_spool' / '..' / 'spool'))
+    assert checkpoint_name(spool) != checkpoint_name(other_spool)
+
+    IngestCheckpointModel.save_position(LEGACY_CHECKPOINT_NAME, skipped_position)
+    db_session.commit()
+    db_session.close()
+
+    assert await SpoolWorker(other_spool).drain_once() == 2
+
+    cli.main(['migrate-checkpoint', '--spool-dir', str(tmp_path / 'spool')])
+
+    assert await SpoolWorker(spool).drain_once() == 1
+
+    assert IngestCheckpointModel.fetch_position(LEGACY_CHECKPOINT_NAME) == 0
+    assert IngestCheckpointModel.fetch_position(checkpoint_name(spool)) == position
+    assert IngestCheckpointModel.fetch_position(checkpoint_name(other_spool)) == position
+    # the other spool is drained from its first record, the spool after the record it drained before
+    assert db_session.execute(select(FrameModel.frame_create_time)
+                              .order_by(FrameModel.frame_create_time)).scalars().all() == \
+        [datetime(2012, 1, 1, 0, 0, 0), datetime(2012, 1, 1, 0, 0, 1), datetime(2012, 1, 1, 0, 0, 1)]
@@ -1,3 +1,4 @@
+import pytest
 from sqlalchemy import select
 
 from app.models import DriveSensorModel
@@ -32,7 +33,7 @@ class TestDriveSensor():
             free_space=excepted_free_space
         )
 
-        DriveSensorModel.save([request_drive_sensor], frame.id)
+        DriveSensorModel.save([request_drive_sensor], frame.id, frame.frame_create_time)
 
         db_session.commit()
 
@@ -73,7 +74,7 @@ class TestDriveSensor():
                 )
             )
 
-        DriveSensorModel.save(request_drive_sensors, frame.id)
+        DriveSensorModel.save(request_drive_sensors, frame.id, frame.frame_create_time)
 
         db_session.commit()
 
@@ -100,3 +101,61 @@ class TestDriveSensor():
         saved_drive_sensors = DriveSensorModel.fetch_by_frame_id(frame_id)
 
         assert len(saved_drive_sensors) == 3
+
+    def test_bulk_save(self, db_session):
+        """
+        Test bulk save of several frames
+        """
+
+        frame_1 = FrameFactory()
+        frame_2 = FrameFactory()
+        db_session.add_all([frame_1, frame_2])
+        db_session.flush()
+
+        request_drive_sensors = [
+            RequestDriveSensor(
+                drive_letter=drive_sensor.drive_letter,
+                drive_type=DriveType[drive_sensor.drive_type],
+                volume_name=drive_sensor.volume_name,
+                file_system=drive_sensor.file_system,
+                all_space=drive_sensor.all_space,
+                free_space=drive_sensor.free_space
+            )
+            for drive_sensor in DriveSensorFactory.build_batch(5)]
+
+        DriveSensorModel.bulk_save([(request_drive_sensors[:2], frame_1.id, frame_1.frame_create_time),
+                                    (request_drive_sensors[2:], frame_2.id, frame_2.frame_create_time)])
+
+        db_session.commit()
+
+        assert len(DriveSensorModel.fetch_by_frame_id(frame_1.id)) == 2
+        assert len(DriveSensorModel.fetch_by_frame_id(frame_2.id)) == 3
+
+    @pytest.mark.anyio
+    async def test_async_save_and_fetch_by_frame_id(self, db_session, async_db_session):
+        """
+        Test awaitable save and fetch by frame id
+        """
+
+        frame = FrameFactory()
+        db_session.add(frame)
+        db_session.commit()
+        frame_id, frame_create_time = frame.id, frame.frame_create_time
+        db_session.close()
+
+        request_drive_sensors = [
+            RequestDriveSensor(
+                drive_letter=drive_sensor.drive_letter,
+                drive_type=DriveType[drive_sensor.drive_type],
+                volume_name=drive_sensor.volume_name,
+                file_system=drive_sensor.file_system,
+                all_space=drive_sensor.all_space,
+                free_space=drive_sensor.free_space
+            )
+            for drive_sensor in DriveSensorFactory.build_batch(3)]
+
+        await DriveSensorModel.async_save(async_db_session, request_drive_sensors, frame_id, frame_create_time)
+        await async_db_session.commit()
+
+        assert len(await DriveSensorModel.async_fetch_by_frame_id(async_db_session, frame_id)) == 3
+        assert len(await DriveSensorModel.async_fetch_by_frame_id(async_db_session, frame_id, frame_create_time)) == 3
@@ -0,0 +1,56 @@
+import io
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from app.errors.exceptions import InvalidImageError
+from app.models.sensors import image
+from app.models.sensors.image import ImageHeader, read_image_header
+
+
+def test_read_image_header_png():
+
+    sample_image = cv2.imread('test/images/sample.png')
+
+    with open('test/images/sample.png', 'rb') as image_file:
+        header = read_image_header(image_file)
+        assert image_file.tell() == 0
+
+    assert header == ImageHeader(format='png',
+                                 width=sample_image.shape[1],
+                                 height=sample_image.shape[0],
+                                 size=len(open('test/images/sample.png', 'rb').read()))
+
+
+def test_read_image_header_jpeg():
+
+    _, jpeg_data = cv2.imencode('.jpg', np.zeros((30, 40, 3), dtype=np.uint8))
+
+    header = read_image_header(io.BytesIO(jpeg_data.tobytes()))
+
+    assert header.format == 'jpg'
+    assert (header.width, header.height) == (40, 30)
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'not an image',
+    b'\x89PNG\r\n\x1a\n',
+    b'\xff\xd8\xff',
+])
+def test_read_image_header_invalid(data):
+
+    with pytest.raises(InvalidImageError):
+        read_image_header(io.BytesIO(data))
+
+
+def test_read_image_header_too_large(monkeypatch):
+
+    monkeypatch.setattr(image, 'SCREENSHOT_MAX_WIDTH', 100)
+
+    png_header = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', 101, 10)
+
+    with pytest.raises(InvalidImageError):
+        read_image_header(io.BytesIO(png_header))
@@ -0,0 +1,136 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models import (
+    DriveSensorIntervalModel,
+    DriveSensorModel,
+    ProcessSensorIntervalModel,
+    ProcessSensorModel,
+)
+from app.models.factories import DriveSensorFactory, FrameFactory, UserSessionFactory
+from app.models.sensors import interval
+from app.schemas.requests.sensors import RequestProcessSensor
+from app.schemas.requests.sensors.drive import DriveType, RequestDriveSensor
+
+
+def process(process_id: int) -> RequestProcessSensor:
+    return RequestProcessSensor(file_path=f'/usr/bin/process_{process_id}',
+                                process_name=f'process_{process_id}',
+                                process_id=process_id,
+                                started_at='2021-01-01 00:00:00')
+
+
+def fetch_process_ids(frame: tuple[int, datetime]) -> list[int]:
+    return sorted(process_sensor.process_id for process_sensor in ProcessSensorModel.fetch_by_frame_id(*frame))
+
+
+@pytest.fixture(autouse=True)
+def interval_mode(monkeypatch):
+    monkeypatch.setattr(interval, 'SENSOR_STORAGE_MODE', 'interval')
+
+
+@pytest.fixture()
+def frames(db_session):
+    user_session = UserSessionFactory()
+    frames = [FrameFactory(user_session=user_session, frame_create_time=datetime(2012, 1, 1, 0, 0, second))
+              for second in range(3)]
+    db_session.add_all(frames)
+    db_session.commit()
+    return [(frame.id, frame.frame_create_time) for frame in frames]
+
+
+class TestSensorInterval():
+
+    def test_save_consecutive_frames(self, db_session, frames):
+        """
+        Test save consecutive frames
+        check unchanged rows extend their interval and changed rows open and close intervals
+        """
+
+        ProcessSensorModel.save([process(1), process(2)], *frames[0])
+        ProcessSensorModel.save([process(1), process(2)], *frames[1])
+        ProcessSensorModel.save([process(1), process(3)], *frames[2])
+        db_session.commit()
+
+        stmt = select(ProcessSensorIntervalModel.process_id,
+                      ProcessSensorIntervalModel.first_seen_at,
+                      ProcessSensorIntervalModel.last_seen_at).order_by(ProcessSensorIntervalModel.process_id)
+
+        assert db_session.execute(stmt).all() == [
+            (1, datetime(2012, 1, 1, 0, 0, 0), datetime(2012, 1, 1, 0, 0, 2)),
+            (2, datetime(2012, 1, 1, 0, 0, 0), datetime(2012, 1, 1, 0, 0, 1)),
+            (3, datetime(2012, 1, 1, 0, 0, 2), datetime(2012, 1, 1, 0, 0, 2)),
+        ]
+        assert db_session.execute(select(func.count()).select_from(ProcessSensorModel)).scalar_one() == 0
+
+        assert fetch_process_ids(frames[0]) == [1, 2]
+        assert fetch_process_ids(frames[1]) == [1, 2]
+        assert fetch_process_ids(frames[2]) == [1, 3]
+
+    def test_save_out_of_order(self, db_session, frames):
+        """
+        Test save a frame older than the saved ones
+        check the intervals around it are split
+        """
+
+        ProcessSensorModel.bulk_save([([process(1)], *frame) for frame in frames])
+        db_session.commit()
+        assert db_session.execute(select(func.count()).select_from(ProcessSensorIntervalModel)).scalar_one() == 1
+
+        ProcessSensorModel.save([process(2)], *frames[1])
+        db_session.commit()
+
+        assert fetch_process_ids(frames[0]) == [1]
+        assert fetch_process_ids(frames[1]) == [2]
+        assert fetch_process_ids(frames[2]) == [1]
+
+    def test_save_duplicated_rows(self, db_session, frames):
+        """
+        Test save identical rows in one frame
+        """
+
+        ProcessSensorModel.save([process(1), process(1)], *frames[0])
+        ProcessSensorModel.save([process(1)], *frames[1])
+        db_session.commit()
+
+        assert fetch_process_ids(frames[0]) == [1, 1]
+        assert fetch_process_ids(frames[1]) == [1]
+
+    def test_fetch_by_frame_id_snapshot(self, db_session, frames, monkeypatch):
+        """
+        Test fetch by frame id
+        check frames saved before switching to interval storage are still read
+        """
+
+        monkeypatch.setattr(interval, 'SENSOR_STORAGE_MODE', 'snapshot')
+        ProcessSensorModel.save([process(1)], *frames[0])
+        monkeypatch.setattr(interval, 'SENSOR_STORAGE_MODE', 'interval')
+        ProcessSensorModel.save([process(2)], *frames[1])
+        db_session.commit()
+
+        assert fetch_process_ids(frames[0]) == [1]
+        assert fetch_process_ids(frames[1]) == [2]
+
+    def test_fetch_drive_sensors(self, db_session, frames):
+        """
+        Test fetch drive sensors saved as intervals
+        """
+
+        drive_sensor = DriveSensorFactory.build()
+        request_drive_sensor = RequestDriveSensor(drive_letter=drive_sensor.drive_letter,
+                                                  drive_type=DriveType[drive_sensor.drive_type],
+                                                  volume_name=drive_sensor.volume_name,
+                                                  file_system=drive_sensor.file_system,
+                                                  all_space=drive_sensor.all_space,
+                                                  free_space=drive_sensor.free_space)
+
+        DriveSensorModel.bulk_save([([request_drive_sensor], *frame) for frame in frames])
+        db_session.commit()
+
+        saved_drive_sensors = DriveSensorModel.fetch_by_frame_id(frames[1][0])
+
+        assert db_session.execute(select(func.count()).select_from(DriveSensorIntervalModel)).scalar_one() == 1
+        assert len(saved_drive_sensors) == 1
+        assert saved_drive_sensors[0].drive_letter == drive_sensor.drive_letter
@@ -32,7 +32,7 @@ class TestIpPortSensor():
             remote_port=excepted_remote_port
         )
 
-        IpPortSensorModel.save([request_ip_port_sensor], frame.id)
+        IpPortSensorModel.save([request_ip_port_sensor], frame.id, frame.frame_create_time)
 
         db_session.commit()
 
@@ -72,7 +72,7 @@ class TestIpPortSensor():
                 )
             )
 
-        IpPortSensorModel.save(request_ip_port_sensors, frame.id)
+        IpPortSensorModel.save(request_ip_port_sensors, frame.id, frame.frame_create_time)
 
         db_session.commit()
 
@@ -98,3 +98,32 @@ class TestIpPortSensor():
         ip_port_sensor = IpPortSensorModel.fetch_by_frame_id(frame_id=frame_id)
 
         assert len(ip_port_sensor) == 2
+
+    def test_bulk_save(self, db_session):
+        """
+        Test bulk save of several frames
+        """
+
+        frame_1 = FrameFactory()
+        frame_2 = FrameFactory()
+        db_session.add_all([frame_1, frame_2])
+        db_session.flush()
+
+        request_ip_port_sensors = [
+            RequestIpPortSensor(
+                state=IpPortType[ip_port_sensor.state],
+                ip=ip_port_sensor.ip,
+                port=ip_port_sensor.port,
+                process_id=ip_port_sensor.process_id,
+                remote_ip=ip_port_sensor.remote_ip,
+                remote_port=ip_port_sensor.remote_port
+            )
+            for ip_port_sensor in IpPortSensorFactory.build_batch(5)]
+
+        IpPortSensorModel.bulk_save([(request_ip_port_sensors[:2], frame_1.id, frame_1.frame_create_time),
+                                     (request_ip_port_sensors[2:], frame_2.id, frame_2.frame_create_time)])
+
+        db_session.commit()
+
+        assert len(IpPortSensorModel.fetch_by_frame_id(frame_1.id)) == 2
+        assert len(IpPortSensorModel.fetch_by_frame_id(frame_2.id)) == 3
@@ -30,7 +30,7 @@ class TestProcessSensor():
             started_at=excepted_started_at
         )
 
-        ProcessSensorModel.save([request_process_sensor], frame.id)
+        ProcessSensorModel.save([request_process_sensor], frame.id, frame.frame_create_time)
 
         db_session.commit()
 
@@ -65,7 +65,7 @@ class TestProcessSensor():
             )
             request_process_sensors.append(request_process_sensor)
 
-        ProcessSensorModel.save(request_process_sensors, frame.id)
+        ProcessSensorModel.save(request_process_sensors, frame.id, frame.frame_create_time)
 
         db_session.commit()
 
@@ -88,3 +88,30 @@ class TestProcessSensor():
         process_sensors = ProcessSensorModel.fetch_by_frame_id(frame_id)
 
         assert len(process_sensors) == 2
+
+    def test_bulk_save(self, db_session):
+        """
+        Test bulk save of several frames
+        """
+
+        frame_1 = FrameFactory()
+        frame_2 = FrameFactory()
+        db_session.add_all([frame_1, frame_2])
+        db_session.flush()
+
+        request_process_sensors = [
+            RequestProcessSensor(
+                file_path=process_sensor.file_path,
+                process_name=process_sensor.process_name,
+                process_id=process_sensor.process_id,
+                started_at=process_sensor.started_at
+            )
+            for process_sensor in ProcessSensorFactory.build_batch(5)]
+
+        ProcessSensorModel.bulk_save([(request_process_sensors[:2], frame_1.id, frame_1.frame_create_time),
+                                      (request_process_sensors[2:], frame_2.id, frame_2.frame_create_time)])
+
+        db_session.commit()
+
+        assert len(ProcessSensorModel.fetch_by_frame_id(frame_1.id)) == 2
+        assert len(ProcessSensorModel.fetch_by_frame_id(frame_2.id)) == 3
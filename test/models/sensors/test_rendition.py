@@ -0,0 +1,39 @@
+import cv2
+
+from app.models.sensors import rendition
+from app.models.sensors.rendition import rendition_path, rendition_paths, schedule_renditions, write_renditions
+
+
+class TestRendition():
+
+    def test_write_renditions(self, tmp_path):
+        """
+        Test write renditions
+        check every width is written as webp and the image is never upscaled
+        """
+
+        image_path = str(tmp_path / 'sample.png')
+        cv2.imwrite(image_path, cv2.imread('test/images/sample.png'))
+
+        write_renditions(image_path, (160, 1280))
+
+        assert cv2.imread(rendition_path(image_path, 160)).shape[:2] == (103, 160)
+        assert cv2.imread(rendition_path(image_path, 1280)).shape[:2] == (442, 688)
+        assert sorted(rendition_paths(image_path)) == sorted([rendition_path(image_path, 160),
+                                                              rendition_path(image_path, 1280)])
+        with open(rendition_path(image_path, 160), 'rb') as rendition_file:
+            assert rendition_file.read(12)[8:] == b'WEBP'
+
+    def test_schedule_renditions(self, tmp_path, monkeypatch):
+        """
+        Test schedule renditions
+        check the configured widths are written in the background
+        """
+
+        monkeypatch.setattr(rendition, 'SCREENSHOT_RENDITION_WIDTHS', (160,))
+        image_path = str(tmp_path / 'sample.png')
+        cv2.imwrite(image_path, cv2.imread('test/images/sample.png'))
+
+        schedule_renditions(image_path).result()
+
+        assert rendition_paths(image_path) == [rendition_path(image_path, 160)]
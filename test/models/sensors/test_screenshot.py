@@ -1,35 +1,57 @@
 import base64
-import os
+import hashlib
+import io
 
 import cv2
+import pytest
 from sqlalchemy import select
 
-from app.models import ScreenshotSensorModel
-from app.models.factories import FrameFactory
+from app.models import ScreenshotBlobModel, ScreenshotSensorModel
+from app.models.sensors import screenshot
+from app.models.factories import FrameFactory, UserSessionFactory
+from app.models.sensors.image import read_image_header
+from app.models.sensors.rendition import (
+    SCREENSHOT_RENDITION_WIDTHS,
+    rendition_executor,
+    rendition_path,
+    rendition_paths,
+)
 from app.schemas.requests.sensors import RequestScreenshotSensor
 
 
 class TestScreenshotSensor():
 
-    def test__save_image(self):
+    def test__write_image(self, tmp_path):
         """
-        Test save image
+        Test write image
+        check the original bytes are written
         """
 
         sample_image = cv2.imread('test/images/sample.png')
 
         _, dst_data = cv2.imencode('.png', sample_image)
 
-        dst_str = base64.b64encode(dst_data)
+        image_file = io.BytesIO(dst_data.tobytes())
+        image_path = str(tmp_path / 'blobs' / 'sample.png')
+
+        ScreenshotSensorModel._write_image(image_file, read_image_header(image_file), image_path)
+
+        with open(image_path, 'rb') as saved_file:
+            assert saved_file.read() == dst_data.tobytes()
+
+    def test__write_image_resize(self, monkeypatch, tmp_path):
+        """
+        Test write image
+        check the image is decoded and resized only when the resize width is configured
+        """
 
-        image_path = ScreenshotSensorModel._save_image(dst_str, 1, "sample_user", "2012-01-01 00:00:00")
+        monkeypatch.setattr(screenshot, 'SCREENSHOT_RESIZE_WIDTH', 16)
 
-        assert image_path == "./screenshots/sample_user/20120101/000000_1.png"
-        assert os.path.exists('./screenshots/sample_user/20120101/000000_1.png')
+        with open('test/images/sample.png', 'rb') as image_file:
+            image_path = str(tmp_path / 'sample.png')
+            ScreenshotSensorModel._write_image(image_file, read_image_header(image_file), image_path)
 
-        os.remove('./screenshots/sample_user/20120101/000000_1.png')
-        os.rmdir('./screenshots/sample_user/20120101')
-        os.rmdir('./screenshots/sample_user')
+        assert cv2.imread(image_path).shape[1] == 16
 
     def test_save(self, db_session):
         """
@@ -49,10 +71,7 @@ class TestScreenshotSensor():
 
         request_screenshot_sensor = RequestScreenshotSensor(image=dst_str)
 
-        ScreenshotSensorModel.save(request_screenshot_sensor,
-                                   frame_id,
-                                   "sample_user",
-                                   "2012-01-01 00:00:00")
+        ScreenshotSensorModel.save(request_screenshot_sensor, frame_id, frame.frame_create_time)
 
         db_session.commit()
 
@@ -60,13 +79,93 @@ class TestScreenshotSensor():
 
         saved_screenshot_sensor = db_session.execute(stmt).scalar_one()
 
+        sha256 = hashlib.sha256(dst_data.tobytes()).hexdigest()
+
         assert saved_screenshot_sensor.frame_id == frame_id
-        assert saved_screenshot_sensor.image_path == "./screenshots/sample_user/20120101/000000_1.png"
-        assert os.path.exists('./screenshots/sample_user/20120101/000000_1.png')
+        assert saved_screenshot_sensor.image_path == \
+            ScreenshotBlobModel.blob_path(saved_screenshot_sensor.blob_id, sha256, 'png')
+        with open(saved_screenshot_sensor.image_path, 'rb') as saved_file:
+            assert saved_file.read() == dst_data.tobytes()
+
+    def test_save_file(self, db_session):
+        """
+        Test save file
+        check the uploaded bytes are stored as they are
+        """
+
+        frame = FrameFactory()
+        db_session.add(frame)
+        db_session.flush()
+        frame_id = frame.id
+
+        with open('test/images/sample.png', 'rb') as image_file:
+            ScreenshotSensorModel.save_file(image_file, frame_id, frame.frame_create_time)
+
+        db_session.commit()
+
+        stmt = select(ScreenshotSensorModel).where(ScreenshotSensorModel.frame_id == frame_id)
+
+        saved_screenshot_sensor = db_session.execute(stmt).scalar_one()
+
+        with open('test/images/sample.png', 'rb') as expected_file, \
+                open(saved_screenshot_sensor.image_path, 'rb') as saved_file:
+            assert saved_file.read() == expected_file.read()
+
+        # the renditions are written by the background stage
+        rendition_executor.submit(lambda: None).result()
+        assert sorted(rendition_paths(saved_screenshot_sensor.image_path)) == sorted(
+            rendition_path(saved_screenshot_sensor.image_path, width) for width in SCREENSHOT_RENDITION_WIDTHS)
+
+    def test_save_file_duplicate(self, db_session, screenshot_blob_dir):
+        """
+        Test save file
+        check identical screenshots share one blob and one file
+        """
+
+        frames = [FrameFactory(), FrameFactory()]
+        db_session.add_all(frames)
+        db_session.flush()
+
+        for frame in frames:
+            with open('test/images/sample.png', 'rb') as image_file:
+                ScreenshotSensorModel.save_file(image_file, frame.id, frame.frame_create_time)
+        db_session.commit()
+
+        saved_screenshot_sensors = db_session.execute(select(ScreenshotSensorModel)).scalars().all()
+        blob = db_session.execute(select(ScreenshotBlobModel)).scalar_one()
+
+        assert [sensor.blob_id for sensor in saved_screenshot_sensors] == [blob.id, blob.id]
+        assert saved_screenshot_sensors[0].image_path == saved_screenshot_sensors[1].image_path
+        assert blob.ref_count == 2
+        assert len(list(screenshot_blob_dir.rglob('*.png'))) == 1
+
+    def test_delete_by_frame_ids(self, db_session, screenshot_blob_dir):
+        """
+        Test delete by frame ids
+        check the blob and its file are removed with the last reference
+        """
 
-        os.remove('./screenshots/sample_user/20120101/000000_1.png')
-        os.rmdir('./screenshots/sample_user/20120101')
-        os.rmdir('./screenshots/sample_user')
+        frames = [FrameFactory(), FrameFactory()]
+        db_session.add_all(frames)
+        db_session.flush()
+        for frame in frames:
+            with open('test/images/sample.png', 'rb') as image_file:
+                ScreenshotSensorModel.save_file(image_file, frame.id, frame.frame_create_time)
+        db_session.commit()
+
+        ScreenshotSensorModel.delete_by_frame_ids([frames[0].id])
+        assert ScreenshotBlobModel.sweep() == []
+        db_session.commit()
+
+        assert db_session.execute(select(ScreenshotBlobModel.ref_count)).scalar_one() == 1
+
+        ScreenshotSensorModel.delete_by_frame_ids([frames[1].id])
+        image_paths = ScreenshotBlobModel.sweep()
+        db_session.commit()
+        ScreenshotBlobModel.remove_files(image_paths)
+
+        assert db_session.execute(select(ScreenshotBlobModel)).scalar_one_or_none() is None
+        assert list(screenshot_blob_dir.rglob('*.png')) == []
 
     def test_fetch_by_frame_id(self, db_session):
 
@@ -74,10 +173,49 @@ class TestScreenshotSensor():
         db_session.add(frame)
         db_session.flush()
         frame_id = frame.id
-        screen_shot_sensor = ScreenshotSensorModel(image_path="test/images/sample.png", frame_id=frame_id)
+        screen_shot_sensor = ScreenshotSensorModel(image_path="test/images/sample.png",
+                                                   frame_id=frame_id,
+                                                   frame_create_time=frame.frame_create_time)
         db_session.add(screen_shot_sensor)
         db_session.commit()
 
         encoded_screenshot_image = ScreenshotSensorModel.fetch_by_frame_id(frame_id)
 
         assert type(encoded_screenshot_image) == bytes
+
+    def test_fetch_image_path_by_session_id_frame_no(self, db_session):
+        """
+        Test fetch image path by session id and frame no
+        check None is returned for a frame without a screenshot
+        """
+
+        user_session = UserSessionFactory()
+        frame_1 = FrameFactory(user_session=user_session)
+        frame_2 = FrameFactory(user_session=user_session)
+        db_session.add_all([frame_1, frame_2, ScreenshotSensorModel(image_path='test/images/sample.png', frame=frame_1)])
+        db_session.commit()
+        session_id = str(user_session.session_id)
+        db_session.close()
+
+        assert ScreenshotSensorModel.fetch_image_path_by_session_id_frame_no(session_id, 1) == 'test/images/sample.png'
+        assert ScreenshotSensorModel.fetch_image_path_by_session_id_frame_no(session_id, 2) is None
+
+    @pytest.mark.anyio
+    async def test_async_save_file_and_fetch_by_frame_id(self, db_session, async_db_session):
+        """
+        Test awaitable save file and fetch by frame id
+        """
+
+        frame = FrameFactory()
+        db_session.add(frame)
+        db_session.commit()
+        frame_id, frame_create_time = frame.id, frame.frame_create_time
+        db_session.close()
+
+        with open('test/images/sample.png', 'rb') as image_file:
+            await ScreenshotSensorModel.async_save_file(async_db_session, image_file, frame_id, frame_create_time)
+        await async_db_session.commit()
+
+        encoded_screenshot_image = await ScreenshotSensorModel.async_fetch_by_frame_id(async_db_session, frame_id)
+
+        assert encoded_screenshot_image == ScreenshotSensorModel.fetch_by_frame_id(frame_id)
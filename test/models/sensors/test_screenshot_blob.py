@@ -0,0 +1,47 @@
+from sqlalchemy import select
+
+from app.models import ScreenshotBlobModel
+
+
+class TestScreenshotBlob():
+
+    def test_acquire(self, db_session):
+        """
+        Test acquire
+        check the blob is inserted once and referenced again
+        """
+
+        sha256 = 'ab' * 32
+
+        blob_id, image_path, inserted = ScreenshotBlobModel.acquire(sha256, 'png', 10)
+        assert inserted
+        assert image_path == ScreenshotBlobModel.blob_path(blob_id, sha256, 'png')
+
+        assert ScreenshotBlobModel.acquire(sha256, 'png', 10) == (blob_id, image_path, False)
+        db_session.commit()
+
+        assert db_session.execute(select(ScreenshotBlobModel.ref_count)).scalar_one() == 2
+
+    def test_release_and_sweep(self, db_session, screenshot_blob_dir):
+        """
+        Test release and sweep
+        check only unreferenced blobs are deleted
+        """
+
+        kept_id, _, _ = ScreenshotBlobModel.acquire('aa' * 32, 'png', 10)
+        swept_id, swept_path, _ = ScreenshotBlobModel.acquire('bb' * 32, 'jpg', 10)
+        ScreenshotBlobModel.acquire('bb' * 32, 'jpg', 10)
+
+        ScreenshotBlobModel.release([swept_id, swept_id])
+        image_paths = ScreenshotBlobModel.sweep()
+        db_session.commit()
+
+        assert image_paths == [swept_path]
+        assert db_session.execute(select(ScreenshotBlobModel.id)).scalars().all() == [kept_id]
+
+        screenshot_blob_dir.mkdir()
+        (screenshot_blob_dir / 'removed.jpg').write_bytes(b'')
+        (screenshot_blob_dir / 'removed_160w.webp').write_bytes(b'')
+        ScreenshotBlobModel.remove_files([str(screenshot_blob_dir / 'removed.jpg'), swept_path])
+
+        assert list(screenshot_blob_dir.iterdir()) == []
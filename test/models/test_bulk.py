@@ -0,0 +1,113 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, select
+
+from app.models import AsyncDBEngine, DriveSensorModel, Engine, bulk_insert
+from app.models.bulk import SENSOR_COPY_THRESHOLD
+from app.models.factories import FrameFactory
+
+
+class TestBulkInsert():
+
+    def _drive_sensors(self, frame_id: int, frame_create_time: datetime, count: int) -> list[dict]:
+        return [
+            {
+                'drive_letter': 'C',
+                'drive_type': 'Fixed',
+                'volume_name': f'tab\tnew line\nback slash\\{index}',
+                'file_system': '',
+                'all_space': '512GB',
+                'free_space': '112GB',
+                'frame_id': frame_id,
+                'frame_create_time': frame_create_time
+            }
+            for index in range(count)]
+
+    def test_bulk_insert_copy(self, db_session):
+        """
+        test rows at or above the threshold are streamed with COPY
+        check escaped values and empty strings survive the round trip
+        """
+
+        frame = FrameFactory()
+        db_session.add(frame)
+        db_session.flush()
+
+        statements = []
+
+        def record_statement(_conn, _cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(Engine, 'before_cursor_execute', record_statement)
+        try:
+            bulk_insert(DriveSensorModel.__table__,
+                        self._drive_sensors(frame.id, frame.frame_create_time, SENSOR_COPY_THRESHOLD))
+        finally:
+            event.remove(Engine, 'before_cursor_execute', record_statement)
+        db_session.commit()
+
+        volume_names = db_session.execute(select(DriveSensorModel.volume_name)
+                                          .order_by(DriveSensorModel.id)).scalars().all()
+        file_systems = set(db_session.execute(select(DriveSensorModel.file_system)).scalars().all())
+
+        assert not statements
+        assert len(volume_names) == SENSOR_COPY_THRESHOLD
+        assert volume_names[1] == 'tab\tnew line\nback slash\\1'
+        assert file_systems == {''}
+
+    @pytest.mark.anyio
+    async def test_bulk_insert_copy_async(self, db_session, async_db_session):
+        """
+        test rows at or above the threshold are streamed with COPY on asyncpg
+        check the rows are committed with the transaction of the async session
+        """
+
+        frame = FrameFactory()
+        db_session.add(frame)
+        db_session.commit()
+        frame_id, frame_create_time = frame.id, frame.frame_create_time
+
+        statements = []
+
+        def record_statement(_conn, _cursor, statement, *args):
+            statements.append(statement)
+
+        def insert_drive_sensors(sync_session):
+            sync_session.execute(select(DriveSensorModel.id).limit(1))
+            statements.clear()
+            bulk_insert(DriveSensorModel.__table__,
+                        self._drive_sensors(frame_id, frame_create_time, SENSOR_COPY_THRESHOLD), sync_session)
+
+        event.listen(AsyncDBEngine.sync_engine, 'before_cursor_execute', record_statement)
+        try:
+            await async_db_session.run_sync(insert_drive_sensors)
+        finally:
+            event.remove(AsyncDBEngine.sync_engine, 'before_cursor_execute', record_statement)
+        await async_db_session.rollback()
+
+        assert not statements
+        assert not DriveSensorModel.fetch_by_frame_id(frame_id)
+
+        await async_db_session.run_sync(insert_drive_sensors)
+        await async_db_session.commit()
+
+        volume_names = db_session.execute(select(DriveSensorModel.volume_name)
+                                          .order_by(DriveSensorModel.id)).scalars().all()
+
+        assert len(volume_names) == SENSOR_COPY_THRESHOLD
+        assert volume_names[1] == 'tab\tnew line\nback slash\\1'
+
+    def test_bulk_insert_multi_row(self, db_session):
+        """
+        test rows below the threshold are inserted with a multi-row insert
+        """
+
+        frame = FrameFactory()
+        db_session.add(frame)
+        db_session.flush()
+
+        bulk_insert(DriveSensorModel.__table__, self._drive_sensors(frame.id, frame.frame_create_time, 3))
+        db_session.commit()
+
+        assert len(DriveSensorModel.fetch_by_frame_id(frame.id)) == 3
@@ -1,8 +1,11 @@
 import datetime
 
-from sqlalchemy import select
+import pytest
+from sqlalchemy import event, select
 
-from app.models import FrameModel
+from app.errors.exceptions import DataBaseError
+from app.models import Engine, FrameModel, IdentityCache, UserSessionModel
+from app.models.frame import FRAME_SAVE_ATTEMPTS
 from app.models.factories import FrameFactory, UserFactory, UserSessionFactory
 
 
@@ -91,6 +94,91 @@ class TestFrameModel():
 
         assert frame_id == expected_frame_id
 
+    def test_save_frame_seq(self, db_session):
+        """
+        test save frame
+        check frames are numbered in the order of frame create time even if they are saved out of order
+        """
+
+        user_session = UserSessionFactory()
+        db_session.add(user_session)
+        db_session.commit()
+        user_session_id, session_id = user_session.id, str(user_session.session_id)
+        db_session.close()
+
+        frame_create_times = ['2020-10-10 10:10:20',
+                              '2020-10-10 10:10:00',
+                              '2020-10-10 10:10:30',
+                              '2020-10-10 10:10:10']
+        for frame_create_time in frame_create_times:
+            FrameModel.save(FrameModel(frame_create_time=frame_create_time, user_session_id=user_session_id))
+        FrameModel.save(FrameModel(frame_create_time=frame_create_times[0], user_session_id=user_session_id))
+        db_session.commit()
+
+        fetched_frames = [FrameModel.fetch_frame_by_session_id_frame_no(session_id, frame_no)
+                          for frame_no in range(1, 5)]
+
+        assert [fetched_frame.frame_create_time for fetched_frame in fetched_frames] == sorted(frame_create_times)
+        assert db_session.get(UserSessionModel, user_session_id).frame_count == 4
+
+    def test_save_single_statement(self, db_session):
+        """
+        test save frame
+        check an existing frame is resolved with one statement when it is not cached
+        """
+
+        user_session = UserSessionFactory()
+        db_session.add(user_session)
+        db_session.commit()
+        user_session_id = user_session.id
+        db_session.close()
+
+        statements = []
+
+        def count_statement(*args):
+            statements.append(args)
+
+        event.listen(Engine, 'before_cursor_execute', count_statement)
+        try:
+            frame_id = FrameModel.save(FrameModel(frame_create_time='2020-10-10 10:10:10',
+                                                  user_session_id=user_session_id))
+            db_session.commit()
+            db_session.close()
+            IdentityCache.clear_all()
+            statements.clear()
+            same_frame_id = FrameModel.save(FrameModel(frame_create_time='2020-10-10 10:10:10',
+                                                       user_session_id=user_session_id))
+        finally:
+            event.remove(Engine, 'before_cursor_execute', count_statement)
+
+        assert same_frame_id == frame_id
+        assert len(statements) == 1
+
+    def test_save_invisible_conflict(self, db_session, monkeypatch):
+        """
+        test save frame
+        check a frame which conflicts but is never visible is given up after the bounded attempts
+        """
+
+        user_session = UserSessionFactory()
+        db_session.add(user_session)
+        db_session.commit()
+        user_session_id = user_session.id
+
+        attempts = []
+
+        class InvisibleResult:
+
+            def first(self):
+                attempts.append(None)
+
+        monkeypatch.setattr(db_session, 'execute', lambda *args, **kwargs: InvisibleResult())
+
+        with pytest.raises(DataBaseError):
+            FrameModel.save(FrameModel(frame_create_time='2020-10-10 10:10:10', user_session_id=user_session_id))
+
+        assert len(attempts) == FRAME_SAVE_ATTEMPTS
+
     def test_fetch_all_user_session(self, db_session):
         """
         test fetch all user session
@@ -149,3 +237,42 @@ class TestFrameModel():
         fetched_frame = FrameModel.fetch_frame_by_session_id_frame_no(user_session_id, 2)
         assert fetched_frame.id == frame_id
         assert fetched_frame.frame_create_time == frame_create_time.strftime('%Y-%m-%d %H:%M:%S')
+
+    @pytest.mark.anyio
+    async def test_async_fetch_all_user_session(self, db_session, async_db_session):
+        """
+        test awaitable fetch all user session
+        check the result is equal to the sync one
+        """
+
+        user_session = UserSessionFactory()
+        db_session.add_all([FrameFactory(user_session=user_session), FrameFactory(user_session=user_session)])
+        db_session.commit()
+        db_session.close()
+
+        fetched_user_session = await FrameModel.async_fetch_all_user_session(async_db_session)
+
+        assert fetched_user_session == FrameModel.fetch_all_user_session()
+
+    @pytest.mark.anyio
+    async def test_async_save_and_fetch_frame_by_session_id_frame_no(self, db_session, async_db_session):
+        """
+        test awaitable save frame and fetch frame by session id
+        check the string frame create time is bound as datetime for asyncpg
+        """
+
+        user_session = UserSessionFactory()
+        db_session.add(user_session)
+        db_session.commit()
+        user_session_id, session_id = user_session.id, str(user_session.session_id)
+        db_session.close()
+
+        frame_id = await FrameModel.async_save(async_db_session,
+                                               FrameModel(frame_create_time='2020-10-10 10:10:10',
+                                                          user_session_id=user_session_id))
+        await async_db_session.commit()
+
+        fetched_frame = await FrameModel.async_fetch_frame_by_session_id_frame_no(async_db_session, session_id, 1)
+
+        assert fetched_frame.id == frame_id
+        assert fetched_frame.frame_create_time == '2020-10-10 10:10:10'
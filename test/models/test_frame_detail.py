@@ -0,0 +1,148 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.models import (
+    DriveSensorModel,
+    Engine,
+    IpPortSensorModel,
+    ProcessSensorModel,
+    ScreenshotSensorModel,
+    async_fetch_frame_detail,
+    async_fetch_frame_range,
+    fetch_frame_detail,
+    fetch_frame_range,
+)
+from app.models import frame_detail
+from app.models.factories import (
+    DriveSensorFactory,
+    FrameFactory,
+    IpPortSensorFactory,
+    ProcessSensorFactory,
+    UserSessionFactory,
+)
+from app.models.sensors import interval
+from app.schemas.requests.sensors import RequestProcessSensor
+
+
+def seed_frame(db_session) -> tuple[str, int, datetime]:
+    user_session = UserSessionFactory()
+    frame = FrameFactory(user_session=user_session)
+    db_session.add_all([*DriveSensorFactory.build_batch(2, frame=frame),
+                        *IpPortSensorFactory.build_batch(3, frame=frame),
+                        *ProcessSensorFactory.build_batch(5, frame=frame),
+                        ScreenshotSensorModel(frame=frame, image_path='test/images/sample.png')])
+    db_session.commit()
+    session_id, frame_id, frame_create_time = str(user_session.session_id), frame.id, frame.frame_create_time
+    db_session.close()
+    return session_id, frame_id, frame_create_time
+
+
+class TestFrameDetail():
+
+    def test_fetch_frame_detail(self, db_session):
+        """
+        test fetch frame detail
+        check the sensors are equal to the ones fetched one by one
+        """
+
+        session_id, frame_id, _ = seed_frame(db_session)
+
+        frame = fetch_frame_detail(session_id, 1)
+
+        assert frame.id == frame_id
+        assert frame.drive_sensors == [
+            {name: getattr(drive_sensor, name) for name in frame.drive_sensors[0]}
+            for drive_sensor in DriveSensorModel.fetch_by_frame_id(frame_id)]
+        assert frame.ip_port_sensors == [
+            {name: getattr(ip_port_sensor, name) for name in frame.ip_port_sensors[0]}
+            for ip_port_sensor in IpPortSensorModel.fetch_by_frame_id(frame_id)]
+        assert sorted(frame.process_sensors, key=lambda process_sensor: process_sensor['process_id']) == sorted(
+            (process_sensor._asdict() for process_sensor in ProcessSensorModel.fetch_by_frame_id(frame_id)),
+            key=lambda process_sensor: process_sensor['process_id'])
+
+    def test_fetch_frame_detail_interval(self, db_session, monkeypatch):
+        """
+        test fetch frame detail
+        check the sensors saved as intervals are included
+        """
+
+        monkeypatch.setattr(interval, 'SENSOR_STORAGE_MODE', 'interval')
+
+        session_id, frame_id, frame_create_time = seed_frame(db_session)
+        ProcessSensorModel.save([RequestProcessSensor(file_path='/usr/bin/python',
+                                                      process_name='python',
+                                                      process_id=1234,
+                                                      started_at='2021-01-01 00:00:00')], frame_id, frame_create_time)
+        db_session.commit()
+
+        frame = fetch_frame_detail(session_id, 1)
+
+        assert len(frame.process_sensors) == 6
+        assert frame.process_sensors[-1] == {'file_path': '/usr/bin/python',
+                                             'process_name': 'python',
+                                             'process_id': 1234,
+                                             'started_at': '2021-01-01 00:00:00'}
+
+    @pytest.mark.anyio
+    async def test_async_fetch_frame_detail(self, db_session, async_db_session):
+        """
+        test awaitable fetch frame detail
+        check the jsonb columns are decoded by asyncpg as well
+        """
+
+        session_id, *_ = seed_frame(db_session)
+
+        frame = await async_fetch_frame_detail(async_db_session, session_id, 1)
+
+        assert frame == fetch_frame_detail(session_id, 1)
+
+    def test_fetch_frame_range(self, db_session, monkeypatch):
+        """
+        test fetch frame range
+        check the frames are read in order by one statement whatever the number of batches
+        """
+
+        monkeypatch.setattr(frame_detail, 'FRAME_RANGE_YIELD_PER', 2)
+
+        user_session = UserSessionFactory()
+        frames = FrameFactory.create_batch(5, user_session=user_session)
+        db_session.add_all([*frames,
+                            *(ProcessSensorFactory.build(frame=frame) for frame in frames),
+                            ScreenshotSensorModel(frame=frames[1], image_path='test/images/sample.png')])
+        db_session.commit()
+        session_id, frame_ids = str(user_session.session_id), [frame.id for frame in frames]
+        db_session.close()
+
+        statements = []
+
+        def count_statement(*args):
+            statements.append(args)
+
+        event.listen(Engine, 'before_cursor_execute', count_statement)
+        try:
+            fetched_frames = list(fetch_frame_range(session_id, 2))
+        finally:
+            event.remove(Engine, 'before_cursor_execute', count_statement)
+
+        assert [frame.id for frame in fetched_frames] == frame_ids[1:]
+        assert [frame.frame_seq for frame in fetched_frames] == [2, 3, 4, 5]
+        assert [frame.image_path for frame in fetched_frames] == ['test/images/sample.png', None, None, None]
+        assert all(len(frame.process_sensors) == 1 for frame in fetched_frames)
+        assert len(statements) == 1
+
+        assert [frame.frame_seq for frame in fetch_frame_range(session_id, 2, 3)] == [2, 3]
+
+    @pytest.mark.anyio
+    async def test_async_fetch_frame_range(self, db_session, async_db_session):
+        """
+        test awaitable fetch frame range
+        check the result is equal to the sync one
+        """
+
+        session_id, *_ = seed_frame(db_session)
+
+        fetched_frames = [frame async for frame in async_fetch_frame_range(async_db_session, session_id, 1)]
+
+        assert fetched_frames == list(fetch_frame_range(session_id, 1))
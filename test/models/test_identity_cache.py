@@ -0,0 +1,122 @@
+import time
+
+from sqlalchemy import event
+
+from app.models import Engine, IdentityCache, UserModel, UserSessionModel, user_id_cache, user_session_id_cache
+from app.models.factories import UserFactory
+
+
+class TestIdentityCache():
+
+    def test_get_put(self):
+        """
+        test put and get
+        check hit and miss counters
+        """
+
+        cache = IdentityCache('test_get_put', max_size=10, ttl=60)
+        IdentityCache.instances.remove(cache)
+
+        assert cache.get('key') is None
+        cache.put('key', 1)
+
+        assert cache.get('key') == 1
+        assert cache.stats() == {'size': 1, 'hits': 1, 'misses': 1}
+
+    def test_size_eviction(self):
+        """
+        test least recently used entry is evicted
+        """
+
+        cache = IdentityCache('test_size_eviction', max_size=2, ttl=60)
+        IdentityCache.instances.remove(cache)
+
+        cache.put('key_1', 1)
+        cache.put('key_2', 2)
+        cache.get('key_1')
+        cache.put('key_3', 3)
+
+        assert cache.get('key_1') == 1
+        assert cache.get('key_2') is None
+        assert cache.get('key_3') == 3
+
+    def test_ttl_eviction(self):
+        """
+        test expired entry is evicted
+        """
+
+        cache = IdentityCache('test_ttl_eviction', max_size=10, ttl=0.01)
+        IdentityCache.instances.remove(cache)
+
+        cache.put('key', 1)
+        time.sleep(0.02)
+
+        assert cache.get('key') is None
+        assert cache.stats()['size'] == 0
+
+    def test_save_known_user_without_query(self, db_session):
+        """
+        test saving a known user and user session issues no lookup query
+        """
+
+        user = UserModel(name='test_user', ip='172.16.35.10', machine_name='test_machine')
+        user_id = UserModel.save(user)
+        user_session_id = UserSessionModel.save(UserSessionModel(session_id='8e140dd8-f921-4988-a91a-53cec6b3ad28',
+                                                                 user_id=user_id))
+        db_session.commit()
+        db_session.close()
+
+        statements = []
+
+        def count_statement(*args):
+            statements.append(args)
+
+        event.listen(Engine, 'before_cursor_execute', count_statement)
+        try:
+            same_user = UserModel(name='test_user', ip='172.16.35.10', machine_name='test_machine')
+            assert UserModel.save(same_user) == user_id
+            assert UserSessionModel.save(UserSessionModel(session_id='8e140dd8-f921-4988-a91a-53cec6b3ad28',
+                                                          user_id=user_id)) == user_session_id
+        finally:
+            event.remove(Engine, 'before_cursor_execute', count_statement)
+
+        assert not statements
+
+    def test_staged_id_is_dropped_on_rollback(self, db_session):
+        """
+        test id of a rolled back insert is not cached
+        """
+
+        user = UserModel(name='test_user', ip='172.16.35.10', machine_name='test_machine')
+        UserModel.save(user)
+        db_session.rollback()
+
+        assert user_id_cache.get(('test_user', '172.16.35.10', 'test_machine')) is None
+
+    def test_rollback_keeps_committed_ids(self, db_session):
+        """
+        test rollback keeps cached ids of committed rows
+        """
+
+        user_session_id_cache.put('8e140dd8-f921-4988-a91a-53cec6b3ad28', 1)
+
+        user = UserFactory()
+        db_session.add(user)
+        db_session.flush()
+        db_session.rollback()
+
+        assert user_session_id_cache.get('8e140dd8-f921-4988-a91a-53cec6b3ad28') == 1
+
+    def test_savepoint_rollback_drops_its_ids(self, db_session):
+        """
+        test a savepoint rolled back drops only the ids staged in it
+        """
+
+        UserModel.save(UserModel(name='test_user_1', ip='172.16.35.10', machine_name='test_machine_1'))
+        savepoint = db_session.begin_nested()
+        UserModel.save(UserModel(name='test_user_2', ip='172.16.35.11', machine_name='test_machine_2'))
+        savepoint.rollback()
+        db_session.commit()
+
+        assert user_id_cache.get(('test_user_1', '172.16.35.10', 'test_machine_1')) is not None
+        assert user_id_cache.get(('test_user_2', '172.16.35.11', 'test_machine_2')) is None
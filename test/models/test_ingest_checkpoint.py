@@ -0,0 +1,42 @@
+from app.models import IngestCheckpointModel
+
+
+class TestIngestCheckpoint():
+
+    def test_fetch_position_not_exists(self):
+        """
+        test fetch position of a spool which has never been drained
+        """
+
+        assert IngestCheckpointModel.fetch_position('records') == 0
+
+    def test_save_position(self, db_session):
+        """
+        test save position twice
+        check the position is overwritten
+        """
+
+        IngestCheckpointModel.save_position('records', 10)
+        IngestCheckpointModel.save_position('records', 20)
+        db_session.commit()
+
+        assert IngestCheckpointModel.fetch_position('records') == 20
+
+    def test_rename(self, db_session):
+        """
+        test rename a checkpoint
+        check it is moved only to a spool name without a checkpoint
+        """
+
+        IngestCheckpointModel.save_position('records', 10)
+        IngestCheckpointModel.save_position('host:/spool', 20)
+        db_session.commit()
+
+        assert not IngestCheckpointModel.rename('records', 'host:/spool')
+        assert not IngestCheckpointModel.rename('missing', 'host:/other_spool')
+        assert IngestCheckpointModel.rename('records', 'host:/other_spool')
+        db_session.commit()
+
+        assert IngestCheckpointModel.fetch_position('records') == 0
+        assert IngestCheckpointModel.fetch_position('host:/spool') == 20
+        assert IngestCheckpointModel.fetch_position('host:/other_spool') == 10
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+from typing import Any, Iterator
+
+from sqlalchemy import event, select, text
+
+from app.models import (
+    BaseModel,
+    DriveSensorModel,
+    Engine,
+    FrameModel,
+    create_partitions,
+    fetch_frame_detail,
+)
+from app.models.factories import DriveSensorFactory, UserSessionFactory
+from app.models.partition import FRAME_PARTITION_MONTHS_AHEAD, add_months, month_start, partition_name
+
+PARTITIONED_TABLES = ('frames', 'drive_sensors', 'ip_port_sensors', 'process_sensors')
+
+
+def fetch_partitions() -> set[str]:
+    with Engine.connect() as conn:
+        return set(conn.execute(text("""
+            SELECT partitions.relname FROM pg_inherits
+            JOIN pg_class AS partitions ON partitions.oid = pg_inherits.inhrelid
+            WHERE partitions.relnamespace = CAST(:schema AS regnamespace) AND partitions.relkind = 'r'
+        """), {'schema': BaseModel.metadata.schema}).scalars())
+
+
+def save_frame(db_session, frame_create_time: datetime) -> tuple[str, int]:
+    """save a frame of a new user session with drive sensors"""
+
+    user_session = UserSessionFactory()
+    db_session.add(user_session)
+    db_session.flush()
+    frame_id = FrameModel.save(FrameModel(frame_create_time=frame_create_time, user_session_id=user_session.id))
+    db_session.add_all(DriveSensorFactory.build_batch(2,
+                                                      frame=None,
+                                                      frame_id=frame_id,
+                                                      frame_create_time=frame_create_time))
+    db_session.commit()
+    session_id = str(user_session.session_id)
+    db_session.close()
+    return session_id, frame_id
+
+
+def executed_relations(plan: dict) -> Iterator[str]:
+    """tables and partitions scanned by a plan node and its children"""
+
+    if 'Relation Name' in plan and plan.get('Actual Loops', 0) > 0:
+        yield plan['Relation Name']
+    for child in plan.get('Plans', []):
+        yield from executed_relations(child)
+
+
+def explain_analyze(query: Any) -> set[str]:
+    """partitions scanned by the statement a query executes"""
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        query()
+    finally:
+        event.remove(Engine, 'before_cursor_execute', before_cursor_execute)
+
+    statement, parameters = statements[-1]
+    with Engine.connect() as conn:
+        plan = conn.exec_driver_sql(f'EXPLAIN (ANALYZE, FORMAT JSON) {statement}', parameters).scalar()[0]['Plan']
+    return set(executed_relations(plan))
+
+
+class TestPartition():
+
+    def test_create_partitions(self):
+        """
+        test the partitions created with the tables
+        check creating them again creates nothing and past months are added on demand
+        """
+
+        current_month = month_start(datetime.now())
+        months = [add_months(current_month, offset) for offset in range(FRAME_PARTITION_MONTHS_AHEAD + 1)]
+
+        assert fetch_partitions() == {partition_name(table, month)
+                                      for table in PARTITIONED_TABLES for month in [None, *months]}
+        assert create_partitions() == []
+
+        previous_month = add_months(current_month, -1)
+        assert create_partitions(first_month=previous_month) == [partition_name(table, previous_month)
+                                                                 for table in PARTITIONED_TABLES]
+
+    def test_default_partition(self, db_session):
+        """
+        test frames out of the monthly partitions are kept in the default partition
+        check the month of those frames is left to the default partition
+        """
+
+        old_month = add_months(month_start(datetime.now()), -2)
+        _, frame_id = save_frame(db_session, old_month + timedelta(days=1))
+
+        stmt = select(text('tableoid::regclass::text')).select_from(FrameModel).where(FrameModel.id == frame_id)
+        assert db_session.execute(stmt).scalar_one() == f'{BaseModel.metadata.schema}.frames_default'
+        # attaching a partition waits for the transactions reading the table
+        db_session.close()
+
+        created = create_partitions(first_month=old_month)
+
+        assert partition_name('frames', old_month) not in created
+        assert partition_name('frames', add_months(old_month, 1)) in created
+        assert len(DriveSensorModel.fetch_by_frame_id(frame_id)) == 2
+
+    def test_partition_pruning(self, db_session):
+        """
+        test the reads of a frame scan the partitions of its month only
+        """
+
+        current_month = month_start(datetime.now())
+        previous_month = add_months(current_month, -1)
+        create_partitions(first_month=previous_month)
+        frame_create_time = current_month + timedelta(hours=1)
+        session_id, frame_id = save_frame(db_session, frame_create_time)
+        save_frame(db_session, previous_month + timedelta(hours=1))
+
+        partitions = {partition_name(table, current_month) for table in PARTITIONED_TABLES}
+
+        assert explain_analyze(lambda: fetch_frame_detail(session_id, 1)) & fetch_partitions() == partitions
+        assert explain_analyze(lambda: DriveSensorModel.fetch_by_frame_id(frame_id, frame_create_time)) \
+            == {partition_name('drive_sensors', current_month)}
+
+    def test_lock_timeout(self, monkeypatch):
+        """
+        test a partition behind a long reader of its table is skipped and created on the next run
+        """
+
+        monkeypatch.setattr('app.models.partition.FRAME_PARTITION_LOCK_TIMEOUT', 100)
+        previous_month = add_months(month_start(datetime.now()), -1)
+
+        with Engine.connect() as reader:
+            reader.execute(select(FrameModel.id)).all()
+            assert create_partitions(first_month=previous_month) == [partition_name(table, previous_month)
+                                                                     for table in PARTITIONED_TABLES[1:]]
+
+        assert create_partitions(first_month=previous_month) == [partition_name('frames', previous_month)]
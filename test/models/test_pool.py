@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from app.models import Engine
+from app.models.pool import PoolMetrics
+
+
+class TestPoolMetrics():
+
+    def test_stats(self):
+        """
+        test checkouts, waits and timeouts are counted with the live state of the pool
+        """
+
+        pool_metrics = PoolMetrics('test')
+        engine = create_engine(Engine.url,
+                               poolclass=pool_metrics.pool_class(QueuePool),
+                               pool_size=1,
+                               max_overflow=0,
+                               pool_timeout=0.1)
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+
+                assert pool_metrics.stats(engine.pool)['checked_out'] == 1
+                with pytest.raises(PoolTimeoutError):
+                    engine.connect()
+
+            # the metrics outlive the pool recreated by dispose
+            engine.dispose()
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+
+            stats = pool_metrics.stats(engine.pool)
+        finally:
+            engine.dispose()
+
+        assert stats['size'] == 1
+        assert stats['max_overflow'] == 0
+        assert stats['checked_out'] == 0
+        assert stats['checked_in'] == 1
+        assert stats['checkouts'] == 2
+        assert stats['timeouts'] == 1
+        assert stats['wait_seconds_max'] >= 0.1
+        assert stats['wait_seconds_total'] >= stats['wait_seconds_max']
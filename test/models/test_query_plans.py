@@ -0,0 +1,212 @@
+"""EXPLAIN of the hot queries of the models on seeded volumes
+
+every statement a hot query executes is captured and planned again with EXPLAIN (FORMAT JSON),
+and the test fails if a plan reads a table or a partition of more than SEQ_SCAN_MAX_ROWS rows with a sequential scan.
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, Callable, Iterator
+
+from sqlalchemy import event, select, text
+
+from app.models import (
+    BaseModel,
+    DriveSensorModel,
+    Engine,
+    FrameModel,
+    IpPortSensorModel,
+    ProcessSensorModel,
+    ScreenshotSensorModel,
+    SessionStatsModel,
+    UserSessionModel,
+    bulk_insert,
+    fetch_frame_detail,
+    fetch_frame_detail_by_id,
+    fetch_frame_range,
+)
+from app.models.factories import (
+    DriveSensorFactory,
+    FrameFactory,
+    IpPortSensorFactory,
+    ProcessSensorFactory,
+    UserSessionFactory,
+)
+from app.models.partition import month_start, partition_name
+
+USER_SESSION_COUNT = 1000
+FRAMES_PER_SESSION = 4
+SENSORS_PER_FRAME = 3
+SENSOR_TEMPLATE_COUNT = 20
+SEQ_SCAN_MAX_ROWS = 100
+
+HOT_QUERIES: dict[str, Callable[[SimpleNamespace], Any]] = {
+    'FrameModel.save':
+        lambda sample: FrameModel.save(FrameModel(frame_create_time=sample.new_frame_create_time,
+                                                  user_session_id=sample.user_session_id)),
+    'FrameModel.fetch_by_frame_create_time_user_session_id':
+        lambda sample: FrameModel.fetch_by_frame_create_time_user_session_id(sample.frame_create_time,
+                                                                             sample.user_session_id),
+    'FrameModel.fetch_frame_by_session_id_frame_no':
+        lambda sample: FrameModel.fetch_frame_by_session_id_frame_no(sample.session_id, 2),
+    'FrameModel.fetch_frame_id_by_session_id_frame_no':
+        lambda sample: FrameModel.fetch_frame_id_by_session_id_frame_no(sample.session_id, 2),
+    'DriveSensorModel.fetch_by_frame_id':
+        lambda sample: DriveSensorModel.fetch_by_frame_id(sample.frame_id),
+    'IpPortSensorModel.fetch_by_frame_id':
+        lambda sample: IpPortSensorModel.fetch_by_frame_id(sample.frame_id),
+    'ProcessSensorModel.fetch_by_frame_id':
+        lambda sample: ProcessSensorModel.fetch_by_frame_id(sample.frame_id),
+    'ScreenshotSensorModel.fetch_image_path_by_frame_id':
+        lambda sample: ScreenshotSensorModel.fetch_image_path_by_frame_id(sample.frame_id),
+    'ScreenshotSensorModel.fetch_image_path_by_session_id_frame_no':
+        lambda sample: ScreenshotSensorModel.fetch_image_path_by_session_id_frame_no(sample.session_id, 2),
+    'ScreenshotSensorModel.fetch_image_paths_by_user_session_id':
+        lambda sample: ScreenshotSensorModel.fetch_image_paths_by_user_session_id(sample.user_session_id),
+    'ScreenshotSensorModel.delete_by_frame_ids':
+        lambda sample: ScreenshotSensorModel.delete_by_frame_ids([sample.frame_id]),
+    'UserSessionModel.fetch_by_session_id':
+        lambda sample: UserSessionModel.fetch_by_session_id(sample.session_id),
+    'SessionStatsModel.fetch_by_session_id':
+        lambda sample: SessionStatsModel.fetch_by_session_id(sample.session_id),
+    'SessionStatsModel.fetch_page':
+        lambda sample: SessionStatsModel.fetch_page(100),
+    'SessionStatsModel.fetch_page after':
+        lambda sample: SessionStatsModel.fetch_page(100, after=sample.after),
+    'SessionStatsModel.fetch_page by user name':
+        lambda sample: SessionStatsModel.fetch_page(100, user_name=sample.user_name),
+    'SessionStatsModel.fetch_page by machine name':
+        lambda sample: SessionStatsModel.fetch_page(100, machine_name=sample.machine_name),
+    'SessionStatsModel.fetch_page by dates':
+        lambda sample: SessionStatsModel.fetch_page(100,
+                                                    start_date=sample.start_time + timedelta(days=1),
+                                                    end_date=sample.start_time + timedelta(days=2)),
+    'SessionStatsModel.fetch_page from a date':
+        lambda sample: SessionStatsModel.fetch_page(100, start_date=sample.start_time + timedelta(days=1)),
+    'SessionStatsModel.fetch_page by user name and dates':
+        lambda sample: SessionStatsModel.fetch_page(100,
+                                                    user_name=sample.user_name,
+                                                    start_date=sample.start_time,
+                                                    end_date=sample.start_time + timedelta(days=1)),
+    'fetch_frame_detail':
+        lambda sample: fetch_frame_detail(sample.session_id, 2),
+    'fetch_frame_detail_by_id':
+        lambda sample: fetch_frame_detail_by_id(sample.frame_id),
+    'fetch_frame_range':
+        lambda sample: list(fetch_frame_range(sample.session_id, 1, FRAMES_PER_SESSION)),
+}
+
+
+def sensor_rows(factory: Any, frames: list[tuple[int, datetime]]) -> list[dict[str, Any]]:
+    """rows of SENSORS_PER_FRAME sensors of each frame, from a few sensors built by the factory"""
+
+    columns = [column.name for column in factory._meta.model.__table__.columns
+               if column.name not in ('id', 'frame_id', 'frame_create_time', 'created_at', 'updated_at')]
+    templates = [{column: getattr(sensor, column) for column in columns}
+                 for sensor in factory.build_batch(SENSOR_TEMPLATE_COUNT, frame=None)]
+    return [{**templates[(frame_id + no) % SENSOR_TEMPLATE_COUNT],
+             'frame_id': frame_id,
+             'frame_create_time': frame_create_time}
+            for frame_id, frame_create_time in frames for no in range(SENSORS_PER_FRAME)]
+
+
+def seed(db_session) -> SimpleNamespace:
+    """seed sessions of frames with sensors and screenshots, and the statistics of the planner"""
+
+    # the frames of the current month are in its partition
+    start_time = month_start(datetime.now())
+    for user_session in UserSessionFactory.build_batch(USER_SESSION_COUNT):
+        db_session.add_all([FrameFactory.build(user_session=user_session,
+                                               frame_create_time=start_time + timedelta(seconds=no))
+                            for no in range(FRAMES_PER_SESSION)])
+    db_session.flush()
+
+    # the sensors are copied in, building each of them with the factories would take most of the test
+    frames = db_session.execute(select(FrameModel.id, FrameModel.frame_create_time)).all()
+    for factory in (DriveSensorFactory, IpPortSensorFactory, ProcessSensorFactory):
+        bulk_insert(factory._meta.model.__table__, sensor_rows(factory, frames))
+    bulk_insert(ScreenshotSensorModel.__table__,
+                [{'image_path': 'test/images/sample.png',
+                  'blob_id': None,
+                  'frame_id': frame_id,
+                  'frame_create_time': frame_create_time}
+                 for frame_id, frame_create_time in frames])
+    FrameModel.rebuild_session_stats()
+    db_session.commit()
+
+    user_session = db_session.get(UserSessionModel, USER_SESSION_COUNT // 2)
+    frame = user_session.frames[1]
+    stats = db_session.get(SessionStatsModel, user_session.id)
+    sample = SimpleNamespace(user_session_id=user_session.id,
+                             session_id=str(user_session.session_id),
+                             frame_id=frame.id,
+                             frame_create_time=frame.frame_create_time.strftime('%Y-%m-%d %H:%M:%S'),
+                             new_frame_create_time=(start_time + timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S'),
+                             user_name=stats.user_name,
+                             machine_name=stats.machine_name,
+                             start_time=stats.start_time,
+                             after=(stats.user_name, stats.start_time, stats.user_session_id))
+    db_session.close()
+
+    with Engine.connect() as conn:
+        conn.execution_options(isolation_level='AUTOCOMMIT').execute(text('ANALYZE'))
+
+    return sample
+
+
+def capture_statements(query: Callable[[], Any]) -> list[tuple[str, Any]]:
+    """statements and parameters executed by a query"""
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        query()
+    finally:
+        event.remove(Engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+
+def seq_scans(plan: dict) -> Iterator[str]:
+    """tables read with a sequential scan by a plan node and its children"""
+
+    if plan['Node Type'] == 'Seq Scan':
+        yield plan['Relation Name']
+    for child in plan.get('Plans', []):
+        yield from seq_scans(child)
+
+
+def test_hot_queries_use_indexes(db_session):
+
+    sample = seed(db_session)
+
+    # plans read the partitions, a partition is named with the table it belongs to
+    with Engine.connect() as conn:
+        row_counts = conn.execute(text("""
+            SELECT tables.relname, coalesce(parents.relname, tables.relname), tables.reltuples FROM pg_class AS tables
+            LEFT JOIN pg_inherits ON pg_inherits.inhrelid = tables.oid
+            LEFT JOIN pg_class AS parents ON parents.oid = pg_inherits.inhparent
+            WHERE tables.relnamespace = CAST(:schema AS regnamespace) AND tables.relkind = 'r'
+        """), {'schema': BaseModel.metadata.schema}).all()
+
+    large_tables = {table for table, _, rows in row_counts if rows > SEQ_SCAN_MAX_ROWS}
+    large_parents = {parent for _, parent, rows in row_counts if rows > SEQ_SCAN_MAX_ROWS}
+    assert {'frames', 'drive_sensors', 'screenshot_sensors', 'user_sessions', 'session_stats'} <= large_parents
+    assert partition_name('frames', month_start(datetime.now())) in large_tables
+
+    seq_scanned = {}
+    for name, query in HOT_QUERIES.items():
+        statements = capture_statements(lambda: query(sample))
+        db_session.rollback()
+        assert statements, name
+
+        with Engine.connect() as conn:
+            for statement, parameters in statements:
+                plan = conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()[0]['Plan']
+                if tables := sorted(set(seq_scans(plan)) & large_tables):
+                    seq_scanned.setdefault(name, []).extend(tables)
+
+    assert seq_scanned == {}
@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.models import AsyncDBEngine
+from app.models.replica import ReplicaLag
+
+
+class TestReplicaLag():
+
+    @pytest.mark.anyio
+    async def test_fresh(self):
+        """
+        test fresh
+        check a server which is not a standby is not behind and the lag is measured once per interval
+        """
+
+        engine = create_async_engine(AsyncDBEngine.url, poolclass=NullPool)
+        replica_lag = ReplicaLag(max_lag=5, check_interval=60)
+
+        assert await replica_lag.fresh(engine)
+        assert await replica_lag.fresh(engine)
+        assert replica_lag.stats() == {'lag_seconds': 0, 'max_lag_seconds': 5, 'checks': 1, 'reads': 2, 'fallbacks': 0}
+
+        # 0 seconds behind is too far behind a negative max lag
+        assert not await ReplicaLag(max_lag=-1).fresh(engine)
+
+    @pytest.mark.anyio
+    async def test_unreachable(self):
+        """
+        test fresh of a replica which is not reachable
+        check the primary is read and the replica is asked again after the interval
+        """
+
+        engine = create_async_engine(AsyncDBEngine.url.set(port=1), poolclass=NullPool)
+        replica_lag = ReplicaLag(check_interval=0)
+
+        assert not await replica_lag.fresh(engine)
+        assert not await replica_lag.fresh(engine)
+        assert replica_lag.lag is None
+        assert (replica_lag.checks, replica_lag.reads, replica_lag.fallbacks) == (2, 0, 2)
@@ -0,0 +1,131 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from app.models import FrameModel, SessionStatsModel
+from app.models.factories import FrameFactory, UserFactory, UserSessionFactory
+
+
+def fetch_stats(db_session) -> list[tuple]:
+    stmt = select(SessionStatsModel.user_session_id,
+                  SessionStatsModel.start_time,
+                  SessionStatsModel.end_time,
+                  SessionStatsModel.frame_count,
+                  SessionStatsModel.last_frame_id).order_by(SessionStatsModel.user_session_id)
+    return db_session.execute(stmt).all()
+
+
+class TestSessionStatsModel():
+
+    def test_add_frame(self, db_session):
+        """
+        test session stats updated by FrameModel.save
+        check frames saved out of order and saved again are counted once
+        """
+
+        user_session = UserSessionFactory()
+        db_session.add(user_session)
+        db_session.commit()
+        user_session_id = user_session.id
+        db_session.close()
+
+        frame_ids = {}
+        for frame_create_time in ['2020-10-10 10:10:20', '2020-10-10 10:10:30', '2020-10-10 10:10:00']:
+            frame_ids[frame_create_time] = FrameModel.save(FrameModel(frame_create_time=frame_create_time,
+                                                                      user_session_id=user_session_id))
+        FrameModel.save(FrameModel(frame_create_time='2020-10-10 10:10:20', user_session_id=user_session_id))
+        db_session.commit()
+
+        assert fetch_stats(db_session) == [(user_session_id,
+                                            datetime(2020, 10, 10, 10, 10, 0),
+                                            datetime(2020, 10, 10, 10, 10, 30),
+                                            3,
+                                            frame_ids['2020-10-10 10:10:30'])]
+
+    def test_rebuild_session_stats(self, db_session):
+        """
+        test rebuild session stats
+        check the rebuilt stats are equal to the ones updated by FrameModel.save
+        """
+
+        user_session_1 = UserSessionFactory()
+        user_session_2 = UserSessionFactory()
+        db_session.add_all([user_session_1, user_session_2])
+        db_session.commit()
+        user_session_ids = [user_session_1.id, user_session_2.id]
+        db_session.close()
+
+        for user_session_id in user_session_ids:
+            for second in [5, 1, 3]:
+                FrameModel.save(FrameModel(frame_create_time=f'2020-10-10 10:10:0{second}',
+                                           user_session_id=user_session_id))
+        db_session.commit()
+        saved_stats = fetch_stats(db_session)
+
+        assert FrameModel.rebuild_session_stats([user_session_ids[0]]) == 1
+        db_session.commit()
+        assert fetch_stats(db_session) == saved_stats
+
+        assert FrameModel.rebuild_session_stats() == 2
+        db_session.commit()
+        assert fetch_stats(db_session) == saved_stats
+
+    def test_fetch_page(self, db_session):
+        """
+        test fetch page
+        check the pages follow each other in the order of user name and start time, and the filters
+        """
+
+        user_session_1 = UserSessionFactory(user=UserFactory(name='test_user_name_1'))
+        user_session_2 = UserSessionFactory(user=UserFactory(name='test_user_name_2'))
+        user_session_3 = UserSessionFactory(user=user_session_1.user)
+        db_session.add_all([FrameFactory(user_session=user_session_1, frame_create_time='2020-10-10 10:10:10'),
+                            FrameFactory(user_session=user_session_1, frame_create_time='2020-10-10 10:20:10'),
+                            FrameFactory(user_session=user_session_2, frame_create_time='2020-10-10 10:15:10'),
+                            FrameFactory(user_session=user_session_3, frame_create_time='2020-10-11 10:00:00')])
+        db_session.commit()
+        user_session_ids = [user_session_1.id, user_session_3.id, user_session_2.id]
+        machine_name = user_session_2.user.machine_name
+        FrameModel.rebuild_session_stats()
+        db_session.commit()
+
+        first_page = SessionStatsModel.fetch_page(2)
+        last = first_page[-1]
+        second_page = SessionStatsModel.fetch_page(2, after=(last.user_name, last.start_time, last.user_session_id))
+
+        assert [row.user_session_id for row in first_page + second_page] == user_session_ids
+        assert first_page[0].start_time == datetime(2020, 10, 10, 10, 10, 10)
+        assert first_page[0].end_time == datetime(2020, 10, 10, 10, 20, 10)
+
+        assert [row.user_session_id for row in SessionStatsModel.fetch_page(10, user_name='test_user_name_1')] \
+            == user_session_ids[:2]
+        assert [row.user_session_id for row in SessionStatsModel.fetch_page(10, machine_name=machine_name)] \
+            == user_session_ids[2:]
+        assert [row.user_session_id for row in SessionStatsModel.fetch_page(
+            10, start_date=datetime(2020, 10, 10, 10, 16), end_date=datetime(2020, 10, 10, 12))] \
+            == user_session_ids[:1]
+        # the dates are inclusive and either of them may be omitted
+        assert [row.user_session_id for row in SessionStatsModel.fetch_page(
+            10, start_date=datetime(2020, 10, 10, 10, 20, 10))] == user_session_ids[:2]
+        assert [row.user_session_id for row in SessionStatsModel.fetch_page(
+            10, end_date=datetime(2020, 10, 10, 10, 15, 10))] == [user_session_ids[0], user_session_ids[2]]
+        assert SessionStatsModel.fetch_page(10,
+                                            start_date=datetime(2020, 10, 11),
+                                            end_date=datetime(2020, 10, 10)) == []
+
+    @pytest.mark.anyio
+    async def test_async_fetch_page(self, db_session, async_db_session):
+        """
+        test awaitable fetch page
+        check the result is equal to the sync one
+        """
+
+        user_session = UserSessionFactory()
+        db_session.add_all([FrameFactory(user_session=user_session), FrameFactory(user_session=user_session)])
+        db_session.commit()
+        FrameModel.rebuild_session_stats()
+        db_session.commit()
+        db_session.close()
+
+        assert await SessionStatsModel.async_fetch_page(async_db_session, 10) == SessionStatsModel.fetch_page(10)
@@ -1,3 +1,4 @@
+import pytest
 from sqlalchemy import select
 
 from app.models.factories import UserFactory
@@ -6,34 +7,6 @@ from app.models.user import UserModel
 
 class TestUser():
 
-    def test_fetch_name_ip_machine_name_data_exists(self, db_session):
-        """
-        test fetch user by name, ip, machine_name
-        check fetched user id is equal to saved user id
-        """
-
-        user = UserFactory()
-        db_session.add(user)
-        db_session.commit()
-        user_id, user_name, user_ip, user_machine_name = user.id, user.name, user.ip, user.machine_name
-        db_session.close()
-
-        fetched_user = UserModel._fetch_by_name_ip_machine_name(user_name, user_ip, user_machine_name)
-
-        assert fetched_user.id == user_id
-
-    def test_fetch_name_ip_machine_name_data_not_exists(self):
-        """
-        test fetch user by name, ip, machine_name
-        check fetched user id is None
-        """
-
-        user = UserFactory()
-
-        fetched_user = UserModel._fetch_by_name_ip_machine_name(user.name, user.ip, user.machine_name)
-
-        assert fetched_user is None
-
     def test_save_data_not_exists(self, db_session):
         """
         test save user
@@ -50,9 +23,9 @@ class TestUser():
         db_session.commit()
         db_session.close()
 
-        stmt = select(UserModel).where(UserModel.name == expected_user_name
-                                       and UserModel.ip == expected_user_ip
-                                       and UserModel.machine_name == expected_user_machine_name)
+        stmt = select(UserModel).where(UserModel.name == expected_user_name,
+                                       UserModel.ip == expected_user_ip,
+                                       UserModel.machine_name == expected_user_machine_name)
         fetched_user = db_session.execute(stmt).scalar()
 
         assert saved_user_id == fetched_user.id
@@ -81,3 +54,37 @@ class TestUser():
         saved_user_id = user.save(user)
 
         assert saved_user_id == expected_user_id
+
+    def test_save_known_name_on_new_machine(self, db_session):
+        """
+        test save user
+        check a known user name on an existing ip with a new machine name is saved as another user
+        """
+
+        first_user = UserModel(name='test_user', ip='172.14.23.23', machine_name='test_machine')
+        first_user_id = UserModel.save(first_user)
+        db_session.commit()
+
+        second_user = UserModel(name='test_user', ip='172.14.23.23', machine_name='test_machine_2')
+        second_user_id = UserModel.save(second_user)
+        db_session.commit()
+
+        assert second_user_id != first_user_id
+        assert UserModel.save(first_user) == first_user_id
+
+    @pytest.mark.anyio
+    async def test_async_save(self, db_session, async_db_session):
+        """
+        test awaitable save user
+        check the user saved through the async session is visible after commit
+        """
+
+        user = UserModel(name='test_user', ip='172.16.35.10', machine_name='test_machine')
+
+        saved_user_id = await UserModel.async_save(async_db_session, user)
+        await async_db_session.commit()
+
+        fetched_user = db_session.execute(select(UserModel).where(UserModel.name == 'test_user')).scalar_one()
+
+        assert saved_user_id == fetched_user.id
+        assert await UserModel.async_save(async_db_session, user) == saved_user_id
@@ -0,0 +1,190 @@
+import hashlib
+import io
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import cv2
+import pytest
+from sqlalchemy import func, select
+
+from app.models import (
+    BaseModel,
+    DriveSensorModel,
+    FrameModel,
+    ScreenshotBlobModel,
+    ScreenshotSensorModel,
+    create_partitions,
+)
+from app.models.factories import DriveSensorFactory, UserSessionFactory
+from app.models.partition import add_months, month_start, partition_name
+from app.models.sensors.rendition import SCREENSHOT_RENDITION_WIDTHS, rendition_executor, rendition_paths
+from app.retention import CompressScreenshots, ExpireSensors, RetentionPolicy, RetentionReport, ThinScreenshots
+
+NOW = datetime.now()
+
+
+def screenshot_file(seed: int) -> io.BytesIO:
+    """png of the sample image with a pixel changed, so every seed is another blob"""
+
+    image = cv2.imread('test/images/sample.png')
+    image[0, 0] = (seed, seed, seed)
+    return io.BytesIO(cv2.imencode('.png', image)[1].tobytes())
+
+
+def save_frames(db_session, frame_create_times: list[datetime], seeds: list[int]) -> list[int]:
+    """save frames of a new user session with a screenshot and drive sensors each"""
+
+    user_session = UserSessionFactory()
+    db_session.add(user_session)
+    db_session.flush()
+
+    frame_ids = []
+    for frame_create_time, seed in zip(frame_create_times, seeds):
+        frame_id = FrameModel.save(FrameModel(frame_create_time=frame_create_time, user_session_id=user_session.id))
+        ScreenshotSensorModel.save_file(screenshot_file(seed), frame_id, frame_create_time)
+        db_session.add_all(DriveSensorFactory.build_batch(2,
+                                                          frame=None,
+                                                          frame_id=frame_id,
+                                                          frame_create_time=frame_create_time))
+        frame_ids.append(frame_id)
+    db_session.commit()
+    db_session.close()
+    return frame_ids
+
+
+def table_exists(db_session, name: str) -> bool:
+    return db_session.execute(select(func.to_regclass(f'{BaseModel.metadata.schema}.{name}'))).scalar() is not None
+
+
+def fetch_screenshots(db_session) -> dict[int, str]:
+    stmt = select(ScreenshotSensorModel.frame_id, ScreenshotSensorModel.image_path)
+    screenshots = dict(db_session.execute(stmt).all())
+    db_session.close()
+    return screenshots
+
+
+class TestRetention():
+
+    def test_policy_without_batches(self):
+        """
+        test a policy which does not run batches cannot be created
+        """
+
+        class IncompletePolicy(RetentionPolicy):
+            name = 'incomplete'
+
+        with pytest.raises(TypeError):
+            IncompletePolicy(days=1)
+
+    def test_compress_screenshots(self, db_session):
+        """
+        test compress screenshots
+        check only blobs without newer frames are encoded as webp and the dry run reports the same bytes
+        """
+
+        old_time = NOW - timedelta(days=10)
+        old_frame_id, shared_frame_id, _ = save_frames(db_session,
+                                                       [old_time, old_time + timedelta(seconds=1), NOW],
+                                                       [1, 2, 2])
+        before = fetch_screenshots(db_session)
+
+        policy = CompressScreenshots(days=7, width=80, batch_size=1, batch_pause=0)
+        dry_run = policy.apply(dry_run=True, now=NOW)
+
+        assert dry_run.items == 1 and dry_run.bytes > 0
+        assert fetch_screenshots(db_session) == before
+
+        assert policy.apply(now=NOW) == dry_run
+
+        after = fetch_screenshots(db_session)
+        assert after[old_frame_id].endswith('.webp')
+        assert cv2.imread(after[old_frame_id]).shape[1] == 80
+        assert not Path(before[old_frame_id]).exists()
+        assert after[shared_frame_id] == before[shared_frame_id]
+        assert policy.apply(now=NOW) == RetentionReport(policy.name)
+
+    def test_compress_screenshots_rekeys_blob(self, db_session):
+        """
+        test compress screenshots
+        check the blob is keyed by the webp with its renditions, and the same image uploaded again gets a new blob
+        """
+
+        old_frame_id, = save_frames(db_session, [NOW - timedelta(days=10)], [1])
+        before = fetch_screenshots(db_session)
+        # the renditions are written by the background stage
+        rendition_executor.submit(lambda: None).result()
+
+        CompressScreenshots(days=7, width=80, batch_size=1, batch_pause=0).apply(now=NOW)
+
+        compressed_path = fetch_screenshots(db_session)[old_frame_id]
+        sha256 = db_session.execute(select(ScreenshotBlobModel.sha256)).scalar_one()
+        assert sha256 == hashlib.sha256(Path(compressed_path).read_bytes()).hexdigest()
+        assert len(rendition_paths(compressed_path)) == len(SCREENSHOT_RENDITION_WIDTHS)
+        assert not rendition_paths(before[old_frame_id])
+
+        new_frame_id, = save_frames(db_session, [NOW], [1])
+
+        new_path = fetch_screenshots(db_session)[new_frame_id]
+        assert new_path.endswith('.png')
+        assert Path(new_path).read_bytes() == screenshot_file(1).getvalue()
+        assert db_session.execute(select(func.count()).select_from(ScreenshotBlobModel)).scalar_one() == 2
+
+    def test_thin_screenshots(self, db_session):
+        """
+        test thin screenshots
+        check the screenshots of every Nth old frame are kept and the blobs of the others are swept
+        """
+
+        old_time = NOW - timedelta(days=100)
+        frame_ids = save_frames(db_session,
+                                [old_time + timedelta(seconds=no) for no in range(5)] + [NOW],
+                                [1, 2, 3, 4, 4, 5])
+        before = fetch_screenshots(db_session)
+
+        policy = ThinScreenshots(days=90, every=2, batch_size=1, batch_pause=0)
+        dry_run = policy.apply(dry_run=True, now=NOW)
+
+        # the blob of the 4th frame is shared with the 5th
+        assert dry_run == RetentionReport(policy.name, items=2, bytes=Path(before[frame_ids[1]]).stat().st_size)
+        assert fetch_screenshots(db_session) == before
+
+        assert policy.apply(now=NOW) == dry_run
+
+        assert fetch_screenshots(db_session) == {frame_id: before[frame_id]
+                                                 for frame_id in (frame_ids[0], frame_ids[2], *frame_ids[4:])}
+        assert not Path(before[frame_ids[1]]).exists()
+        assert db_session.execute(select(ScreenshotBlobModel.ref_count)
+                                  .where(ScreenshotBlobModel.id == 4)).scalar_one() == 1
+
+    def test_expire_sensors(self, db_session):
+        """
+        test expire sensors
+        check old monthly partitions are dropped and old rows of the default partition are deleted
+        """
+
+        old_month = add_months(month_start(NOW), -14)
+        create_partitions(first_month=old_month)
+        frame_ids = save_frames(db_session,
+                                [old_month + timedelta(days=1), add_months(old_month, -6), NOW],
+                                [1, 2, 3])
+
+        policy = ExpireSensors(days=365, batch_size=1, batch_pause=0)
+        dry_run = policy.apply(dry_run=True, now=NOW)
+
+        assert dry_run.items == 4 and dry_run.bytes > 0
+        assert len(DriveSensorModel.fetch_by_frame_id(frame_ids[1])) == 2
+        # the partitions are dropped with locks of their tables
+        db_session.close()
+
+        report = policy.apply(now=NOW)
+
+        assert report.items == 4
+        assert [len(DriveSensorModel.fetch_by_frame_id(frame_id)) for frame_id in frame_ids] == [0, 0, 2]
+        assert db_session.execute(select(DriveSensorModel.id)
+                                  .where(DriveSensorModel.frame_create_time < old_month)).all() == []
+        assert policy.apply(now=NOW) == RetentionReport(policy.name)
+
+        # the frames are kept
+        assert table_exists(db_session, partition_name('frames', old_month))
+        assert not table_exists(db_session, partition_name('drive_sensors', old_month))
+        assert len(db_session.execute(select(FrameModel.id)).all()) == 3
@@ -1,6 +1,9 @@
+import base64
+import json
+
 from fastapi.testclient import TestClient
 
-from app.models import ScreenshotSensorModel
+from app.models import FrameModel, ScreenshotSensorModel
 from app.models.factories import (
     DriveSensorFactory,
     FrameFactory,
@@ -8,6 +11,7 @@ from app.models.factories import (
     ProcessSensorFactory,
     UserSessionFactory,
 )
+from app.routers import frame as frame_router
 from app.routers.setting import AppRoutes
 
 TEST_URL = f"{AppRoutes.Frames.PREFIX}"
@@ -30,15 +34,276 @@ def test_get_frame(app_client: TestClient, db_session):
     db_session.add_all(ip_port_sensor_models)
     db_session.add_all(process_sensor_models)
     db_session.flush()
-    user_session_id = user_session_model.session_id
+    user_session_id, frame_id = user_session_model.session_id, frame_model.id
     frame_no = 1
     db_session.commit()
 
     response = app_client.get(f"{TEST_URL}/{user_session_id}/{frame_no}")
 
+    # the frame no is redirected to the frame id every time
+    assert [redirect.status_code for redirect in response.history] == [307]
+    assert response.history[0].headers['location'] == f"{TEST_URL}/by-id/{frame_id}"
+    assert response.history[0].headers['cache-control'] == 'private, no-cache'
     assert response.status_code == 200
     response_json = response.json()
 
     assert len(response_json['drive_sensors']) == 2
     assert len(response_json['ip_port_sensors']) == 3
     assert len(response_json['process_sensors']) == 5
+    assert response_json['screenshot_sensor']['url'] == f"{TEST_URL}/by-id/{frame_id}/screenshot"
+
+    missing_response = app_client.get(f"{TEST_URL}/{user_session_id}/2")
+
+    assert missing_response.status_code == 400
+
+
+def test_get_frame_read_replica(app_client: TestClient, db_session, read_replica_lag):
+
+    user_session_model = UserSessionFactory()
+    frame_model = FrameFactory(user_session=user_session_model)
+    db_session.add_all([user_session_model, frame_model])
+    db_session.commit()
+    user_session_id = user_session_model.session_id
+    db_session.close()
+
+    # the frame and the frames read ahead are read from the replica
+    response = app_client.get(f"{TEST_URL}/{user_session_id}/1")
+
+    assert response.status_code == 200
+    assert read_replica_lag.reads >= 1
+    assert read_replica_lag.fallbacks == 0
+
+
+def test_get_frame_cached(app_client: TestClient, db_session, monkeypatch):
+
+    user_session_model = UserSessionFactory()
+    frame_model = FrameFactory(user_session=user_session_model)
+    screenshot_sensor_model = ScreenshotSensorModel(frame=frame_model, image_path='test/images/sample.png')
+    db_session.add_all([user_session_model, frame_model, screenshot_sensor_model])
+    db_session.commit()
+    frame_url = f"{TEST_URL}/by-id/{frame_model.id}"
+
+    response = app_client.get(frame_url)
+
+    assert response.status_code == 200
+    assert response.headers['etag'] == f'"frame-{frame_model.id}"'
+    assert response.headers['cache-control'] == 'private, max-age=31536000, immutable'
+
+    # cached responses are answered without the database or the screenshot
+    async def fail(*args, **kwargs):
+        raise AssertionError('the database is queried')
+
+    monkeypatch.setattr(frame_router, 'async_fetch_frame_detail_by_id', fail)
+
+    cached_response = app_client.get(frame_url)
+
+    assert cached_response.status_code == 200
+    assert cached_response.content == response.content
+    assert cached_response.headers['etag'] == response.headers['etag']
+
+    # the etag is derived from the frame id, so it is answered without the cache either
+    frame_router.frame_response_cache.clear()
+    not_modified_response = app_client.get(frame_url,
+                                           headers={'If-None-Match': f"W/\"other\", {response.headers['etag']}"})
+
+    assert not_modified_response.status_code == 304
+    assert not_modified_response.content == b''
+    assert not_modified_response.headers['etag'] == response.headers['etag']
+    assert not_modified_response.headers['cache-control'] == 'private, max-age=31536000, immutable'
+
+
+def test_get_frame_renumbered(app_client: TestClient, db_session, make_image):
+
+    user_session_model = UserSessionFactory()
+    db_session.add(user_session_model)
+    db_session.commit()
+    user_session_id, session_id = user_session_model.id, str(user_session_model.session_id)
+    db_session.close()
+
+    image_paths = {'2021-01-01 00:00:10': make_image('first.png'), '2021-01-01 00:00:20': 'test/images/sample.png'}
+    for frame_create_time, image_path in image_paths.items():
+        frame_id = FrameModel.save(FrameModel(frame_create_time=frame_create_time, user_session_id=user_session_id))
+        db_session.add(ScreenshotSensorModel(frame_id=frame_id,
+                                             frame_create_time=frame_create_time,
+                                             image_path=image_path))
+    db_session.commit()
+
+    response = app_client.get(f"{TEST_URL}/{session_id}/1")
+    app_client.portal.call(frame_router.frame_prefetcher.wait)
+
+    assert response.json()['record_time'] == '2021-01-01 00:00:10'
+    assert frame_id in frame_router.screenshot_response_cache
+
+    # a late frame takes the frame no 1 and the frame nos are redirected to the frames which have them now
+    FrameModel.save(FrameModel(frame_create_time='2021-01-01 00:00:00', user_session_id=user_session_id))
+    db_session.commit()
+
+    renumbered_response = app_client.get(f"{TEST_URL}/{session_id}/1",
+                                         headers={'If-None-Match': response.headers['etag']})
+    next_response = app_client.get(f"{TEST_URL}/{session_id}/2", headers={'If-None-Match': response.headers['etag']})
+    screenshot_response = app_client.get(f"{TEST_URL}/{session_id}/2/screenshot")
+
+    assert renumbered_response.status_code == 200
+    assert renumbered_response.json()['record_time'] == '2021-01-01 00:00:00'
+    assert renumbered_response.headers['etag'] != response.headers['etag']
+    assert next_response.status_code == 304
+    assert next_response.url == response.url
+    with open(image_paths['2021-01-01 00:00:10'], 'rb') as image_file:
+        assert screenshot_response.content == image_file.read()
+
+
+def test_get_frame_prefetch(app_client: TestClient, db_session, monkeypatch):
+
+    user_session_model = UserSessionFactory()
+    frame_models = FrameFactory.build_batch(3, user_session=user_session_model)
+    screenshot_sensor_models = [ScreenshotSensorModel(frame=frame_model, image_path='test/images/sample.png')
+                                for frame_model in frame_models]
+    db_session.add_all([user_session_model, *frame_models, *screenshot_sensor_models])
+    db_session.commit()
+    user_session_id = user_session_model.session_id
+
+    response = app_client.get(f"{TEST_URL}/{user_session_id}/1")
+    app_client.portal.call(frame_router.frame_prefetcher.wait)
+
+    assert response.status_code == 200
+
+    # the frames read ahead are answered without reading the frame or the screenshot file again
+    async def fail(*args, **kwargs):
+        raise AssertionError('the database is queried')
+
+    monkeypatch.setattr(frame_router, 'async_fetch_frame_detail_by_id', fail)
+    monkeypatch.setattr(ScreenshotSensorModel, 'async_fetch_image_path_by_frame_id', fail)
+
+    with open('test/images/sample.png', 'rb') as image_file:
+        image = image_file.read()
+
+    next_response = app_client.get(f"{TEST_URL}/{user_session_id}/2")
+    screenshot_response = app_client.get(next_response.json()['screenshot_sensor']['url'])
+    partial_response = app_client.get(next_response.json()['screenshot_sensor']['url'],
+                                      headers={'Range': 'bytes=8-23'})
+
+    assert next_response.status_code == 200
+    assert screenshot_response.status_code == 200
+    assert screenshot_response.content == image
+    assert screenshot_response.headers['content-type'] == 'image/png'
+    assert partial_response.status_code == 206
+    assert partial_response.content == image[8:24]
+
+    app_client.portal.call(frame_router.frame_prefetcher.wait)
+
+def test_get_frame_screenshot(app_client: TestClient, db_session):
+
+    user_session_model = UserSessionFactory()
+    frame_model = FrameFactory(user_session=user_session_model)
+    screenshot_sensor_model = ScreenshotSensorModel(frame=frame_model, image_path='test/images/sample.png')
+    db_session.add_all([user_session_model, frame_model, screenshot_sensor_model])
+    db_session.commit()
+    screenshot_url = f"{TEST_URL}/{user_session_model.session_id}/1/screenshot"
+
+    with open('test/images/sample.png', 'rb') as image_file:
+        image = image_file.read()
+
+    response = app_client.get(screenshot_url)
+
+    assert response.status_code == 200
+    assert response.content == image
+    assert response.headers['content-type'] == 'image/png'
+    assert response.headers['accept-ranges'] == 'bytes'
+    assert response.headers['etag'] == f'"screenshot-{frame_model.id}"'
+    assert response.headers['cache-control'] == 'private, max-age=31536000, immutable'
+    etag = response.headers['etag']
+
+    partial_response = app_client.get(screenshot_url, headers={'Range': 'bytes=8-23'})
+
+    assert partial_response.status_code == 206
+    assert partial_response.content == image[8:24]
+    assert partial_response.headers['content-range'] == f'bytes 8-23/{len(image)}'
+
+    suffix_response = app_client.get(screenshot_url, headers={'Range': 'bytes=-10', 'If-Range': etag})
+
+    assert suffix_response.status_code == 206
+    assert suffix_response.content == image[-10:]
+
+    # a stale If-Range gets the whole file
+    stale_response = app_client.get(screenshot_url, headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+
+    assert stale_response.status_code == 200
+    assert stale_response.content == image
+
+    unsatisfiable_response = app_client.get(screenshot_url, headers={'Range': f'bytes={len(image)}-'})
+
+    assert unsatisfiable_response.status_code == 416
+    assert unsatisfiable_response.headers['content-range'] == f'bytes */{len(image)}'
+
+    not_modified_response = app_client.get(screenshot_url, headers={'If-None-Match': etag})
+
+    assert not_modified_response.status_code == 304
+    assert not_modified_response.content == b''
+
+
+def test_get_frame_screenshot_not_found(app_client: TestClient, db_session):
+
+    user_session_model = UserSessionFactory()
+    frame_model = FrameFactory(user_session=user_session_model)
+    db_session.add_all([user_session_model, frame_model])
+    db_session.commit()
+
+    response = app_client.get(f"{TEST_URL}/{user_session_model.session_id}/1/screenshot")
+
+    assert response.status_code == 404
+
+
+def test_get_frame_screenshot_rendition(app_client: TestClient, db_session, tmp_path):
+
+    image_path = str(tmp_path / 'sample.png')
+    with open('test/images/sample.png', 'rb') as image_file:
+        (tmp_path / 'sample.png').write_bytes(image_file.read())
+
+    user_session_model = UserSessionFactory()
+    frame_model = FrameFactory(user_session=user_session_model)
+    screenshot_sensor_model = ScreenshotSensorModel(frame=frame_model, image_path=image_path)
+    db_session.add_all([user_session_model, frame_model, screenshot_sensor_model])
+    db_session.commit()
+    screenshot_url = f"{TEST_URL}/{user_session_model.session_id}/1/screenshot"
+
+    # renditions missing on disk are rendered on demand
+    response = app_client.get(screenshot_url, params={'size': 160})
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'image/webp'
+    assert len(response.content) < (tmp_path / 'sample.png').stat().st_size
+    assert (tmp_path / 'sample_160w.webp').exists()
+
+    invalid_response = app_client.get(screenshot_url, params={'size': 100})
+
+    assert invalid_response.status_code == 400
+
+
+def test_get_frame_range(app_client: TestClient, db_session):
+
+    user_session_model = UserSessionFactory()
+    frame_models = FrameFactory.create_batch(3, user_session=user_session_model)
+    db_session.add_all([*frame_models,
+                        *(ScreenshotSensorModel(frame=frame_model, image_path='test/images/sample.png')
+                          for frame_model in frame_models),
+                        *IpPortSensorFactory.build_batch(2, frame=frame_models[1])])
+    db_session.commit()
+    user_session_id = user_session_model.session_id
+
+    response = app_client.get(f"{TEST_URL}/{user_session_id}", params={'from': 2, 'to': 3})
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    frames = [json.loads(line) for line in response.text.splitlines()]
+    assert [frame['frame_no'] for frame in frames] == [2, 3]
+    assert len(frames[0]['ip_port_sensors']) == 2
+    assert frames[0]['screenshot_sensor'] == {'url': f"{TEST_URL}/by-id/{frame_models[1].id}/screenshot"}
+
+    with open('test/images/sample.png', 'rb') as image_file:
+        image = base64.b64encode(image_file.read()).decode()
+
+    screenshot_response = app_client.get(f"{TEST_URL}/{user_session_id}", params={'screenshots': True})
+
+    frames = [json.loads(line) for line in screenshot_response.text.splitlines()]
+    assert [frame['frame_no'] for frame in frames] == [1, 2, 3]
+    assert all(frame['screenshot_sensor']['image'] == image for frame in frames)
@@ -0,0 +1,29 @@
+from fastapi.testclient import TestClient
+
+from app.routers.setting import AppRoutes
+
+TEST_URL = f"{AppRoutes.Metrics.PREFIX}/"
+
+
+def test_get_metrics(app_client: TestClient, db_session):
+
+    response = app_client.get(TEST_URL)
+
+    assert response.status_code == 200
+    response_json = response.json()
+
+    assert set(response_json['pools']) == {'sync', 'async'}
+    assert response_json['pools']['sync']['checkouts'] >= 1
+    assert set(response_json['identity_caches']) == {'users', 'user_sessions', 'frames', 'frame_nos'}
+    assert set(response_json['response_caches']) == {'frames', 'screenshots'}
+    assert 'pending' in response_json['frame_prefetch']
+    assert response_json['read_replica'] is None
+
+
+def test_get_metrics_read_replica(app_client: TestClient, db_session, read_replica_lag):
+
+    response = app_client.get(TEST_URL)
+
+    assert response.status_code == 200
+    assert set(response.json()['pools']) == {'sync', 'async', 'async-read'}
+    assert response.json()['read_replica'] == read_replica_lag.stats()
@@ -4,21 +4,32 @@ import os
 import cv2
 from fastapi.encoders import jsonable_encoder
 from fastapi.testclient import TestClient
+from sqlalchemy import select
 
+from app.errors.message import ErrorMessage
+from app.ingest import record_spool
+from app.models import (
+    DriveSensorModel,
+    FrameModel,
+    IpPortSensorModel,
+    ProcessSensorModel,
+    ScreenshotSensorModel,
+    UserModel,
+    UserSessionModel,
+)
+from app.routers import record as record_router
 from app.routers.setting import AppRoutes
+from app.schemas.requests import RecordUploadIn
 from app.schemas.requests.factories import RecordSaveInFactory, UserFactory
 from app.schemas.responses import RecordSaveOut
 
 TEST_URL = f"{AppRoutes.Records.PREFIX}"
 
 
-def test_save(app_client: TestClient):
+def test_save(app_client: TestClient, db_session):
 
     test_user_name = 'test_user'
     test_created_at = '2012-01-01 00:00:00'
-    test_date, test_time = test_created_at.split(' ')
-    test_date = test_date.replace('-', '')
-    test_time = test_time.replace(':', '')
 
     sample_image = cv2.imread('test/images/sample.png')
 
@@ -36,8 +47,120 @@ def test_save(app_client: TestClient):
 
     assert response.status_code == 200
     assert response.json() == jsonable_encoder(RecordSaveOut(message='success'))
-    assert os.path.exists(f"./screenshots/{test_user_name}/{test_date}/{test_time}_1.png")
+    assert os.path.exists(db_session.execute(select(ScreenshotSensorModel.image_path)).scalar_one())
 
-    os.remove(f"./screenshots/{test_user_name}/{test_date}/{test_time}_1.png")
-    os.rmdir(f"./screenshots/{test_user_name}/{test_date}")
-    os.rmdir(f"./screenshots/{test_user_name}")
+
+def test_save_batch(app_client: TestClient, db_session):
+
+    test_user_name = 'test_user'
+    test_session_id_1 = '8e140dd8-f921-4988-a91a-53cec6b3ad28'
+    test_session_id_2 = '6b0e5ad0-3f8c-4b8e-9a53-2f0f5c1d1e77'
+    test_created_ats = ['2012-01-01 00:00:00', '2012-01-01 00:00:05', '2012-01-01 00:00:10']
+
+    sample_image = cv2.imread('test/images/sample.png')
+
+    _, dst_data = cv2.imencode('.png', sample_image)
+
+    dst_str = base64.b64encode(dst_data)
+
+    user = UserFactory(name=test_user_name)
+    requests = [
+        RecordSaveInFactory(user=user,
+                            session_id=test_session_id_1,
+                            created_at=test_created_ats[0],
+                            screenshot_sensor={'image': dst_str}),
+        RecordSaveInFactory(user=user,
+                            session_id=test_session_id_1,
+                            created_at=test_created_ats[1],
+                            screenshot_sensor={'image': 'broken image'}),
+        RecordSaveInFactory(user=user,
+                            session_id=test_session_id_2,
+                            created_at=test_created_ats[2],
+                            screenshot_sensor={'image': dst_str}),
+    ]
+
+    response = app_client.post(f"{TEST_URL}/batch", json=jsonable_encoder(requests))
+
+    assert response.status_code == 200
+    assert [result['status'] for result in response.json()['results']] == ['success', 'failed', 'success']
+
+    assert len(db_session.execute(select(UserModel.id)).all()) == 1
+    assert len(db_session.execute(select(UserSessionModel.id)).all()) == 2
+    assert len(db_session.execute(select(FrameModel.id)).all()) == 2
+    assert len(db_session.execute(select(DriveSensorModel.id)).all()) == 2
+    assert len(db_session.execute(select(IpPortSensorModel.id)).all()) == 2
+    assert len(db_session.execute(select(ProcessSensorModel.id)).all()) == 2
+    assert len(set(db_session.execute(select(ScreenshotSensorModel.blob_id)).scalars().all())) == 1
+
+
+def test_upload(app_client: TestClient, db_session):
+
+    test_user_name = 'test_user'
+    test_created_at = '2012-01-01 00:00:00'
+
+    request = RecordSaveInFactory(
+        user=UserFactory(name=test_user_name),
+        created_at=test_created_at,
+    )
+    record = RecordUploadIn(**request.dict(exclude={'screenshot_sensor'}))
+
+    with open('test/images/sample.png', 'rb') as image_file:
+        response = app_client.post(f"{TEST_URL}/upload",
+                                   data={'record': record.json()},
+                                   files={'screenshot': ('sample.png', image_file, 'image/png')})
+
+    assert response.status_code == 200
+    assert response.json() == jsonable_encoder(RecordSaveOut(message='success'))
+
+    with open('test/images/sample.png', 'rb') as expected_file, \
+            open(db_session.execute(select(ScreenshotSensorModel.image_path)).scalar_one(), 'rb') as saved_file:
+        assert saved_file.read() == expected_file.read()
+
+
+def test_upload_invalid_record(app_client: TestClient):
+
+    with open('test/images/sample.png', 'rb') as image_file:
+        response = app_client.post(f"{TEST_URL}/upload",
+                                   data={'record': '{"created_at": "2012-01-01 00:00:00"}'},
+                                   files={'screenshot': ('sample.png', image_file, 'image/png')})
+
+    assert response.status_code == 400
+
+
+def test_upload_invalid_image(app_client: TestClient):
+
+    request = RecordSaveInFactory(created_at='2012-01-01 00:00:00')
+    record = RecordUploadIn(**request.dict(exclude={'screenshot_sensor'}))
+
+    response = app_client.post(f"{TEST_URL}/upload",
+                               data={'record': record.json()},
+                               files={'screenshot': ('sample.png', b'not an image', 'image/png')})
+
+    assert response.status_code == 400
+    assert response.json() == {'detail': ErrorMessage.INVALID_IMAGE}
+
+
+def test_save_spool(app_client: TestClient, monkeypatch, tmp_path):
+
+    monkeypatch.setattr(record_router, 'INGEST_MODE', 'spool')
+    monkeypatch.setattr(record_spool, 'directory', tmp_path)
+
+    request = RecordSaveInFactory()
+
+    response = app_client.post(f"{TEST_URL}/", content=request.json())
+
+    assert response.status_code == 202
+    assert response.json() == jsonable_encoder(RecordSaveOut(message='accepted'))
+    assert record_spool.read(0, 10)[0] == [request.json().encode()]
+
+
+def test_save_spool_full(app_client: TestClient, monkeypatch, tmp_path):
+
+    monkeypatch.setattr(record_router, 'INGEST_MODE', 'spool')
+    monkeypatch.setattr(record_spool, 'directory', tmp_path)
+    monkeypatch.setattr(record_spool, 'max_bytes', 10)
+
+    response = app_client.post(f"{TEST_URL}/", content=RecordSaveInFactory().json())
+
+    assert response.status_code == 503
+    assert response.json() == {'detail': ErrorMessage.SPOOL_FULL}
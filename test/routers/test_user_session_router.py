@@ -0,0 +1,145 @@
+import cv2
+from fastapi.testclient import TestClient
+
+from app.export import video_exporter
+from app.models import FrameModel, ScreenshotSensorModel
+from app.models.factories import UserSessionFactory
+from app.routers.setting import AppRoutes
+
+TEST_URL = f"{AppRoutes.UserSessions.PREFIX}{AppRoutes.UserSessions.GET_URL}"
+VIDEO_URL = f"{AppRoutes.UserSessions.PREFIX}{AppRoutes.UserSessions.VIDEO_URL}"
+
+
+def test_get_user_sessions(app_client: TestClient, db_session):
+
+    user_session_model = UserSessionFactory()
+    db_session.add(user_session_model)
+    db_session.commit()
+    user_session_id, session_id = user_session_model.id, str(user_session_model.session_id)
+    db_session.close()
+
+    for frame_create_time in ['2021-01-01 00:00:10', '2021-01-01 00:00:00']:
+        FrameModel.save(FrameModel(frame_create_time=frame_create_time, user_session_id=user_session_id))
+    db_session.commit()
+
+    response = app_client.get(TEST_URL)
+
+    assert response.status_code == 200
+    user_sessions = response.json()['user_sessions']
+    assert len(user_sessions) == 1
+    assert user_sessions[0]['sessionId'] == session_id
+    assert user_sessions[0]['startDate'] == '2021-01-01 00:00:00'
+    assert user_sessions[0]['endDate'] == '2021-01-01 00:00:10'
+
+    # the dates the sessions overlap
+    for params, count in [({'startDate': '2021-01-01T00:00:10'}, 1),
+                          ({'startDate': '2021-01-01T00:00:11'}, 0),
+                          ({'startDate': '2020-12-31T00:00:00', 'endDate': '2021-01-01T00:00:00'}, 1)]:
+        response = app_client.get(TEST_URL, params=params)
+
+        assert response.status_code == 200
+        assert len(response.json()['user_sessions']) == count
+
+
+def test_get_user_sessions_read_replica(app_client: TestClient, db_session, read_replica_lag):
+
+    user_session_model = UserSessionFactory()
+    db_session.add(user_session_model)
+    db_session.commit()
+    user_session_id = user_session_model.id
+    db_session.close()
+    FrameModel.save(FrameModel(frame_create_time='2021-01-01 00:00:00', user_session_id=user_session_id))
+    db_session.commit()
+
+    response = app_client.get(TEST_URL)
+
+    assert response.status_code == 200
+    assert len(response.json()['user_sessions']) == 1
+    assert (read_replica_lag.reads, read_replica_lag.fallbacks) == (1, 0)
+
+    # a replica too far behind is not read
+    read_replica_lag.max_lag = -1
+    response = app_client.get(TEST_URL)
+
+    assert response.status_code == 200
+    assert len(response.json()['user_sessions']) == 1
+    assert (read_replica_lag.reads, read_replica_lag.fallbacks) == (1, 1)
+
+
+def test_get_user_sessions_pages(app_client: TestClient, db_session):
+
+    user_session_models = UserSessionFactory.create_batch(3)
+    db_session.add_all(user_session_models)
+    db_session.commit()
+    for user_session_model in user_session_models:
+        FrameModel.save(FrameModel(frame_create_time='2021-01-01 00:00:00', user_session_id=user_session_model.id))
+    db_session.commit()
+    expected_session_ids = [str(user_session_model.session_id) for user_session_model
+                            in sorted(user_session_models, key=lambda model: model.user.name)]
+    db_session.close()
+
+    session_ids = []
+    cursor = None
+    for _ in range(2):
+        params = {'limit': 2} if cursor is None else {'limit': 2, 'cursor': cursor}
+        response = app_client.get(TEST_URL, params=params)
+        assert response.status_code == 200
+        session_ids.extend(user_session['sessionId'] for user_session in response.json()['user_sessions'])
+        cursor = response.json()['next_cursor']
+
+    assert session_ids == expected_session_ids
+    assert cursor is None
+
+    filtered_response = app_client.get(TEST_URL, params={'userName': user_session_models[1].user.name})
+
+    assert [user_session['sessionId'] for user_session in filtered_response.json()['user_sessions']] \
+        == [str(user_session_models[1].session_id)]
+
+    invalid_response = app_client.get(TEST_URL, params={'cursor': 'invalid'})
+
+    assert invalid_response.status_code == 400
+
+
+def test_get_user_session_video(app_client: TestClient, db_session, tmp_path, monkeypatch):
+
+    monkeypatch.setattr(video_exporter, 'export_dir', str(tmp_path))
+
+    user_session_model = UserSessionFactory()
+    db_session.add(user_session_model)
+    db_session.commit()
+    user_session_id, session_id = user_session_model.id, str(user_session_model.session_id)
+    db_session.close()
+
+    for frame_create_time in ['2021-01-01 00:00:00', '2021-01-01 00:00:10', '2021-01-01 00:00:20']:
+        frame_id = FrameModel.save(FrameModel(frame_create_time=frame_create_time, user_session_id=user_session_id))
+        db_session.add(ScreenshotSensorModel(image_path='test/images/sample.png',
+                                             frame_id=frame_id,
+                                             frame_create_time=frame_create_time))
+    db_session.commit()
+    db_session.close()
+
+    response = app_client.get(VIDEO_URL.format(session_id=session_id), params={'fps': 5, 'width': 320})
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'video/mp4'
+    video_path = tmp_path / 'video.mp4'
+    video_path.write_bytes(response.content)
+    capture = cv2.VideoCapture(str(video_path))
+    assert int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) == 3
+    capture.release()
+
+    # the second request is served from disk
+    cached_response = app_client.get(VIDEO_URL.format(session_id=session_id),
+                                     params={'fps': 5, 'width': 320},
+                                     headers={'If-None-Match': response.headers['etag']})
+
+    assert cached_response.status_code == 304
+
+    mjpeg_response = app_client.get(VIDEO_URL.format(session_id=session_id), params={'format': 'mjpeg'})
+
+    assert mjpeg_response.status_code == 200
+    assert mjpeg_response.headers['content-type'] == 'video/x-msvideo'
+
+    not_found_response = app_client.get(VIDEO_URL.format(session_id=str(UserSessionFactory.build().session_id)))
+
+    assert not_found_response.status_code == 404